@@ -165,13 +165,15 @@ def parse_dataset():
 # ============================================================
 
 def load_into_hippograph(conversations, api_url="http://localhost:5003", api_key=None,
-                         granularity="session"):
+                         granularity="session", batch_size=64):
     """Load LOCOMO into HippoGraph via REST API.
     
     Granularity:
     - "session": one note per session (~272 notes, avg 2692 chars)
     - "turn": one note per dialogue turn (~5882 notes, avg 123 chars)
     
+    Notes are sent batch_size at a time to /api/add_notes (1 = /api/add_note per note).
+    
     For benchmark, runs against separate container (port 5003) with clean DB.
     """
     import urllib.request
@@ -181,6 +183,8 @@ def load_into_hippograph(conversations, api_url="http://localhost:5003", api_key
     total_loaded = 0
     session_dia_map = {}
     errors = []
+    pending = []  # (note_key, note) for the current conversation
+    t0 = time.time()
     
     for conv in conversations:
         conv_id = conv["id"]
@@ -213,17 +217,7 @@ def load_into_hippograph(conversations, api_url="http://localhost:5003", api_key
                     "conv_id": conv_id
                 }
                 
-                payload = json.dumps({"content": content, "category": category})
-                req = urllib.request.Request(
-                    f"{api_url}/api/add_note?api_key={api_key}",
-                    data=payload.encode(), headers=headers, method="POST"
-                )
-                try:
-                    with urllib.request.urlopen(req, timeout=30) as resp:
-                        json.loads(resp.read())
-                        total_loaded += 1
-                except Exception as e:
-                    errors.append(f"{note_key}: {e}")
+                pending.append((note_key, {"content": content, "category": category}))
         
         elif granularity == "turn":
             for session in conv["sessions"]:
@@ -245,17 +239,7 @@ def load_into_hippograph(conversations, api_url="http://localhost:5003", api_key
                         "conv_id": conv_id
                     }
                     
-                    payload = json.dumps({"content": content, "category": category})
-                    req = urllib.request.Request(
-                        f"{api_url}/api/add_note?api_key={api_key}",
-                        data=payload.encode(), headers=headers, method="POST"
-                    )
-                    try:
-                        with urllib.request.urlopen(req, timeout=30) as resp:
-                            json.loads(resp.read())
-                            total_loaded += 1
-                    except Exception as e:
-                        errors.append(f"{note_key}: {e}")
+                    pending.append((note_key, {"content": content, "category": category}))
         
         elif granularity == "hybrid":
             CHUNK_SIZE = 3  # turns per note
@@ -283,17 +267,24 @@ def load_into_hippograph(conversations, api_url="http://localhost:5003", api_key
                         "conv_id": conv_id
                     }
                     
-                    payload = json.dumps({"content": content, "category": category})
-                    req = urllib.request.Request(
-                        f"{api_url}/api/add_note?api_key={api_key}",
-                        data=payload.encode(), headers=headers, method="POST"
-                    )
-                    try:
-                        with urllib.request.urlopen(req, timeout=30) as resp:
-                            json.loads(resp.read())
-                            total_loaded += 1
-                    except Exception as e:
-                        errors.append(f"{note_key}: {e}")
+                    pending.append((note_key, {"content": content, "category": category}))
+        
+        # Notes keep their order: one /api/add_notes call per batch_size notes
+        # (batch_size=1 uses /api/add_note, one request per note)
+        for start in range(0, len(pending), max(batch_size, 1)):
+            chunk = pending[start:start + max(batch_size, 1)]
+            if batch_size > 1:
+                url, payload = f"{api_url}/api/add_notes?api_key={api_key}", {"notes": [n for _, n in chunk]}
+            else:
+                url, payload = f"{api_url}/api/add_note?api_key={api_key}", chunk[0][1]
+            req = urllib.request.Request(url, data=json.dumps(payload).encode(), headers=headers, method="POST")
+            try:
+                with urllib.request.urlopen(req, timeout=30 * len(chunk)) as resp:
+                    json.loads(resp.read())
+                    total_loaded += len(chunk)
+            except Exception as e:
+                errors.append(f"{chunk[0][0]}..{chunk[-1][0]}: {e}")
+        pending = []
         
         print(f"  ✅ Conv {conv_id} ({speaker_a} & {speaker_b}): loaded")
     
@@ -302,7 +293,9 @@ def load_into_hippograph(conversations, api_url="http://localhost:5003", api_key
     with open(map_path, "w") as f:
         json.dump(session_dia_map, f, indent=2)
     
-    print(f"\n📊 Total loaded: {total_loaded} notes (granularity={granularity})")
+    elapsed = time.time() - t0
+    print(f"\n📊 Total loaded: {total_loaded} notes (granularity={granularity}, batch_size={batch_size}) "
+          f"in {elapsed:.1f}s ({total_loaded / max(elapsed, 1e-9):.1f} notes/s)")
     if errors:
         print(f"⚠️  Errors: {len(errors)}")
         for e in errors[:3]:
@@ -492,6 +485,8 @@ def main():
     parser.add_argument("--api-key", default="benchmark_key_locomo_2026", help="API key")
     parser.add_argument("--granularity", default="session", choices=["session", "turn", "hybrid"],
                         help="Note granularity: session (~272), turn (~5882), hybrid (3-turn groups ~1960)")
+    parser.add_argument("--batch-size", type=int, default=64,
+                        help="Notes per /api/add_notes call (1 = one /api/add_note request per note)")
     
     args = parser.parse_args()
     
@@ -503,7 +498,7 @@ def main():
     
     if args.load or args.all:
         conversations, qa_pairs = parse_dataset()
-        load_into_hippograph(conversations, args.api_url, args.api_key, args.granularity)
+        load_into_hippograph(conversations, args.api_url, args.api_key, args.granularity, args.batch_size)
     
     if args.eval or args.all:
         conversations, qa_pairs = parse_dataset()
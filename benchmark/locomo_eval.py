@@ -1,9 +1,9 @@
 #!/usr/bin/env python3
 """
 LOCOMO Evaluator — runs QA queries against loaded benchmark data.
-Run INSIDE Docker: docker exec hippograph-bench python3 /app/benchmark/locomo_eval.py
+Run INSIDE Docker: docker exec hippograph-bench python3 /app/benchmark/locomo_eval.py [--activation-mode ppr]
 """
-import json, sys, time, os
+import json, sys, time, os, argparse
 sys.path.insert(0, "/app/src")
 
 LOCOMO_DATA = "/app/benchmark/locomo10.json"
@@ -37,7 +37,7 @@ def init_engine():
         gc.add_edge(e["source_id"], e["target_id"], e["weight"])
     
     nids = [n["id"] for n in nodes]
-    etups = [(e["source_id"], e["target_id"], e["weight"]) for e in edges]
+    etups = [(e["source_id"], e["target_id"], e["weight"], e["edge_type"]) for e in edges]
     get_graph_metrics().compute(etups, nids)
     
     bm25_docs = [(n["id"], n.get("content","")) for n in nodes]
@@ -45,7 +45,7 @@ def init_engine():
     
     print(f"Engine: {len(nodes)} nodes, {len(edges)} edges")
 
-def run_eval(top_k=5):
+def run_eval(top_k=5, activation_mode=None, epsilon=None, results_out=RESULTS_OUT):
     from graph_engine import search_with_activation
     
     with open(LOCOMO_DATA) as f:
@@ -65,21 +65,25 @@ def run_eval(top_k=5):
             qas.append({"ci":ci, "q":qa["question"], "a":qa.get("answer",""),
                         "cat":CAT_NAMES.get(cat,"?"), "ev":qa.get("evidence",[])})
     
-    print(f"\nEval: {len(qas)} queries, top_k={top_k}")
+    print(f"\nEval: {len(qas)} queries, top_k={top_k}, activation_mode={activation_mode or 'default'}")
     stats = {}
+    latencies = []
     
     for i, qa in enumerate(qas):
         cf = f"locomo-conv{qa['ci']}"
         try:
-            hits = search_with_activation(qa["q"], limit=top_k, category_filter=cf)
+            t_q = time.perf_counter()
+            hits, _ = search_with_activation(qa["q"], limit=top_k, category_filter=cf,
+                                             activation_mode=activation_mode, epsilon=epsilon)
+            latencies.append((time.perf_counter() - t_q) * 1000)
         except Exception as e:
             continue
         
         hit = False
         rank = 0
         ev_set = set(qa["ev"])
-        for ri, (nid, score, node) in enumerate(hits):
-            if note_dia.get(nid, set()) & ev_set:
+        for ri, r in enumerate(hits):
+            if note_dia.get(r["id"], set()) & ev_set:
                 hit = True
                 rank = ri + 1
                 break
@@ -99,7 +103,7 @@ def run_eval(top_k=5):
     
     # Report
     print(f"\n{'='*60}")
-    print(f"LOCOMO BENCHMARK — HippoGraph")
+    print(f"LOCOMO BENCHMARK — HippoGraph ({activation_mode or 'default'} activation)")
     print(f"{'='*60}")
     t = sum(s["tot"] for s in stats.values())
     h = sum(s["hits"] for s in stats.values())
@@ -113,12 +117,27 @@ def run_eval(top_k=5):
             mr = s["mrr"]/s["tot"] if s["tot"] else 0
             print(f"  {cn:12s}: Recall@{top_k}={r:5.1f}% ({s['hits']:3d}/{s['tot']:3d}) MRR={mr:.3f}")
     
-    with open(RESULTS_OUT,"w") as f:
-        json.dump({"stats":stats,"top_k":top_k,"total":t},f,indent=2)
-    print(f"\nSaved: {RESULTS_OUT}")
+    latencies.sort()
+    lat = {"p50_ms": latencies[len(latencies)//2], "p99_ms": latencies[int(len(latencies)*0.99)]} if latencies else {}
+    if lat:
+        print(f"\nLatency: p50={lat['p50_ms']:.1f}ms  p99={lat['p99_ms']:.1f}ms")
+    
+    summary = {"stats":stats,"top_k":top_k,"total":t,"activation_mode":activation_mode,
+               "recall":h/t if t else 0.0,"mrr":m/t if t else 0.0,"latency":lat}
+    if results_out:
+        with open(results_out,"w") as f:
+            json.dump(summary,f,indent=2)
+        print(f"\nSaved: {results_out}")
+    return summary
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="LOCOMO retrieval evaluation")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--activation-mode", choices=["spreading", "ppr"], default=None)
+    parser.add_argument("--epsilon", type=float, default=None)
+    args = parser.parse_args()
+    out = RESULTS_OUT if not args.activation_mode else RESULTS_OUT.replace(".json", f"_{args.activation_mode}.json")
     t0 = time.time()
     init_engine()
-    run_eval(top_k=5)
+    run_eval(top_k=args.top_k, activation_mode=args.activation_mode, epsilon=args.epsilon, results_out=out)
     print(f"\nTime: {time.time()-t0:.1f}s")
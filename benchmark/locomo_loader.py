@@ -11,7 +11,7 @@ import os
 sys.path.insert(0, "/app/src")
 
 from database import get_connection, init_database
-from graph_engine import add_note_with_links
+from graph_engine import add_notes_with_links
 
 LOCOMO_DATA = "/app/benchmark/locomo10.json"
 
@@ -30,6 +30,7 @@ def load_sessions():
         sb = conv.get("speaker_b", f"B{conv_idx}")
         
         sn = 1
+        notes, meta = [], []
         while f"session_{sn}" in conv:
             turns = conv[f"session_{sn}"]
             ts = conv.get(f"session_{sn}_date_time", "")
@@ -46,23 +47,22 @@ def load_sessions():
                 if did:
                     dia_ids.append(did)
             
-            content = "\n".join(lines)
-            cat = f"locomo-conv{conv_idx}"
-            
-            try:
-                result = add_note_with_links(content, category=cat)
-                nid = result.get("id") if isinstance(result, dict) else result
-                session_map[str(nid)] = {
-                    "dia_ids": dia_ids,
-                    "conv_id": conv_idx,
-                    "session_num": sn
-                }
-                total += 1
-            except Exception as e:
-                print(f"  ERR c{conv_idx} s{sn}: {e}")
-            
+            notes.append({"content": "\n".join(lines), "category": f"locomo-conv{conv_idx}"})
+            meta.append({"dia_ids": dia_ids, "conv_id": conv_idx, "session_num": sn})
             sn += 1
         
+        # One batch per conversation: one encode, one transaction
+        try:
+            batch = add_notes_with_links(notes)
+            for result, info in zip(batch["results"], meta):
+                if "node_id" in result:
+                    session_map[str(result["node_id"])] = info
+                    total += 1
+                else:
+                    print(f"  SKIP c{conv_idx} s{info['session_num']}: {result.get('message')}")
+        except Exception as e:
+            print(f"  ERR c{conv_idx}: {e}")
+        
         print(f"  Conv {conv_idx} ({sa} & {sb}): {sn-1} sessions")
     
     mp = "/app/benchmark/session_dia_map.json"
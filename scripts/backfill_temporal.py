@@ -14,7 +14,7 @@ import argparse
 from datetime import datetime
 
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
-from temporal_extractor import extract_temporal_expressions
+from temporal_extractor import extract_temporal_batch
 
 
 def backfill(db_path: str, dry_run: bool = False):
@@ -35,18 +35,17 @@ def backfill(db_path: str, dry_run: bool = False):
     updated = 0
     skipped = 0
     
+    # Use each note's creation time as reference for relative expressions
+    ref_dates = []
     for note in notes:
-        note_id = note['id']
-        content = note['content']
-        timestamp = note['timestamp']
-        
-        # Use note's creation time as reference for relative expressions
         try:
-            ref_date = datetime.fromisoformat(timestamp) if timestamp else datetime.now()
+            ref_dates.append(datetime.fromisoformat(note['timestamp']) if note['timestamp'] else None)
         except ValueError:
-            ref_date = datetime.now()
-        
-        result = extract_temporal_expressions(content, ref_date)
+            ref_dates.append(None)
+    results = extract_temporal_batch([note['content'] for note in notes], ref_dates)
+    
+    for note, result in zip(notes, results):
+        note_id = note['id']
         
         if result['t_event_start']:
             if dry_run:
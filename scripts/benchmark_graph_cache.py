@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Graph cache memory benchmark: tuple lists vs CSR arrays.
+
+Generates a synthetic graph (default 1M edge rows, stored like the DB
+stores them: two directed rows per undirected edge) and measures:
+  - legacy dict-of-lists representation (tracemalloc)
+  - CSR GraphCache (array bytes + tracemalloc of build)
+  - get_neighbors() latency on random nodes
+
+Usage:
+    python3 scripts/benchmark_graph_cache.py [--edges 1000000] [--nodes 50000]
+"""
+import os
+import sys
+import time
+import argparse
+import tracemalloc
+from collections import defaultdict
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from graph_cache import GraphCache
+
+EDGE_TYPES = ["semantic", "entity", "temporal_chain", "consolidation"]
+
+
+def synth_edges(n_rows, n_nodes, seed=42):
+    """n_rows edge dicts: n_rows/2 undirected edges, each as two directed rows."""
+    rng = np.random.default_rng(seed)
+    half = n_rows // 2
+    src = rng.integers(1, n_nodes + 1, half)
+    dst = rng.integers(1, n_nodes + 1, half)
+    weights = rng.uniform(0.3, 1.0, half).round(4)
+    types = rng.integers(0, len(EDGE_TYPES), half)
+    edges = []
+    for s, d, w, t in zip(src.tolist(), dst.tolist(), weights.tolist(), types.tolist()):
+        et = EDGE_TYPES[t]
+        edges.append({"source_id": s, "target_id": d, "weight": w, "edge_type": et})
+        edges.append({"source_id": d, "target_id": s, "weight": w, "edge_type": et})
+    return edges
+
+
+def legacy_build(all_edges):
+    """Previous GraphCache.build: both directions per row as Python tuples."""
+    edges = defaultdict(list)
+    for edge in all_edges:
+        edges[edge["source_id"]].append((edge["target_id"], edge["weight"], edge["edge_type"]))
+        edges[edge["target_id"]].append((edge["source_id"], edge["weight"], edge["edge_type"]))
+    return edges
+
+
+def traced(fn, *args):
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    result = fn(*args)
+    elapsed = time.perf_counter() - t0
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, current, elapsed
+
+
+def time_lookups(get, node_ids):
+    t0 = time.perf_counter()
+    total = 0
+    for nid in node_ids:
+        total += len(get(nid))
+    return (time.perf_counter() - t0) / len(node_ids) * 1e6, total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Graph cache memory benchmark")
+    parser.add_argument("--edges", type=int, default=1_000_000, help="Edge rows (DB rows)")
+    parser.add_argument("--nodes", type=int, default=50_000)
+    parser.add_argument("--lookups", type=int, default=20_000)
+    args = parser.parse_args()
+
+    print(f"🧪 Generating {args.edges:,} edge rows over {args.nodes:,} nodes...")
+    all_edges = synth_edges(args.edges, args.nodes)
+
+    legacy, legacy_bytes, legacy_s = traced(legacy_build, all_edges)
+    legacy_entries = sum(len(v) for v in legacy.values())
+
+    cache = GraphCache()
+    _, csr_traced, csr_s = traced(cache.build, all_edges)
+    mem = cache.memory_usage()
+    stats = cache.get_stats()
+
+    rng = np.random.default_rng(0)
+    probe = rng.integers(1, args.nodes + 1, args.lookups).tolist()
+    legacy_us, _ = time_lookups(lambda n: legacy.get(n, []), probe)
+    csr_us, _ = time_lookups(cache.get_neighbors, probe)
+
+    print(f"\n{'':<22} {'entries':>12} {'memory MB':>10} {'B/entry':>8} {'build s':>8} {'get µs':>8}")
+    print("-" * 74)
+    print(f"{'tuple lists (legacy)':<22} {legacy_entries:>12,} {legacy_bytes / 1e6:>10.1f} "
+          f"{legacy_bytes / legacy_entries:>8.1f} {legacy_s:>8.2f} {legacy_us:>8.2f}")
+    print(f"{'CSR arrays':<22} {stats['edge_count']:>12,} {mem['total_bytes'] / 1e6:>10.1f} "
+          f"{mem['bytes_per_entry']:>8.1f} {csr_s:>8.2f} {csr_us:>8.2f}")
+    print(f"\n📉 Memory: {legacy_bytes / max(mem['total_bytes'], 1):.1f}x smaller "
+          f"(build peak-retained {csr_traced / 1e6:.1f} MB incl. arrays)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,358 @@
+#!/usr/bin/env python3
+"""
+Offline bulk loader: import notes from JSON / NDJSON straight into SQLite.
+
+add_note / add_notes go through the server one request at a time; this
+loads large exports and datasets directly:
+
+  1. Stream records (NDJSON line by line, a top-level JSON array item by
+     item; an export_memory.py file {"nodes": [...]} is read whole) and
+     turn them into notes. Formats: notes ({"content": ...}, also
+     export_memory.py nodes, timestamps kept), locomo (one note per
+     conversation session, as benchmark/locomo_loader.py) and skills
+     (convert_to_json.py output, formatted as add_skills.py does).
+  2. Skip notes whose content is already stored, or earlier in the load
+     (content_hash; --keep-duplicates loads them anyway), then encode
+     --batch-size notes at a time on a pool of --workers threads
+     (chunks of ENCODE_BATCH_SIZE), extracting entities for the previous
+     batch while the next one encodes.
+  3. Write each batch with create_notes_batch on a connection tuned for
+     bulk load (WAL, synchronous=OFF, large cache). The batch and the
+     resume checkpoint (settings table) commit in the same transaction.
+  4. Link: build one HNSW index over every note once, then give each
+     loaded note edges to its MAX_SEMANTIC_LINKS nearest notes above
+     SIMILARITY_THRESHOLD (earlier and later notes alike).
+
+The server builds its ANN, BM25 and graph-cache indexes from the database
+at startup, so restart it afterwards (stop it during the load: the loader
+is meant to be the only writer).
+
+Resume: re-running with the same input skips the records already loaded
+(and linking, if done). --restart ignores the checkpoint and loads the
+whole file again; a changed input file is refused unless --restart is
+given.
+
+Usage:
+    python3 scripts/bulk_load.py INPUT [--db-path data/memory.db] [--format auto|notes|locomo|skills]
+        [--category imported] [--batch-size 1000] [--workers 2] [--keep-duplicates] [--no-link] [--restart]
+        [--dry-run]
+"""
+import sys
+import os
+import json
+import time
+import hashlib
+import argparse
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+import database
+from database import (get_connection, create_notes_batch, create_edges, get_setting, set_setting,
+                      content_hash, find_exact_duplicates)
+
+FORMATS = ("auto", "notes", "locomo", "skills")
+LINK_BATCH = 5000  # loaded notes linked per transaction
+
+
+# ===== Input =====
+
+def iter_json_array(f, chunk_size=1 << 20):
+    """Items of a top-level JSON array, decoded one at a time."""
+    decoder = json.JSONDecoder()
+    buf = f.read(chunk_size).lstrip()
+    if not buf.startswith('['):
+        raise ValueError("expected a JSON array")
+    buf, eof = buf[1:], False
+    while True:
+        buf = buf.lstrip().lstrip(',').lstrip()
+        if buf.startswith(']'):
+            return
+        try:
+            item, end = decoder.raw_decode(buf)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            more = f.read(chunk_size)
+            eof = not more
+            buf += more
+            continue
+        yield item
+        buf = buf[end:]
+        if len(buf) < chunk_size and not eof:
+            more = f.read(chunk_size)
+            eof = not more
+            buf += more
+
+
+def iter_records(path):
+    """Input records: NDJSON lines, JSON array items, or the nodes of an export."""
+    with open(path, encoding='utf-8') as f:
+        if path.endswith(('.ndjson', '.jsonl')):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+            return
+        head = f.read(1)
+        while head.isspace():
+            head = f.read(1)
+        f.seek(0)
+        if head == '[':
+            yield from iter_json_array(f)
+        else:
+            data = json.load(f)
+            yield from data.get("nodes", []) if isinstance(data, dict) else []
+
+
+def detect_format(record):
+    if "conversation" in record:
+        return "locomo"
+    if "content" in record:
+        return "notes"
+    if "name" in record and ("purpose" in record or "when_to_use" in record):
+        return "skills"
+    raise ValueError(f"unrecognised record (keys: {sorted(record)[:8]})")
+
+
+def skill_content(skill):
+    """Same text as scripts/add_skills.py"""
+    content = f"SKILL LEARNED: {skill['name']}"
+    if 'purpose' in skill:
+        content += f"\n\nPurpose: {skill['purpose']}"
+    if 'when_to_use' in skill:
+        content += f"\n\nWhen to use: {skill['when_to_use']}"
+    if 'tags' in skill:
+        content += f"\n\nTags: {', '.join(skill['tags'])}"
+    return content
+
+
+def record_notes(record, fmt, category=None):
+    """Notes (dicts for create_notes_batch) from one input record."""
+    if fmt == "notes":
+        if not record.get("content"):
+            return []
+        note = {k: record[k] for k in ("content", "category", "importance", "timestamp", "emotional_tone",
+                                       "emotional_intensity", "emotional_reflection") if record.get(k) is not None}
+        if category:
+            note["category"] = category
+        return [note]
+    if fmt == "skills":
+        return [{"content": skill_content(record), "category": category or record.get("category", "general"),
+                 "importance": record.get("importance", "normal")}]
+    # locomo: one note per session, as benchmark/locomo_loader.py
+    conv = record["conversation"]
+    sa, sb = conv.get("speaker_a", "A"), conv.get("speaker_b", "B")
+    notes, sn = [], 1
+    while f"session_{sn}" in conv:
+        lines = [f"[{sa} & {sb} — {conv.get(f'session_{sn}_date_time', '')}]"]
+        lines += [f"{t.get('speaker', '?')}: {t['text']}" for t in conv[f"session_{sn}"] if t.get("text")]
+        notes.append({"content": "\n".join(lines), "category": category or "locomo"})
+        sn += 1
+    return notes
+
+
+def iter_batches(records, fmt, category, batch_size, skip):
+    """(records consumed so far, notes) per batch; batches end on record boundaries."""
+    batch, consumed = [], 0
+    for record in records:
+        consumed += 1
+        if consumed <= skip:
+            continue
+        if fmt == "auto":
+            fmt = detect_format(record)
+        batch.extend(record_notes(record, fmt, category))
+        if len(batch) >= batch_size:
+            yield consumed, batch
+            batch = []
+    yield consumed, batch
+
+
+# ===== Load =====
+
+def checkpoint_key(path):
+    return "bulk_load:" + hashlib.sha1(os.path.abspath(path).encode()).hexdigest()[:16]
+
+
+@contextmanager
+def bulk_connection():
+    """get_connection() with pragmas for bulk writes (they are per connection)."""
+    with get_connection() as conn:
+        conn.execute("PRAGMA synchronous = OFF")  # an OS crash may drop the last batches, checkpoint included; resume redoes them
+        conn.execute("PRAGMA temp_store = MEMORY")
+        conn.execute("PRAGMA cache_size = -262144")  # 256 MB
+        yield conn
+
+
+def drop_exact_duplicates(notes, inflight):
+    """
+    Notes whose content is neither stored nor in a batch still being
+    encoded (inflight hashes), and how many were dropped. Adds the kept
+    notes' hashes to inflight.
+    """
+    hashes = [content_hash(note["content"]) for note in notes]
+    stored = find_exact_duplicates(hashes)
+    kept = []
+    for note, h in zip(notes, hashes):
+        if h in stored or h in inflight:
+            continue
+        inflight.add(h)
+        kept.append(note)
+    return kept, len(notes) - len(kept)
+
+
+def encode_batch(model, notes):
+    from graph_engine import _embedding_text, ENCODE_BATCH_SIZE
+    texts = [_embedding_text(n["content"], n.get("emotional_tone"), n.get("emotional_reflection")) for n in notes]
+    if not texts:
+        return np.zeros((0, model.dimension), dtype=np.float32)
+    return np.concatenate([np.asarray(model.encode(texts[i:i + ENCODE_BATCH_SIZE]), dtype=np.float32)
+                           for i in range(0, len(texts), ENCODE_BATCH_SIZE)])
+
+
+def load(path, fmt="auto", category=None, batch_size=1000, workers=2, restart=False, keep_duplicates=False):
+    """Phase 1: notes, entities and node_entities. Returns the checkpoint dict."""
+    from stable_embeddings import get_model
+    from entity_extractor import extract_entities_batch
+    from entity_graph import MATERIALIZE_ENTITY_EDGES, ENTITY_EDGE_WEIGHT, ENTITY_LINK_MAX_DF, ENTITY_LINK_TOP_K
+
+    key = checkpoint_key(path)
+    size = os.path.getsize(path)
+    state = json.loads(get_setting(key, "null") or "null")
+    if state and not restart:
+        if state["size"] != size:
+            raise SystemExit(f"❌ {path} changed since the interrupted load ({state['size']} → {size} bytes); "
+                             f"use --restart to load it from the start")
+        if state["loaded"]:
+            print(f"⏭️  Already loaded: {state['notes']:,} notes from {state['records']:,} records")
+            return state
+        print(f"↩️  Resuming after {state['records']:,} records ({state['notes']:,} notes loaded)")
+    else:
+        state = {"size": size, "records": 0, "notes": 0, "duplicates": 0, "first_id": None, "last_id": None,
+                 "loaded": False, "linked": False}
+
+    model = get_model()
+    t0 = time.time()
+    loaded_before = state["notes"]
+    batches = iter_batches(iter_records(path), fmt, category, batch_size, state["records"])
+    inflight = set()  # content hashes of batches encoded but not yet written
+
+    def write(consumed, notes, future, duplicates):
+        _write_batch(key, state, consumed, notes, future, extract_entities_batch, MATERIALIZE_ENTITY_EDGES,
+                     ENTITY_EDGE_WEIGHT, ENTITY_LINK_MAX_DF, ENTITY_LINK_TOP_K, duplicates)
+        inflight.difference_update(content_hash(note["content"]) for note in notes)
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        # Keep `workers` batches encoding ahead of the writer
+        pending = []
+        for consumed, notes in batches:
+            duplicates = 0
+            if not keep_duplicates:
+                notes, duplicates = drop_exact_duplicates(notes, inflight)
+            pending.append((consumed, notes, pool.submit(encode_batch, model, notes), duplicates))
+            if len(pending) >= max(1, workers):
+                write(*pending.pop(0))
+                rate = (state["notes"] - loaded_before) / max(time.time() - t0, 1e-9)
+                print(f"  {state['records']:,} records, {state['notes']:,} notes, "
+                      f"{state.get('duplicates', 0):,} exact duplicates skipped ({rate:,.0f} notes/s)")
+        for item in pending:
+            write(*item)
+
+    state["loaded"] = True
+    set_setting(key, json.dumps(state))
+    seconds = time.time() - t0
+    added = state["notes"] - loaded_before
+    print(f"✅ Loaded {added:,} notes in {seconds:.1f}s ({added / max(seconds, 1e-9):,.0f} notes/s), "
+          f"{state.get('duplicates', 0):,} exact duplicates skipped")
+    return state
+
+
+def _write_batch(key, state, consumed, notes, future, extract_entities_batch,
+                 materialize, entity_weight, link_max_df, link_top_k, duplicates=0):
+    """Notes of one batch plus the checkpoint, in one transaction."""
+    embeddings = future.result()
+    for note, embedding in zip(notes, embeddings):
+        note["embedding"] = embedding.tobytes()
+    note_entities = extract_entities_batch([note["content"] for note in notes])
+    with bulk_connection() as conn:
+        written = create_notes_batch(notes, note_entities, entity_edge_weight=entity_weight if materialize else None,
+                                     entity_link_max_df=link_max_df, entity_link_top_k=link_top_k, conn=conn)
+        update = {"records": consumed, "notes": state["notes"] + len(notes),
+                  "duplicates": state.get("duplicates", 0) + duplicates}
+        if written["node_ids"]:
+            update["first_id"] = state["first_id"] or written["node_ids"][0]
+            update["last_id"] = written["node_ids"][-1]
+        set_setting(key, json.dumps({**state, **update}), conn=conn)
+    state.update(update)  # only once committed
+
+
+def link(path, state):
+    """Phase 2: semantic edges for the loaded notes from one HNSW index over all notes."""
+    from ann_index import ANNIndex
+    from graph_engine import MAX_SEMANTIC_LINKS, SIMILARITY_THRESHOLD
+
+    if state["linked"] or state["first_id"] is None:
+        return 0
+    t0 = time.time()
+    with get_connection() as conn:
+        rows = conn.execute("SELECT id, embedding FROM nodes WHERE embedding IS NOT NULL").fetchall()
+    ids = np.array([r[0] for r in rows], dtype=np.int64)
+    vectors = np.vstack([np.frombuffer(r[1], dtype=np.float32) for r in rows])
+    index = ANNIndex(dimension=vectors.shape[1])
+    index.add_vectors(ids.tolist(), vectors)
+    print(f"📊 Built ANN index over {len(ids):,} notes in {time.time() - t0:.1f}s")
+
+    loaded = np.flatnonzero((ids >= state["first_id"]) & (ids <= state["last_id"]))
+    edges = 0
+    for start in range(0, len(loaded), LINK_BATCH):
+        rows = []
+        for i in loaded[start:start + LINK_BATCH]:
+            hits = index.search(vectors[i], k=MAX_SEMANTIC_LINKS + 1, min_similarity=SIMILARITY_THRESHOLD)
+            rows.extend((int(ids[i]), rid, sim, "semantic") for rid, sim in hits if rid != ids[i])
+        with bulk_connection() as conn:
+            edges += len(create_edges(rows, conn=conn))
+        print(f"  linked {min(start + LINK_BATCH, len(loaded)):,}/{len(loaded):,} notes")
+
+    state["linked"] = True
+    set_setting(checkpoint_key(path), json.dumps(state))
+    print(f"🔗 Wrote {edges:,} semantic edges in {time.time() - t0:.1f}s")
+    return edges
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Bulk-load notes from JSON/NDJSON into the database")
+    parser.add_argument('input', help="JSON array, NDJSON (.ndjson/.jsonl) or export_memory.py file")
+    parser.add_argument('--db-path', default='data/memory.db')
+    parser.add_argument('--format', choices=FORMATS, default='auto')
+    parser.add_argument('--category', help="Category for every note (default: from the record)")
+    parser.add_argument('--batch-size', type=int, default=1000, help="Notes per encode batch and transaction")
+    parser.add_argument('--workers', type=int, default=2, help="Encoder threads")
+    parser.add_argument('--no-link', action='store_true', help="Skip semantic linking")
+    parser.add_argument('--keep-duplicates', action='store_true',
+                        help="Also load notes whose exact content is already stored")
+    parser.add_argument('--restart', action='store_true', help="Ignore the resume checkpoint")
+    parser.add_argument('--dry-run', action='store_true', help="Parse and count only")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.input):
+        print(f"❌ Input not found: {args.input}")
+        sys.exit(1)
+
+    if args.dry_run:
+        records = notes = 0
+        for records, batch in iter_batches(iter_records(args.input), args.format, args.category, 10000, 0):
+            notes += len(batch)
+        print(f"DRY RUN: {records:,} records → {notes:,} notes")
+        sys.exit(0)
+
+    database.DB_PATH = args.db_path
+    database.init_database()
+    with get_connection() as conn:
+        conn.execute("PRAGMA journal_mode = WAL")  # persistent; readers are not blocked by the load
+
+    state = load(args.input, args.format, args.category, args.batch_size, args.workers, args.restart,
+                 args.keep_duplicates)
+    if not args.no_link:
+        link(args.input, state)
+    print("Restart the server so it rebuilds the ANN, BM25 and graph-cache indexes.")
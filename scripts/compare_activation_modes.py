@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Compare activation modes (spreading vs ppr vs diffusion vs community) on the same engine.
+
+Runs the regression queries from benchmark_search.py (P@5, Top-1) and,
+with --locomo, the LOCOMO evaluation (Recall@k, MRR) once per mode, and
+reports latency plus graph work (nodes touched / edges expanded, read
+back from search_logs). Every mode's top-5 is also compared with live
+spreading's (overlap@5), which shows how far precomputed diffusion
+vectors drift from the live ranking and what community-scoped spreading
+loses by pruning edges between communities.
+
+Run inside Docker:
+    docker exec hippograph python3 /app/scripts/compare_activation_modes.py
+    docker exec hippograph-bench python3 /app/scripts/compare_activation_modes.py --locomo
+    ... --modes spreading,ppr,diffusion,community --epsilon 1e-4
+"""
+import os
+import sys
+import time
+import sqlite3
+import argparse
+
+sys.path.insert(0, '/app/src')
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+
+def last_search_work():
+    """(nodes_touched, edges_expanded) of the most recent logged search."""
+    from search_logger import DB_PATH
+    try:
+        conn = sqlite3.connect(DB_PATH)
+        row = conn.execute(
+            "SELECT nodes_touched, edges_expanded FROM search_logs ORDER BY id DESC LIMIT 1"
+        ).fetchone()
+        conn.close()
+        return row or (None, None)
+    except sqlite3.OperationalError:
+        return (None, None)
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))] if values else 0.0
+
+
+def run_regression(mode, epsilon):
+    """P@5 / Top-1 on the reference queries, plus latency and work."""
+    from graph_engine import search_with_activation
+    from benchmark_search import BENCHMARKS
+
+    p5_total, top1_total = 0.0, 0
+    latencies, nodes, edges, rankings = [], [], [], []
+    for query, expected in BENCHMARKS:
+        t0 = time.perf_counter()
+        results, _ = search_with_activation(query, limit=5, activation_mode=mode, epsilon=epsilon)
+        latencies.append((time.perf_counter() - t0) * 1000)
+        n, e = last_search_work()
+        if n is not None:
+            nodes.append(n)
+            edges.append(e)
+        top5 = [r["id"] for r in results[:5]]
+        rankings.append(top5)
+        p5_total += sum(1 for eid in expected if eid in top5) / min(len(expected), 5)
+        top1_total += 1 if top5 and top5[0] in expected else 0
+
+    n = len(BENCHMARKS)
+    return {
+        "p5": p5_total / n,
+        "top1": top1_total / n,
+        "p50_ms": percentile(latencies, 0.5),
+        "p99_ms": percentile(latencies, 0.99),
+        "avg_nodes": sum(nodes) / len(nodes) if nodes else None,
+        "avg_edges": sum(edges) / len(edges) if edges else None,
+        "rankings": rankings,
+    }
+
+
+def overlap_with(rankings, reference):
+    """Mean |top-5 ∩ reference top-5| / 5 over the benchmark queries."""
+    pairs = [(a, b) for a, b in zip(rankings, reference) if b]
+    if not pairs:
+        return None
+    return sum(len(set(a) & set(b)) / len(b) for a, b in pairs) / len(pairs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare activation modes")
+    parser.add_argument("--modes", default="spreading,ppr,diffusion,community", help="Comma-separated activation modes")
+    parser.add_argument("--epsilon", type=float, default=None, help="Epsilon passed to every mode")
+    parser.add_argument("--locomo", action="store_true", help="Also run LOCOMO (needs benchmark data loaded)")
+    parser.add_argument("--top-k", type=int, default=5)
+    args = parser.parse_args()
+    modes = [m.strip() for m in args.modes.split(",") if m.strip()]
+
+    rows = {}
+    for mode in modes:
+        print(f"\n=== Regression queries: {mode} ===")
+        rows[mode] = run_regression(mode, args.epsilon)
+
+    reference = rows["spreading"]["rankings"] if "spreading" in rows else None
+    print(f"\n{'mode':<10} {'P@5':>6} {'Top-1':>6} {'p50 ms':>8} {'p99 ms':>8} {'nodes':>8} {'edges':>8} {'vs live':>8}")
+    print("-" * 69)
+    for mode, r in rows.items():
+        nodes = f"{r['avg_nodes']:.0f}" if r["avg_nodes"] is not None else "-"
+        edges = f"{r['avg_edges']:.0f}" if r["avg_edges"] is not None else "-"
+        overlap = overlap_with(r["rankings"], reference) if reference else None
+        overlap = f"{overlap:.0%}" if overlap is not None else "-"
+        print(f"{mode:<10} {r['p5']:>6.0%} {r['top1']:>6.0%} {r['p50_ms']:>8.1f} {r['p99_ms']:>8.1f} "
+              f"{nodes:>8} {edges:>8} {overlap:>8}")
+
+    if args.locomo:
+        sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'benchmark'))
+        sys.path.insert(0, '/app/benchmark')
+        from locomo_eval import init_engine, run_eval
+        init_engine()
+        summaries = {m: run_eval(top_k=args.top_k, activation_mode=m, epsilon=args.epsilon, results_out=None)
+                     for m in modes}
+        print(f"\n{'mode':<10} {f'R@{args.top_k}':>7} {'MRR':>6} {'p50 ms':>8} {'p99 ms':>8}")
+        print("-" * 44)
+        for mode, s in summaries.items():
+            lat = s.get("latency", {})
+            print(f"{mode:<10} {s['recall']:>7.1%} {s['mrr']:>6.3f} "
+                  f"{lat.get('p50_ms', 0):>8.1f} {lat.get('p99_ms', 0):>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Drop materialised entity edges.
+
+Spreading now reaches notes that share an entity through the node_entities
+bipartite graph (note → entity → notes, see src/entity_graph.py), so the
+pairwise `entity` rows in the edges table are redundant. This reports how
+many there are against the node_entities links that replace them, then
+deletes them. node_entities itself is left untouched.
+
+Run with the server stopped (or restart it afterwards so the graph cache
+is rebuilt), and keep MATERIALIZE_ENTITY_EDGES unset/false so new notes do
+not write them again.
+
+Usage:
+    python3 scripts/drop_entity_edges.py [--db-path data/memory.db] [--dry-run] [--vacuum]
+"""
+import sys
+import os
+import sqlite3
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+from entity_graph import EntityGraph
+
+
+def analyze(conn):
+    total = conn.execute("SELECT COUNT(*) FROM edges").fetchone()[0]
+    entity_edges = conn.execute("SELECT COUNT(*) FROM edges WHERE edge_type = 'entity'").fetchone()[0]
+    graph = EntityGraph()
+    graph.build(conn.execute("SELECT node_id, entity_id FROM node_entities"))
+    stats = graph.get_stats()
+
+    print(f"Edges: {total:,}")
+    print(f"  entity: {entity_edges:,} ({entity_edges / max(total, 1):.1%})")
+    print(f"  other:  {total - entity_edges:,}")
+    print(f"node_entities links: {stats['links']:,} ({stats['entities']:,} entities on {stats['notes']:,} notes)")
+    print(f"  largest entity: {stats['max_df']:,} notes; {stats['capped_entities']:,} above ENTITY_SPREAD_MAX_DF={graph.max_df}")
+    return entity_edges
+
+
+def drop(db_path: str, dry_run: bool = False, vacuum: bool = False):
+    conn = sqlite3.connect(db_path)
+    entity_edges = analyze(conn)
+
+    if dry_run:
+        print(f"\nDRY RUN: would delete {entity_edges:,} entity edges")
+        conn.close()
+        return
+
+    conn.execute("DELETE FROM edges WHERE edge_type = 'entity'")
+    conn.commit()
+    print(f"\n✅ Deleted {entity_edges:,} entity edges")
+    if vacuum:
+        conn.execute("VACUUM")
+        print("🧹 Vacuumed database")
+    conn.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Drop materialised entity edges")
+    parser.add_argument('--db-path', default='data/memory.db')
+    parser.add_argument('--dry-run', action='store_true')
+    parser.add_argument('--vacuum', action='store_true', help="VACUUM afterwards to reclaim the space")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db_path):
+        print(f"❌ Database not found: {args.db_path}")
+        sys.exit(1)
+
+    drop(args.db_path, args.dry_run, args.vacuum)
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Merge entities whose names differ only by case.
+
+Entity lookups used SQLite's LOWER(name), which only folds ASCII, so
+non-ASCII case variants ("Москва" / "москва") could be stored as separate
+entities. init_database() then cannot put the unique index on
+entities.name_norm and falls back to a plain one. This keeps the lowest id
+of every name_norm group, moves the other entities' note links onto it,
+deletes the duplicates and creates the unique index.
+
+Restart the server afterwards so the entity graph and entity dictionary
+reload.
+
+Usage:
+    python3 scripts/merge_entity_names.py [--db-path data/memory.db] [--dry-run]
+"""
+import sys
+import os
+import sqlite3
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+from database import normalize_entity_name
+
+
+def merge(db_path, dry_run=False):
+    """Returns {"groups", "merged", "links_moved"}."""
+    conn = sqlite3.connect(db_path)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        missing = conn.execute("SELECT id, name FROM entities WHERE name_norm IS NULL").fetchall()
+        conn.executemany("UPDATE entities SET name_norm = ? WHERE id = ?",
+                         [(normalize_entity_name(name), eid) for eid, name in missing])
+        groups = conn.execute("""
+            SELECT name_norm, MIN(id), GROUP_CONCAT(id) FROM entities
+            GROUP BY name_norm HAVING COUNT(*) > 1
+        """).fetchall()
+        # (duplicate id, kept id)
+        pairs = [(int(eid), keep) for _, keep, ids in groups for eid in ids.split(',') if int(eid) != keep]
+        result = {"groups": len(groups), "merged": len(pairs), "links_moved": 0}
+        if dry_run:
+            for name_norm, keep, ids in groups:
+                print(f"  {name_norm!r}: keep #{keep}, merge {ids}")
+            conn.rollback()
+            return result
+
+        for dup, keep in pairs:
+            conn.execute("""
+                INSERT OR IGNORE INTO node_entities (node_id, entity_id)
+                SELECT node_id, ? FROM node_entities WHERE entity_id = ?
+            """, (keep, dup))
+            result["links_moved"] += conn.execute("SELECT changes()").fetchone()[0]
+        conn.executemany("DELETE FROM node_entities WHERE entity_id = ?", [(dup,) for dup, _ in pairs])
+        conn.executemany("DELETE FROM entities WHERE id = ?", [(dup,) for dup, _ in pairs])
+        conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_entities_name_norm ON entities(name_norm)")
+        conn.execute("DROP INDEX IF EXISTS idx_entities_name_norm_dup")
+        conn.commit()
+        return result
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Merge entities that differ only by case")
+    parser.add_argument('--db-path', default='data/memory.db')
+    parser.add_argument('--dry-run', action='store_true')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db_path):
+        print(f"❌ Database not found: {args.db_path}")
+        sys.exit(1)
+
+    result = merge(args.db_path, dry_run=args.dry_run)
+    if args.dry_run:
+        print(f"\nDRY RUN: would merge {result['merged']:,} entities into {result['groups']:,}")
+    else:
+        print(f"\n✅ Merged {result['merged']:,} entities into {result['groups']:,} "
+              f"({result['links_moved']:,} note links moved); unique name_norm index created")
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Store undirected edges once per pair.
+
+Older versions wrote every semantic/entity/consolidation link twice,
+(a, b) and (b, a). The graph cache and diffusion read each row in both
+directions, and graph metrics (PageRank, communities) mirrors every row
+whose type is not in DIRECTED_EDGE_TYPES, so the mirrored row only
+doubled the edges table, its indexes and every scan. This merges each undirected pair
+into one (min_id, max_id) row keeping the max weight and the earliest
+created_at. Directed types (DIRECTED_EDGE_TYPES, default temporal_chain)
+are left as they are.
+
+Reports edge-table size and graph-cache startup time (load edges + build)
+before and after.
+
+Usage:
+    python3 scripts/migrate_canonical_edges.py [--db-path data/memory.db] [--dry-run] [--vacuum]
+"""
+import sys
+import os
+import time
+import sqlite3
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+from database import DIRECTED_EDGE_TYPES
+
+EDGE_OBJECTS = ('edges', 'idx_edges_source', 'idx_edges_target', 'sqlite_autoindex_edges_1')
+
+
+def table_bytes(conn):
+    """Bytes in the edges table and its indexes (None if SQLite lacks dbstat)."""
+    try:
+        row = conn.execute(
+            f"SELECT SUM(pgsize) FROM dbstat WHERE name IN ({','.join('?' * len(EDGE_OBJECTS))})",
+            EDGE_OBJECTS).fetchone()
+        return row[0]
+    except sqlite3.OperationalError:
+        return None
+
+
+def startup_seconds(conn, runs=3):
+    """Best-of-N time to load all edges and build the graph cache, as at server start."""
+    from graph_cache import GraphCache
+    best = None
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        rows = conn.execute("SELECT source_id, target_id, weight, edge_type FROM edges").fetchall()
+        cache = GraphCache()
+        cache.build([{"source_id": s, "target_id": t, "weight": w, "edge_type": et} for s, t, w, et in rows])
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def measure(conn, label):
+    rows = conn.execute("SELECT COUNT(*) FROM edges").fetchone()[0]
+    size = table_bytes(conn)
+    seconds = startup_seconds(conn)
+    size_text = f"{size / 1024 / 1024:.1f} MB" if size is not None else "n/a (no dbstat)"
+    print(f"{label}: {rows:,} rows, edges + indexes {size_text}, graph cache startup {seconds * 1000:.0f} ms")
+    return {"rows": rows, "bytes": size, "startup_seconds": seconds}
+
+
+def migrate(db_path: str, dry_run: bool = False, vacuum: bool = False):
+    conn = sqlite3.connect(db_path)
+    directed = sorted(DIRECTED_EDGE_TYPES) or ['']
+    not_directed = f"edge_type NOT IN ({','.join('?' * len(directed))})"
+
+    before = measure(conn, "Before")
+    undirected = conn.execute(f"SELECT COUNT(*) FROM edges WHERE {not_directed}", directed).fetchone()[0]
+    pairs = conn.execute(
+        f"""SELECT COUNT(*) FROM (SELECT 1 FROM edges WHERE {not_directed}
+            GROUP BY MIN(source_id, target_id), MAX(source_id, target_id), edge_type)""", directed).fetchone()[0]
+    print(f"Undirected rows: {undirected:,} → {pairs:,} pairs (directed types kept: {', '.join(sorted(DIRECTED_EDGE_TYPES))})")
+
+    if dry_run:
+        print(f"\nDRY RUN: would remove {undirected - pairs:,} mirrored/duplicate rows")
+        conn.close()
+        return {"before": before, "removed": undirected - pairs}
+
+    with conn:
+        conn.execute("DROP TABLE IF EXISTS temp.canonical_edges")
+        conn.execute(
+            f"""CREATE TEMP TABLE canonical_edges AS
+                SELECT MIN(source_id, target_id) AS s, MAX(source_id, target_id) AS t, edge_type,
+                       MAX(weight) AS w, MIN(created_at) AS c
+                FROM edges WHERE {not_directed}
+                GROUP BY 1, 2, 3""", directed)
+        conn.execute(f"DELETE FROM edges WHERE {not_directed}", directed)
+        conn.execute(
+            """INSERT INTO edges (source_id, target_id, weight, edge_type, created_at)
+               SELECT s, t, w, edge_type, c FROM canonical_edges""")
+        conn.execute("DROP TABLE temp.canonical_edges")
+    print(f"\n✅ Merged {undirected:,} undirected rows into {pairs:,}")
+    if vacuum:
+        conn.execute("VACUUM")
+        print("🧹 Vacuumed database")
+
+    after = measure(conn, "After")
+    conn.close()
+    return {"before": before, "after": after, "removed": undirected - pairs}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Store undirected edges once per (min_id, max_id) pair")
+    parser.add_argument('--db-path', default='data/memory.db')
+    parser.add_argument('--dry-run', action='store_true')
+    parser.add_argument('--vacuum', action='store_true', help="VACUUM afterwards to shrink the file")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db_path):
+        print(f"❌ Database not found: {args.db_path}")
+        sys.exit(1)
+
+    migrate(args.db_path, args.dry_run, args.vacuum)
@@ -3,33 +3,40 @@
 Re-extract entities for all notes using multilingual NER.
 Replaces old entity links (from en_core_web_sm) with new ones
 from xx_ent_wiki_sm for Russian text and en_core_web_sm for English.
-Preserves semantic edges — only entity edges are rebuilt.
+Preserves semantic edges — only entity edges are rebuilt (and only
+recreated with MATERIALIZE_ENTITY_EDGES=true; otherwise spreading reaches
+co-entity notes through node_entities).
 """
 import sqlite3
 import sys
 import os
 
 sys.path.insert(0, '/app/src')
-from entity_extractor import extract_entities, detect_language
+from entity_extractor import extract_entities_batch, detect_language
+from entity_graph import MATERIALIZE_ENTITY_EDGES
+from database import init_database, normalize_entity_name
 
 DB_PATH = os.getenv('DB_PATH', '/app/data/memory.db')
+BATCH_SIZE = int(os.getenv('RE_EXTRACT_BATCH_SIZE', '256'))  # notes per NER batch (nlp.pipe)
 
-def get_or_create_entity(cursor, name, entity_type):
+def load_entity_ids(cursor):
+    """Resident name_norm → id map, so known entities never hit SQLite."""
+    cursor.execute("SELECT name_norm, id FROM entities WHERE name_norm IS NOT NULL")
+    return dict(cursor.fetchall())
+
+
+def get_or_create_entity(cursor, entity_ids, name, entity_type):
     """Get existing entity ID or create new one.
-    Note: entities table has UNIQUE on name only (not name+type).
+    Note: entities are unique on name_norm (lowercased name), not name+type.
     """
-    cursor.execute(
-        "SELECT id FROM entities WHERE name = ?",
-        (name,)
-    )
-    row = cursor.fetchone()
-    if row:
-        return row[0]
-    cursor.execute(
-        "INSERT INTO entities (name, entity_type) VALUES (?, ?)",
-        (name, entity_type)
-    )
-    return cursor.lastrowid
+    name_norm = normalize_entity_name(name)
+    if name_norm not in entity_ids:
+        cursor.execute(
+            "INSERT INTO entities (name, entity_type, name_norm) VALUES (?, ?, ?)",
+            (name, entity_type, name_norm)
+        )
+        entity_ids[name_norm] = cursor.lastrowid
+    return entity_ids[name_norm]
 
 
 def find_shared_entity_nodes(cursor, entity_id, exclude_node_id):
@@ -42,6 +49,7 @@ def find_shared_entity_nodes(cursor, entity_id, exclude_node_id):
 
 
 def main():
+    init_database()  # adds/backfills entities.name_norm on older databases
     conn = sqlite3.connect(DB_PATH)
     conn.execute("PRAGMA journal_mode=WAL")
     cursor = conn.cursor()
@@ -50,6 +58,7 @@ def main():
     cursor.execute("SELECT id, content FROM nodes ORDER BY id")
     notes = cursor.fetchall()
     total = len(notes)
+    entity_ids = load_entity_ids(cursor)
     print(f"Processing {total} notes...")
 
     # Stats
@@ -65,7 +74,11 @@ def main():
         'errors': 0,
     }
 
+    note_entities = []
     for i, (note_id, content) in enumerate(notes):
+        if i % BATCH_SIZE == 0:
+            # Step 3 for the next batch of notes: multilingual NER through nlp.pipe
+            note_entities = extract_entities_batch([c for _, c in notes[i:i + BATCH_SIZE]])
         try:
             lang = detect_language(content)
             if lang == 'ru':
@@ -87,12 +100,12 @@ def main():
             )
             stats['old_node_entities_removed'] += cursor.rowcount
 
-            # Step 3: Extract entities with new multilingual NER
-            entities = extract_entities(content)
+            # Step 3: Entities from the batched extraction
+            entities = note_entities[i % BATCH_SIZE]
 
             # Step 4: Create node_entities and entity edges
             for entity_text, entity_type in entities:
-                entity_id = get_or_create_entity(cursor, entity_text, entity_type)
+                entity_id = get_or_create_entity(cursor, entity_ids, entity_text, entity_type)
                 # Link node to entity
                 cursor.execute(
                     "INSERT OR IGNORE INTO node_entities (node_id, entity_id) VALUES (?, ?)",
@@ -102,30 +115,14 @@ def main():
                     stats['new_node_entities_created'] += 1
 
                 # Create entity edges to other nodes sharing this entity
-                shared_nodes = find_shared_entity_nodes(cursor, entity_id, note_id)
+                shared_nodes = find_shared_entity_nodes(cursor, entity_id, note_id) if MATERIALIZE_ENTITY_EDGES else []
                 for other_node_id in shared_nodes:
-                    # Check if edge already exists
-                    cursor.execute(
-                        "SELECT id FROM edges WHERE source_id = ? AND target_id = ? AND edge_type = 'entity'",
-                        (note_id, other_node_id)
-                    )
-                    if not cursor.fetchone():
-                        cursor.execute(
-                            "INSERT INTO edges (source_id, target_id, weight, edge_type) VALUES (?, ?, 0.6, 'entity')",
-                            (note_id, other_node_id)
-                        )
-                        stats['new_entity_edges_created'] += 1
-                    # Reverse edge
+                    # Undirected: one row per pair, stored as (min_id, max_id)
                     cursor.execute(
-                        "SELECT id FROM edges WHERE source_id = ? AND target_id = ? AND edge_type = 'entity'",
-                        (other_node_id, note_id)
+                        "INSERT OR IGNORE INTO edges (source_id, target_id, weight, edge_type) VALUES (?, ?, 0.6, 'entity')",
+                        (min(note_id, other_node_id), max(note_id, other_node_id))
                     )
-                    if not cursor.fetchone():
-                        cursor.execute(
-                            "INSERT INTO edges (source_id, target_id, weight, edge_type) VALUES (?, ?, 0.6, 'entity')",
-                            (other_node_id, note_id)
-                        )
-                        stats['new_entity_edges_created'] += 1
+                    stats['new_entity_edges_created'] += cursor.rowcount
 
             stats['processed'] += 1
 
@@ -161,6 +158,7 @@ def main():
     print(f"New node_entities created: {stats['new_node_entities_created']}")
     print(f"New entity edges created:  {stats['new_entity_edges_created']}")
     print(f"Orphaned entities cleaned: {orphaned}")
+    print("Restart the server so the entity graph and entity dictionary reload.")
     print(f"Errors: {stats['errors']}")
 
 
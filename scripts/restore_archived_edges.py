@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Restore edges archived by sleep-compute sparsification.
+
+The sparsification step (src/sparsify.py) moves edges over the per-node
+degree cap into edges_archive instead of deleting them. This lists what is
+archived and moves the selected edges back into the edges table. An edge
+re-created since it was archived keeps the higher weight; edges whose
+notes have been deleted stay in the archive.
+
+Restart the server afterwards (or run sleep compute from the MCP tool) so
+the graph cache picks the edges up. Raise SPARSIFY_MAX_DEGREE or set a
+SPARSIFY_TYPE_CAPS override first, or the next run archives them again.
+
+Usage:
+    python3 scripts/restore_archived_edges.py [--db-path data/memory.db] [--node-id 42]
+        [--edge-type consolidation] [--since 2026-01-01] [--dry-run]
+"""
+import sys
+import os
+import sqlite3
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+from database import EDGES_ARCHIVE_SCHEMA
+from sparsify import restore_edges
+
+
+def summary(conn):
+    conn.execute(EDGES_ARCHIVE_SCHEMA)
+    rows = conn.execute(
+        "SELECT edge_type, reason, COUNT(*), MAX(archived_at) FROM edges_archive GROUP BY 1, 2 ORDER BY 3 DESC"
+    ).fetchall()
+    if not rows:
+        print("Archive is empty")
+    for edge_type, reason, count, last in rows:
+        print(f"  {edge_type} ({reason}): {count:,} edges, last archived {last}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Restore edges archived by sparsification")
+    parser.add_argument('--db-path', default='data/memory.db')
+    parser.add_argument('--node-id', type=int, help="Only edges touching this note")
+    parser.add_argument('--edge-type', help="Only this edge type")
+    parser.add_argument('--since', help="Only edges archived at or after this ISO timestamp")
+    parser.add_argument('--dry-run', action='store_true')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db_path):
+        print(f"❌ Database not found: {args.db_path}")
+        sys.exit(1)
+
+    conn = sqlite3.connect(args.db_path)
+    summary(conn)
+    conn.close()
+
+    result = restore_edges(args.db_path, node_id=args.node_id, edge_type=args.edge_type,
+                           since=args.since, dry_run=args.dry_run)
+    if args.dry_run:
+        print(f"\nDRY RUN: would restore {result['matched'] - result['dangling']:,} of {result['matched']:,} "
+              f"matching edges ({result['dangling']:,} reference deleted notes)")
+    else:
+        print(f"\n✅ Restored {result['restored']:,} edges ({result['dangling']:,} left: notes deleted)")
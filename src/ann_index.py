@@ -2,13 +2,20 @@
 """
 ANN (Approximate Nearest Neighbor) Index using hnswlib
 Provides O(log n) similarity search with INCREMENTAL updates
+
+Thread safety: hnswlib's knn_query must not run concurrently with
+add_items/resize_index, so searches share a read lock and inserts take
+the write lock (held only for the single add_items call).
 """
 
 import numpy as np
 import hnswlib
 import os
+import time
 from typing import List, Tuple, Optional
 
+from rwlock import RWLock
+
 # Configuration
 USE_ANN_INDEX = os.getenv("USE_ANN_INDEX", "true").lower() == "true"
 HNSW_SPACE = os.getenv("HNSW_SPACE", "cosine")  # cosine, ip, or l2
@@ -16,6 +23,12 @@ HNSW_M = int(os.getenv("HNSW_M", "16"))
 HNSW_EF_CONSTRUCTION = int(os.getenv("HNSW_EF_CONSTRUCTION", "200"))
 HNSW_EF_SEARCH = int(os.getenv("HNSW_EF_SEARCH", "50"))
 MAX_ELEMENTS = int(os.getenv("HNSW_MAX_ELEMENTS", "50000"))
+# "hnsw" = single incremental HNSW graph, "segmented" = LSM-style segments (segmented_index.py)
+ANN_INDEX_TYPE = os.getenv("ANN_INDEX_TYPE", "hnsw").lower()
+
+# Tuned ef_search stored by ann_tune.py (settings table), re-read at most every N seconds
+EF_SEARCH_SETTING = "hnsw_ef_search"
+ANN_SETTINGS_POLL_SEC = float(os.getenv("ANN_SETTINGS_POLL_SEC", "30"))
 
 
 class ANNIndex:
@@ -27,7 +40,12 @@ class ANNIndex:
         self.dimension = dimension
         self.index = None
         self.node_ids = []
+        self._id_set = set()
         self.enabled = USE_ANN_INDEX
+        self.ef_search = HNSW_EF_SEARCH
+        self._ef_checked_at = time.monotonic()
+        self._lock = RWLock()
+        self.max_elements = MAX_ELEMENTS
         
         if not self.enabled:
             print("ℹ️  ANN indexing disabled (USE_ANN_INDEX=false)")
@@ -39,11 +57,11 @@ class ANNIndex:
         # space='l2' - Euclidean distance
         self.index = hnswlib.Index(space=HNSW_SPACE, dim=dimension)
         self.index.init_index(
-            max_elements=MAX_ELEMENTS,
+            max_elements=self.max_elements,
             ef_construction=HNSW_EF_CONSTRUCTION,
             M=HNSW_M
         )
-        self.index.set_ef(HNSW_EF_SEARCH)
+        self.index.set_ef(self.ef_search)
         
         print(f"✅ Created hnswlib {HNSW_SPACE.upper()} index (M={HNSW_M}, ef_construction={HNSW_EF_CONSTRUCTION}, dim={dimension})")
     
@@ -69,8 +87,11 @@ class ANNIndex:
             return 0
         
         embeddings_matrix = np.array(embeddings, dtype=np.float32)
-        self.index.add_items(embeddings_matrix, node_ids)
-        self.node_ids = node_ids
+        with self._lock.write_lock():
+            self._ensure_capacity(len(node_ids))
+            self.index.add_items(embeddings_matrix, node_ids)
+            self.node_ids = node_ids
+            self._id_set = set(node_ids)
         
         print(f"✅ Built ANN index with {len(embeddings)} vectors")
         return len(embeddings)
@@ -84,27 +105,114 @@ class ANNIndex:
             embedding = embedding.reshape(1, -1)
         
         try:
-            self.index.add_items(embedding, [node_id])
-            self.node_ids.append(node_id)
+            with self._lock.write_lock():
+                self._ensure_capacity(self.index.get_current_count() + 1)
+                self.index.add_items(embedding, [node_id])
+                # Existing label = vector update (hnswlib replaces it in place)
+                if node_id not in self._id_set:
+                    self._id_set.add(node_id)
+                    self.node_ids.append(node_id)
             return True
         except Exception as e:
             print(f"⚠️  Failed to add vector {node_id}: {e}")
             return False
     
+    def add_vectors(self, node_ids: List[int], embeddings: np.ndarray) -> int:
+        """Add a batch of vectors with one add_items call (one write-lock hold)."""
+        if not self.enabled or self.index is None or len(node_ids) == 0:
+            return 0
+        embeddings = np.asarray(embeddings, dtype=np.float32).reshape(len(node_ids), -1)
+        try:
+            with self._lock.write_lock():
+                self._ensure_capacity(self.index.get_current_count() + len(node_ids))
+                self.index.add_items(embeddings, list(node_ids))
+                for node_id in node_ids:
+                    if node_id not in self._id_set:
+                        self._id_set.add(node_id)
+                        self.node_ids.append(node_id)
+            return len(node_ids)
+        except Exception as e:
+            print(f"⚠️  Failed to add {len(node_ids)} vectors: {e}")
+            return 0
+    
+    def remove_vector(self, node_id: int) -> bool:
+        """Remove vector from search results (hnswlib tombstone, slot not reclaimed)."""
+        if not self.enabled or self.index is None:
+            return False
+        with self._lock.write_lock():
+            if node_id not in self._id_set:
+                return False
+            try:
+                self.index.mark_deleted(node_id)
+            except RuntimeError:
+                return False
+            self._id_set.discard(node_id)
+            self.node_ids = [n for n in self.node_ids if n != node_id]
+        return True
+    
+    @property
+    def vector_count(self) -> int:
+        """Number of live (searchable) vectors."""
+        return len(self._id_set)
+    
+    def _ensure_capacity(self, needed: int):
+        """Grow the index (caller holds write lock). Doubles to amortize resizes."""
+        if needed <= self.max_elements:
+            return
+        new_size = max(needed, self.max_elements * 2)
+        self.index.resize_index(new_size)
+        print(f"📈 Resized ANN index: {self.max_elements} → {new_size} elements")
+        self.max_elements = new_size
+    
+    def set_ef_search(self, ef: int) -> bool:
+        """Change ef_search at runtime (no rebuild needed)."""
+        if not self.enabled or self.index is None:
+            return False
+        ef = int(ef)
+        if ef < 1:
+            return False
+        if ef != self.ef_search:
+            with self._lock.write_lock():
+                self.index.set_ef(ef)
+            print(f"🎛️  ANN ef_search: {self.ef_search} → {ef}")
+            self.ef_search = ef
+        return True
+    
+    def refresh_tuned_ef(self, force: bool = False) -> int:
+        """
+        Apply ef_search stored by ann_tune.py (settings table).
+        Polled from search() at most every ANN_SETTINGS_POLL_SEC seconds.
+        """
+        now = time.monotonic()
+        if not force and now - self._ef_checked_at < ANN_SETTINGS_POLL_SEC:
+            return self.ef_search
+        self._ef_checked_at = now
+        try:
+            from database import get_setting
+            value = get_setting(EF_SEARCH_SETTING)
+            if value is not None:
+                self.set_ef_search(int(value))
+        except Exception as e:
+            print(f"⚠️  Failed to read tuned ef_search: {e}")
+        return self.ef_search
+    
     def search(self, query_embedding: np.ndarray, k: int = 10, 
                min_similarity: float = 0.3) -> List[Tuple[int, float]]:
         """Search for k nearest neighbors."""
         if not self.enabled or self.index is None or len(self.node_ids) == 0:
             return []
         
+        self.refresh_tuned_ef()
+        
         if query_embedding.ndim == 1:
             query_embedding = query_embedding.reshape(1, -1)
         
         try:
-            actual_k = min(k, self.index.get_current_count())
-            if actual_k == 0:
-                return []
-            labels, distances = self.index.knn_query(query_embedding, k=actual_k)
+            with self._lock.read_lock():
+                actual_k = min(k, self.index.get_current_count())
+                if actual_k == 0:
+                    return []
+                labels, distances = self.index.knn_query(query_embedding, k=actual_k)
             
             results = []
             for label, dist in zip(labels[0], distances[0]):
@@ -130,7 +238,8 @@ class ANNIndex:
         if not self.enabled or self.index is None:
             return
         
-        self.index.save_index(path)
+        with self._lock.read_lock():
+            self.index.save_index(path)
         print(f"💾 Saved ANN index to {path}")
     
     def load(self, path: str):
@@ -142,9 +251,12 @@ class ANNIndex:
             print(f"⚠️  Index file not found: {path}")
             return
         
-        self.index.load_index(path)
-        # Rebuild node_ids list from index
-        self.node_ids = self.index.get_ids_list()
+        with self._lock.write_lock():
+            self.index.load_index(path, max_elements=self.max_elements)
+            self.max_elements = self.index.get_max_elements()
+            # Rebuild node_ids list from index
+            self.node_ids = self.index.get_ids_list()
+            self._id_set = set(self.node_ids)
         print(f"📂 Loaded ANN index from {path} ({len(self.node_ids)} vectors)")
     
     def get_stats(self) -> dict:
@@ -154,13 +266,14 @@ class ANNIndex:
         
         return {
             "enabled": True,
+            "type": "hnsw",
             "space": HNSW_SPACE,
             "dimension": self.dimension,
             "vectors": len(self.node_ids),
-            "max_elements": MAX_ELEMENTS,
+            "max_elements": self.max_elements,
             "M": HNSW_M,
             "ef_construction": HNSW_EF_CONSTRUCTION,
-            "ef_search": HNSW_EF_SEARCH
+            "ef_search": self.ef_search
         }
 
 
@@ -170,7 +283,8 @@ _ann_index = None
 
 def get_ann_index() -> ANNIndex:
     """Get or create global ANN index instance.
-    Auto-detects embedding dimension from the loaded model."""
+    Auto-detects embedding dimension from the loaded model.
+    ANN_INDEX_TYPE=segmented selects the LSM-style SegmentedANNIndex."""
     global _ann_index
     if _ann_index is None:
         try:
@@ -180,7 +294,11 @@ def get_ann_index() -> ANNIndex:
         except Exception:
             dim = int(os.getenv("EMBEDDING_DIMENSION", "384"))
             print(f"📐 Using configured embedding dimension: {dim}")
-        _ann_index = ANNIndex(dimension=dim)
+        if ANN_INDEX_TYPE == "segmented":
+            from segmented_index import SegmentedANNIndex
+            _ann_index = SegmentedANNIndex(dimension=dim)
+        else:
+            _ann_index = ANNIndex(dimension=dim)
     return _ann_index
 
 
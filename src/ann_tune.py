@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+ANN Autotuner — measure HNSW recall vs latency on the live corpus.
+
+Samples queries (note embeddings, or real queries from search_logs),
+computes exact top-k by brute force as ground truth, then sweeps
+ef_search (and optionally M) and prints recall@k vs p50/p99 latency.
+
+The chosen ef_search can be stored in the settings table; the running
+server picks it up via ANNIndex.refresh_tuned_ef() (set_ef, no restart).
+
+Usage:
+    # Sweep ef_search with current HNSW_M / HNSW_EF_CONSTRUCTION
+    python3 src/ann_tune.py
+
+    # Real queries from search_logs (needs embedding model), sweep M too
+    python3 src/ann_tune.py --source logs --m 16,32
+
+    # Store the ef_search of the fastest (M, ef) reaching recall@10 >= 0.98
+    python3 src/ann_tune.py --target-recall 0.98 --apply
+
+    # Store a fixed ef_search without sweeping
+    python3 src/ann_tune.py --set-ef 64
+"""
+import os
+import sys
+import time
+import sqlite3
+import argparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from ann_index import HNSW_SPACE, HNSW_M, HNSW_EF_CONSTRUCTION, HNSW_EF_SEARCH, EF_SEARCH_SETTING
+
+DB_PATH = os.getenv("DB_PATH", "/app/data/memory.db")
+DEFAULT_EF_SWEEP = [10, 16, 32, 50, 64, 100, 150, 200, 300]
+
+
+def load_corpus(db_path):
+    """Load (ids, embeddings matrix) for all notes with embeddings."""
+    conn = sqlite3.connect(db_path)
+    rows = conn.execute(
+        "SELECT id, embedding FROM nodes WHERE embedding IS NOT NULL ORDER BY id"
+    ).fetchall()
+    conn.close()
+
+    ids, vectors = [], []
+    dim = None
+    for nid, blob in rows:
+        emb = np.frombuffer(blob, dtype=np.float32)
+        if dim is None:
+            dim = len(emb)
+        if len(emb) != dim:
+            continue
+        ids.append(nid)
+        vectors.append(emb)
+    if not vectors:
+        return np.array([], dtype=np.int64), np.zeros((0, 0), dtype=np.float32)
+    return np.array(ids, dtype=np.int64), np.vstack(vectors).astype(np.float32)
+
+
+def sample_queries(db_path, source, n, ids, matrix, seed=42):
+    """
+    Return (query_matrix, query_node_ids).
+    source='notes': random note embeddings (query_node_ids used to drop self-matches)
+    source='logs':  distinct recent queries from search_logs, encoded with the model
+    """
+    rng = np.random.default_rng(seed)
+    if source == "logs":
+        conn = sqlite3.connect(db_path)
+        try:
+            rows = conn.execute(
+                "SELECT query FROM search_logs GROUP BY query ORDER BY MAX(id) DESC LIMIT ?", (n,)
+            ).fetchall()
+        except sqlite3.OperationalError:
+            rows = []
+        conn.close()
+        texts = [r[0] for r in rows if r[0]]
+        if not texts:
+            print("⚠️  No queries in search_logs, falling back to note embeddings")
+            return sample_queries(db_path, "notes", n, ids, matrix, seed)
+        from stable_embeddings import get_model
+        queries = get_model().encode(texts).astype(np.float32)
+        return queries, [None] * len(texts)
+
+    count = min(n, len(ids))
+    picks = rng.choice(len(ids), size=count, replace=False)
+    return matrix[picks], [int(ids[i]) for i in picks]
+
+
+def exact_topk(matrix, ids, queries, k, space=HNSW_SPACE):
+    """Brute-force top-k node ids per query (ground truth)."""
+    if space == "l2":
+        # argmin ||q - x||^2 == argmin (||x||^2 - 2 q·x)
+        scores = -(np.sum(matrix ** 2, axis=1)[None, :] - 2.0 * queries @ matrix.T)
+    else:
+        if space == "cosine":
+            matrix = matrix / np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+            queries = queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+        scores = queries @ matrix.T
+
+    k = min(k, matrix.shape[0])
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    row = np.arange(scores.shape[0])[:, None]
+    order = np.argsort(-scores[row, top], axis=1)
+    return ids[top[row, order]]
+
+
+def recall_at_k(found, truth, k):
+    """Mean |found ∩ truth| / k over queries (both lists of id lists)."""
+    if not truth:
+        return 0.0
+    total = 0.0
+    for f, t in zip(found, truth):
+        t = list(t)[:k]
+        if not t:
+            continue
+        total += len(set(list(f)[:k]) & set(t)) / len(t)
+    return total / len(truth)
+
+
+def build_hnsw(matrix, ids, m, ef_construction, space=HNSW_SPACE):
+    """Build an hnswlib index with the same parameters the server would use."""
+    import hnswlib
+    index = hnswlib.Index(space=space, dim=matrix.shape[1])
+    index.init_index(max_elements=max(len(ids), 1), ef_construction=ef_construction, M=m)
+    index.add_items(matrix, ids)
+    return index
+
+
+def measure(index, queries, query_ids, truth, k, ef):
+    """Run queries one by one (like the server does) and time each one."""
+    index.set_ef(ef)
+    found = []
+    latencies = []
+    fetch_k = min(k + 1, index.get_current_count())
+    for q, qid in zip(queries, query_ids):
+        t0 = time.perf_counter()
+        labels, _ = index.knn_query(q.reshape(1, -1), k=fetch_k)
+        latencies.append((time.perf_counter() - t0) * 1000)
+        found.append([int(l) for l in labels[0] if int(l) != qid][:k])
+    latencies.sort()
+    n = len(latencies)
+    return {
+        "ef": ef,
+        "recall": recall_at_k(found, truth, k),
+        "p50_ms": latencies[n // 2] if n else 0.0,
+        "p99_ms": latencies[min(n - 1, int(n * 0.99))] if n else 0.0,
+    }
+
+
+def sweep(matrix, ids, queries, query_ids, k, ef_values, m_values, ef_construction):
+    """Sweep (M, ef_search) and return list of result rows."""
+    # Ground truth: request k+1 so self-matches can be dropped for note queries
+    truth_raw = exact_topk(matrix, ids, queries, k + 1)
+    truth = [[int(t) for t in row if int(t) != qid][:k] for row, qid in zip(truth_raw, query_ids)]
+
+    rows = []
+    for m in m_values:
+        t0 = time.perf_counter()
+        index = build_hnsw(matrix, ids, m, ef_construction)
+        build_s = time.perf_counter() - t0
+        for ef in ef_values:
+            r = measure(index, queries, query_ids, truth, k, ef)
+            r["M"] = m
+            r["build_s"] = build_s
+            rows.append(r)
+    return rows
+
+
+def print_table(rows, k):
+    print(f"\n{'M':>4} {'ef':>5} {f'recall@{k}':>10} {'p50 ms':>8} {'p99 ms':>8} {'build s':>8}")
+    print("-" * 48)
+    for r in rows:
+        print(f"{r['M']:>4} {r['ef']:>5} {r['recall']:>10.4f} {r['p50_ms']:>8.3f} "
+              f"{r['p99_ms']:>8.3f} {r['build_s']:>8.2f}")
+
+
+def choose_config(rows, target_recall):
+    """Fastest (lowest p50) swept (M, ef_search) row whose recall meets the target, across all M."""
+    candidates = [r for r in rows if r["recall"] >= target_recall]
+    if not candidates:
+        return None
+    return min(candidates, key=lambda r: (r["p50_ms"], r["ef"], r["M"]))
+
+
+def store_ef(db_path, ef):
+    """Persist ef_search in settings table (server applies it via set_ef)."""
+    import database
+    database.DB_PATH = db_path
+    database.set_setting(EF_SEARCH_SETTING, int(ef))
+    print(f"💾 Stored ef_search={ef} — server applies it within ANN_SETTINGS_POLL_SEC")
+
+
+def _int_list(value):
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HNSW recall/latency autotuner")
+    parser.add_argument("--db", type=str, default=None, help="Database path override")
+    parser.add_argument("--source", choices=["notes", "logs"], default="notes",
+                        help="Query source: note embeddings or search_logs queries")
+    parser.add_argument("--queries", type=int, default=200, help="Number of sampled queries")
+    parser.add_argument("-k", type=int, default=10, help="Recall@k cutoff")
+    parser.add_argument("--ef", type=_int_list, default=DEFAULT_EF_SWEEP, help="ef_search values (comma list)")
+    parser.add_argument("--m", type=_int_list, default=[HNSW_M], help="M values (comma list)")
+    parser.add_argument("--ef-construction", type=int, default=HNSW_EF_CONSTRUCTION)
+    parser.add_argument("--target-recall", type=float, default=None,
+                        help="Pick the fastest swept (M, ef_search) reaching this recall")
+    parser.add_argument("--apply", action="store_true", help="Store the chosen ef_search for the server")
+    parser.add_argument("--set-ef", type=int, default=None, help="Store this ef_search without sweeping")
+    args = parser.parse_args()
+
+    db_path = args.db or DB_PATH
+    if not os.path.exists(db_path):
+        print(f"Database not found: {db_path}")
+        sys.exit(1)
+
+    if args.set_ef is not None:
+        store_ef(db_path, args.set_ef)
+        return
+
+    ids, matrix = load_corpus(db_path)
+    if len(ids) < 2:
+        print("Not enough embeddings to tune")
+        sys.exit(1)
+
+    queries, query_ids = sample_queries(db_path, args.source, args.queries, ids, matrix)
+    print(f"📐 Corpus: {len(ids)} vectors (dim={matrix.shape[1]}, space={HNSW_SPACE})")
+    print(f"🔎 Queries: {len(query_ids)} from {args.source}, k={args.k}")
+    print(f"⚙️  Current config: M={HNSW_M}, ef_construction={HNSW_EF_CONSTRUCTION}, ef_search={HNSW_EF_SEARCH}")
+
+    rows = sweep(matrix, ids, queries, query_ids, args.k, args.ef, args.m, args.ef_construction)
+    print_table(rows, args.k)
+
+    if args.target_recall is not None:
+        best = choose_config(rows, args.target_recall)
+        m_swept = ",".join(str(m) for m in args.m)
+        if best is None:
+            print(f"\n❌ No (M, ef_search) reached recall@{args.k} >= {args.target_recall} (M={m_swept})")
+            sys.exit(1)
+        print(f"\n✅ Fastest config reaching recall@{args.k} >= {args.target_recall}: "
+              f"M={best['M']}, ef_search={best['ef']} (p50 {best['p50_ms']:.3f} ms)")
+        if best["M"] != HNSW_M:
+            print(f"   M is a build setting: set HNSW_M={best['M']} and restart so the index is rebuilt "
+                  f"(the server currently builds with M={HNSW_M})")
+        if args.apply:
+            store_ef(db_path, best["ef"])
+
+
+if __name__ == "__main__":
+    main()
@@ -3,11 +3,17 @@
 BM25 Keyword Search for Neural Memory Graph.
 Builds inverted index at startup, provides keyword scoring for blend search.
 Zero external dependencies — pure Python + math.
+
+Thread safety: searches never take a lock. Writers are serialized by a
+mutex and only ever insert new keys / replace whole values, then publish
+corpus stats (n_docs, avg_dl) as one tuple; build() publishes a complete
+new snapshot in a single assignment.
 """
 import math
 import re
 import os
 import time
+import threading
 from typing import Dict, List, Tuple
 from collections import Counter
 
@@ -28,10 +34,16 @@ class BM25Index:
         self._doc_freqs: Dict[str, int] = {}      # term → num docs containing it
         self._doc_lens: Dict[int, int] = {}        # node_id → doc length
         self._doc_terms: Dict[int, Counter] = {}   # node_id → term frequencies
-        self._avg_dl: float = 0.0                  # average document length
-        self._n_docs: int = 0
         self._node_ids: List[int] = []
+        self._total_len: int = 0
+        self._stats: Tuple[int, float] = (0, 0.0)  # (n_docs, avg_dl), published atomically
         self._built: bool = False
+        self._write_lock = threading.Lock()
+        self._snapshot = self._make_snapshot()
+    
+    def _make_snapshot(self):
+        """Bundle structures so a search reads one consistent set of references."""
+        return (self._doc_freqs, self._doc_lens, self._doc_terms, self._node_ids)
     
     def build(self, documents: List[Tuple[int, str]]):
         """
@@ -40,10 +52,11 @@ class BM25Index:
         """
         start = time.time()
         
-        self._doc_freqs = {}
-        self._doc_lens = {}
-        self._doc_terms = {}
-        self._node_ids = []
+        # Build into fresh structures, readers keep using the old snapshot
+        doc_freqs: Dict[str, int] = {}
+        doc_lens: Dict[int, int] = {}
+        doc_terms: Dict[int, Counter] = {}
+        node_ids: List[int] = []
         
         total_len = 0
         
@@ -51,41 +64,72 @@ class BM25Index:
             tokens = tokenize(content)
             tf = Counter(tokens)
             
-            self._doc_terms[node_id] = tf
-            self._doc_lens[node_id] = len(tokens)
-            self._node_ids.append(node_id)
+            if node_id not in doc_terms:
+                node_ids.append(node_id)
+            else:
+                total_len -= doc_lens[node_id]
+                for term in doc_terms[node_id]:
+                    doc_freqs[term] -= 1
+            doc_terms[node_id] = tf
+            doc_lens[node_id] = len(tokens)
             total_len += len(tokens)
             
             # Update document frequencies
             for term in tf:
-                self._doc_freqs[term] = self._doc_freqs.get(term, 0) + 1
+                doc_freqs[term] = doc_freqs.get(term, 0) + 1
         
-        self._n_docs = len(documents)
-        self._avg_dl = total_len / max(self._n_docs, 1)
-        self._built = True
+        n_docs = len(node_ids)
+        with self._write_lock:
+            self._doc_freqs = doc_freqs
+            self._doc_lens = doc_lens
+            self._doc_terms = doc_terms
+            self._node_ids = node_ids
+            self._total_len = total_len
+            self._stats = (n_docs, total_len / max(n_docs, 1))
+            self._snapshot = self._make_snapshot()
+            self._built = True
         
         elapsed = time.time() - start
         print(f"🔍 BM25 index built in {elapsed:.2f}s: "
-              f"{self._n_docs} docs, {len(self._doc_freqs)} unique terms, "
-              f"avg_dl={self._avg_dl:.1f}")
+              f"{n_docs} docs, {len(doc_freqs)} unique terms, "
+              f"avg_dl={self._stats[1]:.1f}")
     
     def add_document(self, node_id: int, content: str):
         """Add a single document to the index (for new notes)."""
         tokens = tokenize(content)
+        with self._write_lock:
+            self._add_tokens(node_id, tokens)
+    
+    def add_documents(self, documents: List[Tuple[int, str]]):
+        """Add a batch of (node_id, content) documents under one lock acquisition."""
+        tokenized = [(node_id, tokenize(content)) for node_id, content in documents]
+        with self._write_lock:
+            for node_id, tokens in tokenized:
+                self._add_tokens(node_id, tokens)
+    
+    def _add_tokens(self, node_id: int, tokens: List[str]):
+        """Index one tokenized document (caller holds the write lock)."""
         tf = Counter(tokens)
+        old_tf = self._doc_terms.get(node_id)
+        if old_tf is not None:
+            # Re-added document: retract its previous contribution
+            self._total_len -= self._doc_lens.get(node_id, 0)
+            for term in old_tf:
+                self._doc_freqs[term] = max(0, self._doc_freqs.get(term, 0) - 1)
         
-        self._doc_terms[node_id] = tf
+        # Document frequencies first, then the document itself:
+        # a concurrent search never sees a doc whose terms are not counted
+        for term in tf:
+            self._doc_freqs[term] = self._doc_freqs.get(term, 0) + 1
         self._doc_lens[node_id] = len(tokens)
-        if node_id not in self._node_ids:
+        self._doc_terms[node_id] = tf
+        if old_tf is None:
             self._node_ids.append(node_id)
         
-        # Update stats
-        total_len = sum(self._doc_lens.values())
-        self._n_docs = len(self._doc_terms)
-        self._avg_dl = total_len / max(self._n_docs, 1)
-        
-        for term in tf:
-            self._doc_freqs[term] = self._doc_freqs.get(term, 0) + 1
+        # Update stats (incremental, O(1))
+        self._total_len += len(tokens)
+        n_docs = len(self._node_ids)
+        self._stats = (n_docs, self._total_len / max(n_docs, 1))
     
     def search(self, query: str, top_k: int = 50) -> Dict[int, float]:
         """
@@ -101,23 +145,28 @@ class BM25Index:
         
         scores: Dict[int, float] = {}
         
-        for node_id in self._node_ids:
+        # Lock-free read: capture one consistent set of references
+        doc_freqs, doc_lens, doc_terms, node_ids = self._snapshot
+        n_docs, avg_dl = self._stats
+        avg_dl = avg_dl or 1.0
+        
+        for node_id in node_ids[:len(node_ids)]:
             score = 0.0
-            tf = self._doc_terms.get(node_id, {})
-            dl = self._doc_lens.get(node_id, 0)
+            tf = doc_terms.get(node_id, {})
+            dl = doc_lens.get(node_id, 0)
             
             for term in query_tokens:
                 if term not in tf:
                     continue
                 
                 # IDF: log((N - df + 0.5) / (df + 0.5) + 1)
-                df = self._doc_freqs.get(term, 0)
-                idf = math.log((self._n_docs - df + 0.5) / (df + 0.5) + 1.0)
+                df = doc_freqs.get(term, 0)
+                idf = math.log((n_docs - df + 0.5) / (df + 0.5) + 1.0)
                 
                 # TF component with length normalization
                 freq = tf[term]
                 tf_norm = (freq * (BM25_K1 + 1)) / (
-                    freq + BM25_K1 * (1 - BM25_B + BM25_B * dl / self._avg_dl)
+                    freq + BM25_K1 * (1 - BM25_B + BM25_B * dl / avg_dl)
                 )
                 
                 score += idf * tf_norm
@@ -7,11 +7,120 @@ SQLite with graph schema: nodes, edges, entities
 import sqlite3
 import os
 import json
+import math
+import hashlib
+import threading
+import unicodedata
 from datetime import datetime
 from contextlib import contextmanager
 
 DB_PATH = os.getenv("DB_PATH", "/app/data/memory.db")
 ENABLE_EMOTIONAL_MEMORY = os.getenv("ENABLE_EMOTIONAL_MEMORY", "false").lower() == "true"
+# Edge types whose direction matters; all other types are undirected and
+# stored once per pair as (min_id, max_id) — see canonical_edge()
+DIRECTED_EDGE_TYPES = frozenset(
+    t.strip() for t in os.getenv("DIRECTED_EDGE_TYPES", "temporal_chain").split(",") if t.strip()
+)
+
+SETTINGS_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS settings (
+        key TEXT PRIMARY KEY,
+        value TEXT,
+        updated_at TEXT
+    )
+"""
+
+# Edges removed by sleep-compute sparsification; restorable (see src/sparsify.py)
+EDGES_ARCHIVE_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS edges_archive (
+        id INTEGER PRIMARY KEY,
+        source_id INTEGER NOT NULL,
+        target_id INTEGER NOT NULL,
+        weight REAL,
+        edge_type TEXT,
+        created_at TEXT,
+        archived_at TEXT,
+        reason TEXT
+    )
+"""
+
+# Durable queue for ENRICHMENT_MODE=async: a row per note still waiting for
+# entity/temporal extraction and linking (src/enrichment.py). Rows are
+# deleted in the transaction that writes the links.
+ENRICHMENT_JOBS_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS enrichment_jobs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        node_id INTEGER NOT NULL REFERENCES nodes(id) ON DELETE CASCADE,
+        status TEXT NOT NULL DEFAULT 'pending',
+        attempts INTEGER NOT NULL DEFAULT 0,
+        error TEXT,
+        created_at TEXT,
+        started_at TEXT
+    )
+"""
+
+
+def content_hash(content):
+    """
+    Exact-duplicate key of a note: SHA-256 of the content after Unicode NFC
+    normalisation and whitespace collapsing (case is kept).
+    """
+    normalized = " ".join(unicodedata.normalize("NFC", content).split())
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+def normalize_entity_name(name):
+    """Lookup key for an entity name (entities.name_norm)."""
+    return name.strip().lower()
+
+
+class EntityDictionary:
+    """
+    Resident name_norm → entity id map, so resolving a known entity never
+    touches SQLite. Warmed at startup (warm()), filled on lookups, and fed
+    new entities only once their transaction commits (see get_connection),
+    so a rolled-back insert never leaves a dangling id behind.
+
+    Entities are only deleted offline (scripts/re_extract_entities.py);
+    restart the server afterwards, as for the entity graph.
+    """
+
+    def __init__(self):
+        self._ids = {}
+        self._path = None
+        self._lock = threading.Lock()
+
+    def _current(self):
+        # Tests and tools repoint DB_PATH; never serve ids from another database
+        if self._path != DB_PATH:
+            with self._lock:
+                if self._path != DB_PATH:
+                    self._ids, self._path = {}, DB_PATH
+        return self._ids
+
+    def get(self, name_norm):
+        return self._current().get(name_norm)
+
+    def update(self, mapping):
+        if mapping:
+            ids = self._current()
+            with self._lock:
+                ids.update(mapping)
+
+    def warm(self, conn=None):
+        """Load every entity; returns the number of names."""
+        with _session(conn) as conn:
+            rows = conn.execute("SELECT name_norm, id FROM entities WHERE name_norm IS NOT NULL").fetchall()
+        self.update({name_norm: eid for name_norm, eid in rows})
+        return len(self)
+
+    def __len__(self):
+        return len(self._current())
+
+
+entity_dictionary = EntityDictionary()
+# Entities inserted inside a still-open get_connection() transaction, by id(conn)
+_pending_entities = {}
 
 
 @contextmanager
@@ -20,16 +129,39 @@ def get_connection():
     conn = sqlite3.connect(DB_PATH)
     conn.row_factory = sqlite3.Row
     conn.execute("PRAGMA foreign_keys = ON")
+    pending = _pending_entities[id(conn)] = {}
     try:
         yield conn
         conn.commit()
+        entity_dictionary.update(pending)
     except Exception:
         conn.rollback()
         raise
     finally:
+        _pending_entities.pop(id(conn), None)
         conn.close()
 
 
+@contextmanager
+def _session(conn=None):
+    """
+    The caller's connection, or a fresh one for this call only.
+
+    Functions taking conn=None join the caller's transaction when given one
+    (no commit, the caller commits or rolls back), so a unit of work such as
+    add_note_with_links runs as:
+
+        with get_connection() as conn:
+            node_id = create_node(..., conn=conn)
+            create_edge(..., conn=conn)
+    """
+    if conn is not None:
+        yield conn
+    else:
+        with get_connection() as conn:
+            yield conn
+
+
 def init_database():
     """Initialize database schema"""
     os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
@@ -53,7 +185,8 @@ def init_database():
                 emotional_reflection TEXT,
                 t_event_start TEXT,
                 t_event_end TEXT,
-                temporal_expressions TEXT
+                temporal_expressions TEXT,
+                content_hash TEXT
             )
         """)
         
@@ -71,6 +204,18 @@ def init_database():
             cursor.execute("ALTER TABLE nodes ADD COLUMN temporal_expressions TEXT")
             print("  ↳ Added bi-temporal columns to nodes table")
         
+        # Migration: exact-duplicate key (content_hash()), checked before any model work.
+        # Not UNIQUE: force=true adds verbatim copies on purpose
+        if 'content_hash' not in columns:
+            cursor.execute("ALTER TABLE nodes ADD COLUMN content_hash TEXT")
+            print("  ↳ Added 'content_hash' column to nodes table")
+        missing = cursor.execute("SELECT id, content FROM nodes WHERE content_hash IS NULL").fetchall()
+        if missing:
+            cursor.executemany("UPDATE nodes SET content_hash = ? WHERE id = ?",
+                               [(content_hash(content), nid) for nid, content in missing])
+            print(f"  ↳ Backfilled content_hash for {len(missing)} notes")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_nodes_content_hash ON nodes(content_hash)")
+        
         # Edges table (connections between nodes)
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS edges (
@@ -91,10 +236,29 @@ def init_database():
             CREATE TABLE IF NOT EXISTS entities (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 name TEXT UNIQUE NOT NULL,
-                entity_type TEXT DEFAULT 'concept'
+                entity_type TEXT DEFAULT 'concept',
+                name_norm TEXT
             )
         """)
         
+        # Migration: normalised lookup key (Python lower(), unlike SQLite's
+        # ASCII-only LOWER), indexed so lookups stop scanning the table
+        cursor.execute("PRAGMA table_info(entities)")
+        if 'name_norm' not in [col[1] for col in cursor.fetchall()]:
+            cursor.execute("ALTER TABLE entities ADD COLUMN name_norm TEXT")
+            print("  ↳ Added 'name_norm' column to entities table")
+        missing = cursor.execute("SELECT id, name FROM entities WHERE name_norm IS NULL").fetchall()
+        if missing:
+            cursor.executemany("UPDATE entities SET name_norm = ? WHERE id = ?",
+                               [(normalize_entity_name(name), eid) for eid, name in missing])
+            print(f"  ↳ Backfilled name_norm for {len(missing)} entities")
+        try:
+            cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_entities_name_norm ON entities(name_norm)")
+        except sqlite3.IntegrityError:
+            # Older lookups missed non-ASCII case variants, so a name can exist twice
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_entities_name_norm_dup ON entities(name_norm)")
+            print("  ⚠️  Entities differ only by case — run scripts/merge_entity_names.py to merge them")
+        
         # Node-Entity linking table
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS node_entities (
@@ -112,16 +276,37 @@ def init_database():
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_node_entities_node ON node_entities(node_id)")
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_node_entities_entity ON node_entities(entity_id)")
         
+        # Runtime settings (key/value), e.g. tuned ANN parameters
+        cursor.execute(SETTINGS_SCHEMA)
+        cursor.execute(EDGES_ARCHIVE_SCHEMA)
+        cursor.execute(ENRICHMENT_JOBS_SCHEMA)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_enrichment_jobs_status ON enrichment_jobs(status, id)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_enrichment_jobs_node ON enrichment_jobs(node_id)")
+        
     print(f"✅ Database initialized: {DB_PATH}")
 
 
+def _auto_temporal(content, timestamp):
+    """(t_event_start, t_event_end, temporal_expressions JSON) extracted from content, Nones if none."""
+    try:
+        from temporal_extractor import extract_temporal_expressions
+        temporal = extract_temporal_expressions(content, datetime.fromisoformat(timestamp))
+        if temporal["expressions"]:
+            return temporal["t_event_start"], temporal["t_event_end"], json.dumps(temporal["expressions"])
+    except Exception:
+        pass  # Graceful degradation — temporal is optional
+    return None, None, None
+
+
 def create_node(content, category="general", embedding=None, importance="normal", 
                 emotional_tone=None, emotional_intensity=5, emotional_reflection=None,
-                t_event_start=None, t_event_end=None, temporal_expressions=None):
+                t_event_start=None, t_event_end=None, temporal_expressions=None, conn=None,
+                auto_temporal=True):
     """Create a new node (note). 
     Importance: 'critical', 'normal', or 'low'
     Emotional fields: tone (keywords), intensity (0-10), reflection (narrative) - only if ENABLE_EMOTIONAL_MEMORY=true
     Bi-temporal: t_event_start/end (nullable) = when event happened, temporal_expressions = JSON array of extracted expressions
+    auto_temporal=False leaves extraction to fill_node_temporal (async enrichment)
     """
     timestamp = datetime.now().isoformat()
     
@@ -132,41 +317,63 @@ def create_node(content, category="general", embedding=None, importance="normal"
         emotional_reflection = None
     
     # Auto-extract temporal expressions if not provided
-    if t_event_start is None and temporal_expressions is None:
-        try:
-            from temporal_extractor import extract_temporal_expressions
-            ref_date = datetime.fromisoformat(timestamp)
-            temporal = extract_temporal_expressions(content, ref_date)
-            if temporal["expressions"]:
-                temporal_expressions = json.dumps(temporal["expressions"])
-                t_event_start = temporal["t_event_start"]
-                t_event_end = temporal["t_event_end"]
-        except Exception:
-            pass  # Graceful degradation — temporal is optional
+    if auto_temporal and t_event_start is None and temporal_expressions is None:
+        t_event_start, t_event_end, temporal_expressions = _auto_temporal(content, timestamp)
     
-    with get_connection() as conn:
+    with _session(conn) as conn:
         cursor = conn.cursor()
         cursor.execute(
             """INSERT INTO nodes (content, category, timestamp, embedding, last_accessed, access_count, 
                importance, emotional_tone, emotional_intensity, emotional_reflection,
-               t_event_start, t_event_end, temporal_expressions) 
-               VALUES (?, ?, ?, ?, ?, 0, ?, ?, ?, ?, ?, ?, ?)""",
+               t_event_start, t_event_end, temporal_expressions, content_hash) 
+               VALUES (?, ?, ?, ?, ?, 0, ?, ?, ?, ?, ?, ?, ?, ?)""",
             (content, category, timestamp, embedding, timestamp, importance, 
              emotional_tone, emotional_intensity, emotional_reflection,
-             t_event_start, t_event_end, temporal_expressions)
+             t_event_start, t_event_end, temporal_expressions, content_hash(content))
         )
         return cursor.lastrowid
 
 
-def get_node(node_id):
+def fill_node_temporal(node_id, conn=None):
+    """Extract temporal expressions for a node created without them. Returns True if any were found."""
+    with _session(conn) as conn:
+        row = conn.execute(
+            "SELECT content, timestamp FROM nodes WHERE id = ? AND t_event_start IS NULL AND temporal_expressions IS NULL",
+            (node_id,)).fetchone()
+        if row is None:
+            return False
+        t_event_start, t_event_end, temporal_expressions = _auto_temporal(row[0], row[1])
+        if temporal_expressions is None:
+            return False
+        conn.execute("UPDATE nodes SET t_event_start = ?, t_event_end = ?, temporal_expressions = ? WHERE id = ?",
+                     (t_event_start, t_event_end, temporal_expressions, node_id))
+        return True
+
+
+def get_node(node_id, conn=None):
     """Get node by ID"""
-    with get_connection() as conn:
+    with _session(conn) as conn:
         cursor = conn.cursor()
         cursor.execute("SELECT * FROM nodes WHERE id = ?", (node_id,))
         row = cursor.fetchone()
         return dict(row) if row else None
 
 
+def find_exact_duplicates(hashes, conn=None):
+    """{content_hash: (node_id, content)} of existing notes with these hashes (oldest note per hash)"""
+    hashes = list(dict.fromkeys(hashes))
+    found = {}
+    with _session(conn) as conn:
+        for start in range(0, len(hashes), 900):
+            chunk = hashes[start:start + 900]
+            rows = conn.execute(
+                f"""SELECT content_hash, id, content FROM nodes WHERE content_hash IN ({','.join('?' * len(chunk))})
+                    ORDER BY id""", chunk).fetchall()
+            for h, nid, content in rows:
+                found.setdefault(h, (nid, content))
+    return found
+
+
 def update_node(node_id, content=None, category=None, embedding=None, importance=None,
                 emotional_tone=None, emotional_intensity=None, emotional_reflection=None):
     """Update existing node. Emotional fields only if ENABLE_EMOTIONAL_MEMORY=true"""
@@ -186,6 +393,8 @@ def update_node(node_id, content=None, category=None, embedding=None, importance
         if content is not None:
             updates.append("content = ?")
             params.append(content)
+            updates.append("content_hash = ?")
+            params.append(content_hash(content))
         if category is not None:
             updates.append("category = ?")
             params.append(category)
@@ -271,9 +480,21 @@ def touch_node(node_id):
         )
 
 
-def create_edge(source_id, target_id, weight=0.5, edge_type="semantic"):
-    """Create edge between nodes (or update weight if exists)"""
-    with get_connection() as conn:
+def canonical_edge(source_id, target_id, edge_type="semantic"):
+    """(source_id, target_id) as stored: (min, max) for undirected edge types."""
+    if edge_type in DIRECTED_EDGE_TYPES or source_id <= target_id:
+        return source_id, target_id
+    return target_id, source_id
+
+
+def create_edge(source_id, target_id, weight=0.5, edge_type="semantic", conn=None):
+    """
+    Create edge between nodes (or update weight if exists).
+    Undirected types are stored once per pair, so create_edge(a, b) and
+    create_edge(b, a) write the same row.
+    """
+    source_id, target_id = canonical_edge(source_id, target_id, edge_type)
+    with _session(conn) as conn:
         cursor = conn.cursor()
         try:
             cursor.execute(
@@ -290,37 +511,212 @@ def create_edge(source_id, target_id, weight=0.5, edge_type="semantic"):
             return None
 
 
+def create_edges(rows, conn=None):
+    """
+    Write many (source_id, target_id, weight, edge_type) edges with one
+    executemany; existing edges keep MAX(weight). Returns the canonical rows.
+    """
+    written = {}
+    for source_id, target_id, weight, edge_type in rows:
+        key = canonical_edge(source_id, target_id, edge_type) + (edge_type,)
+        written[key] = max(weight, written.get(key, weight))
+    timestamp = datetime.now().isoformat()
+    with _session(conn) as conn:
+        conn.executemany(
+            """INSERT INTO edges (source_id, target_id, weight, edge_type, created_at) VALUES (?, ?, ?, ?, ?)
+               ON CONFLICT(source_id, target_id, edge_type) DO UPDATE SET weight = MAX(weight, excluded.weight)""",
+            [(s, t, w, et, timestamp) for (s, t, et), w in written.items()]
+        )
+    return [(s, t, w, et) for (s, t, et), w in written.items()]
+
+
+def create_notes_batch(notes, note_entities=(), edges=(), batch_edges=(), entity_edge_weight=None,
+                       entity_link_max_df=0, entity_link_top_k=0, conn=None):
+    """
+    Insert many notes with their entity links and edges in ONE transaction.
+
+    Args:
+        notes: dicts with content, embedding (bytes) and optional category,
+               importance, emotional_* fields (same defaults as create_node)
+               and timestamp (ISO, imports; default now)
+        note_entities: per note, a list of (name, entity_type)
+        edges: (note_index, existing_node_id, weight, edge_type)
+        batch_edges: (note_index, other_note_index, weight, edge_type) within the batch
+        entity_edge_weight: also write pairwise entity edges to notes sharing
+                            an entity (MATERIALIZE_ENTITY_EDGES), None = don't
+        entity_link_max_df, entity_link_top_k: fan-out caps for those edges,
+                            see get_co_entity_node_ids (0 = no cap)
+
+    Node ids are allocated up front under BEGIN IMMEDIATE so nodes, links and
+    edges all go in with executemany. Existing edges keep MAX(weight).
+    With conn, the caller's transaction is used and committed by the caller.
+
+    Returns:
+        {"node_ids": [...], "entity_ids": [[...] per note], "edges": [(s, t, w, type)]}
+    """
+    if not notes:
+        return {"node_ids": [], "entity_ids": [], "edges": []}
+    timestamp = datetime.now().isoformat()
+    note_entities = list(note_entities) or [[] for _ in notes]
+
+    rows = []
+    for note in notes:
+        tone, intensity, reflection = (note.get("emotional_tone"), note.get("emotional_intensity", 5),
+                                       note.get("emotional_reflection"))
+        if not ENABLE_EMOTIONAL_MEMORY:
+            tone, intensity, reflection = None, 5, None
+        created = note.get("timestamp") or timestamp
+        rows.append([note["content"], note.get("category", "general"), created, note.get("embedding"),
+                     created, note.get("importance", "normal"), tone, intensity, reflection,
+                     *_auto_temporal(note["content"], created), content_hash(note["content"])])
+
+    with _session(conn) as conn:
+        cursor = conn.cursor()
+        if not conn.in_transaction:
+            cursor.execute("BEGIN IMMEDIATE")
+        # Same ids AUTOINCREMENT would hand out (never reuses a deleted note's id)
+        seq = cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = 'nodes'").fetchone()
+        first = max(seq[0] if seq else 0, cursor.execute("SELECT COALESCE(MAX(id), 0) FROM nodes").fetchone()[0]) + 1
+        node_ids = list(range(first, first + len(rows)))
+        cursor.executemany(
+            """INSERT INTO nodes (id, content, category, timestamp, embedding, last_accessed, access_count,
+               importance, emotional_tone, emotional_intensity, emotional_reflection,
+               t_event_start, t_event_end, temporal_expressions, content_hash)
+               VALUES (?, ?, ?, ?, ?, ?, 0, ?, ?, ?, ?, ?, ?, ?, ?)""",
+            [[nid] + row for nid, row in zip(node_ids, rows)]
+        )
+
+        # Entities: resident dictionary first, one lookup for the rest, insert the missing ones
+        first_seen = {}
+        for entities in note_entities:
+            for name, entity_type in entities:
+                first_seen.setdefault(normalize_entity_name(name), (name, entity_type))
+        entity_id = {}
+        names = []
+        for name_norm in first_seen:
+            eid = entity_dictionary.get(name_norm)
+            if eid is None:
+                names.append(name_norm)
+            else:
+                entity_id[name_norm] = eid
+        for start in range(0, len(names), 900):
+            chunk = names[start:start + 900]
+            cursor.execute(f"SELECT id, name_norm FROM entities WHERE name_norm IN ({','.join('?' * len(chunk))})",
+                           chunk)
+            for eid, name_norm in cursor.fetchall():
+                entity_id.setdefault(name_norm, eid)
+        for name_norm in names:
+            if name_norm not in entity_id:
+                entity_id[name_norm] = _insert_entity(cursor, *first_seen[name_norm], name_norm)
+        pending = _pending_entities.get(id(conn))
+        if pending is not None:
+            pending.update(entity_id)
+        entity_ids = [list(dict.fromkeys(entity_id[normalize_entity_name(name)] for name, _ in entities))
+                      for entities in note_entities]
+        cursor.executemany("INSERT OR IGNORE INTO node_entities (node_id, entity_id) VALUES (?, ?)",
+                           [(nid, eid) for nid, eids in zip(node_ids, entity_ids) for eid in eids])
+
+        written = {}
+        for i, target, weight, edge_type in edges:
+            key = canonical_edge(node_ids[i], target, edge_type) + (edge_type,)
+            written[key] = max(weight, written.get(key, weight))
+        for i, j, weight, edge_type in batch_edges:
+            key = canonical_edge(node_ids[i], node_ids[j], edge_type) + (edge_type,)
+            written[key] = max(weight, written.get(key, weight))
+        if entity_edge_weight is not None:
+            for nid, eids in zip(node_ids, entity_ids):
+                for other, _ in get_co_entity_node_ids(nid, eids, entity_link_max_df, entity_link_top_k,
+                                                       conn=conn):
+                    key = canonical_edge(nid, other, "entity") + ("entity",)
+                    written[key] = entity_edge_weight
+        edge_rows = [(s, t, w, et) for (s, t, et), w in written.items()]
+        cursor.executemany(
+            """INSERT INTO edges (source_id, target_id, weight, edge_type, created_at) VALUES (?, ?, ?, ?, ?)
+               ON CONFLICT(source_id, target_id, edge_type) DO UPDATE SET weight = MAX(weight, excluded.weight)""",
+            [(s, t, w, et, timestamp) for s, t, w, et in edge_rows]
+        )
+    return {"node_ids": node_ids, "entity_ids": entity_ids, "edges": edge_rows}
+
+
 def get_connected_nodes(node_id):
-    """Get all nodes connected to given node"""
+    """Get all nodes connected to given node (no embedding BLOBs)"""
+    # Two index lookups (idx_edges_source / idx_edges_target) instead of an OR join
     with get_connection() as conn:
         cursor = conn.cursor()
         cursor.execute(
-            """SELECT DISTINCT n.*, e.weight, e.edge_type
-               FROM nodes n
-               JOIN edges e ON (n.id = e.target_id AND e.source_id = ?)
-                            OR (n.id = e.source_id AND e.target_id = ?)
-               WHERE n.id != ?""",
-            (node_id, node_id, node_id)
+            """SELECT n.id, n.content, n.category, n.timestamp, n.importance, e.weight, e.edge_type
+               FROM edges e JOIN nodes n ON n.id = e.target_id
+               WHERE e.source_id = ? AND e.target_id != ?
+               UNION
+               SELECT n.id, n.content, n.category, n.timestamp, n.importance, e.weight, e.edge_type
+               FROM edges e JOIN nodes n ON n.id = e.source_id
+               WHERE e.target_id = ? AND e.source_id != ?""",
+            (node_id, node_id, node_id, node_id)
         )
         return [dict(row) for row in cursor.fetchall()]
 
 
-def get_or_create_entity(name, entity_type="concept"):
-    """Get existing entity or create new one"""
-    name_lower = name.lower().strip()
+def get_node_previews(node_ids, preview_chars=200):
+    """
+    Preview columns for many nodes in one query (chunked under SQLite's
+    parameter limit): id, category, importance, timestamp, the first
+    preview_chars characters of content, and full content length.
+    Returns {node_id: dict}; missing ids are absent.
+    """
+    node_ids = list(dict.fromkeys(node_ids))
+    previews = {}
     with get_connection() as conn:
         cursor = conn.cursor()
-        cursor.execute("SELECT id FROM entities WHERE LOWER(name) = ?", (name_lower,))
+        for start in range(0, len(node_ids), 900):
+            chunk = node_ids[start:start + 900]
+            placeholders = ",".join("?" * len(chunk))
+            cursor.execute(
+                f"""SELECT id, category, importance, timestamp,
+                           SUBSTR(content, 1, ?) AS preview, LENGTH(content) AS full_length
+                    FROM nodes WHERE id IN ({placeholders})""",
+                [preview_chars] + chunk
+            )
+            for row in cursor.fetchall():
+                previews[row["id"]] = dict(row)
+    return previews
+
+
+def _insert_entity(cursor, name, entity_type, name_norm):
+    """Insert an entity, or return the id of the one that got there first."""
+    cursor.execute("INSERT OR IGNORE INTO entities (name, entity_type, name_norm) VALUES (?, ?, ?)",
+                   (name, entity_type, name_norm))
+    if cursor.rowcount:
+        return cursor.lastrowid
+    # Lost a race on name_norm (or an exact name stored before name_norm existed)
+    row = cursor.execute("SELECT id FROM entities WHERE name_norm = ? OR name = ?", (name_norm, name)).fetchone()
+    return row[0]
+
+
+def get_or_create_entity(name, entity_type="concept", conn=None):
+    """Get existing entity or create new one (resident dictionary first, then SQLite)"""
+    name_norm = normalize_entity_name(name)
+    eid = entity_dictionary.get(name_norm)
+    if eid is not None:
+        return eid
+    with _session(conn) as conn:
+        pending = _pending_entities.get(id(conn))
+        if pending and name_norm in pending:
+            return pending[name_norm]
+        cursor = conn.cursor()
+        cursor.execute("SELECT id FROM entities WHERE name_norm = ?", (name_norm,))
         row = cursor.fetchone()
         if row:
+            entity_dictionary.update({name_norm: row["id"]})
             return row["id"]
-        cursor.execute("INSERT INTO entities (name, entity_type) VALUES (?, ?)", (name, entity_type))
-        return cursor.lastrowid
+        eid = _insert_entity(cursor, name, entity_type, name_norm)
+        if pending is not None:
+            pending[name_norm] = eid  # published when the transaction commits
+        return eid
 
 
-def link_node_to_entity(node_id, entity_id):
+def link_node_to_entity(node_id, entity_id, conn=None):
     """Link node to entity"""
-    with get_connection() as conn:
+    with _session(conn) as conn:
         cursor = conn.cursor()
         try:
             cursor.execute("INSERT INTO node_entities (node_id, entity_id) VALUES (?, ?)", (node_id, entity_id))
@@ -329,9 +725,56 @@ def link_node_to_entity(node_id, entity_id):
             return False
 
 
-def get_nodes_by_entity(entity_id):
+def link_node_to_entities(node_id, entity_ids, conn=None):
+    """Link a node to many entities with one executemany (existing links are ignored)"""
+    with _session(conn) as conn:
+        conn.executemany("INSERT OR IGNORE INTO node_entities (node_id, entity_id) VALUES (?, ?)",
+                         [(node_id, eid) for eid in dict.fromkeys(entity_ids)])
+
+
+def get_co_entity_node_ids(node_id, entity_ids, max_df=0, top_k=0, conn=None):
+    """
+    Earlier notes (id < node_id) sharing entities with node_id, strongest first.
+
+    Ids only, from node_entities. Entities on more than max_df notes are
+    skipped (counting stops at max_df + 1, so a huge entity costs no more
+    than a capped one). Notes are scored Adamic–Adar style, sum of
+    1 / log(1 + df) over the shared entities, so one rare shared entity
+    beats several common ones; ties go to the newest note. top_k bounds
+    the result (0 = no cap).
+
+    Returns [(node_id, score)].
+    """
+    entity_ids = list(dict.fromkeys(entity_ids))
+    if not entity_ids:
+        return []
+    with _session(conn) as conn:
+        cursor = conn.cursor()
+        weights = []
+        for eid in entity_ids:
+            if max_df:
+                cursor.execute("SELECT COUNT(*) FROM (SELECT 1 FROM node_entities WHERE entity_id = ? LIMIT ?)",
+                               (eid, max_df + 1))
+            else:
+                cursor.execute("SELECT COUNT(*) FROM node_entities WHERE entity_id = ?", (eid,))
+            df = cursor.fetchone()[0]
+            if df and not (max_df and df > max_df):
+                weights.append((eid, 1.0 / math.log1p(df)))
+        if not weights:
+            return []
+        values = ",".join("(?, ?)" for _ in weights)
+        cursor.execute(
+            f"""WITH w(entity_id, weight) AS (VALUES {values})
+                SELECT ne.node_id, SUM(w.weight) AS score FROM node_entities ne JOIN w ON w.entity_id = ne.entity_id
+                WHERE ne.node_id < ? GROUP BY ne.node_id ORDER BY score DESC, ne.node_id DESC LIMIT ?""",
+            [x for pair in weights for x in pair] + [node_id, top_k or -1]
+        )
+        return [(row[0], row[1]) for row in cursor.fetchall()]
+
+
+def get_nodes_by_entity(entity_id, conn=None):
     """Get all nodes linked to an entity"""
-    with get_connection() as conn:
+    with _session(conn) as conn:
         cursor = conn.cursor()
         cursor.execute(
             "SELECT n.* FROM nodes n JOIN node_entities ne ON n.id = ne.node_id WHERE ne.entity_id = ?",
@@ -340,6 +783,14 @@ def get_nodes_by_entity(entity_id):
         return [dict(row) for row in cursor.fetchall()]
 
 
+def get_all_node_entities():
+    """Get every (node_id, entity_id) link"""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT node_id, entity_id FROM node_entities")
+        return [(row[0], row[1]) for row in cursor.fetchall()]
+
+
 def get_entity_counts_batch():
     """Get entity count per node as dict {node_id: count}"""
     with get_connection() as conn:
@@ -377,6 +828,31 @@ def get_stats():
         }
 
 
+def get_setting(key, default=None, conn=None):
+    """Get runtime setting value (string) or default if unset"""
+    try:
+        with _session(conn) as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT value FROM settings WHERE key = ?", (key,))
+            row = cursor.fetchone()
+            return row["value"] if row else default
+    except sqlite3.OperationalError:
+        # settings table missing (database not initialized yet)
+        return default
+
+
+def set_setting(key, value, conn=None):
+    """Store runtime setting (picked up by the running server without restart)"""
+    with _session(conn) as conn:
+        cursor = conn.cursor()
+        cursor.execute(SETTINGS_SCHEMA)
+        cursor.execute(
+            """INSERT INTO settings (key, value, updated_at) VALUES (?, ?, ?)
+               ON CONFLICT(key) DO UPDATE SET value = excluded.value, updated_at = excluded.updated_at""",
+            (key, str(value), datetime.now().isoformat())
+        )
+
+
 def get_all_edges():
     """Get all edges from database for graph cache"""
     with get_connection() as conn:
@@ -493,10 +969,91 @@ def restore_note_version(note_id, version_number):
             UPDATE nodes
             SET content = ?, category = ?, importance = ?,
                 emotional_tone = ?, emotional_intensity = ?, emotional_reflection = ?,
-                timestamp = ?
+                timestamp = ?, content_hash = ?
             WHERE id = ?
         """, (version_dict['content'], version_dict['category'], version_dict['importance'],
               version_dict['emotional_tone'], version_dict['emotional_intensity'],
-              version_dict['emotional_reflection'], datetime.now().isoformat(), note_id))
+              version_dict['emotional_reflection'], datetime.now().isoformat(),
+              content_hash(version_dict['content']), note_id))
         
         return cursor.rowcount > 0
+
+
+# ===== Enrichment jobs (ENRICHMENT_MODE=async) =====
+
+def enqueue_enrichment(node_id, conn=None):
+    """Queue a note for background enrichment (pass the conn that creates it)"""
+    with _session(conn) as conn:
+        cursor = conn.cursor()
+        cursor.execute("INSERT INTO enrichment_jobs (node_id, status, created_at) VALUES (?, 'pending', ?)",
+                       (node_id, datetime.now().isoformat()))
+        return cursor.lastrowid
+
+
+def claim_enrichment_job():
+    """Mark the oldest pending job running. Returns {id, node_id, attempts} or None."""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("BEGIN IMMEDIATE")  # two workers never claim the same job
+        row = cursor.execute(
+            "SELECT id, node_id, attempts FROM enrichment_jobs WHERE status = 'pending' ORDER BY id LIMIT 1"
+        ).fetchone()
+        if row is None:
+            return None
+        cursor.execute("UPDATE enrichment_jobs SET status = 'running', attempts = attempts + 1, started_at = ? "
+                       "WHERE id = ?", (datetime.now().isoformat(), row["id"]))
+        return {"id": row["id"], "node_id": row["node_id"], "attempts": row["attempts"] + 1}
+
+
+def finish_enrichment_job(job_id, conn=None):
+    """Remove a finished job (pass the conn that writes the note's links)"""
+    with _session(conn) as conn:
+        conn.execute("DELETE FROM enrichment_jobs WHERE id = ?", (job_id,))
+
+
+def fail_enrichment_job(job_id, error, max_attempts):
+    """Return a job to the queue, or park it as failed after max_attempts"""
+    with get_connection() as conn:
+        conn.execute(
+            "UPDATE enrichment_jobs SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+            "error = ? WHERE id = ?", (max_attempts, str(error)[:500], job_id))
+
+
+def recover_enrichment_jobs(running=True, failed=False):
+    """Requeue jobs left running by a crash or restart, and/or failed ones. Returns the count."""
+    statuses = [status for status, on in (('running', running), ('failed', failed)) if on]
+    if not statuses:
+        return 0
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            f"UPDATE enrichment_jobs SET status = 'pending', attempts = 0 "
+            f"WHERE status IN ({','.join('?' * len(statuses))})", statuses)
+        return cursor.rowcount
+
+
+def get_enrichment_depth():
+    """Jobs waiting or in progress"""
+    with get_connection() as conn:
+        return conn.execute("SELECT COUNT(*) FROM enrichment_jobs WHERE status IN ('pending', 'running')").fetchone()[0]
+
+
+def get_enrichment_status(node_id):
+    """'pending', 'running' or 'failed' (with error) while a job exists, else 'done'"""
+    with get_connection() as conn:
+        row = conn.execute("SELECT status, attempts, error FROM enrichment_jobs WHERE node_id = ? ORDER BY id DESC",
+                           (node_id,)).fetchone()
+        if row is None:
+            exists = conn.execute("SELECT 1 FROM nodes WHERE id = ?", (node_id,)).fetchone()
+            return {"node_id": node_id, "status": "done" if exists else "not_found"}
+        return {"node_id": node_id, "status": row["status"], "attempts": row["attempts"], "error": row["error"]}
+
+
+def get_enrichment_stats():
+    """Job counts by status and the age of the oldest pending job"""
+    with get_connection() as conn:
+        counts = dict(conn.execute("SELECT status, COUNT(*) FROM enrichment_jobs GROUP BY status").fetchall())
+        oldest = conn.execute("SELECT MIN(created_at) FROM enrichment_jobs WHERE status = 'pending'").fetchone()[0]
+    age = (datetime.now() - datetime.fromisoformat(oldest)).total_seconds() if oldest else 0.0
+    return {"pending": counts.get("pending", 0), "running": counts.get("running", 0),
+            "failed": counts.get("failed", 0), "oldest_pending_sec": round(age, 1)}
@@ -0,0 +1,583 @@
+#!/usr/bin/env python3
+"""
+Precomputed diffusion vectors for O(k) query-time spreading.
+
+Spreading activation is linear up to the per-iteration max-normalization
+(a global scale) and the SPREAD_MIN_ACTIVATION cut-off:
+
+    x_{t+1} = decay * (x_t + A x_t)   →   x_T = M^T x_0,  M = decay * (I + A)
+
+so the spread of a query is the weighted sum of the spreads of its seeds.
+Sleep-compute (step_diffusion) stores, for every node u, the top
+DIFFUSION_TOP_K entries of M^T e_u (T = ACTIVATION_ITERATIONS, raw scale,
+not normalized) in the diffusion_vectors table. At query time
+activation_mode="diffusion" sums the seeds' vectors instead of walking
+the graph; seeds without a vector (notes added since the last run) are
+diffused live over the graph cache with the same recurrence.
+
+Refresh is incremental: each row keeps a hash of the node's 1-hop
+adjacency. A node whose hash changed is recomputed, together with every
+node that holds it among its stored top-K entries. Invalidating the full
+T - 1 hop ball instead would be exact, but with entity hubs that ball is
+most of the graph; a change at a node outside u's top-K only moves mass
+that was already below u's K-th entry. Changing the hops, decay or top-K
+parameters recomputes everything.
+
+Unless MATERIALIZE_ENTITY_EDGES is set, A also includes the entity hops
+of node_entities (B W Bᵀ, see entity_graph.py), matching live spreading.
+"""
+import os
+import time
+import hashlib
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+
+from entity_graph import MATERIALIZE_ENTITY_EDGES
+
+DIFFUSION_TOP_K = int(os.getenv("DIFFUSION_TOP_K", "50"))  # entries kept per node
+DIFFUSION_HOPS = int(os.getenv("ACTIVATION_ITERATIONS", "3"))  # same T as live spreading
+DIFFUSION_DECAY = float(os.getenv("ACTIVATION_DECAY", "0.7"))
+DIFFUSION_BATCH = int(os.getenv("DIFFUSION_BATCH", "512"))  # source nodes per sparse product
+DIFFUSION_POLL_SEC = float(os.getenv("DIFFUSION_POLL_SEC", "60"))  # reload check interval
+DIFFUSION_STALE_TOLERANCE = float(os.getenv("DIFFUSION_STALE_TOLERANCE", "0.1"))  # × K-th score, 0 = exact invalidation
+DIFFUSION_REPORT_QUERIES = int(os.getenv("DIFFUSION_REPORT_QUERIES", "50"))  # sampled for the ranking report
+
+DIFFUSION_VERSION_SETTING = "diffusion_version"
+DIFFUSION_PARAMS_SETTING = "diffusion_params"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS diffusion_vectors (
+    node_id INTEGER PRIMARY KEY,
+    neighbor_ids BLOB NOT NULL,
+    scores BLOB NOT NULL,
+    adjacency_hash TEXT NOT NULL,
+    strength REAL,
+    drift REAL DEFAULT 0,
+    computed_at TEXT
+)
+"""
+
+
+# ===== Offline computation (sleep-compute) =====
+
+def _adjacency(edges: Iterable[Tuple[int, int, float, str]], node_ids: Iterable[int]):
+    """
+    Edge rows → (ids, scipy CSR matrix A) matching the graph cache view:
+    bidirectional, max weight per (source, target, type), summed over types.
+    """
+    from scipy import sparse
+
+    ids = np.unique(np.fromiter(node_ids, dtype=np.int64))
+    best = {}
+    for src, dst, weight, edge_type in edges:
+        for key in ((src, dst, edge_type), (dst, src, edge_type)):
+            if weight > best.get(key, -1.0):
+                best[key] = weight
+    n = len(ids)
+    if not best:
+        return ids, sparse.csr_matrix((n, n), dtype=np.float64)
+
+    keys = list(best)
+    src_ids = np.array([k[0] for k in keys], dtype=np.int64)
+    dst_ids = np.array([k[1] for k in keys], dtype=np.int64)
+    weights = np.array([best[k] for k in keys], dtype=np.float64)
+    # Drop edges to nodes that no longer exist (dangling rows)
+    ok = np.isin(src_ids, ids) & np.isin(dst_ids, ids)
+    src = np.searchsorted(ids, src_ids[ok])
+    dst = np.searchsorted(ids, dst_ids[ok])
+    # Duplicates (same pair, different types) are summed by the constructor
+    A = sparse.csr_matrix((weights[ok], (src, dst)), shape=(n, n))
+    A.sum_duplicates()
+    return ids, A
+
+
+def _entity_links(conn) -> List[Tuple[int, int]]:
+    """(node_id, entity_id) rows, or none when the database has no node_entities table."""
+    if not conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'node_entities'").fetchone():
+        return []
+    return conn.execute("SELECT node_id, entity_id FROM node_entities").fetchall()
+
+
+def _entity_adjacency(ids: np.ndarray, links: Iterable[Tuple[int, int]]):
+    """
+    node_entities rows → note × note matrix B W Bᵀ (zero diagonal): the
+    linear form of spreading's note → entity → notes hop (see entity_graph).
+    Entity weights are rounded to 0.01 so the slow IDF drift as the corpus
+    grows does not change every entity-linked node's adjacency hash.
+    """
+    from scipy import sparse
+    from entity_graph import EntityGraph
+
+    n = len(ids)
+    graph = EntityGraph()
+    graph.build(links)
+    rows, cols, weights = [], [], []
+    for col, (_, w, notes) in enumerate(graph.spreadable()):
+        rows.append(np.asarray(notes, dtype=np.int64))
+        cols.append(np.full(len(notes), col, dtype=np.int64))
+        weights.append(round(w, 2))
+    if not rows:
+        return sparse.csr_matrix((n, n), dtype=np.float64)
+    note_ids, cols = np.concatenate(rows), np.concatenate(cols)
+    ok = np.isin(note_ids, ids)
+    B = sparse.csr_matrix((np.ones(int(ok.sum())), (np.searchsorted(ids, note_ids[ok]), cols[ok])),
+                          shape=(n, len(weights)))
+    E = (B @ sparse.diags(np.asarray(weights)) @ B.T).tocsr()
+    E.setdiag(0)
+    E.eliminate_zeros()
+    return E
+
+
+def adjacency_change(old_strength, new_strength) -> float:
+    """Relative change of a node's adjacency from its weighted degree (1.0 when unknown)."""
+    if old_strength is None:
+        return 1.0
+    delta = abs(new_strength - old_strength) / max(new_strength, old_strength, 1e-12)
+    return delta if delta > 0 else 1.0  # same strength, different rows: rewired
+
+
+def adjacency_hashes(ids: np.ndarray, A) -> List[str]:
+    """Per-node hash of (neighbour id, weight) rows — changes iff the 1-hop adjacency changed."""
+    hashes = []
+    for i in range(len(ids)):
+        start, end = A.indptr[i], A.indptr[i + 1]
+        h = hashlib.blake2b(digest_size=8)
+        h.update(ids[A.indices[start:end]].tobytes())
+        h.update(np.round(A.data[start:end], 6).tobytes())
+        hashes.append(h.hexdigest())
+    return hashes
+
+
+def stale_holders(stored_vectors, change: Dict[int, float], tolerance: float) -> Tuple[set, Dict[int, float]]:
+    """
+    Node ids whose stored vector changes have moved by >= tolerance × its K-th score.
+
+    change maps changed node x → relative change of its adjacency (0..1).
+    The shift of u's entries is bounded (first order) by sum v_u[x] * change[x]
+    over changed x in u's top-K; it accumulates in the row's drift across
+    runs, so many small changes to a hub eventually refresh its holders.
+    Truncated vectors (fewer than top_k entries) hold the whole
+    neighbourhood, so any change there counts.
+
+    Returns:
+        (holders to recompute, {node_id: accumulated drift} for the others)
+    """
+    changed_ids = np.fromiter(change.keys(), dtype=np.int64, count=len(change))
+    rel = np.fromiter(change.values(), dtype=np.float64, count=len(change))
+    order = np.argsort(changed_ids)
+    changed_ids, rel = changed_ids[order], rel[order]
+    holders, drift = set(), {}
+    for nid, ids_blob, score_blob, prior, top_k in stored_vectors:
+        ids = np.frombuffer(ids_blob, dtype=np.int64)
+        hit = np.isin(ids, changed_ids)
+        if not hit.any():
+            continue
+        scores = np.frombuffer(score_blob, dtype=np.float32)
+        shift = (prior or 0.0) + float(np.dot(scores[hit], rel[np.searchsorted(changed_ids, ids[hit])]))
+        if len(ids) < top_k or shift >= tolerance * float(scores[-1]):
+            holders.add(nid)
+        else:
+            drift[nid] = shift
+    return holders, drift
+
+
+def compute_vectors(A, sources: np.ndarray, hops: int, decay: float, top_k: int):
+    """
+    Yield (source_index, neighbor_indices, scores) for every source: the
+    top_k entries of M^hops e_source, M = decay * (I + A).
+    """
+    from scipy import sparse
+
+    n = A.shape[0]
+    M = (decay * (A + sparse.identity(n, format="csr"))).tocsr()
+    for start in range(0, len(sources), DIFFUSION_BATCH):
+        batch = sources[start:start + DIFFUSION_BATCH]
+        X = sparse.csc_matrix((np.ones(len(batch)), (batch, np.arange(len(batch)))),
+                              shape=(n, len(batch)))
+        for _ in range(hops):
+            X = (M @ X).tocsc()
+        for col, src in enumerate(batch):
+            lo, hi = X.indptr[col], X.indptr[col + 1]
+            idx, vals = X.indices[lo:hi], X.data[lo:hi]
+            if len(vals) > top_k:
+                keep = np.argpartition(-vals, top_k - 1)[:top_k]
+                idx, vals = idx[keep], vals[keep]
+            order = np.argsort(-vals, kind="stable")
+            yield src, idx[order], vals[order]
+
+
+def refresh_diffusion_vectors(db_path: str, hops: int = None, decay: float = None,
+                              top_k: int = None, tolerance: float = None, dry_run: bool = False) -> dict:
+    """
+    Recompute diffusion vectors for nodes whose T-hop neighbourhood changed.
+
+    Returns:
+        {nodes, changed, dirty, removed, computed, full, bytes, drifting, seconds}
+    """
+    from database import SETTINGS_SCHEMA
+
+    hops = DIFFUSION_HOPS if hops is None else hops
+    decay = DIFFUSION_DECAY if decay is None else decay
+    top_k = DIFFUSION_TOP_K if top_k is None else top_k
+    tolerance = DIFFUSION_STALE_TOLERANCE if tolerance is None else tolerance
+    params = f"hops={hops};decay={decay};top_k={top_k}"
+    t0 = time.time()
+
+    conn = sqlite3.connect(db_path)
+    conn.execute(SCHEMA)
+    conn.execute(SETTINGS_SCHEMA)
+    node_ids = [r[0] for r in conn.execute("SELECT id FROM nodes")]
+    edges = conn.execute("SELECT source_id, target_id, weight, edge_type FROM edges").fetchall()
+    stored = {nid: (h, strength) for nid, h, strength in
+              conn.execute("SELECT node_id, adjacency_hash, strength FROM diffusion_vectors")}
+    row = conn.execute("SELECT value FROM settings WHERE key = ?", (DIFFUSION_PARAMS_SETTING,)).fetchone()
+    full = row is None or row[0] != params
+
+    ids, A = _adjacency(edges, node_ids)
+    if not MATERIALIZE_ENTITY_EDGES:
+        A = (A + _entity_adjacency(ids, _entity_links(conn))).tocsr()
+    hashes = adjacency_hashes(ids, A)
+    strengths = np.asarray(A.sum(axis=1)).ravel()
+    if full:
+        changed = np.ones(len(ids), dtype=bool)
+    else:
+        changed = np.array([stored.get(int(nid), (None,))[0] != h for nid, h in zip(ids, hashes)], dtype=bool)
+    dirty = changed
+    drift = {}
+    if not full and changed.any():
+        change = {int(ids[i]): adjacency_change(stored.get(int(ids[i]), (None, None))[1], strengths[i])
+                  for i in np.flatnonzero(changed)}
+        holders, drift = stale_holders(
+            conn.execute("SELECT node_id, neighbor_ids, scores, drift, ? FROM diffusion_vectors", (top_k,)),
+            change, tolerance)
+        dirty = changed | np.isin(ids, np.fromiter(holders, dtype=np.int64, count=len(holders)))
+    live = set(int(i) for i in ids)
+    removed = [nid for nid in stored if nid not in live]
+
+    result = {
+        "nodes": len(ids), "changed": int(changed.sum()), "dirty": int(dirty.sum()),
+        "removed": len(removed), "computed": 0, "full": full, "bytes": 0, "drifting": len(drift),
+    }
+    if dry_run:
+        conn.close()
+        result["seconds"] = round(time.time() - t0, 2)
+        return result
+
+    now = datetime.now().isoformat()
+    rows = []
+    for src, idx, vals in compute_vectors(A, np.flatnonzero(dirty), hops, decay, top_k):
+        neighbor_blob = ids[idx].astype(np.int64).tobytes()
+        score_blob = vals.astype(np.float32).tobytes()
+        result["bytes"] += len(neighbor_blob) + len(score_blob)
+        rows.append((int(ids[src]), neighbor_blob, score_blob, hashes[src], float(strengths[src]), now))
+
+    conn.executemany(
+        "INSERT OR REPLACE INTO diffusion_vectors (node_id, neighbor_ids, scores, adjacency_hash, strength, computed_at) "
+        "VALUES (?, ?, ?, ?, ?, ?)", rows)
+    conn.executemany("UPDATE diffusion_vectors SET drift = ? WHERE node_id = ?",
+                     [(d, nid) for nid, d in drift.items()])
+    conn.executemany("DELETE FROM diffusion_vectors WHERE node_id = ?", [(nid,) for nid in removed])
+    for key, value in ((DIFFUSION_PARAMS_SETTING, params), (DIFFUSION_VERSION_SETTING, now)):
+        conn.execute(
+            """INSERT INTO settings (key, value, updated_at) VALUES (?, ?, ?)
+               ON CONFLICT(key) DO UPDATE SET value = excluded.value, updated_at = excluded.updated_at""",
+            (key, value, now))
+    conn.commit()
+    conn.close()
+
+    result["computed"] = len(rows)
+    result["seconds"] = round(time.time() - t0, 2)
+    return result
+
+
+# ===== Query time =====
+
+class DiffusionStore:
+    """
+    Resident copy of diffusion_vectors: {node_id: (neighbor_ids, scores)}.
+    Reloaded when sleep-compute publishes a new diffusion_version.
+    """
+
+    def __init__(self, db_path: str = None):
+        self.db_path = db_path  # None = database.DB_PATH
+        self._vectors: Dict[int, Tuple[np.ndarray, np.ndarray]] = {}
+        self._version = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self.hops = DIFFUSION_HOPS
+        self.decay = DIFFUSION_DECAY
+        self.top_k = DIFFUSION_TOP_K
+
+    def __len__(self):
+        return len(self._vectors)
+
+    def _connect(self):
+        if self.db_path is None:
+            from database import DB_PATH
+            return sqlite3.connect(DB_PATH)
+        return sqlite3.connect(self.db_path)
+
+    def load(self) -> int:
+        """Load all vectors from the database. Returns the number of nodes loaded."""
+        self._checked_at = time.monotonic()
+        try:
+            conn = self._connect()
+            rows = conn.execute("SELECT node_id, neighbor_ids, scores FROM diffusion_vectors").fetchall()
+            settings = dict(conn.execute(
+                "SELECT key, value FROM settings WHERE key IN (?, ?)",
+                (DIFFUSION_VERSION_SETTING, DIFFUSION_PARAMS_SETTING)))
+            conn.close()
+        except sqlite3.OperationalError:
+            return 0  # not computed yet (sleep-compute never ran)
+
+        vectors = {nid: (np.frombuffer(ids_blob, dtype=np.int64), np.frombuffer(score_blob, dtype=np.float32))
+                   for nid, ids_blob, score_blob in rows}
+        params = dict(p.split("=") for p in settings.get(DIFFUSION_PARAMS_SETTING, "").split(";") if "=" in p)
+        with self._lock:
+            self._vectors = vectors
+            self._version = settings.get(DIFFUSION_VERSION_SETTING)
+            self.hops = int(params.get("hops", self.hops))
+            self.decay = float(params.get("decay", self.decay))
+            self.top_k = int(params.get("top_k", self.top_k))
+        print(f"✅ Loaded diffusion vectors: {len(vectors)} nodes (top-{self.top_k}, {self.hops} hops)")
+        return len(vectors)
+
+    def refresh(self, force: bool = False) -> bool:
+        """Reload if sleep-compute published new vectors. Polled at most every DIFFUSION_POLL_SEC."""
+        now = time.monotonic()
+        if not force and now - self._checked_at < DIFFUSION_POLL_SEC:
+            return False
+        self._checked_at = now
+        try:
+            conn = self._connect()
+            row = conn.execute("SELECT value FROM settings WHERE key = ?", (DIFFUSION_VERSION_SETTING,)).fetchone()
+            conn.close()
+            version = row[0] if row else None
+        except sqlite3.OperationalError:
+            return False  # settings table missing (database not initialized yet)
+        except Exception as e:
+            print(f"⚠️  Failed to read diffusion version: {e}")
+            return False
+        if version is None or version == self._version:
+            return False
+        self.load()
+        return True
+
+    def get(self, node_id: int):
+        return self._vectors.get(node_id)
+
+    def _live_vector(self, node_id: int, graph_cache, budget: int, entity_graph=None):
+        """
+        M^hops e_node over the graph cache (same recurrence as compute_vectors).
+        Once `budget` edges are spent no further rows are read; a row cut by
+        the budget keeps its strongest edges, and the hops left only decay.
+        """
+        from spreading import entity_hop
+        x = {node_id: 1.0}
+        edges = 0
+        for hop in range(self.hops):
+            nxt = {nid: a * self.decay for nid, a in x.items()}
+            for nid, a in x.items():
+                if budget and edges >= budget:
+                    break
+                neighbors = graph_cache.top_neighbors(nid, limit=budget - edges if budget else 0)
+                edges += len(neighbors)
+                for nb, w, _ in neighbors:
+                    nxt[nb] = nxt.get(nb, 0.0) + a * w * self.decay
+            if entity_graph is not None and not (budget and edges >= budget):
+                visits, _ = entity_hop(list(x.items()), entity_graph, nxt, self.decay,
+                                       budget - edges if budget else None)
+                edges += visits
+            x = nxt
+            if budget and edges >= budget:
+                scale = self.decay ** (self.hops - hop - 1)
+                x = {nid: a * scale for nid, a in x.items()}
+                break
+        if len(x) > self.top_k:
+            keep = sorted(x.items(), key=lambda kv: kv[1], reverse=True)[:self.top_k]
+            x = dict(keep)
+        ids = np.fromiter(x.keys(), dtype=np.int64, count=len(x))
+        scores = np.fromiter(x.values(), dtype=np.float32, count=len(x))
+        return ids, scores, edges
+
+    def diffuse(self, seeds: Dict[int, float], graph_cache=None,
+                max_edges: int = None, entity_graph=None) -> Tuple[Dict[int, float], dict]:
+        """
+        Activation = sum of seed weight × seed diffusion vector.
+
+        Args:
+            seeds: {node_id: activation} (e.g. ANN similarities)
+            graph_cache: Used for seeds with no precomputed vector
+            max_edges: Edge budget for those live fallbacks (default SPREAD_MAX_EDGES)
+            entity_graph: EntityGraph for entity hops in those live fallbacks
+
+        Returns:
+            (activations normalized to max 1.0, stats dict)
+        """
+        from spreading import SPREAD_MAX_EDGES
+        max_edges = SPREAD_MAX_EDGES if max_edges is None else max_edges
+        self.refresh()
+
+        parts_ids, parts_scores = [], []
+        fallback = 0
+        edges_expanded = 0
+        for nid, a in seeds.items():
+            if a <= 0:
+                continue
+            vec = self._vectors.get(nid)
+            if vec is None:
+                if graph_cache is None:
+                    vec = (np.array([nid], dtype=np.int64), np.array([self.decay ** self.hops], dtype=np.float32))
+                else:
+                    budget = max(max_edges - edges_expanded, 1) if max_edges else 0
+                    ids, scores, edges = self._live_vector(nid, graph_cache, budget, entity_graph)
+                    edges_expanded += edges
+                    vec = (ids, scores)
+                fallback += 1
+            parts_ids.append(vec[0])
+            parts_scores.append(vec[1] * a)
+
+        stats = {"iterations": self.hops, "nodes_touched": 0, "edges_expanded": edges_expanded,
+                 "precomputed": len(parts_ids) - fallback, "fallback": fallback}
+        if not parts_ids:
+            return {}, stats
+
+        ids, inverse = np.unique(np.concatenate(parts_ids), return_inverse=True)
+        totals = np.bincount(inverse, weights=np.concatenate(parts_scores).astype(np.float64))
+        max_total = totals.max()
+        if max_total > 0:
+            totals /= max_total
+        activations = {int(nid): float(s) for nid, s in zip(ids, totals) if s > 0}
+        stats["nodes_touched"] = len(activations)
+        print(f"  Diffusion: {stats['precomputed']} precomputed + {fallback} live seeds → {len(activations)} nodes")
+        return activations, stats
+
+    def get_stats(self) -> dict:
+        entries = sum(len(ids) for ids, _ in self._vectors.values())
+        return {
+            "nodes": len(self._vectors),
+            "entries": entries,
+            "memory_mb": round(entries * 12 / (1024 * 1024), 2),
+            "hops": self.hops,
+            "decay": self.decay,
+            "top_k": self.top_k,
+            "version": self._version,
+        }
+
+
+def _top(scores: Dict[int, float], k: int) -> List[int]:
+    return [nid for nid, _ in sorted(scores.items(), key=lambda x: x[1], reverse=True)[:k]]
+
+
+def compare_with_live(store: DiffusionStore, graph_cache, seed_sets: List[Dict[int, float]],
+                      k: int = 10, entity_graph=None) -> dict:
+    """
+    Ranking change of diffusion vs live spreading on the same seeds.
+
+    Live spreading runs twice: as served (SPREAD_* budgets) and unbounded.
+    The unbounded run is what the vectors approximate, so overlap_exact
+    isolates top-K truncation and staleness, while overlap_at_k also
+    includes the budget cuts of live spreading.
+
+    Returns:
+        {queries, k, overlap_at_k (mean |top-k ∩ live top-k| / k), top1_agreement,
+         kendall_tau (mean, over the union of both top-k lists), overlap_exact}
+    """
+    from spreading import spread_activation
+
+    overlaps, top1, taus, exact_overlaps = [], [], [], []
+    for seeds in seed_sets:
+        live, _ = spread_activation(dict(seeds), graph_cache, store.hops, store.decay, epsilon=0,
+                                    entity_graph=entity_graph)
+        exact, _ = spread_activation(dict(seeds), graph_cache, store.hops, store.decay,
+                                     max_frontier=0, max_edges=0, epsilon=0, entity_graph=entity_graph)
+        approx, _ = store.diffuse(seeds, graph_cache, entity_graph=entity_graph)
+        if not live or not approx:
+            continue
+        live_top, approx_top, exact_top = _top(live, k), _top(approx, k), _top(exact, k)
+        overlaps.append(len(set(live_top) & set(approx_top)) / max(min(k, len(live_top)), 1))
+        exact_overlaps.append(len(set(exact_top) & set(approx_top)) / max(min(k, len(exact_top)), 1))
+        top1.append(1.0 if live_top[0] == approx_top[0] else 0.0)
+        union = list(dict.fromkeys(live_top + approx_top))
+        if len(union) > 1:
+            taus.append(_kendall_tau([live.get(n, 0.0) for n in union], [approx.get(n, 0.0) for n in union]))
+
+    n = len(overlaps)
+    return {
+        "queries": n,
+        "k": k,
+        "overlap_at_k": round(sum(overlaps) / n, 4) if n else None,
+        "top1_agreement": round(sum(top1) / n, 4) if n else None,
+        "kendall_tau": round(sum(taus) / len(taus), 4) if taus else None,
+        "overlap_exact": round(sum(exact_overlaps) / n, 4) if n else None,
+    }
+
+
+def ranking_report(db_path: str, queries: int = None, seeds_per_query: int = 10, k: int = 10) -> dict:
+    """
+    compare_with_live on sampled queries: each query is a random note's
+    embedding, seeded (like ANN) with its most similar notes.
+    """
+    from graph_cache import GraphCache
+
+    queries = DIFFUSION_REPORT_QUERIES if queries is None else queries
+    conn = sqlite3.connect(db_path)
+    rows = conn.execute("SELECT id, embedding FROM nodes WHERE embedding IS NOT NULL").fetchall()
+    edges = conn.execute("SELECT source_id, target_id, weight, edge_type FROM edges").fetchall()
+    links = _entity_links(conn)
+    conn.close()
+    if not rows or not (edges or links) or queries <= 0:
+        return {"queries": 0}
+
+    ids = np.array([r[0] for r in rows], dtype=np.int64)
+    emb = np.vstack([np.frombuffer(r[1], dtype=np.float32) for r in rows])
+    emb = emb / np.maximum(np.linalg.norm(emb, axis=1, keepdims=True), 1e-12)
+
+    graph = GraphCache()
+    graph.build([{"source_id": s, "target_id": t, "weight": w, "edge_type": et} for s, t, w, et in edges])
+    entity_graph = None
+    if not MATERIALIZE_ENTITY_EDGES:
+        from entity_graph import EntityGraph
+        entity_graph = EntityGraph()
+        entity_graph.build(links)
+    store = DiffusionStore(db_path)
+    store.load()
+
+    rng = np.random.default_rng(0)
+    seed_sets = []
+    for qi in rng.choice(len(ids), size=min(queries, len(ids)), replace=False):
+        sims = emb @ emb[qi]
+        top = np.argsort(-sims)[:seeds_per_query]
+        seed_sets.append({int(ids[j]): float(sims[j]) for j in top if sims[j] >= 0.3})
+    return compare_with_live(store, graph, seed_sets, k=k, entity_graph=entity_graph)
+
+
+def _kendall_tau(a: List[float], b: List[float]) -> float:
+    """Kendall tau-a between two score lists (ties count as neither)."""
+    concordant = discordant = 0
+    for i in range(len(a)):
+        for j in range(i + 1, len(a)):
+            s = (a[i] - a[j]) * (b[i] - b[j])
+            if s > 0:
+                concordant += 1
+            elif s < 0:
+                discordant += 1
+    pairs = len(a) * (len(a) - 1) / 2
+    return (concordant - discordant) / pairs if pairs else 1.0
+
+
+# Global instance
+_store = None
+
+
+def get_diffusion_store() -> DiffusionStore:
+    """Get or create global diffusion store (loaded lazily on first use)."""
+    global _store
+    if _store is None:
+        _store = DiffusionStore()
+        _store.load()
+    return _store
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Background enrichment for add_note (ENRICHMENT_MODE=async).
+
+A synchronous add waits for embedding, duplicate check, NER, temporal
+extraction, entity linking and semantic linking before it returns the
+note id. In async mode add_note_with_links only embeds, checks for
+duplicates and commits the note together with a row in enrichment_jobs
+(one transaction), indexes it in ANN/BM25 so it is searchable at once,
+and returns with "enrichment": "pending". A pool of ENRICHMENT_WORKERS
+threads then runs graph_engine.enrich_note for each job: entities,
+temporal expressions and edges are written in one transaction that also
+deletes the job row.
+
+Durability: the queue is the table, so jobs survive restarts. Jobs left
+'running' by a crash are requeued at startup (recover_enrichment_jobs);
+a job that fails ENRICHMENT_MAX_ATTEMPTS times is parked as 'failed'
+with its error; get_enrichment_workers().start(retry_failed=True)
+requeues it.
+
+Backpressure: when ENRICHMENT_MAX_PENDING jobs are waiting, add_note
+enriches inline instead of queueing, so a writer faster than the workers
+is slowed to their pace rather than growing the backlog without bound.
+"""
+import os
+import threading
+from typing import Callable, List, Optional
+
+from database import (claim_enrichment_job, fail_enrichment_job, recover_enrichment_jobs,
+                      get_enrichment_depth, get_enrichment_stats)
+
+ENRICHMENT_MODE = os.getenv("ENRICHMENT_MODE", "sync").lower()  # sync | async
+ENRICHMENT_WORKERS = int(os.getenv("ENRICHMENT_WORKERS", "2"))
+ENRICHMENT_MAX_PENDING = int(os.getenv("ENRICHMENT_MAX_PENDING", "1000"))  # queue bound, 0 = unbounded
+ENRICHMENT_MAX_ATTEMPTS = int(os.getenv("ENRICHMENT_MAX_ATTEMPTS", "3"))
+ENRICHMENT_POLL_SEC = float(os.getenv("ENRICHMENT_POLL_SEC", "5"))  # idle workers re-check the table
+
+
+class EnrichmentWorkers:
+    """Thread pool draining the enrichment_jobs table."""
+
+    def __init__(self, enrich_fn: Callable = None, max_attempts: int = None, poll_sec: float = None):
+        # enrich_fn(node_id, job_id) must delete the job in the transaction that writes the links
+        self.enrich_fn = enrich_fn
+        self.max_attempts = ENRICHMENT_MAX_ATTEMPTS if max_attempts is None else max_attempts
+        self.poll_sec = ENRICHMENT_POLL_SEC if poll_sec is None else poll_sec
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self.processed = 0
+        self.failures = 0
+        self._lock = threading.Lock()
+
+    def _enrich(self, node_id, job_id):
+        if self.enrich_fn is None:
+            from graph_engine import enrich_note
+            self.enrich_fn = enrich_note
+        return self.enrich_fn(node_id, job_id)
+
+    def run_once(self) -> bool:
+        """Claim and run one job. Returns False when the queue is empty."""
+        job = claim_enrichment_job()
+        if job is None:
+            return False
+        try:
+            self._enrich(job["node_id"], job["id"])
+            with self._lock:
+                self.processed += 1
+        except Exception as e:
+            fail_enrichment_job(job["id"], e, self.max_attempts)
+            with self._lock:
+                self.failures += 1
+            print(f"⚠️  Enrichment of note #{job['node_id']} failed (attempt {job['attempts']}): {e}")
+        return True
+
+    def drain(self) -> int:
+        """Run jobs on the calling thread until the queue is empty. Returns jobs run."""
+        count = 0
+        while self.run_once():
+            count += 1
+        return count
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                if self.run_once():
+                    continue
+            except Exception as e:  # e.g. database locked while claiming
+                print(f"⚠️  Enrichment worker error: {e}")
+            self._wake.wait(self.poll_sec)
+            self._wake.clear()
+
+    def start(self, workers: int = None, retry_failed: bool = False) -> int:
+        """Requeue interrupted jobs and start the threads. Returns jobs requeued."""
+        self._threads = [t for t in self._threads if t.is_alive()]
+        # 'running' rows are only stale when no worker of this process is running
+        recovered = recover_enrichment_jobs(running=not self._threads, failed=retry_failed)
+        workers = ENRICHMENT_WORKERS if workers is None else workers
+        self._stop.clear()
+        for i in range(len(self._threads), workers):
+            thread = threading.Thread(target=self._loop, name=f"enrichment-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return recovered
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        self._wake.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def notify(self):
+        """Wake idle workers (a job was queued)."""
+        self._wake.set()
+
+    @property
+    def alive(self) -> int:
+        return sum(1 for t in self._threads if t.is_alive())
+
+    def get_stats(self) -> dict:
+        stats = get_enrichment_stats()
+        stats.update({"mode": ENRICHMENT_MODE, "workers": self.alive, "max_pending": ENRICHMENT_MAX_PENDING,
+                      "processed": self.processed, "failures": self.failures})
+        return stats
+
+
+def queue_full() -> bool:
+    """True when add_note should enrich inline (backpressure)."""
+    return bool(ENRICHMENT_MAX_PENDING) and get_enrichment_depth() >= ENRICHMENT_MAX_PENDING
+
+
+# Global singleton
+_global_workers: Optional[EnrichmentWorkers] = None
+
+
+def get_enrichment_workers() -> EnrichmentWorkers:
+    """Get or create the global worker pool (not started)"""
+    global _global_workers
+    if _global_workers is None:
+        _global_workers = EnrichmentWorkers()
+    return _global_workers
+
+
+def start_enrichment_workers(workers: int = None) -> bool:
+    """Start the pool at server startup: in async mode, or to drain jobs left from one."""
+    pool = get_enrichment_workers()
+    if ENRICHMENT_MODE != "async" and not get_enrichment_depth():
+        return False
+    recovered = pool.start(workers)
+    depth = get_enrichment_depth()
+    print(f"🧵 Enrichment workers: {pool.alive} ({depth} jobs queued, {recovered} recovered after restart)")
+    return True
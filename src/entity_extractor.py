@@ -3,12 +3,28 @@
 Enhanced Entity Extractor for Neural Memory Graph
 Supports regex and spaCy backends with confidence scores and noise filtering.
 Multilingual: English (en_core_web_sm) + Russian/mixed (xx_ent_wiki_sm)
+Known entities (KNOWN_ENTITIES plus an optional KNOWN_ENTITIES_FILE) are
+matched in one pass by an Aho–Corasick automaton.
 """
-import re
 import os
-from typing import List, Tuple, Dict
+import json
+import threading
+import time
+from typing import List, Tuple, Dict, Optional
+
+import ahocorasick
 
 EXTRACTOR_TYPE = os.getenv("ENTITY_EXTRACTOR", "regex")
+NER_BATCH_SIZE = int(os.getenv("NER_BATCH_SIZE", "64"))  # docs per nlp.pipe batch
+NER_N_PROCESS = int(os.getenv("NER_N_PROCESS", "1"))  # nlp.pipe worker processes for large batches
+
+KNOWN_ENTITIES_FILE = os.getenv("KNOWN_ENTITIES_FILE", "")  # JSON {"term": ["Name", "type"]}, hot-reloaded
+KNOWN_ENTITIES_RELOAD_SEC = float(os.getenv("KNOWN_ENTITIES_RELOAD_SEC", "30"))  # how often its mtime is checked
+# Keys up to this length must be whole words ("ann" not in "planning"); longer keys also match inside words
+KNOWN_ENTITY_WHOLE_WORD_LEN = 3
+
+# Only doc.ents is read; every other pipe (tagger, parser, lemmatizer...) is disabled
+NER_PIPES = {"ner", "entity_ruler"}
 
 # Entity filtering configuration
 MIN_ENTITY_LENGTH = 2  # Skip single-character entities
@@ -196,11 +212,132 @@ def normalize_entity(text: str) -> str:
     return text
 
 
+def _is_word_char(ch: str) -> bool:
+    return ch.isalnum() or ch == "_"
+
+
+class KnownEntityMatcher:
+    """
+    Aho–Corasick automaton (pyahocorasick) over the lowercased known-entity
+    keys. One pass over the text finds every key, so the cost is text
+    length plus matches, independent of the dictionary size.
+    """
+
+    def __init__(self, entities: Dict[str, Tuple[str, str]]):
+        self.keys = [key.lower() for key in entities]
+        self.values = list(entities.values())
+        self._automaton = ahocorasick.Automaton()
+        for index, key in enumerate(self.keys):
+            self._automaton.add_word(key, index)
+        if self.keys:
+            self._automaton.make_automaton()
+
+    def __len__(self):
+        return len(self.keys)
+
+    def find(self, text_lower: str) -> List[int]:
+        """Indices of the keys found in the text, in dictionary order"""
+        if not self.keys:
+            return []
+        found = set()
+        for end, index in self._automaton.iter(text_lower):
+            if index in found:
+                continue
+            length = len(self.keys[index])
+            if length <= KNOWN_ENTITY_WHOLE_WORD_LEN:
+                start = end - length + 1
+                if start > 0 and _is_word_char(text_lower[start - 1]):
+                    continue
+                if end + 1 < len(text_lower) and _is_word_char(text_lower[end + 1]):
+                    continue
+            found.add(index)
+        return sorted(found)
+
+    def match(self, text: str) -> List[Tuple[str, str, float]]:
+        """(name, type, 1.0) for each known entity in the text"""
+        entities = []
+        for index in self.find(text.lower()):
+            name, etype = self.values[index]
+            if is_valid_entity(name):
+                entities.append((name, etype, 1.0))
+        return entities
+
+
+def load_known_entities_file(path: str) -> Dict[str, Tuple[str, str]]:
+    """
+    User dictionary: a JSON object of term → [name, type] (or
+    {"name": ..., "type": ...}). Terms are matched case-insensitively.
+    """
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    entities = {}
+    for term, value in data.items():
+        if isinstance(value, dict):
+            name, etype = value.get("name", term), value.get("type", "concept")
+        else:
+            name, etype = value
+        entities[term.lower()] = (name, etype)
+    return entities
+
+
+_base_matcher = KnownEntityMatcher(KNOWN_ENTITIES)  # built once at import
+_matcher = _base_matcher
+_matcher_lock = threading.Lock()
+_file_mtime: Optional[float] = None
+_file_checked = 0.0
+
+
+def get_known_entity_matcher() -> KnownEntityMatcher:
+    """
+    Matcher for KNOWN_ENTITIES plus KNOWN_ENTITIES_FILE. The file's mtime
+    is checked at most every KNOWN_ENTITIES_RELOAD_SEC; a changed file is
+    rebuilt into a new automaton and swapped in. A file that fails to load
+    keeps the previous matcher.
+    """
+    global _matcher, _file_mtime, _file_checked
+    if not KNOWN_ENTITIES_FILE:
+        return _base_matcher
+    now = time.monotonic()
+    if _file_checked and now - _file_checked < KNOWN_ENTITIES_RELOAD_SEC:
+        return _matcher
+    with _matcher_lock:
+        if _file_checked and now - _file_checked < KNOWN_ENTITIES_RELOAD_SEC:
+            return _matcher
+        _file_checked = now
+        try:
+            mtime = os.path.getmtime(KNOWN_ENTITIES_FILE)
+            if mtime != _file_mtime:
+                entities = {**KNOWN_ENTITIES, **load_known_entities_file(KNOWN_ENTITIES_FILE)}
+                _matcher = KnownEntityMatcher(entities)
+                _file_mtime = mtime
+                print(f"📖 Known entities: {len(_matcher)} terms ({KNOWN_ENTITIES_FILE})")
+        except (OSError, ValueError, TypeError) as e:
+            print(f"⚠️  Could not load {KNOWN_ENTITIES_FILE}: {e}, keeping {len(_matcher)} known entities")
+    return _matcher
+
+
+def _trim_pipeline(nlp):
+    """
+    Disable every pipe NER does not need. A shared tok2vec/transformer is
+    kept only when an NER pipe listens to it (en_core_web_sm's ner has its
+    own embedding layer, so its tok2vec goes too).
+    """
+    keep = set(NER_PIPES)
+    for name, pipe in nlp.pipeline:
+        listeners = getattr(pipe, "listening_components", None) or []
+        if keep & set(listeners):
+            keep.add(name)
+    for name in [n for n in nlp.pipe_names if n not in keep]:
+        nlp.disable_pipe(name)
+    return nlp
+
+
 def _get_spacy_model(lang: str):
     """
     Load and cache the appropriate spaCy model based on language.
     English → en_core_web_sm (better for English NER)
     Russian/mixed → xx_ent_wiki_sm (multilingual NER)
+    The cached pipeline is trimmed to NER (_trim_pipeline).
     """
     cache_attr = f"_nlp_{lang}"
     if not hasattr(_get_spacy_model, cache_attr):
@@ -213,21 +350,49 @@ def _get_spacy_model(lang: str):
                 model = spacy.load("en_core_web_sm")
         else:
             model = spacy.load("en_core_web_sm")
-        setattr(_get_spacy_model, cache_attr, model)
+        setattr(_get_spacy_model, cache_attr, _trim_pipeline(model))
     return getattr(_get_spacy_model, cache_attr)
 
 
 def extract_entities_regex(text: str) -> List[Tuple[str, str, float]]:
     """
-    Extract entities using regex patterns.
+    Extract known entities (Aho–Corasick over the dictionary).
     Returns: List of (entity_text, entity_type, confidence)
     """
-    entities = []
-    text_lower = text.lower()
-    for key, (name, etype) in KNOWN_ENTITIES.items():
-        if key in text_lower:
-            if is_valid_entity(name):
-                entities.append((name, etype, 1.0))
+    seen = set()
+    unique = []
+    for entity_text, entity_type, confidence in get_known_entity_matcher().match(text):
+        normalized = normalize_entity(entity_text)
+        if normalized not in seen:
+            seen.add(normalized)
+            unique.append((entity_text, entity_type, confidence))
+    return unique
+
+
+def _doc_entities(text: str, doc) -> List[Tuple[str, str, float]]:
+    """Known entities of the text plus the spaCy entities of its doc"""
+    # Known entities first (high confidence)
+    entities = get_known_entity_matcher().match(text)
+
+    for ent in doc.ents:
+        if not is_valid_entity(ent.text):
+            continue
+        normalized = normalize_entity(ent.text)
+        # Skip if already found in known entities
+        if any(normalize_entity(e[0]) == normalized for e in entities):
+            continue
+        # Map spaCy label to our types
+        entity_type = SPACY_LABEL_MAP.get(ent.label_, "concept")
+        # Skip NUMBER types - these are noise
+        if entity_type == "number":
+            continue
+        # Skip measurement types - usually noise
+        if entity_type == "measurement":
+            continue
+        confidence = 0.8
+        entities.append((ent.text, entity_type, confidence))
+
+    # Deduplicate based on normalized text
     seen = set()
     unique = []
     for entity_text, entity_type, confidence in entities:
@@ -245,60 +410,43 @@ def extract_entities_spacy(text: str) -> List[Tuple[str, str, float]]:
     Returns: List of (entity_text, entity_type, confidence)
     """
     try:
-        lang = detect_language(text)
-        nlp = _get_spacy_model(lang)
-        doc = nlp(text)
-        
-        entities = []
-        text_lower = text.lower()
-        
-        # First, add known entities (high confidence)
-        # Use word boundary matching for short keywords to avoid false positives
-        import re
-        for key, (name, etype) in KNOWN_ENTITIES.items():
-            if len(key) <= 3:
-                # Short keywords: require word boundaries
-                if re.search(r'\b' + re.escape(key) + r'\b', text_lower):
-                    if is_valid_entity(name):
-                        entities.append((name, etype, 1.0))
-            else:
-                if key in text_lower and is_valid_entity(name):
-                    entities.append((name, etype, 1.0))
-        
-        # Then, add spaCy detected entities
-        for ent in doc.ents:
-            if not is_valid_entity(ent.text):
-                continue
-            normalized = normalize_entity(ent.text)
-            # Skip if already found in known entities
-            if any(normalize_entity(e[0]) == normalized for e in entities):
-                continue
-            # Map spaCy label to our types
-            entity_type = SPACY_LABEL_MAP.get(ent.label_, "concept")
-            # Skip NUMBER types - these are noise
-            if entity_type == "number":
-                continue
-            # Skip measurement types - usually noise
-            if entity_type == "measurement":
-                continue
-            confidence = 0.8
-            entities.append((ent.text, entity_type, confidence))
-        
-        # Deduplicate based on normalized text
-        seen = set()
-        unique = []
-        for entity_text, entity_type, confidence in entities:
-            normalized = normalize_entity(entity_text)
-            if normalized not in seen:
-                seen.add(normalized)
-                unique.append((entity_text, entity_type, confidence))
-        return unique
-        
+        nlp = _get_spacy_model(detect_language(text))
+        return _doc_entities(text, nlp(text))
     except Exception as e:
         print(f"⚠️  spaCy extraction failed: {e}, falling back to regex")
         return extract_entities_regex(text)
 
 
+def extract_entities_spacy_batch(texts: List[str], batch_size: int = None,
+                                 n_process: int = None) -> List[List[Tuple[str, str, float]]]:
+    """
+    spaCy NER over many texts: texts are grouped by detected language and
+    each group runs through its model with nlp.pipe. Same results as
+    extract_entities_spacy per text, in input order.
+    """
+    batch_size = batch_size or NER_BATCH_SIZE
+    n_process = n_process or NER_N_PROCESS
+    by_lang: Dict[str, List[int]] = {}
+    for i, text in enumerate(texts):
+        by_lang.setdefault(detect_language(text), []).append(i)
+
+    results: List[List[Tuple[str, str, float]]] = [None] * len(texts)
+    for lang, positions in by_lang.items():
+        try:
+            nlp = _get_spacy_model(lang)
+            # Worker processes only pay off when each gets at least one full batch
+            processes = n_process if len(positions) >= batch_size * n_process else 1
+            docs = nlp.pipe((texts[i] for i in positions), batch_size=batch_size, n_process=processes)
+            for i, doc in zip(positions, docs):
+                results[i] = _doc_entities(texts[i], doc)
+        except Exception as e:
+            print(f"⚠️  spaCy batch extraction failed ({lang}): {e}, falling back to regex")
+            for i in positions:
+                if results[i] is None:
+                    results[i] = extract_entities_regex(texts[i])
+    return results
+
+
 def extract_entities(text: str, min_confidence: float = 0.5) -> List[Tuple[str, str]]:
     """
     Extract entities from text using configured backend.
@@ -323,3 +471,20 @@ def extract_entities_with_confidence(text: str) -> List[Tuple[str, str, float]]:
         return extract_entities_spacy(text)
     else:
         return extract_entities_regex(text)
+
+
+def extract_entities_batch(texts: List[str], min_confidence: float = 0.5, batch_size: int = None,
+                           n_process: int = None) -> List[List[Tuple[str, str]]]:
+    """
+    extract_entities for many texts (bulk ingest, re-extraction).
+    With the spaCy backend this batches through nlp.pipe.
+    """
+    if EXTRACTOR_TYPE == "spacy":
+        entities_with_confidence = extract_entities_spacy_batch(texts, batch_size, n_process)
+    else:
+        entities_with_confidence = [extract_entities_regex(text) for text in texts]
+    return [
+        [(entity_text, entity_type) for entity_text, entity_type, confidence in entities
+         if confidence >= min_confidence]
+        for entities in entities_with_confidence
+    ]
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+Bipartite note ↔ entity graph for entity-mediated spreading.
+
+Notes that share an entity used to be joined by materialised `entity`
+edges (two rows per pair), so a common concept such as "memory" grew
+the edges table quadratically and every add wrote one edge pair per
+earlier mention. Instead the node_entities table is held in memory as
+two adjacency maps (note → entities, entity → notes) and activation
+hops note → entity → notes:
+
+  - spread_activation(..., entity_graph=...) sums the frontier's
+    activation per entity and pushes it to each entity's notes once,
+    so a shared entity costs one pass over its notes per iteration
+    rather than one edge per (frontier note, note) pair;
+  - EntityView exposes entities as virtual nodes (negative ids) to
+    walks that only know get_neighbors(), e.g. ppr_push.
+
+Each entity has an IDF weight
+
+    w(e) = ENTITY_EDGE_WEIGHT * log(1 + N / df) / log(1 + N / 2)
+
+(N = notes with at least one entity, df = notes mentioning e), so an
+entity shared by two notes weighs like the old 0.6 edge and one shared
+by most of the corpus tends to 0. Entities with df above
+ENTITY_SPREAD_MAX_DF, or mentioned by a single note, are not spread
+through at all.
+
+MATERIALIZE_ENTITY_EDGES=true restores the old pairwise edges (and
+turns the bipartite pass off, so entity links are not counted twice);
+each new note then links to its ENTITY_LINK_TOP_K strongest co-entity
+notes, skipping entities on more than ENTITY_LINK_MAX_DF notes.
+scripts/drop_entity_edges.py removes edges materialised before.
+
+Thread safety: as for the graph cache, readers never lock. Adds append
+to per-entity lists; removals swap in new lists.
+"""
+import math
+import os
+import threading
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+MATERIALIZE_ENTITY_EDGES = os.getenv("MATERIALIZE_ENTITY_EDGES", "false").lower() == "true"
+ENTITY_EDGE_WEIGHT = float(os.getenv("ENTITY_EDGE_WEIGHT", "0.6"))  # weight of an entity shared by two notes
+ENTITY_SPREAD_MAX_DF = int(os.getenv("ENTITY_SPREAD_MAX_DF", "500"))  # skip entities on more notes, 0 = no cap
+# MATERIALIZE_ENTITY_EDGES only: a new note gets entity edges to at most ENTITY_LINK_TOP_K
+# notes, through entities on at most ENTITY_LINK_MAX_DF notes (0 = no cap)
+ENTITY_LINK_MAX_DF = int(os.getenv("ENTITY_LINK_MAX_DF", str(ENTITY_SPREAD_MAX_DF)))
+ENTITY_LINK_TOP_K = int(os.getenv("ENTITY_LINK_TOP_K", "20"))
+
+
+class EntityGraph:
+    """In-memory copy of node_entities with IDF entity weights."""
+
+    def __init__(self, max_df: int = None, base_weight: float = None):
+        self.max_df = ENTITY_SPREAD_MAX_DF if max_df is None else max_df
+        self.base_weight = ENTITY_EDGE_WEIGHT if base_weight is None else base_weight
+        self._notes: Dict[int, List[int]] = {}     # entity → notes
+        self._entities: Dict[int, List[int]] = {}  # note → entities
+        self._lock = threading.Lock()               # writers only
+        self.link_count = 0
+
+    def build(self, links: Iterable[Tuple[int, int]]) -> int:
+        """Replace contents with (node_id, entity_id) rows. Returns the link count."""
+        notes: Dict[int, List[int]] = {}
+        entities: Dict[int, List[int]] = {}
+        count = 0
+        for node_id, entity_id in set(links):
+            notes.setdefault(entity_id, []).append(node_id)
+            entities.setdefault(node_id, []).append(entity_id)
+            count += 1
+        with self._lock:
+            self._notes, self._entities, self.link_count = notes, entities, count
+        return count
+
+    def add_links(self, node_id: int, entity_ids: Iterable[int]) -> int:
+        """Link a note to entities (existing links are ignored). Returns links added."""
+        added = 0
+        with self._lock:
+            known = self._entities.get(node_id, [])
+            for eid in entity_ids:
+                if eid in known:
+                    continue
+                known = known + [eid]
+                self._notes.setdefault(eid, []).append(node_id)
+                added += 1
+            if added:
+                self._entities[node_id] = known
+                self.link_count += added
+        return added
+
+    def remove_node(self, node_id: int) -> int:
+        """Drop a note and its links. Returns links removed."""
+        with self._lock:
+            entity_ids = self._entities.pop(node_id, [])
+            for eid in entity_ids:
+                rest = [n for n in self._notes.get(eid, []) if n != node_id]
+                if rest:
+                    self._notes[eid] = rest
+                else:
+                    self._notes.pop(eid, None)
+            self.link_count -= len(entity_ids)
+        return len(entity_ids)
+
+    @property
+    def note_count(self) -> int:
+        return len(self._entities)
+
+    def entities_of(self, node_id: int) -> List[int]:
+        return self._entities.get(node_id, [])
+
+    def notes_of(self, entity_id: int) -> List[int]:
+        return self._notes.get(entity_id, [])
+
+    def df(self, entity_id: int) -> int:
+        return len(self._notes.get(entity_id, ()))
+
+    def weight(self, entity_id: int) -> float:
+        """IDF weight of an entity hop; 0.0 when the entity is not spread through."""
+        df = self.df(entity_id)
+        if df < 2 or (self.max_df and df > self.max_df):
+            return 0.0
+        n = max(self.note_count, 2)
+        return min(self.base_weight, self.base_weight * math.log1p(n / df) / math.log1p(n / 2))
+
+    def spreadable(self) -> List[Tuple[int, float, List[int]]]:
+        """(entity_id, weight, notes) for every entity spreading goes through."""
+        out = []
+        for eid, notes in list(self._notes.items()):
+            w = self.weight(eid)
+            if w > 0:
+                out.append((eid, w, notes))
+        return out
+
+    def co_entity_notes(self, node_id: int) -> Set[int]:
+        """Other notes reachable through one spreadable entity of node_id."""
+        out = set()
+        for eid in self.entities_of(node_id):
+            if self.weight(eid) > 0:
+                out.update(self.notes_of(eid))
+        out.discard(node_id)
+        return out
+
+    def get_stats(self) -> dict:
+        dfs = [len(v) for v in self._notes.values()]
+        capped = sum(1 for d in dfs if self.max_df and d > self.max_df)
+        return {
+            "notes": self.note_count,
+            "entities": len(dfs),
+            "links": self.link_count,
+            "max_df": max(dfs) if dfs else 0,
+            "capped_entities": capped,
+            # Entity edges the pairwise scheme would store: 2 rows per sharing pair (upper bound)
+            "pairwise_edges": sum(d * (d - 1) for d in dfs),
+        }
+
+
+class EntityView:
+    """
+    Graph-cache view with entities as virtual nodes (entity e ↦ node id -e).
+
+    Notes gain one neighbour per spreadable entity; an entity's neighbours
+    are its notes, all at the entity's IDF weight. For walks that only use
+    get_neighbors()/top_neighbors()/degree() (ppr_push); strip() removes the
+    virtual nodes from the result.
+    """
+
+    def __init__(self, graph_cache, entity_graph: EntityGraph):
+        self.graph_cache = graph_cache
+        self.entity_graph = entity_graph
+
+    def get_neighbors(self, node_id: int):
+        eg = self.entity_graph
+        if node_id < 0:
+            w = eg.weight(-node_id)
+            return [(nid, w, "entity") for nid in eg.notes_of(-node_id)] if w > 0 else []
+        out = list(self.graph_cache.get_neighbors(node_id))
+        for eid in eg.entities_of(node_id):
+            w = eg.weight(eid)
+            if w > 0:
+                out.append((-eid, w, "entity"))
+        return out
+
+    def top_neighbors(self, node_id: int, limit: int = 0):
+        """Strongest `limit` neighbours (0 = all), without building a hub entity's whole row."""
+        eg = self.entity_graph
+        if node_id < 0:
+            w = eg.weight(-node_id)
+            if w <= 0:
+                return []
+            notes = eg.notes_of(-node_id)
+            return [(nid, w, "entity") for nid in (notes[:limit] if limit else notes)]
+        out = list(self.graph_cache.top_neighbors(node_id, limit=limit))
+        for eid in eg.entities_of(node_id):
+            w = eg.weight(eid)
+            if w > 0:
+                out.append((-eid, w, "entity"))
+        out.sort(key=lambda e: e[1], reverse=True)
+        return out[:limit] if limit else out
+
+    def degree(self, node_id: int) -> int:
+        if node_id < 0:
+            return self.entity_graph.df(-node_id) if self.entity_graph.weight(-node_id) > 0 else 0
+        return self.graph_cache.degree(node_id) + len(self.entity_graph.entities_of(node_id))
+
+    @staticmethod
+    def strip(scores: Dict[int, float]) -> Dict[int, float]:
+        """Drop virtual entity nodes and renormalise to max 1.0."""
+        notes = {nid: s for nid, s in scores.items() if nid >= 0}
+        top = max(notes.values()) if notes else 0.0
+        if top > 0 and top != 1.0:
+            notes = {nid: s / top for nid, s in notes.items()}
+        return notes
+
+
+# Global singleton
+_global_entity_graph: Optional[EntityGraph] = None
+
+
+def get_entity_graph() -> EntityGraph:
+    """Get or create the global entity graph (built from node_entities on first use)"""
+    global _global_entity_graph
+    if _global_entity_graph is None:
+        _global_entity_graph = EntityGraph()
+        from database import get_all_node_entities
+        _global_entity_graph.build(get_all_node_entities())
+    return _global_entity_graph
+
+
+def rebuild_entity_graph(links: Iterable[Tuple[int, int]]) -> int:
+    """Rebuild the global entity graph from (node_id, entity_id) rows"""
+    return get_entity_graph().build(links)
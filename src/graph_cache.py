@@ -2,85 +2,465 @@
 """
 In-Memory Graph Cache for Fast Edge Traversal
 Eliminates SQLite bottleneck in spreading activation
+
+Storage is CSR (compressed sparse row) numpy arrays instead of Python
+tuples: for node keys[i], its neighbours are neighbors[offsets[i]:offsets[i+1]]
+with float32 weights and uint8 edge-type codes (names interned in
+edge_types). ~13 bytes per adjacency entry instead of ~100+ for a tuple
+in a list. Every row is cached in both directions (undirected types are
+stored once per pair as (min_id, max_id)); duplicate rows for the same
+(source, target, type) — e.g. the mirrored rows older databases stored
+per undirected edge — collapse into one entry per direction, keeping the
+max weight.
+
+Entries are keyed by (node, neighbour, edge_type) with the same upsert
+semantics as database.create_edge: adding an existing edge keeps
+MAX(weight). add_edge/remove_edge/remove_node write to a small delta
+buffer ({node: {(neighbour, edge_type): weight or None}}, None = removed)
+that overrides the CSR rows and is folded into a new CSR snapshot once
+it holds GRAPH_CACHE_DELTA_MAX entries.
+
+reconcile() compares the cache with the edges table, reports drift and
+rebuilds from the table when they disagree; start_reconciler() runs it
+every GRAPH_CACHE_RECONCILE_SEC seconds.
+
+Thread safety: row readers never lock. The (CSR, delta) pair is one
+immutable-by-convention tuple swapped atomically; delta rows are
+copy-on-write, so a search iterating get_neighbors() never sees a row
+change under it. The outer delta dict is updated in place (copying it
+per write would cost O(delta nodes) per edge), so the few readers that
+walk the whole delta (reconcile, get_stats) take a copy of it under the
+write lock first.
 """
+import os
+import time
+import threading
 from typing import Dict, List, Tuple, Optional
-from collections import defaultdict
+
+import numpy as np
+
+# Delta entries (directed) buffered before they are folded into the CSR arrays
+GRAPH_CACHE_DELTA_MAX = int(os.getenv("GRAPH_CACHE_DELTA_MAX", "10000"))
+# Reconcile cache against the edges table every N seconds (0 = disabled)
+GRAPH_CACHE_RECONCILE_SEC = float(os.getenv("GRAPH_CACHE_RECONCILE_SEC", "3600"))
+
+# Rough CPython cost of one (int, float, str) adjacency tuple in a list:
+# tuple 64 + int 28 + float 24 + list slot 8 (edge_type strings are shared)
+TUPLE_ENTRY_BYTES = 124
+
+_EMPTY_CSR = (
+    np.zeros(0, dtype=np.int64),    # keys: sorted node ids with neighbours
+    np.zeros(1, dtype=np.int64),    # offsets: len(keys) + 1
+    np.zeros(0, dtype=np.int64),    # neighbors
+    np.zeros(0, dtype=np.float32),  # weights
+    np.zeros(0, dtype=np.uint8),    # edge type codes
+)
+
+
+def _make_csr(src, dst, weights, types):
+    """Sort directed entries by source, dedupe (src, dst, type) keeping max weight."""
+    if len(src) == 0:
+        return _EMPTY_CSR
+    order = np.lexsort((types, dst, src))
+    src, dst, weights, types = src[order], dst[order], weights[order], types[order]
+
+    new_group = np.ones(len(src), dtype=bool)
+    new_group[1:] = (src[1:] != src[:-1]) | (dst[1:] != dst[:-1]) | (types[1:] != types[:-1])
+    starts = np.flatnonzero(new_group)
+    weights = np.maximum.reduceat(weights, starts)
+    src, dst, types = src[starts], dst[starts], types[starts]
+
+    keys, counts = np.unique(src, return_counts=True)
+    offsets = np.zeros(len(keys) + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    return (keys, offsets, dst.astype(np.int64), weights.astype(np.float32), types.astype(np.uint8))
+
+
+def _entry_keys(csr) -> np.ndarray:
+    """One opaque key per (src, dst, type) entry, for set operations between snapshots."""
+    keys, offsets, neighbors, _, types = csr
+    src = np.repeat(keys, np.diff(offsets))
+    packed = np.ascontiguousarray(np.stack([src, neighbors, types.astype(np.int64)], axis=1))
+    return packed.view(np.dtype((np.void, packed.dtype.itemsize * 3))).ravel()
 
 
 class GraphCache:
     """
     In-memory cache of graph structure (edges)
-    
-    Structure: {node_id: [(neighbor_id, weight, edge_type), ...]}
+
+    Structure: CSR arrays + delta {node_id: {(neighbor_id, edge_type): weight or None}}
     """
-    
+
     def __init__(self):
-        self.edges: Dict[int, List[Tuple[int, float, str]]] = defaultdict(list)
         self.enabled = True
-        self.edge_count = 0
-    
+        self.edge_count = 0  # directed entries: 2 per stored row (1 for self-loops)
+        self.edge_types: List[str] = []  # code → name (append-only)
+        self._type_codes: Dict[str, int] = {}
+        self._state = (_EMPTY_CSR, {}, 0)  # (csr, delta, delta_entries)
+        self._version = 0  # bumped on every mutation (reconcile heals only if unchanged)
+        self._write_lock = threading.Lock()
+        self.last_reconcile: Optional[dict] = None
+
+    def _intern(self, edge_type: str) -> int:
+        """Edge type name → uint8 code (caller holds write lock)."""
+        code = self._type_codes.get(edge_type)
+        if code is None:
+            if len(self.edge_types) >= 256:
+                raise ValueError(f"Too many edge types for uint8 codes: {edge_type}")
+            code = len(self.edge_types)
+            self.edge_types.append(edge_type)
+            self._type_codes[edge_type] = code
+        return code
+
+    def _csr_from_edges(self, all_edges: List[dict]):
+        """Edge rows → deduplicated bidirectional CSR (interns edge types)."""
+        n = len(all_edges)
+        src = np.empty(n, dtype=np.int64)
+        dst = np.empty(n, dtype=np.int64)
+        weights = np.empty(n, dtype=np.float32)
+        types = np.empty(n, dtype=np.uint8)
+        with self._write_lock:
+            for i, edge in enumerate(all_edges):
+                src[i] = edge["source_id"]
+                dst[i] = edge["target_id"]
+                weights[i] = edge.get("weight", 0.5)
+                types[i] = self._intern(edge.get("edge_type", "semantic"))
+        # Bidirectional: source -> target and target -> source
+        return _make_csr(np.concatenate([src, dst]), np.concatenate([dst, src]),
+                         np.concatenate([weights, weights]), np.concatenate([types, types]))
+
     def build(self, all_edges: List[dict]) -> int:
         """
         Build cache from all edges
-        
+
         Args:
             all_edges: List of edge dicts with source_id, target_id, weight, edge_type
-        
+
         Returns:
-            Number of edges cached
+            Number of directed entries cached
         """
-        self.edges.clear()
-        self.edge_count = 0
-        
-        for edge in all_edges:
-            source_id = edge["source_id"]
-            target_id = edge["target_id"]
-            weight = edge.get("weight", 0.5)
-            edge_type = edge.get("edge_type", "semantic")
-            
-            # Bidirectional: source -> target and target -> source
-            self.edges[source_id].append((target_id, weight, edge_type))
-            self.edges[target_id].append((source_id, weight, edge_type))
-            
-            self.edge_count += 1
-        
-        print(f"✅ Built graph cache: {self.edge_count} edges, {len(self.edges)} nodes")
+        csr = self._csr_from_edges(all_edges)
+
+        # Publish atomically: concurrent readers see either old or new graph
+        with self._write_lock:
+            self._state = (csr, {}, 0)
+            self.edge_count = len(csr[2])
+            self._version += 1
+
+        print(f"✅ Built graph cache: {self.edge_count} edges, {len(csr[0])} nodes")
         return self.edge_count
-    
+
+    @staticmethod
+    def _csr_row(csr, node_id: int):
+        keys, offsets, neighbors, weights, types = csr
+        i = int(np.searchsorted(keys, node_id))
+        if i < len(keys) and keys[i] == node_id:
+            a, b = offsets[i], offsets[i + 1]
+            return neighbors[a:b], weights[a:b], types[a:b]
+        return None
+
     def get_neighbors(self, node_id: int) -> List[Tuple[int, float, str]]:
         """
-        Get all neighbors of a node (O(1) lookup)
-        
+        Get all neighbors of a node (O(log n) key lookup)
+
         Args:
             node_id: Node to get neighbors for
-        
+
         Returns:
-            List of (neighbor_id, weight, edge_type) tuples
+            List of (neighbor_id, weight, edge_type) tuples, one per (neighbor, edge_type)
         """
-        return self.edges.get(node_id, [])
-    
+        csr, delta, _ = self._state
+        result = []
+        row = self._csr_row(csr, node_id)
+        if row is not None:
+            names = self.edge_types
+            result = list(zip(row[0].tolist(), row[1].tolist(),
+                              [names[c] for c in row[2].tolist()]))
+        overrides = delta.get(node_id)
+        if overrides:
+            result = [e for e in result if (e[0], e[2]) not in overrides]
+            result += [(nb, w, et) for (nb, et), w in overrides.items() if w is not None]
+        return result
+
+    def neighbor_arrays(self, node_id: int, edge_types=None, min_weight: float = 0.0,
+                        limit: int = 0) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Filtered neighbor entries of a node as arrays, strongest first.
+
+        Selection runs on the CSR row arrays, so a hub's row is never
+        materialized as tuples (only nodes with pending delta are filtered
+        in Python).
+
+        Args:
+            node_id: Node to expand
+            edge_types: Optional iterable of edge type names to keep
+            min_weight: Drop entries below this weight
+            limit: Keep at most this many entries (0 = all)
+
+        Returns:
+            (neighbor ids int64, weights float32, edge type codes uint8) — codes index edge_types
+        """
+        csr, delta, _ = self._state
+        if delta.get(node_id):
+            entries = [e for e in self.get_neighbors(node_id)
+                       if e[1] >= min_weight and (edge_types is None or e[2] in edge_types)]
+            entries.sort(key=lambda e: e[1], reverse=True)
+            if limit:
+                entries = entries[:limit]
+            return (np.array([e[0] for e in entries], dtype=np.int64),
+                    np.array([e[1] for e in entries], dtype=np.float32),
+                    np.array([self._type_codes[e[2]] for e in entries], dtype=np.uint8))
+
+        row = self._csr_row(csr, node_id)
+        if row is None:
+            return _EMPTY_CSR[2], _EMPTY_CSR[3], _EMPTY_CSR[4]
+        neighbors, weights, types = row
+        if min_weight <= 0 and edge_types is None:
+            idx = np.arange(len(neighbors))
+        else:
+            mask = weights >= min_weight
+            if edge_types is not None:
+                codes = [self._type_codes[t] for t in edge_types if t in self._type_codes]
+                mask &= np.isin(types, np.array(codes, dtype=np.uint8))
+            idx = np.flatnonzero(mask)
+        if limit and len(idx) > limit:
+            idx = idx[np.argpartition(-weights[idx], limit - 1)[:limit]]
+        idx = idx[np.argsort(-weights[idx], kind="stable")]
+        return neighbors[idx], weights[idx], types[idx]
+
+    def top_neighbors(self, node_id: int, limit: int = 0, edge_types=None,
+                      min_weight: float = 0.0) -> List[Tuple[int, float, str]]:
+        """
+        Strongest neighbor entries of a node, filtered by edge type and weight.
+
+        Args:
+            node_id: Node to expand
+            limit: Keep at most this many entries, strongest first (0 = all)
+            edge_types: Optional iterable of edge type names to keep
+            min_weight: Drop entries below this weight
+        """
+        neighbors, weights, types = self.neighbor_arrays(node_id, edge_types, min_weight, limit)
+        names = self.edge_types
+        return list(zip(neighbors.tolist(), weights.tolist(), [names[c] for c in types.tolist()]))
+
+    def degree(self, node_id: int) -> int:
+        """Number of neighbor entries without materializing them (delta counted approximately)."""
+        (keys, offsets, _, _, _), delta, _ = self._state
+        i = int(np.searchsorted(keys, node_id))
+        count = int(offsets[i + 1] - offsets[i]) if i < len(keys) and keys[i] == node_id else 0
+        overrides = delta.get(node_id)
+        if overrides:
+            count += sum(1 if w is not None else -1 for w in overrides.values())
+        return max(count, 0)
+
+    def _weight(self, csr, delta, node_id, neighbor_id, edge_type) -> Optional[float]:
+        """Current weight of one directed entry, None if absent."""
+        overrides = delta.get(node_id)
+        if overrides and (neighbor_id, edge_type) in overrides:
+            return overrides[(neighbor_id, edge_type)]
+        row = self._csr_row(csr, node_id)
+        code = self._type_codes.get(edge_type)
+        if row is None or code is None:
+            return None
+        neighbors, weights, types = row
+        a = int(np.searchsorted(neighbors, neighbor_id, side="left"))
+        b = int(np.searchsorted(neighbors, neighbor_id, side="right"))
+        for j in range(a, b):
+            if types[j] == code:
+                return float(weights[j])
+        return None
+
+    def _set(self, node_id, neighbor_id, edge_type, weight):
+        """Upsert (weight) or remove (None) one directed entry (caller holds write lock)."""
+        csr, delta, pending = self._state
+        old = self._weight(csr, delta, node_id, neighbor_id, edge_type)
+        if old == weight:
+            return False
+        key = (neighbor_id, edge_type)
+        row = delta.get(node_id, {})
+        if key not in row:
+            pending += 1
+        delta[node_id] = {**row, key: weight}
+        self._state = (csr, delta, pending)
+        if old is None:
+            self.edge_count += 1
+        elif weight is None:
+            self.edge_count -= 1
+        self._version += 1
+        return True
+
+    def _maybe_fold(self):
+        if self._state[2] >= GRAPH_CACHE_DELTA_MAX:
+            self._state = (self._merged(self._state), {}, 0)
+
     def add_edge(self, source_id: int, target_id: int, weight: float = 0.5, edge_type: str = "semantic"):
         """
         Add edge to cache (for incremental updates)
-        
+        Existing (neighbor, edge_type) entries keep MAX(weight), like create_edge.
+
         Args:
             source_id: Source node
             target_id: Target node
             weight: Edge weight
             edge_type: Type of edge
         """
-        # Bidirectional
-        self.edges[source_id].append((target_id, weight, edge_type))
-        self.edges[target_id].append((source_id, weight, edge_type))
-        self.edge_count += 1
-    
+        with self._write_lock:
+            self._intern(edge_type)
+            csr, delta, _ = self._state
+            for a, b in ((source_id, target_id), (target_id, source_id)):
+                old = self._weight(csr, delta, a, b, edge_type)
+                if old is None or weight > old:
+                    self._set(a, b, edge_type, weight)
+            self._maybe_fold()
+
+    def add_edges(self, edges: List[Tuple[int, int, float, str]]) -> None:
+        """Add many (source_id, target_id, weight, edge_type) edges under one lock hold."""
+        with self._write_lock:
+            for source_id, target_id, weight, edge_type in edges:
+                self._intern(edge_type)
+                for a, b in ((source_id, target_id), (target_id, source_id)):
+                    csr, delta, _ = self._state
+                    old = self._weight(csr, delta, a, b, edge_type)
+                    if old is None or weight > old:
+                        self._set(a, b, edge_type, weight)
+            self._maybe_fold()
+
+    def remove_edge(self, source_id: int, target_id: int, edge_type: str = None) -> int:
+        """Remove edge in both directions (all edge types if edge_type is None)."""
+        removed = 0
+        with self._write_lock:
+            if edge_type is None:
+                types = {et for nb, _, et in self.get_neighbors(source_id) if nb == target_id}
+                types |= {et for nb, _, et in self.get_neighbors(target_id) if nb == source_id}
+            else:
+                types = {edge_type}
+            for et in types:
+                removed += self._set(source_id, target_id, et, None)
+                removed += self._set(target_id, source_id, et, None)
+            self._maybe_fold()
+        return removed
+
+    def remove_node(self, node_id: int) -> int:
+        """Remove all edges of a node (mirrors ON DELETE CASCADE)."""
+        removed = 0
+        with self._write_lock:
+            for nb, _, et in self.get_neighbors(node_id):
+                removed += self._set(node_id, nb, et, None)
+                removed += self._set(nb, node_id, et, None)
+            self._maybe_fold()
+        return removed
+
+    def _snapshot(self):
+        """(state, version) with a private copy of the outer delta dict (rows are copy-on-write)."""
+        with self._write_lock:
+            csr, delta, pending = self._state
+            return (csr, dict(delta), pending), self._version
+
+    def _merged(self, state):
+        """CSR with the delta applied (does not publish)."""
+        csr, delta, pending = state
+        if not pending:
+            return csr
+        keys, offsets, neighbors, weights, types = csr
+        keep = np.ones(len(neighbors), dtype=bool)
+        d_src, d_dst, d_w, d_t = [], [], [], []
+        for node_id, overrides in delta.items():
+            i = int(np.searchsorted(keys, node_id))
+            if i < len(keys) and keys[i] == node_id:
+                names = self.edge_types
+                for j in range(offsets[i], offsets[i + 1]):
+                    if (int(neighbors[j]), names[types[j]]) in overrides:
+                        keep[j] = False
+            for (neighbor_id, edge_type), weight in overrides.items():
+                if weight is None:
+                    continue
+                d_src.append(node_id)
+                d_dst.append(neighbor_id)
+                d_w.append(weight)
+                d_t.append(self._type_codes[edge_type])
+        src = np.concatenate([np.repeat(keys, np.diff(offsets))[keep], np.array(d_src, dtype=np.int64)])
+        dst = np.concatenate([neighbors[keep], np.array(d_dst, dtype=np.int64)])
+        w = np.concatenate([weights[keep], np.array(d_w, dtype=np.float32)])
+        t = np.concatenate([types[keep], np.array(d_t, dtype=np.uint8)])
+        return _make_csr(src, dst, w, t)
+
+    def compact(self):
+        """Fold pending delta entries now (e.g. before measuring memory)."""
+        with self._write_lock:
+            self._state = (self._merged(self._state), {}, 0)
+
+    def reconcile(self, all_edges: List[dict] = None, heal: bool = True) -> dict:
+        """
+        Compare cache with the edges table and report drift.
+        With heal=True, a drifted cache is replaced by a fresh build from the
+        table, unless the cache was written to during the check (then retried
+        on the next cycle).
+        """
+        t0 = time.time()
+        state, version = self._snapshot()
+        if all_edges is None:
+            from database import get_all_edges
+            all_edges = get_all_edges()
+        expected = self._csr_from_edges(all_edges)
+        actual = self._merged(state)
+
+        exp_keys, act_keys = _entry_keys(expected), _entry_keys(actual)
+        _, exp_idx, act_idx = np.intersect1d(exp_keys, act_keys, assume_unique=True, return_indices=True)
+        mismatched = int((np.abs(expected[3][exp_idx] - actual[3][act_idx]) > 1e-6).sum())
+        report = {
+            "table_entries": len(exp_keys),
+            "cache_entries": len(act_keys),
+            "missing": len(exp_keys) - len(exp_idx),
+            "extra": len(act_keys) - len(act_idx),
+            "weight_mismatch": mismatched,
+            "healed": False,
+        }
+        report["drift"] = report["missing"] + report["extra"] + report["weight_mismatch"]
+
+        if report["drift"] and heal:
+            with self._write_lock:
+                if self._version == version:
+                    self._state = (expected, {}, 0)
+                    self.edge_count = len(exp_keys)
+                    self._version += 1
+                    report["healed"] = True
+        report["seconds"] = round(time.time() - t0, 3)
+        self.last_reconcile = report
+
+        if report["drift"]:
+            status = "healed" if report["healed"] else ("concurrent writes, retry next cycle" if heal else "not healed")
+            print(f"⚠️  Graph cache drift: {report['missing']} missing, {report['extra']} extra, "
+                  f"{report['weight_mismatch']} weight mismatches ({status})")
+        return report
+
+    def memory_usage(self) -> dict:
+        """Bytes used by CSR arrays and delta buffer, vs. the tuple-list estimate."""
+        (keys, offsets, neighbors, weights, types), delta, pending = self._state
+        csr_bytes = keys.nbytes + offsets.nbytes + neighbors.nbytes + weights.nbytes + types.nbytes
+        delta_bytes = pending * TUPLE_ENTRY_BYTES
+        entries = self.edge_count
+        return {
+            "csr_bytes": int(csr_bytes),
+            "delta_bytes_est": int(delta_bytes),
+            "total_bytes": int(csr_bytes + delta_bytes),
+            "bytes_per_entry": round((csr_bytes + delta_bytes) / entries, 2) if entries else 0,
+            "tuple_list_bytes_est": int(entries * TUPLE_ENTRY_BYTES),
+        }
+
     def get_stats(self) -> dict:
         """Get cache statistics"""
+        ((keys, _, _, _, _), delta, pending), _ = self._snapshot()
+        delta_nodes = np.fromiter(delta.keys(), dtype=np.int64, count=len(delta))
+        node_count = len(keys) + int((~np.isin(delta_nodes, keys)).sum())
         return {
             "enabled": self.enabled,
             "edge_count": self.edge_count,
-            "node_count": len(self.edges),
-            "avg_degree": self.edge_count * 2 / len(self.edges) if self.edges else 0
+            "node_count": node_count,
+            "delta_entries": pending,
+            "edge_types": list(self.edge_types),
+            "avg_degree": self.edge_count / node_count if node_count else 0,
+            "memory": self.memory_usage(),
+            "last_reconcile": self.last_reconcile,
         }
 
 
@@ -93,13 +473,13 @@ def get_graph_cache() -> GraphCache:
     global _global_cache
     if _global_cache is None:
         _global_cache = GraphCache()
-        
+
         # Auto-build if empty
         if _global_cache.edge_count == 0:
             from database import get_all_edges
             edges = get_all_edges()
             _global_cache.build(edges)
-    
+
     return _global_cache
 
 
@@ -107,3 +487,27 @@ def rebuild_graph_cache(edges: List[dict]) -> int:
     """Rebuild global graph cache"""
     cache = get_graph_cache()
     return cache.build(edges)
+
+
+_reconciler: Optional[threading.Thread] = None
+
+
+def start_reconciler(interval: float = None) -> bool:
+    """Reconcile the global cache with the edges table every `interval` seconds (daemon thread)."""
+    global _reconciler
+    interval = GRAPH_CACHE_RECONCILE_SEC if interval is None else interval
+    if interval <= 0 or (_reconciler is not None and _reconciler.is_alive()):
+        return False
+
+    def loop():
+        while True:
+            time.sleep(interval)
+            try:
+                get_graph_cache().reconcile()
+            except Exception as e:
+                print(f"⚠️  Graph cache reconcile failed: {e}")
+
+    _reconciler = threading.Thread(target=loop, name="graph-cache-reconcile", daemon=True)
+    _reconciler.start()
+    print(f"🔁 Graph cache reconciler every {interval:.0f}s")
+    return True
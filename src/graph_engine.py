@@ -7,19 +7,24 @@ Implements spreading activation search and automatic linking
 import numpy as np
 import os
 import math
+import time
 from datetime import datetime
 from typing import List, Dict, Any
 
 from database import (
-    create_node, get_node, get_all_nodes, touch_node,
-    create_edge, get_connected_nodes,
-    get_or_create_entity, link_node_to_entity, get_nodes_by_entity,
-    get_entity_counts_batch
+    get_connection, create_node, get_node, get_all_nodes, touch_node, create_edges,
+    get_or_create_entity, link_node_to_entities, get_co_entity_node_ids,
+    get_entity_counts_batch, create_notes_batch, fill_node_temporal,
+    enqueue_enrichment, finish_enrichment_job, content_hash, find_exact_duplicates
 )
 from stable_embeddings import get_model
-from entity_extractor import extract_entities
+from entity_extractor import extract_entities, extract_entities_batch
 from ann_index import get_ann_index
 from graph_cache import get_graph_cache
+from entity_graph import (get_entity_graph, EntityView, MATERIALIZE_ENTITY_EDGES, ENTITY_EDGE_WEIGHT,
+                          ENTITY_LINK_MAX_DF, ENTITY_LINK_TOP_K)
+from enrichment import ENRICHMENT_MODE, get_enrichment_workers, queue_full as enrichment_queue_full
+from spreading import spread_activation, spread_community, ppr_push, ACTIVATION_MODE, ACTIVATION_MODES
 
 # Configuration from environment
 ACTIVATION_ITERATIONS = int(os.getenv("ACTIVATION_ITERATIONS", "3"))
@@ -96,6 +101,8 @@ def importance_factor(importance, access_count=0):
 # Deduplication thresholds
 DUPLICATE_THRESHOLD = float(os.getenv("DUPLICATE_THRESHOLD", "0.95"))  # Block creation
 SIMILAR_THRESHOLD = float(os.getenv("SIMILAR_THRESHOLD", "0.90"))  # Warn about similar
+ADD_NOTES_MAX_BATCH = int(os.getenv("ADD_NOTES_MAX_BATCH", "1000"))  # notes per add_notes call
+ENCODE_BATCH_SIZE = int(os.getenv("ENCODE_BATCH_SIZE", "64"))  # texts per model.encode call (bounds activation memory)
 
 
 def find_similar_notes(content, threshold=SIMILAR_THRESHOLD, limit=5):
@@ -130,31 +137,44 @@ def find_similar_notes(content, threshold=SIMILAR_THRESHOLD, limit=5):
     return similarities[:limit]
 
 
+def _exact_duplicate(existing_id, existing_content, **extra):
+    """Duplicate result for a verbatim repeat (same content_hash), found without the model"""
+    return {"error": "duplicate", "duplicate_type": "exact", "message": "Identical note exists",
+            "existing_id": existing_id, "existing_content": existing_content[:200], "similarity": 1.0, **extra}
+
+
 def add_note_with_links(content, category="general", importance="normal", force=False,
                         emotional_tone=None, emotional_intensity=5, emotional_reflection=None):
     """
     Add note with automatic entity extraction, linking, and emotional context.
     
-    1. Check for duplicates (unless force=True)
+    1. Check for duplicates (unless force=True): exact repeats by content
+       hash before any model work, then semantic ones (embedding ≥ DUPLICATE_THRESHOLD)
     2. Create embedding (includes emotional context if provided)
     3. Extract entities (people, concepts, projects)
-    4. Link to other notes sharing same entities
+    4. Link to its entities (notes sharing them are reached through the entity graph)
     5. Find semantically similar notes and create edges
     
+    All writes share one connection and one transaction; ANN, BM25, graph
+    cache and entity graph are updated only after it commits.
+    
+    With ENRICHMENT_MODE=async, steps 3-5 (and temporal extraction) are
+    queued for the enrichment workers (enrich_note): the result carries
+    "enrichment": "pending" and no entities or links yet.
+    
     Returns dict with node_id and link statistics.
-    If duplicate found, returns error with existing note info.
+    If duplicate found, returns error with existing note info and
+    duplicate_type "exact" or "semantic".
     """
+    if not force:
+        exact = find_exact_duplicates([content_hash(content)])
+        if exact:
+            return _exact_duplicate(*next(iter(exact.values())))
+    
     model = get_model()
     
     # Include emotional context in embedding if provided
-    full_text = content
-    if emotional_tone or emotional_reflection:
-        emotional_context = []
-        if emotional_tone:
-            emotional_context.append(f"Emotional tone: {emotional_tone}")
-        if emotional_reflection:
-            emotional_context.append(emotional_reflection)
-        full_text = f"{content}\n\n{'. '.join(emotional_context)}"
+    full_text = _embedding_text(content, emotional_tone, emotional_reflection)
     
     embedding = model.encode(full_text)[0]
     
@@ -170,88 +190,350 @@ def add_note_with_links(content, category="general", importance="normal", force=
             if d:
                 eid,sim = d[0]
                 en = get_node(eid)
-                if en: return {"error": "duplicate", "message": f"Similar note exists ({sim:.2%})", "existing_id": eid, "existing_content": en["content"][:200], "similarity": round(sim, 4)}
+                if en: return {"error": "duplicate", "duplicate_type": "semantic", "message": f"Similar note exists ({sim:.2%})", "existing_id": eid, "existing_content": en["content"][:200], "similarity": round(sim, 4)}
         else:
             # Fallback to linear scan if ANN not enabled
             for n in get_all_nodes():
                 if n["embedding"] is None: continue
                 sim = cosine_similarity(embedding, np.frombuffer(n["embedding"], dtype=np.float32))
-                if sim >= DUPLICATE_THRESHOLD: return {"error": "duplicate", "message": f"Similar note exists ({sim:.2%})", "existing_id": n["id"], "existing_content": n["content"][:200], "similarity": round(sim, 4)}
-    
-    # Create the node with emotional context
-    node_id = create_node(content, category, embedding.tobytes(), importance, emotional_tone, emotional_intensity, emotional_reflection)
-    
-    # Add to ANN index incrementally (enables immediate search for this note)
-    if ann_index.enabled:
-        ann_index.add_vector(node_id, embedding)
-    
-    # Update BM25 index
-    from bm25_index import get_bm25_index
-    bm25 = get_bm25_index()
-    if bm25.is_built:
-        bm25.add_document(node_id, content)
-    
-    # Extract entities and create entity-based links
+                if sim >= DUPLICATE_THRESHOLD: return {"error": "duplicate", "duplicate_type": "semantic", "message": f"Similar note exists ({sim:.2%})", "existing_id": n["id"], "existing_content": n["content"][:200], "similarity": round(sim, 4)}
+    
+    # Async enrichment: commit and acknowledge now, link in the background
+    # (inline instead when the queue is full — backpressure)
+    if ENRICHMENT_MODE == "async" and not enrichment_queue_full():
+        with get_connection() as conn:
+            node_id = create_node(content, category, embedding.tobytes(), importance, emotional_tone,
+                                  emotional_intensity, emotional_reflection, conn=conn, auto_temporal=False)
+            enqueue_enrichment(node_id, conn=conn)
+        _index_note(node_id, content, embedding, ann_index)
+        get_enrichment_workers().notify()
+        return {"node_id": node_id, "entities": [], "entity_links": 0, "semantic_links": 0,
+                "enrichment": "pending"}
+    
+    # Read phase (no writes yet): entities and semantic candidates.
+    # The note is not in the index yet, so no self-match to filter.
     entities = extract_entities(content)
-    entity_links = []
-    
-    graph_cache = get_graph_cache()  # Get cache for incremental updates
-    
-    for en,et in entities:
-        eid = get_or_create_entity(en, et)
-        link_node_to_entity(node_id, eid)
-        for r in get_nodes_by_entity(eid):
-            if r["id"] != node_id:
-                create_edge(node_id, r["id"], weight=0.6, edge_type="entity")
-                create_edge(r["id"], node_id, weight=0.6, edge_type="entity")
-                if graph_cache.enabled:
-                    graph_cache.add_edge(node_id, r["id"], weight=0.6, edge_type="entity")
-                entity_links.append(r["id"])
-    
-    # Find semantically similar notes
-    # OPTIMIZED: Use ANN index for O(log n) instead of O(n) linear scan
-    semantic_links = []
-    similar_warnings = []
+    sims = _semantic_candidates(embedding, ann_index)
+    
+    # Write phase: node, entity links and edges in ONE transaction (one
+    # connection, one commit); any failure rolls the whole note back
+    with get_connection() as conn:
+        node_id = create_node(content, category, embedding.tobytes(), importance, emotional_tone,
+                              emotional_intensity, emotional_reflection, conn=conn)
+        links = _write_links(node_id, entities, sims, conn)
+    
+    # In-memory indexes only after the commit, so a rolled-back add leaves no trace
+    _index_note(node_id, content, embedding, ann_index)
+    result = _publish_links(node_id, entities, links)
+    if ENRICHMENT_MODE == "async":
+        result["enrichment"] = "inline (queue full)"
+    return result
+
+
+def enrich_note(node_id, job_id=None):
+    """
+    Enrichment of a note added with ENRICHMENT_MODE=async: entities,
+    temporal expressions and edges, as add_note_with_links would have
+    written them. One transaction, which also deletes the job (job_id), so
+    a job is either done completely or still queued.
     
+    Returns the add_note_with_links-style result, or None if the note was
+    deleted meanwhile.
+    """
+    node = get_node(node_id)
+    if node is None:
+        if job_id is not None:
+            finish_enrichment_job(job_id)
+        return None
+    entities = extract_entities(node["content"])
+    sims = []
+    if node["embedding"] is not None:
+        embedding = np.frombuffer(node["embedding"], dtype=np.float32)
+        sims = _semantic_candidates(embedding, get_ann_index(), exclude=node_id)
+    
+    with get_connection() as conn:
+        fill_node_temporal(node_id, conn=conn)
+        links = _write_links(node_id, entities, sims, conn)
+        if job_id is not None:
+            finish_enrichment_job(job_id, conn=conn)
+    return _publish_links(node_id, entities, links)
+
+
+def _semantic_candidates(embedding, ann_index, exclude=None):
+    """(node_id, similarity) above SIMILARITY_THRESHOLD, best first, at least MAX_SEMANTIC_LINKS."""
     if ann_index.enabled:
         # Fast semantic search using ANN index
-        # Request 2x candidates to account for self-reference filtering
-        sims = [(n,s) for n,s in ann_index.search(embedding, k=MAX_SEMANTIC_LINKS*2, min_similarity=SIMILARITY_THRESHOLD) if n!=node_id]
+        sims = ann_index.search(embedding, k=MAX_SEMANTIC_LINKS*2 + (exclude is not None),
+                                min_similarity=SIMILARITY_THRESHOLD)
     else:
         # Fallback to linear scan if ANN not enabled
         sims = []
         for n in get_all_nodes():
-            if n["id"]==node_id or n["embedding"] is None: continue
+            if n["embedding"] is None: continue
             sim = cosine_similarity(embedding, np.frombuffer(n["embedding"], dtype=np.float32))
             if sim >= SIMILARITY_THRESHOLD: sims.append((n["id"], sim))
         sims.sort(key=lambda x: x[1], reverse=True)
+    return [(rid, sim) for rid, sim in sims if rid != exclude]
+
+
+def _write_links(node_id, entities, sims, conn):
+    """Entity links and edges of a new note, on conn. Returns what _publish_links needs."""
+    cache_edges = []
+    entity_links = []
+    semantic_links = []
+    similar_warnings = []
+    
+    # Link the note to its entities (node_entities). Spreading reaches
+    # co-entity notes through the entity graph; pairwise entity edges are
+    # only written with MATERIALIZE_ENTITY_EDGES=true, to the strongest
+    # ENTITY_LINK_TOP_K notes (ids only, popular entities skipped)
+    entity_ids = list(dict.fromkeys(get_or_create_entity(en, et, conn=conn) for en, et in entities))
+    link_node_to_entities(node_id, entity_ids, conn=conn)
+    if MATERIALIZE_ENTITY_EDGES:
+        for rid, _ in get_co_entity_node_ids(node_id, entity_ids, ENTITY_LINK_MAX_DF, ENTITY_LINK_TOP_K,
+                                             conn=conn):
+            cache_edges.append((node_id, rid, ENTITY_EDGE_WEIGHT, "entity"))
+            entity_links.append(rid)
     
     # Create edges for top MAX_SEMANTIC_LINKS similar nodes
     for rid,sim in sims[:MAX_SEMANTIC_LINKS]:
-        create_edge(node_id, rid, weight=sim, edge_type="semantic")
-        create_edge(rid, node_id, weight=sim, edge_type="semantic")
-        if graph_cache.enabled:
-            graph_cache.add_edge(node_id, rid, weight=sim, edge_type="semantic")
+        cache_edges.append((node_id, rid, sim, "semantic"))
         semantic_links.append((rid, sim))
         if sim >= SIMILAR_THRESHOLD: similar_warnings.append({"id": rid, "similarity": round(sim, 4)})
+    # All edges of the note in one executemany (a pair that is both entity
+    # and semantic keeps one row per type)
+    cache_edges = create_edges(cache_edges, conn=conn)
+    return {"entity_ids": entity_ids, "edges": cache_edges, "entity_links": entity_links,
+            "semantic_links": semantic_links, "similar_warnings": similar_warnings}
+
 
+def _index_note(node_id, content, embedding, ann_index):
+    """Add a committed note to the ANN and BM25 indexes."""
+    if ann_index.enabled:
+        ann_index.add_vector(node_id, embedding)
+    from bm25_index import get_bm25_index
+    bm25 = get_bm25_index()
+    if bm25.is_built:
+        bm25.add_document(node_id, content)
+
+
+def _publish_links(node_id, entities, links):
+    """Update graph cache and entity graph after the links committed; build the add result."""
+    graph_cache = get_graph_cache()
+    if graph_cache.enabled:
+        graph_cache.add_edges(links["edges"])
+    entity_graph = get_entity_graph()
+    entity_graph.add_links(node_id, links["entity_ids"])
+    entity_links = links["entity_links"]
+    if not MATERIALIZE_ENTITY_EDGES:
+        entity_links = entity_graph.co_entity_notes(node_id)
     
     result = {
         "node_id": node_id,
         "entities": entities,
         "entity_links": len(set(entity_links)),
-        "semantic_links": len(semantic_links)
+        "semantic_links": len(links["semantic_links"])
     }
     
-    if similar_warnings:
+    if links["similar_warnings"]:
         result["warning"] = "Similar notes exist"
-        result["similar_notes"] = similar_warnings
+        result["similar_notes"] = links["similar_warnings"]
     
     return result
 
 
+def _embedding_text(content, emotional_tone=None, emotional_reflection=None):
+    """Text that is embedded for a note: content plus emotional context if given."""
+    if not (emotional_tone or emotional_reflection):
+        return content
+    emotional_context = []
+    if emotional_tone:
+        emotional_context.append(f"Emotional tone: {emotional_tone}")
+    if emotional_reflection:
+        emotional_context.append(emotional_reflection)
+    return f"{content}\n\n{'. '.join(emotional_context)}"
+
+
+def add_notes_with_links(notes: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Add a batch of notes; same result per note as add_note_with_links.
+
+    notes: dicts with content and optional category, importance, force,
+    emotional_tone, emotional_intensity, emotional_reflection.
+
+    1. Exact duplicates (content hash) of stored notes or of earlier notes
+       of the batch are answered without encoding
+    2. Encode the rest in ENCODE_BATCH_SIZE chunks
+    3. Semantic duplicate check against the index and against earlier notes of the batch
+    4. Semantic candidates: index search + earlier notes of the batch, so a
+       batch links like the same notes added one by one
+    5. Nodes, entities, node_entities and edges in one transaction
+    6. ANN, BM25, graph cache and entity graph updated once, after the commit
+
+    Returns {"results": [per note, in order], "added", "duplicates", "errors",
+    "seconds", "notes_per_sec"}. Duplicates of an earlier note in the batch
+    carry "existing_index" instead of "existing_id"; an exact repeat of a
+    batch note that was itself a duplicate gets that note's verdict.
+    """
+    t0 = time.time()
+    results = [None] * len(notes)
+    valid = []
+    for i, note in enumerate(notes):
+        if not isinstance(note, dict) or not str(note.get("content") or "").strip():
+            results[i] = {"index": i, "error": "invalid", "message": "content required"}
+        else:
+            valid.append(i)
+
+    # Exact duplicates first: verbatim repeats never reach the model
+    hashes = {i: content_hash(notes[i]["content"]) for i in valid}
+    existing = find_exact_duplicates([hashes[i] for i in valid if not notes[i].get("force", False)])
+    first_in_batch, repeat_of = {}, {}
+    for i in valid:
+        if not notes[i].get("force", False):
+            if hashes[i] in existing:
+                results[i] = {"index": i, **_exact_duplicate(*existing[hashes[i]])}
+                continue
+            if hashes[i] in first_in_batch:
+                repeat_of[i] = first_in_batch[hashes[i]]
+                continue
+        first_in_batch.setdefault(hashes[i], i)
+    valid = [i for i in valid if results[i] is None and i not in repeat_of]
+
+    if valid:
+        model = get_model()
+        texts = [_embedding_text(notes[i]["content"], notes[i].get("emotional_tone"),
+                                 notes[i].get("emotional_reflection")) for i in valid]
+        embeddings = np.concatenate([np.asarray(model.encode(texts[start:start + ENCODE_BATCH_SIZE]), dtype=np.float32)
+                                     for start in range(0, len(texts), ENCODE_BATCH_SIZE)])
+        unit = embeddings / np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+        batch_sims = unit @ unit.T
+
+        ann_index = get_ann_index()
+        if ann_index.enabled:
+            def index_search(emb, k, threshold):
+                return ann_index.search(emb, k=k, min_similarity=threshold)
+        else:
+            # Fallback to linear scan if ANN not enabled: load the existing embeddings once
+            stored = [(n["id"], np.frombuffer(n["embedding"], dtype=np.float32))
+                      for n in get_all_nodes() if n["embedding"] is not None]
+            stored_ids = [nid for nid, _ in stored]
+            stored_unit = np.array([e for _, e in stored], dtype=np.float32).reshape(len(stored), embeddings.shape[1])
+            stored_unit = stored_unit / np.maximum(np.linalg.norm(stored_unit, axis=1, keepdims=True), 1e-12)
+
+            def index_search(emb, k, threshold):
+                if not stored_ids:
+                    return []
+                sims = stored_unit @ (emb / max(float(np.linalg.norm(emb)), 1e-12))
+                top = np.argsort(-sims)[:k]
+                return [(stored_ids[j], float(sims[j])) for j in top if sims[j] >= threshold]
+
+        accepted = []  # positions in `valid` that will be inserted
+        edges, batch_edges, warnings = [], [], []
+        for pos, i in enumerate(valid):
+            note = notes[i]
+            emb = embeddings[pos]
+            if not note.get("force", False):
+                d = index_search(emb, 5, DUPLICATE_THRESHOLD)
+                if d:
+                    eid, sim = d[0]
+                    en = get_node(eid)
+                    if en:
+                        results[i] = {"index": i, "error": "duplicate", "duplicate_type": "semantic",
+                                      "message": f"Similar note exists ({sim:.2%})",
+                                      "existing_id": eid, "existing_content": en["content"][:200],
+                                      "similarity": round(sim, 4)}
+                        continue
+                if accepted and batch_sims[pos, accepted].max() >= DUPLICATE_THRESHOLD:
+                    a = accepted[int(np.argmax(batch_sims[pos, accepted]))]
+                    sim = float(batch_sims[pos, a])
+                    results[i] = {"index": i, "error": "duplicate", "duplicate_type": "semantic",
+                                  "message": f"Similar note in batch ({sim:.2%})",
+                                  "existing_index": valid[a], "existing_content": notes[valid[a]]["content"][:200],
+                                  "similarity": round(sim, 4)}
+                    continue
+
+            # Top MAX_SEMANTIC_LINKS among indexed notes and earlier notes of the batch
+            candidates = [(("id", n), s) for n, s in index_search(emb, MAX_SEMANTIC_LINKS * 2, SIMILARITY_THRESHOLD)]
+            candidates += [(("batch", k), float(batch_sims[pos, a])) for k, a in enumerate(accepted)
+                           if batch_sims[pos, a] >= SIMILARITY_THRESHOLD]
+            candidates.sort(key=lambda x: x[1], reverse=True)
+            note_warnings = []
+            for (kind, ref), sim in candidates[:MAX_SEMANTIC_LINKS]:
+                if kind == "id":
+                    edges.append((len(accepted), ref, sim, "semantic"))
+                else:
+                    batch_edges.append((len(accepted), ref, sim, "semantic"))
+                if sim >= SIMILAR_THRESHOLD:
+                    note_warnings.append((kind, ref, round(sim, 4)))
+            warnings.append(note_warnings)
+            accepted.append(pos)
+
+        if accepted:
+            note_entities = extract_entities_batch([notes[valid[pos]]["content"] for pos in accepted])
+            rows = [{**notes[valid[pos]], "embedding": embeddings[pos].tobytes()} for pos in accepted]
+            written = create_notes_batch(
+                rows, note_entities, edges, batch_edges,
+                entity_edge_weight=ENTITY_EDGE_WEIGHT if MATERIALIZE_ENTITY_EDGES else None,
+                entity_link_max_df=ENTITY_LINK_MAX_DF, entity_link_top_k=ENTITY_LINK_TOP_K)
+            node_ids = written["node_ids"]
+
+            # Indexes only after the commit: a failed batch leaves no phantom entries
+            if ann_index.enabled:
+                ann_index.add_vectors(node_ids, embeddings[accepted])
+            from bm25_index import get_bm25_index
+            bm25 = get_bm25_index()
+            if bm25.is_built:
+                bm25.add_documents([(nid, notes[valid[pos]]["content"]) for nid, pos in zip(node_ids, accepted)])
+            graph_cache = get_graph_cache()
+            if graph_cache.enabled:
+                graph_cache.add_edges(written["edges"])
+            entity_graph = get_entity_graph()
+            for nid, eids in zip(node_ids, written["entity_ids"]):
+                entity_graph.add_links(nid, eids)
+
+            semantic_count = {}
+            for k, _, _, _ in edges:
+                semantic_count[k] = semantic_count.get(k, 0) + 1
+            for k, _, _, _ in batch_edges:
+                semantic_count[k] = semantic_count.get(k, 0) + 1
+            for k, (pos, nid) in enumerate(zip(accepted, node_ids)):
+                i = valid[pos]
+                if MATERIALIZE_ENTITY_EDGES:
+                    entity_links = {t if s == nid else s for s, t, _, et in written["edges"]
+                                    if et == "entity" and nid in (s, t)}
+                else:
+                    entity_links = entity_graph.co_entity_notes(nid)
+                result = {"index": i, "node_id": nid, "entities": note_entities[k],
+                          "entity_links": len(entity_links), "semantic_links": semantic_count.get(k, 0)}
+                if warnings[k]:
+                    result["warning"] = "Similar notes exist"
+                    result["similar_notes"] = [{"id": ref if kind == "id" else node_ids[ref], "similarity": sim}
+                                               for kind, ref, sim in warnings[k]]
+                results[i] = result
+
+    for i, first in repeat_of.items():
+        if "node_id" in results[first]:
+            results[i] = {"index": i, "error": "duplicate", "duplicate_type": "exact",
+                          "message": "Identical note in batch", "existing_index": first,
+                          "existing_content": notes[first]["content"][:200], "similarity": 1.0}
+        else:
+            results[i] = {**results[first], "index": i}
+
+    seconds = time.time() - t0
+    added = sum(1 for r in results if "node_id" in r)
+    return {
+        "results": results,
+        "added": added,
+        "duplicates": sum(1 for r in results if r.get("error") == "duplicate"),
+        "errors": sum(1 for r in results if r.get("error") == "invalid"),
+        "seconds": round(seconds, 3),
+        "notes_per_sec": round(added / seconds, 1) if seconds > 0 else float(added),
+    }
+
+
 def search_with_activation(query, limit=5, iterations=ACTIVATION_ITERATIONS, decay=ACTIVATION_DECAY, 
-                          category_filter=None, time_after=None, time_before=None, entity_type_filter=None):
+                          category_filter=None, time_after=None, time_before=None, entity_type_filter=None,
+                          activation_mode=None, epsilon=None):
     """
     Search using spreading activation algorithm.
     
@@ -270,6 +552,11 @@ def search_with_activation(query, limit=5, iterations=ACTIVATION_ITERATIONS, dec
         time_before: Optional datetime string - only return notes created before this time (ISO format)
         entity_type_filter: Optional entity type - only return notes containing entities of this type
                            (e.g., "person", "organization", "concept", "location")
+        activation_mode: "spreading" (iterative, default ACTIVATION_MODE), "ppr"
+                         (Personalized PageRank by forward push, seeded from ANN + BM25)
+                         "diffusion" (sum of precomputed per-node diffusion vectors) or "community"
+                         (spreading inside the seeds' communities, then over a few bridge edges)
+        epsilon: Convergence knob — PPR residual tolerance, or spreading L1 early-exit threshold
     
     This finds notes that are:
     - Semantically similar to query
@@ -277,6 +564,10 @@ def search_with_activation(query, limit=5, iterations=ACTIVATION_ITERATIONS, dec
     - Recently accessed (recency boost)
     - Optionally filtered by category, time range, and/or entity type
     """
+    mode = (activation_mode or ACTIVATION_MODE).lower()
+    if mode not in ACTIVATION_MODES:
+        raise ValueError(f"Unknown activation_mode '{mode}' (expected one of {', '.join(ACTIVATION_MODES)})")
+    
     model = get_model()
     
     # Initialize search logger
@@ -310,7 +601,7 @@ def search_with_activation(query, limit=5, iterations=ACTIVATION_ITERATIONS, dec
     activations = {}
     semantic_sims = {}  # Preserve raw semantic similarities for blend scoring
     
-    if ann_index.enabled and len(ann_index.node_ids) > 0:
+    if ann_index.enabled and ann_index.vector_count > 0:
         # Fast ANN search
         results = ann_index.search(query_emb, k=limit*3, min_similarity=0.0)
         for node_id, sim in results:
@@ -330,43 +621,39 @@ def search_with_activation(query, limit=5, iterations=ACTIVATION_ITERATIONS, dec
     
     if slog: slog.mark("ann")
     
-    # Step 2: Spreading activation with normalization and damping
-    for iteration in range(iterations):
-        new_activations = {}
-        
-        # Spread from activated nodes
-        for node_id, activation in activations.items():
-            if activation < 0.01:  # Skip very weakly activated nodes
-                continue
-            
-            # Keep original activation (with decay)
-            new_activations[node_id] = new_activations.get(node_id, 0) + activation * decay
-            
-            # Spread to neighbors
-            # Use in-memory graph cache (O(1) instead of SQL)
-            graph_cache = get_graph_cache()
-            neighbors = graph_cache.get_neighbors(node_id)
-            for neighbor_id, edge_weight, edge_type in neighbors:
-                
-                # Spread activation through edge
-                spread = activation * edge_weight * decay
-                
-                # Add to neighbor's activation
-                new_activations[neighbor_id] = new_activations.get(neighbor_id, 0) + spread
-        
-        # Normalization: scale to 0-1 range based on max
-        if new_activations:
-            max_activation = max(new_activations.values())
-            if max_activation > 0:
-                for node_id in new_activations:
-                    new_activations[node_id] /= max_activation
-        
-        activations = new_activations
-        
-        # Debug output
-        if activations:
-            print(f"  Iteration {iteration+1}: {len(activations)} nodes, max={max(activations.values()):.4f}, sum={sum(activations.values()):.4f}")
-
+    # Step 2: Spreading activation with normalization, damping and work budgets,
+    # or Personalized PageRank seeded from ANN + BM25 candidates
+    bm25_raw = None
+    # Co-entity notes are reached through node_entities unless entity edges are materialised
+    entity_graph = None if MATERIALIZE_ENTITY_EDGES else get_entity_graph()
+    if mode == "ppr":
+        from bm25_index import get_bm25_index
+        bm25_raw = get_bm25_index().search(query, top_k=100)
+        seeds = dict(semantic_sims)
+        if bm25_raw:
+            max_bm25 = max(bm25_raw.values())
+            top_bm25 = sorted(bm25_raw.items(), key=lambda x: x[1], reverse=True)[:limit*3]
+            for nid, s in top_bm25:
+                if max_bm25 > 0:
+                    seeds[nid] = seeds.get(nid, 0) + s / max_bm25
+        if entity_graph is not None:
+            activations, spread_stats = ppr_push(seeds, EntityView(get_graph_cache(), entity_graph), epsilon=epsilon)
+            activations = EntityView.strip(activations)
+        else:
+            activations, spread_stats = ppr_push(seeds, get_graph_cache(), epsilon=epsilon)
+    elif mode == "diffusion":
+        from diffusion import get_diffusion_store
+        activations, spread_stats = get_diffusion_store().diffuse(activations, get_graph_cache(),
+                                                                      entity_graph=entity_graph)
+    elif mode == "community":
+        from graph_metrics import get_graph_metrics
+        activations, spread_stats = spread_community(activations, get_graph_cache(),
+                                                     get_graph_metrics().get_community, iterations, decay,
+                                                     epsilon=epsilon, entity_graph=entity_graph)
+    else:
+        activations, spread_stats = spread_activation(activations, get_graph_cache(), iterations, decay,
+                                                      epsilon=epsilon, entity_graph=entity_graph)
+    
     if slog: slog.mark("spreading")
 
     
@@ -418,8 +705,9 @@ def search_with_activation(query, limit=5, iterations=ACTIVATION_ITERATIONS, dec
     # Get BM25 scores if gamma > 0
     bm25_scores = {}
     if gamma > 0:
-        from bm25_index import get_bm25_index
-        bm25_raw = get_bm25_index().search(query, top_k=100)
+        if bm25_raw is None:
+            from bm25_index import get_bm25_index
+            bm25_raw = get_bm25_index().search(query, top_k=100)
         if bm25_raw:
             max_bm25 = max(bm25_raw.values())
             if max_bm25 > 0:
@@ -606,41 +894,53 @@ def search_with_activation(query, limit=5, iterations=ACTIVATION_ITERATIONS, dec
                 "time_after": time_after,
                 "time_before": time_before,
                 "entity_type_filter": entity_type_filter,
+                "activation_mode": mode,
             },
             signals={
                 "alpha": alpha, "beta": beta, "gamma": gamma, "delta": effective_delta,
                 "bm25_matches": len(bm25_scores),
                 "temporal_matches": len(temporal_scores),
                 "rerank_enabled": RERANK_ENABLED,
+                "spread_iterations": spread_stats["iterations"],
+                "nodes_touched": spread_stats["nodes_touched"],
+                "edges_expanded": spread_stats["edges_expanded"],
             })
     
     return results, total_activated
 
 
-def get_node_graph(node_id):
-    """Get graph visualization data for a specific node"""
-    node = get_node(node_id)
-    if not node:
-        return {"error": "Node not found"}
-    
-    connected = get_connected_nodes(node_id)
+def get_node_graph(node_id, fanout=None):
+    """Get graph visualization data for a specific node (1-hop, from the graph cache)"""
+    from neighborhood import get_neighborhood
+    hood = get_neighborhood(node_id, hops=1, fanout=fanout)
+    if "error" in hood:
+        return hood
+    
+    previews = {n["id"]: n for n in hood["nodes"]}
+    center = previews[node_id]
+    connections = []
+    for e in sorted(hood["edges"], key=lambda e: e["weight"], reverse=True):
+        other = e["target"] if e["source"] == node_id else e["source"]
+        if other == node_id or (e["source"] != node_id and e["target"] != node_id):
+            continue
+        connections.append({
+            "id": other,
+            "content": (previews[other].get("preview") or "")[:100],
+            "weight": e["weight"],
+            "type": e["type"]
+        })
     
     return {
         "node": {
             "id": node_id,
-            "content": node["content"][:100],
-            "category": node["category"]
+            "content": (center.get("preview") or "")[:100],
+            "category": center["category"]
         },
-        "connections": [
-            {
-                "id": c["id"],
-                "content": c["content"][:100] if c.get("content") else "",
-                "weight": c.get("weight", 0.5),
-                "type": c.get("edge_type", "unknown")
-            }
-            for c in connected
-        ]
+        "connections": connections,
+        "truncated": hood["truncated"]
     }
+
+
 """
 Context Window Protection implementation for search_with_activation
 
@@ -689,7 +989,7 @@ def estimate_tokens(text):
 def search_with_activation_protected(query, limit=5, max_results=10, detail_mode="full",
                                    iterations=ACTIVATION_ITERATIONS, decay=ACTIVATION_DECAY, 
                                    category_filter=None, time_after=None, time_before=None, 
-                                   entity_type_filter=None):
+                                   entity_type_filter=None, activation_mode=None, epsilon=None):
     """
     Search with context window protection.
     
@@ -698,6 +998,8 @@ def search_with_activation_protected(query, limit=5, max_results=10, detail_mode
                     Overrides 'limit' if limit > max_results
         detail_mode: "brief" (first line + metadata) or "full" (complete content)
                     Default: "full"
+        activation_mode: "spreading", "ppr", "diffusion" or "community" (default: ACTIVATION_MODE env)
+        epsilon: Convergence knob for the chosen activation mode
     
     Returns:
         {
@@ -732,7 +1034,9 @@ def search_with_activation_protected(query, limit=5, max_results=10, detail_mode
         category_filter=category_filter,
         time_after=time_after,
         time_before=time_before,
-        entity_type_filter=entity_type_filter
+        entity_type_filter=entity_type_filter,
+        activation_mode=activation_mode,
+        epsilon=epsilon
     )
     
     # Format based on detail mode
@@ -746,6 +1050,7 @@ def search_with_activation_protected(query, limit=5, max_results=10, detail_mode
     # Metadata
     metadata = {
         "total_activated": total_activated,
+        "activation_mode": activation_mode or ACTIVATION_MODE,
         "returned": len(formatted_results),
         "detail_mode": detail_mode,
         "estimated_tokens": estimate_tokens(str(formatted_results)),
@@ -1,86 +1,263 @@
 #!/usr/bin/env python3
 """
 Graph Metrics for Neural Memory Graph
-Computes PageRank and community detection, cached at startup.
+Computes PageRank and community detection, persisted in the graph_metrics table.
+
+PageRank is power iteration on a scipy.sparse transition matrix, warm-started
+from the previous vector (few iterations when the graph changed a little).
+Communities come from weighted label propagation on the undirected CSR graph,
+O(edges) per sweep. Sleep-compute recomputes and saves both; the server loads
+the saved values at startup and only computes when none are stored.
 """
 import os
 import time
-from typing import Dict, List, Set, Tuple
+import sqlite3
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+import numpy as np
 
 # PageRank weight in final scoring (small boost, not dominant)
 PAGERANK_BOOST = float(os.getenv("PAGERANK_BOOST", "0.1"))
+PAGERANK_ALPHA = 0.85  # damping factor (networkx default)
+PAGERANK_TOL = 1e-6  # per-node L1 tolerance (networkx convention: stop when err < N * tol)
+PAGERANK_MAX_ITER = 100
+LPA_MAX_ITER = int(os.getenv("LPA_MAX_ITER", "30"))
+LPA_MIN_CHANGED = 0.001  # stop when at most this fraction of nodes would change label
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS graph_metrics (
+    node_id INTEGER PRIMARY KEY,
+    pagerank REAL NOT NULL,
+    community INTEGER NOT NULL,
+    computed_at TEXT
+)
+"""
+
+
+def pagerank(A, alpha: float = PAGERANK_ALPHA, x0: np.ndarray = None,
+             tol: float = PAGERANK_TOL, max_iter: int = PAGERANK_MAX_ITER) -> Tuple[np.ndarray, int]:
+    """
+    Weighted PageRank by power iteration (dangling mass spread uniformly).
+
+    Args:
+        A: scipy.sparse (n × n) weighted adjacency, A[i, j] = weight of i → j
+        x0: Optional start vector (e.g. the previous PageRank), any scale
+
+    Returns:
+        (PageRank vector summing to 1, iterations used)
+    """
+    from scipy import sparse
+
+    n = A.shape[0]
+    if n == 0:
+        return np.zeros(0), 0
+    out_weight = np.asarray(A.sum(axis=1)).ravel()
+    dangling = out_weight == 0
+    inv = np.divide(1.0, out_weight, out=np.zeros(n), where=~dangling)
+    P = sparse.diags(inv) @ A  # row-stochastic except dangling rows
+    PT = P.T.tocsr()
+
+    x = np.full(n, 1.0 / n) if x0 is None or x0.sum() <= 0 else x0 / x0.sum()
+    for iteration in range(1, max_iter + 1):
+        x_new = alpha * (PT @ x + x[dangling].sum() / n) + (1.0 - alpha) / n
+        err = np.abs(x_new - x).sum()
+        x = x_new
+        if err < n * tol:
+            return x, iteration
+    print(f"⚠️  PageRank did not converge in {max_iter} iterations (err={err:.2e})")
+    return x, max_iter
+
+
+def label_propagation(A, max_iter: int = LPA_MAX_ITER, seed: int = 0) -> Tuple[np.ndarray, int]:
+    """
+    Weighted label propagation on a symmetric adjacency matrix.
+
+    Each sweep, a random half of the nodes adopts the label with the
+    largest total edge weight among its neighbours (semi-synchronous
+    updates avoid the oscillation of fully synchronous LPA on bipartite
+    structure). Ties keep the current label. Nodes without edges get -1.
+
+    Returns:
+        (label per node, sweeps used)
+    """
+    from scipy import sparse
+
+    n = A.shape[0]
+    labels = np.arange(n)
+    isolated = np.asarray((A != 0).sum(axis=1)).ravel() == 0
+    if n == 0:
+        return labels, 0
+
+    rng = np.random.default_rng(seed)
+    A = A.tocsr()
+    rows = np.concatenate([np.repeat(np.arange(n), np.diff(A.indptr)), np.arange(n)])
+    # Own label wins ties: tiny self weight below any real edge weight
+    keep_bonus = np.full(n, 1e-9 * (A.data.min() if A.nnz else 1.0))
+    data = np.concatenate([A.data, keep_bonus])
+    sweeps = 0
+    for sweeps in range(1, max_iter + 1):
+        # S[i, l] = total weight from i to neighbours labelled l (duplicates summed)
+        S = sparse.csr_matrix((data, (rows, np.concatenate([labels[A.indices], labels]))), shape=(n, n))
+        S.sum_duplicates()
+        # Row-wise argmax (every row has its own-label entry, so none is empty)
+        row_len = np.diff(S.indptr)
+        row_max = np.maximum.reduceat(S.data, S.indptr[:-1])
+        hits = np.flatnonzero(S.data == np.repeat(row_max, row_len))
+        hit_rows = np.repeat(np.arange(n), row_len)[hits]
+        _, first = np.unique(hit_rows, return_index=True)
+        best = S.indices[hits[first]]
+        pending = ~isolated & (best != labels)
+        if pending.sum() <= LPA_MIN_CHANGED * n:
+            break
+        labels = np.where(pending & (rng.random(n) < 0.5), best, labels)
+    labels = np.where(isolated, -1, labels)
+    return labels, sweeps
 
 
 class GraphMetrics:
     """Cached graph metrics: PageRank scores and community labels."""
-    
+
     def __init__(self):
         self._pagerank: Dict[int, float] = {}
         self._communities: Dict[int, int] = {}  # node_id → community_id
         self._community_sizes: Dict[int, int] = {}
         self._computed_at: float = 0
         self._node_count: int = 0
-    
-    def compute(self, edges: List[Tuple[int, int, float]], node_ids: List[int]):
+        self._last_run: Dict = {}
+
+    def compute(self, edges: List[Tuple[int, int, float]], node_ids: List[int], warm_start: bool = True):
         """
         Compute PageRank and communities from edge list.
-        Called at startup and after significant graph changes.
+        Called by sleep-compute, and at startup when nothing is persisted.
+
+        Args:
+            edges: (source_id, target_id, weight, edge_type) rows as stored; rows whose
+                   type is not in DIRECTED_EDGE_TYPES (one row per undirected pair)
+                   count in both directions. 3-tuples are taken as directed.
+            node_ids: All node ids (nodes without edges included)
+            warm_start: Start PageRank from the current vector, if any
         """
-        import networkx as nx
-        
+        from scipy import sparse
+        from database import DIRECTED_EDGE_TYPES
+
         start = time.time()
-        
-        G = nx.DiGraph()
-        for nid in node_ids:
-            G.add_node(nid)
-        for src, tgt, w in edges:
-            G.add_edge(src, tgt, weight=w)
-        
-        # PageRank
-        if G.number_of_edges() > 0:
-            self._pagerank = nx.pagerank(G, weight='weight', max_iter=100)
+
+        ids = np.unique(np.asarray(list(node_ids), dtype=np.int64))
+        n = len(ids)
+        if edges:
+            src = np.fromiter((e[0] for e in edges), dtype=np.int64, count=len(edges))
+            dst = np.fromiter((e[1] for e in edges), dtype=np.int64, count=len(edges))
+            w = np.fromiter((e[2] for e in edges), dtype=np.float64, count=len(edges))
+            both = np.fromiter((len(e) > 3 and e[3] not in DIRECTED_EDGE_TYPES for e in edges),
+                               dtype=bool, count=len(edges))
+            ok = np.isin(src, ids) & np.isin(dst, ids) & (src != dst) & (w > 0)
+            src, dst, w, both = np.searchsorted(ids, src[ok]), np.searchsorted(ids, dst[ok]), w[ok], both[ok]
+            # Undirected pairs are stored once as (min_id, max_id): add the reverse direction
+            src, dst, w = (np.concatenate([src, dst[both]]), np.concatenate([dst, src[both]]),
+                           np.concatenate([w, w[both]]))
         else:
-            self._pagerank = {nid: 1.0 / max(len(node_ids), 1) for nid in node_ids}
-        
+            src = dst = np.zeros(0, dtype=np.int64)
+            w = np.zeros(0)
+        # One edge per (source, target): strongest edge type wins
+        order = np.lexsort((-w, dst, src))
+        src, dst, w = src[order], dst[order], w[order]
+        first = np.ones(len(src), dtype=bool)
+        first[1:] = (src[1:] != src[:-1]) | (dst[1:] != dst[:-1])
+        A = sparse.csr_matrix((w[first], (src[first], dst[first])), shape=(n, n))
+
+        # PageRank (warm start from the previous scores; new nodes start at the mean)
+        x0 = None
+        if warm_start and self._pagerank:
+            prev = np.array([self._pagerank.get(int(nid), np.nan) for nid in ids])
+            known = ~np.isnan(prev)
+            if known.any():
+                x0 = np.where(known, prev, np.nanmean(prev))
+        t_pr = time.time()
+        pr, pr_iter = pagerank(A, x0=x0)
+        t_pr = time.time() - t_pr
+
         # Normalize PageRank to 0-1 range
-        if self._pagerank:
-            max_pr = max(self._pagerank.values())
-            if max_pr > 0:
-                self._pagerank = {k: v / max_pr for k, v in self._pagerank.items()}
-        
+        max_pr = pr.max() if n else 0.0
+        if max_pr > 0:
+            pr = pr / max_pr
+        self._pagerank = dict(zip(ids.tolist(), pr.tolist()))
+
         # Community detection (on undirected graph)
-        UG = G.to_undirected()
-        components = sorted(nx.connected_components(UG), key=len, reverse=True)
-        
-        if len(components) > 0 and len(components[0]) > 4:
-            try:
-                from networkx.algorithms.community import greedy_modularity_communities
-                largest = UG.subgraph(components[0]).copy()
-                comms = greedy_modularity_communities(largest, weight='weight')
-                comms = sorted(comms, key=len, reverse=True)
-                for comm_id, comm_nodes in enumerate(comms):
-                    self._community_sizes[comm_id] = len(comm_nodes)
-                    for nid in comm_nodes:
-                        self._communities[nid] = comm_id
-            except Exception as e:
-                print(f"⚠️  Community detection failed: {e}")
-        
-        # Mark isolated nodes as community -1
-        for nid in node_ids:
-            if nid not in self._communities:
-                self._communities[nid] = -1
-        
+        t_lpa = time.time()
+        labels, sweeps = label_propagation((A + A.T).tocsr())
+        t_lpa = time.time() - t_lpa
+        self._set_communities(ids, labels)
+
         self._computed_at = time.time()
-        self._node_count = len(node_ids)
+        self._node_count = n
+        self._last_run = {
+            "pagerank_iterations": pr_iter, "pagerank_ms": round(t_pr * 1000, 1),
+            "warm_start": x0 is not None,
+            "lpa_sweeps": sweeps, "lpa_ms": round(t_lpa * 1000, 1),
+        }
         elapsed = time.time() - start
         print(f"📊 Graph metrics computed in {elapsed:.2f}s: "
-              f"{len(self._pagerank)} PR scores, "
-              f"{len(self._community_sizes)} communities")
-    
+              f"{len(self._pagerank)} PR scores ({pr_iter} iterations{', warm' if x0 is not None else ''}), "
+              f"{len(self._community_sizes)} communities ({sweeps} LPA sweeps)")
+
+    def _set_communities(self, ids: np.ndarray, labels: np.ndarray):
+        """Relabel communities by size (0 = largest); -1 stays isolated."""
+        self._communities = {}
+        self._community_sizes = {}
+        grouped = labels[labels >= 0]
+        if len(grouped):
+            uniq, counts = np.unique(grouped, return_counts=True)
+            by_size = uniq[np.lexsort((uniq, -counts))]
+            remap = {int(old): new for new, old in enumerate(by_size)}
+            self._community_sizes = {remap[int(u)]: int(c) for u, c in zip(uniq, counts)}
+        else:
+            remap = {}
+        for nid, label in zip(ids.tolist(), labels.tolist()):
+            self._communities[nid] = remap[label] if label >= 0 else -1
+
+    @staticmethod
+    def _connect(db_path: str = None):
+        if db_path is None:
+            from database import DB_PATH as db_path
+        return sqlite3.connect(db_path)
+
+    def save(self, db_path: str = None) -> int:
+        """Persist scores and communities (replaces the previous run). Returns rows written."""
+        now = datetime.now().isoformat()
+        conn = self._connect(db_path)
+        conn.execute(SCHEMA)
+        conn.execute("DELETE FROM graph_metrics")
+        conn.executemany(
+            "INSERT INTO graph_metrics (node_id, pagerank, community, computed_at) VALUES (?, ?, ?, ?)",
+            [(nid, pr, self._communities.get(nid, -1), now) for nid, pr in self._pagerank.items()])
+        conn.commit()
+        conn.close()
+        return len(self._pagerank)
+
+    def load(self, db_path: str = None) -> bool:
+        """Load persisted metrics. Returns False when nothing is stored yet."""
+        try:
+            conn = self._connect(db_path)
+            rows = conn.execute("SELECT node_id, pagerank, community FROM graph_metrics").fetchall()
+            conn.close()
+        except sqlite3.OperationalError:
+            return False  # table not created yet (sleep-compute never ran)
+        if not rows:
+            return False
+        ids = np.array([r[0] for r in rows], dtype=np.int64)
+        self._pagerank = {r[0]: r[1] for r in rows}
+        self._set_communities(ids, np.array([r[2] for r in rows], dtype=np.int64))
+        self._computed_at = time.time()
+        self._node_count = len(rows)
+        self._last_run = {"loaded": True}
+        print(f"📊 Loaded graph metrics: {len(rows)} PR scores, {len(self._community_sizes)} communities")
+        return True
+
     def get_pagerank(self, node_id: int) -> float:
         """Get normalized PageRank score (0-1) for a node."""
         return self._pagerank.get(node_id, 0.0)
-    
+
     def get_pagerank_boost(self, node_id: int) -> float:
         """
         Get multiplicative PageRank boost for search scoring.
@@ -89,11 +266,11 @@ class GraphMetrics:
         """
         pr = self.get_pagerank(node_id)
         return 1.0 + PAGERANK_BOOST * pr
-    
+
     def get_community(self, node_id: int) -> int:
         """Get community ID for a node. -1 = isolated."""
         return self._communities.get(node_id, -1)
-    
+
     def get_stats(self) -> Dict:
         """Get summary statistics for neural_stats tool."""
         return {
@@ -106,8 +283,9 @@ class GraphMetrics:
                 self._community_sizes.items(), key=lambda x: -x[1]
             )[:10]),
             "isolated_nodes": sum(1 for v in self._communities.values() if v == -1),
+            "last_run": self._last_run,
         }
-    
+
     @property
     def is_computed(self) -> bool:
         return self._computed_at > 0
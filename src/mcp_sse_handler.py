@@ -11,10 +11,16 @@ import hmac
 import os
 
 from database import get_stats, get_node, delete_node as db_delete_node, update_node as db_update_node, get_note_history, restore_note_version
-from graph_engine import add_note_with_links
+from graph_engine import add_note_with_links, add_notes_with_links, ADD_NOTES_MAX_BATCH
 from websocket_events import broadcast_note_added, broadcast_note_updated, broadcast_note_deleted, broadcast_search
 from graph_engine import search_with_activation, get_node_graph, search_with_activation_protected, find_similar_notes
 from stable_embeddings import get_model
+from ann_index import get_ann_index
+from graph_cache import get_graph_cache
+from entity_graph import get_entity_graph
+from spreading import ACTIVATION_MODES
+from neighborhood import get_neighborhood, NEIGHBORHOOD_MAX_HOPS, NEIGHBORHOOD_FANOUT, NEIGHBORHOOD_MAX_NODES
+from paths import find_paths, PATH_MAX_DEPTH, PATH_DEPTH_LIMIT, PATH_MAX_K, PATH_MODES
 
 # Authentication - use environment variable
 API_KEY = os.getenv("NEURAL_API_KEY", "change_me_in_production")
@@ -71,7 +77,9 @@ def get_tools_list():
                     "time_before": {"type": "string", "description": "Optional: only return notes created before this datetime (ISO format: '2026-02-01T00:00:00')"},
                     "entity_type": {"type": "string", "description": "Optional: only return notes containing entities of this type (e.g., 'person', 'organization', 'concept', 'location', 'tech')"},
                     "max_results": {"type": "integer", "default": 10, "minimum": 1, "maximum": 50, "description": "Hard limit on results (prevents context overflow)"},
-                    "detail_mode": {"type": "string", "enum": ["brief", "full"], "default": "full", "description": "brief: first line + metadata, full: complete content"}
+                    "detail_mode": {"type": "string", "enum": ["brief", "full"], "default": "full", "description": "brief: first line + metadata, full: complete content"},
+                    "activation_mode": {"type": "string", "enum": ["spreading", "ppr", "diffusion", "community"], "description": "Optional: spreading (iterative spreading activation), ppr (Personalized PageRank seeded from semantic + keyword matches), diffusion (precomputed spreading vectors from sleep_compute, fastest) or community (spreading inside the matches' communities plus a few bridge edges). Default from server config"},
+                    "epsilon": {"type": "number", "description": "Optional: convergence tolerance for the activation mode (ppr residual tolerance, e.g. 1e-4; smaller = more thorough, slower)"}
                 },
                 "required": ["query"]
             }
@@ -93,6 +101,43 @@ def get_tools_list():
                 "required": ["content"]
             }
         },
+        {
+            "name": "add_notes",
+            "description": "Add many notes in one call: batched embedding, one database transaction. Duplicates are checked against existing notes and within the batch. Returns a line per note.",
+            "inputSchema": {
+                "type": "object",
+                "properties": {
+                    "notes": {
+                        "type": "array",
+                        "description": "Notes to add (same fields as add_note)",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "content": {"type": "string"},
+                                "category": {"type": "string", "default": "general"},
+                                "importance": {"type": "string", "enum": ["critical", "normal", "low"], "default": "normal"},
+                                "force": {"type": "boolean", "default": False},
+                                "emotional_tone": {"type": "string"},
+                                "emotional_intensity": {"type": "integer", "default": 5, "minimum": 0, "maximum": 10},
+                                "emotional_reflection": {"type": "string"}
+                            },
+                            "required": ["content"]
+                        }
+                    }
+                },
+                "required": ["notes"]
+            }
+        },
+        {
+            "name": "enrichment_status",
+            "description": "Background enrichment (ENRICHMENT_MODE=async): status of one note's entity/temporal extraction and linking, or queue depth, workers and failures when note_id is omitted.",
+            "inputSchema": {
+                "type": "object",
+                "properties": {
+                    "note_id": {"type": "integer", "description": "Note to check (omit for queue stats)"}
+                }
+            }
+        },
         {
             "name": "update_note",
             "description": "Update existing note by ID",
@@ -129,6 +174,38 @@ def get_tools_list():
                 "required": ["note_id"]
             }
         },
+        {
+            "name": "get_neighborhood",
+            "description": "Get the k-hop neighbourhood of a note: connected notes (previews) and the edges between them, strongest edges first. Filter by edge type and weight, cap fan-out per hop.",
+            "inputSchema": {
+                "type": "object",
+                "properties": {
+                    "note_id": {"type": "integer", "description": "Centre note ID"},
+                    "hops": {"type": "integer", "default": 1, "description": f"Depth, 1-{NEIGHBORHOOD_MAX_HOPS}"},
+                    "edge_types": {"type": "array", "items": {"type": "string"}, "description": "Optional: only follow these edge types (e.g. semantic, entity, temporal_chain)"},
+                    "min_weight": {"type": "number", "default": 0.0, "description": "Optional: only follow edges with at least this weight"},
+                    "fanout": {"type": "integer", "description": f"Optional: max edges expanded per note per hop (default {NEIGHBORHOOD_FANOUT})"},
+                    "max_nodes": {"type": "integer", "description": f"Optional: max notes returned (default {NEIGHBORHOOD_MAX_NODES})"}
+                },
+                "required": ["note_id"]
+            }
+        },
+        {
+            "name": "find_path",
+            "description": "Explain how two notes are connected: the top-k distinct paths between them in the graph, with edge types and weights. 'strongest' maximizes the product of edge weights, 'shortest' minimizes hops.",
+            "inputSchema": {
+                "type": "object",
+                "properties": {
+                    "source_id": {"type": "integer", "description": "Start note ID"},
+                    "target_id": {"type": "integer", "description": "End note ID"},
+                    "k": {"type": "integer", "default": 3, "description": f"Number of paths, 1-{PATH_MAX_K}"},
+                    "mode": {"type": "string", "enum": list(PATH_MODES), "default": "strongest", "description": "strongest (max weight product) or shortest (fewest hops)"},
+                    "max_depth": {"type": "integer", "default": PATH_MAX_DEPTH, "description": f"Max hops per path, 1-{PATH_DEPTH_LIMIT}"},
+                    "edge_types": {"type": "array", "items": {"type": "string"}, "description": "Optional: only follow these edge types (e.g. semantic, entity, temporal_chain)"}
+                },
+                "required": ["source_id", "target_id"]
+            }
+        },
         {
             "name": "set_importance",
             "description": "Set importance level for a note: 'critical' (2x boost), 'normal', or 'low' (0.5x)",
@@ -214,7 +291,9 @@ def handle_tool_call(params):
             args.get("category", None),
             args.get("time_after", None),
             args.get("time_before", None),
-            args.get("entity_type", None)
+            args.get("entity_type", None),
+            args.get("activation_mode", None),
+            args.get("epsilon", None)
         )
     elif tool_name == "add_note":
         return tool_add_note(
@@ -226,6 +305,10 @@ def handle_tool_call(params):
             args.get("emotional_intensity", 5),
             args.get("emotional_reflection", None)
         )
+    elif tool_name == "add_notes":
+        return tool_add_notes(args.get("notes", []))
+    elif tool_name == "enrichment_status":
+        return tool_enrichment_status(args.get("note_id"))
     elif tool_name == "update_note":
         return tool_update_note(args.get("note_id"), args.get("content"), args.get("category"))
     elif tool_name == "delete_note":
@@ -234,6 +317,24 @@ def handle_tool_call(params):
         return tool_stats()
     elif tool_name == "get_graph":
         return tool_get_graph(args.get("note_id"))
+    elif tool_name == "get_neighborhood":
+        return tool_get_neighborhood(
+            args.get("note_id"),
+            args.get("hops", 1),
+            args.get("edge_types", None),
+            args.get("min_weight", 0.0),
+            args.get("fanout", None),
+            args.get("max_nodes", None)
+        )
+    elif tool_name == "find_path":
+        return tool_find_path(
+            args.get("source_id"),
+            args.get("target_id"),
+            args.get("k", 3),
+            args.get("mode", "strongest"),
+            args.get("max_depth", PATH_MAX_DEPTH),
+            args.get("edge_types", None)
+        )
     elif tool_name == "set_importance":
         return tool_set_importance(args.get("note_id"), args.get("importance"))
     elif tool_name == "find_similar":
@@ -252,8 +353,12 @@ def handle_tool_call(params):
 
 
 def tool_search_memory(query: str, limit: int, max_results: int = 10, detail_mode: str = "full", category: str = None, 
-                      time_after: str = None, time_before: str = None, entity_type: str = None):
+                      time_after: str = None, time_before: str = None, entity_type: str = None,
+                      activation_mode: str = None, epsilon: float = None):
     """Search with spreading activation and optional filters (category, time range, entity type)"""
+    if activation_mode and activation_mode not in ACTIVATION_MODES:
+        return {"error": {"code": -32602, "message": f"activation_mode must be one of: {', '.join(ACTIVATION_MODES)}"}}
+    
     response = search_with_activation_protected(
         query=query,
         limit=limit,
@@ -262,7 +367,9 @@ def tool_search_memory(query: str, limit: int, max_results: int = 10, detail_mod
         category_filter=category,
         time_after=time_after,
         time_before=time_before,
-        entity_type_filter=entity_type
+        entity_type_filter=entity_type,
+        activation_mode=activation_mode,
+        epsilon=epsilon
     )
     
     results = response["results"]
@@ -317,6 +424,7 @@ def tool_search_memory(query: str, limit: int, max_results: int = 10, detail_mod
         
         text += f"\n📊 Context Window Protection:\n"
         text += f"- Detail mode: {metadata['detail_mode']}\n"
+        text += f"- Activation mode: {metadata['activation_mode']}\n"
         text += f"- Results returned: {metadata['returned']}\n"
         text += f"- Total activated: {metadata['total_activated']}\n"
         text += f"- Estimated tokens: ~{metadata['estimated_tokens']}\n"
@@ -350,9 +458,12 @@ def tool_add_note(content: str, category: str, importance: str = "normal", force
     if emotional_tone:
         text += f"Emotional tone: {emotional_tone}\n"
         text += f"Intensity: {emotional_intensity}/10\n"
-    text += f"Entities found: {result['entities']}\n"
-    text += f"Entity links created: {result['entity_links']}\n"
-    text += f"Semantic links created: {result['semantic_links']}"
+    if result.get("enrichment") == "pending":
+        text += "⏳ Entities and links are being added in the background (see enrichment_status)"
+    else:
+        text += f"Entities found: {result['entities']}\n"
+        text += f"Entity links created: {result['entity_links']}\n"
+        text += f"Semantic links created: {result['semantic_links']}"
     
     # Broadcast to graph viewer
     broadcast_note_added(result['node_id'], category, importance, content[:200], result['entities'], result['entity_links'])
@@ -366,6 +477,55 @@ def tool_add_note(content: str, category: str, importance: str = "normal", force
     return {"content": [{"type": "text", "text": text}]}
 
 
+def tool_enrichment_status(note_id=None):
+    """Enrichment status of a note, or of the queue"""
+    from enrichment import get_enrichment_workers
+    from database import get_enrichment_status
+    if note_id is not None:
+        status = get_enrichment_status(note_id)
+        text = f"Note #{note_id}: {status['status']}"
+        if status.get("error"):
+            text += f" after {status['attempts']} attempts — {status['error']}"
+        return {"content": [{"type": "text", "text": text}]}
+    
+    stats = get_enrichment_workers().get_stats()
+    text = f"🧵 Enrichment ({stats['mode']} mode)\n"
+    text += f"Pending: {stats['pending']} (max {stats['max_pending'] or 'unbounded'}), running: {stats['running']}, failed: {stats['failed']}\n"
+    text += f"Oldest pending: {stats['oldest_pending_sec']}s\n"
+    text += f"Workers: {stats['workers']}, processed since start: {stats['processed']}, failures: {stats['failures']}"
+    return {"content": [{"type": "text", "text": text}]}
+
+
+def tool_add_notes(notes: list):
+    """Add a batch of notes (one encode, one transaction)"""
+    if not notes or not isinstance(notes, list):
+        return {"error": {"code": -32602, "message": "notes required"}}
+    if len(notes) > ADD_NOTES_MAX_BATCH:
+        return {"error": {"code": -32602, "message": f"At most {ADD_NOTES_MAX_BATCH} notes per call"}}
+    
+    batch = add_notes_with_links(notes)
+    
+    lines = [f"✅ Added {batch['added']}/{len(notes)} notes in {batch['seconds']}s ({batch['notes_per_sec']} notes/s)"
+             f", {batch['duplicates']} duplicates, {batch['errors']} invalid"]
+    for result in batch["results"]:
+        i = result["index"]
+        if result.get("error") == "duplicate":
+            existing = f"#{result['existing_id']}" if "existing_id" in result else f"batch item {result['existing_index']}"
+            lines.append(f"[{i}] ⚠️ {result['message']} — {existing} (use force=true to add anyway)")
+        elif "error" in result:
+            lines.append(f"[{i}] ❌ {result['message']}")
+        else:
+            note = notes[i]
+            lines.append(f"[{i}] #{result['node_id']}: {len(result['entities'])} entities, "
+                         f"{result['entity_links']} entity links, {result['semantic_links']} semantic links"
+                         + (f", similar to {', '.join('#' + str(s['id']) for s in result['similar_notes'])}"
+                            if "warning" in result else ""))
+            broadcast_note_added(result['node_id'], note.get("category", "general"), note.get("importance", "normal"),
+                                 note["content"][:200], result['entities'], result['entity_links'])
+    
+    return {"content": [{"type": "text", "text": "\n".join(lines)}]}
+
+
 def tool_update_note(note_id: int, content: str, category: str = None):
     """Update existing note"""
     if not note_id or not content:
@@ -378,6 +538,7 @@ def tool_update_note(note_id: int, content: str, category: str = None):
     model = get_model()
     embedding = model.encode(content)[0]
     db_update_node(note_id, content, category, embedding.tobytes())
+    get_ann_index().add_vector(note_id, embedding)
     
     broadcast_note_updated(note_id, category or existing["category"], content[:200])
     return {"content": [{"type": "text", "text": f"✅ Updated note #{note_id}"}]}
@@ -392,6 +553,9 @@ def tool_delete_note(note_id: int):
     if not deleted:
         return {"error": {"code": -32602, "message": f"Note #{note_id} not found"}}
     
+    get_ann_index().remove_vector(note_id)
+    get_graph_cache().remove_node(note_id)
+    get_entity_graph().remove_node(note_id)
     broadcast_note_deleted(note_id)
     text = f"✅ Deleted note #{note_id}\nWas: [{deleted['category']}] {deleted['content'][:100]}..."
     return {"content": [{"type": "text", "text": text}]}
@@ -452,6 +616,82 @@ def tool_get_graph(note_id: int):
     
     for conn in graph['connections']:
         text += f"  → [{conn['type']}] (weight: {conn['weight']:.2f}) #{conn['id']}: {conn['content']}\n"
+    if graph.get('truncated'):
+        text += "  … strongest connections only (use get_neighborhood with a larger fanout for more)\n"
+    
+    return {"content": [{"type": "text", "text": text}]}
+
+
+def tool_get_neighborhood(note_id: int, hops: int = 1, edge_types: list = None, min_weight: float = 0.0,
+                          fanout: int = None, max_nodes: int = None):
+    """Get k-hop neighbourhood of a note"""
+    if not note_id:
+        return {"error": {"code": -32602, "message": "Note ID required"}}
+    if not isinstance(hops, int) or not 1 <= hops <= NEIGHBORHOOD_MAX_HOPS:
+        return {"error": {"code": -32602, "message": f"hops must be between 1 and {NEIGHBORHOOD_MAX_HOPS}"}}
+    
+    hood = get_neighborhood(note_id, hops=hops, edge_types=edge_types, min_weight=min_weight,
+                            fanout=fanout, max_nodes=max_nodes)
+    if "error" in hood:
+        return {"error": {"code": -32602, "message": hood["error"]}}
+    
+    center = hood["nodes"][0]
+    text = f"🕸️ Neighbourhood of note #{note_id} ({hops} hop{'s' if hops > 1 else ''}): "
+    text += f"{len(hood['nodes']) - 1} notes, {len(hood['edges'])} edges"
+    text += " (truncated by fan-out/max_nodes caps)\n\n" if hood["truncated"] else "\n\n"
+    text += f"Centre [{center['category']}]: {center['preview'][:100]}\n"
+    
+    # Strongest edge reaching each note from the previous hop
+    hop_of = {n["id"]: n["hop"] for n in hood["nodes"]}
+    via = {}
+    for e in hood["edges"]:
+        for a, b in ((e["source"], e["target"]), (e["target"], e["source"])):
+            if hop_of[b] == hop_of[a] + 1 and e["weight"] > via.get(b, (None, -1.0, None))[1]:
+                via[b] = (a, e["weight"], e["type"])
+    
+    for hop in range(1, hops + 1):
+        level = [n for n in hood["nodes"] if n["hop"] == hop]
+        if not level:
+            break
+        text += f"\nHop {hop} ({len(level)}):\n"
+        for n in level:
+            parent, weight, etype = via.get(n["id"], (None, 0.0, "?"))
+            text += f"  → [{etype}] (weight: {weight:.2f}) #{n['id']} via #{parent} [{n['category']}]: {n['preview'][:100]}\n"
+    
+    return {"content": [{"type": "text", "text": text}]}
+
+
+def tool_find_path(source_id: int, target_id: int, k: int = 3, mode: str = "strongest",
+                   max_depth: int = PATH_MAX_DEPTH, edge_types: list = None):
+    """Find top-k paths between two notes"""
+    if not source_id or not target_id:
+        return {"error": {"code": -32602, "message": "source_id and target_id required"}}
+    if mode not in PATH_MODES:
+        return {"error": {"code": -32602, "message": f"mode must be one of: {', '.join(PATH_MODES)}"}}
+    if not isinstance(max_depth, int) or not 1 <= max_depth <= PATH_DEPTH_LIMIT:
+        return {"error": {"code": -32602, "message": f"max_depth must be between 1 and {PATH_DEPTH_LIMIT}"}}
+    if not isinstance(k, int) or not 1 <= k <= PATH_MAX_K:
+        return {"error": {"code": -32602, "message": f"k must be between 1 and {PATH_MAX_K}"}}
+    
+    result = find_paths(source_id, target_id, k=k, mode=mode, max_depth=max_depth, edge_types=edge_types)
+    if "error" in result:
+        return {"error": {"code": -32602, "message": result["error"]}}
+    
+    notes = result["notes"]
+    text = f"🧭 Paths from #{source_id} to #{target_id} ({mode}, max {max_depth} hops): "
+    text += f"{len(result['paths'])} found in {result['stats']['ms']:.1f}ms\n"
+    text += f"  From: {notes[source_id]['preview'][:100]}\n"
+    text += f"  To:   {notes[target_id]['preview'][:100]}\n"
+    if not result["paths"]:
+        text += "\nNo connection within the depth bound.\n"
+    for i, path in enumerate(result["paths"], 1):
+        text += f"\nPath {i} ({path['hops']} hop{'s' if path['hops'] > 1 else ''}, strength {path['strength']:.3f}):\n"
+        text += f"  #{source_id}\n"
+        for e in path["edges"]:
+            preview = notes.get(e["target"], {}).get("preview", "")[:80]
+            text += f"  → [{e['type']}] ({e['weight']:.2f}) #{e['target']}: {preview}\n"
+    if result["stats"]["budget_hit"]:
+        text += "\n⚠️ Search budget reached — results may be incomplete\n"
     
     return {"content": [{"type": "text", "text": text}]}
 
@@ -594,6 +834,13 @@ def tool_search_stats():
             lines.append(f"  Temporal: {p['temporal']}ms")
             lines.append(f"  Rerank: {p['rerank']}ms")
         
+        if stats.get("spreading"):
+            s = stats["spreading"]
+            lines.append(f"\n🕸️ Spreading work:")
+            lines.append(f"  Nodes touched: avg {s['avg_nodes_touched']}, max {s['max_nodes_touched']}")
+            lines.append(f"  Edges expanded: avg {s['avg_edges_expanded']}, max {s['max_edges_expanded']}")
+            lines.append(f"  Iterations: avg {s['avg_iterations']}")
+        
         if stats.get("recent_zero_results"):
             lines.append(f"\n⚠️ Recent zero-result queries:")
             for zr in stats["recent_zero_results"][:5]:
@@ -637,12 +884,43 @@ def tool_sleep_compute(dry_run=False):
         if 'error' not in d:
             lines.append(f"⏳ Decay: {d.get('stale_edges', 0)} stale edges {'(would decay)' if dry_run else 'decayed'}")
         
+        sp = results.get('sparsify', {})
+        if 'error' not in sp and not sp.get('disabled'):
+            b, a = sp.get('before', {}), sp.get('after', {})
+            lines.append(f"✂️ Sparsify: {sp.get('removed', 0)} edges {'would be ' if dry_run else ''}archived, "
+                         f"degree avg {b.get('avg_degree')} → {a.get('avg_degree')}, max {b.get('max_degree')} → {a.get('max_degree')}")
+            if 'p50_ms' in b:
+                lines.append(f"   spreading p50 {b['p50_ms']}ms → {a['p50_ms']}ms, edges expanded {b['edges_expanded']} → {a['edges_expanded']}, "
+                             f"hops {b['iterations']:g} → {a['iterations']:g}")
+        
         dup = results.get('duplicates', {})
         if 'error' not in dup:
-            lines.append(f"🔄 Duplicates: {dup.get('duplicates', 0)} near-duplicates found")
+            lines.append(f"🔄 Duplicates: {dup.get('exact_duplicates', 0)} exact, {dup.get('duplicates', 0)} near-duplicates found")
+            for group in dup.get('exact_groups', [])[:5]:
+                lines.append(f"   #{group[0]} = " + ", ".join(f"#{nid}" for nid in group[1:]))
             for a, b, sim in dup.get('pairs', [])[:5]:
                 lines.append(f"   #{a} ↔ #{b} ({sim:.3f})")
         
+        dif = results.get('diffusion', {})
+        if 'error' not in dif:
+            n = dif.get('dirty', 0) if dry_run else dif.get('computed', 0)
+            lines.append(f"🌊 Diffusion vectors: {n}/{dif.get('nodes', 0)} {'would be ' if dry_run else ''}recomputed, {dif.get('removed', 0)} dropped")
+            r = dif.get('ranking', {})
+            if r.get('queries'):
+                lines.append(f"   vs live spreading: overlap@{r['k']} {r['overlap_at_k']:.2f} (unbounded {r['overlap_exact']:.2f}), top-1 agreement {r['top1_agreement']:.2f}, kendall tau {r['kendall_tau']}")
+        else:
+            lines.append(f"🌊 Diffusion vectors: ERROR — {dif['error']}")
+        
+        # Consolidation/decay/sparsification rewrote edges in the DB: bring the in-memory cache back in line
+        if not dry_run:
+            r = get_graph_cache().reconcile()
+            lines.append(f"🔗 Graph cache: {r['drift']} drifted entries ({r['missing']} missing, {r['extra']} extra, "
+                         f"{r['weight_mismatch']} weight){' — rebuilt from edges table' if r['healed'] else ''}")
+            # PageRank boosts and communities (activation_mode=community) come from the table just rewritten
+            if 'error' not in results.get('pagerank', {}):
+                from graph_metrics import get_graph_metrics
+                get_graph_metrics().load(db_path)
+        
         return {"content": [{"type": "text", "text": "\n".join(lines)}]}
     except Exception as e:
         return {"content": [{"type": "text", "text": f"❌ Sleep compute error: {e}"}]}
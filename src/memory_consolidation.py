@@ -141,16 +141,25 @@ class MemoryConsolidator:
         cursor = conn.cursor()
         created = 0
         
+        # Pairs archived by sparsification stay archived (restore_edges brings them back)
+        try:
+            archived = set(cursor.execute(
+                "SELECT source_id, target_id FROM edges_archive WHERE edge_type = 'consolidation'"))
+        except sqlite3.OperationalError:
+            archived = set()
+        
         # Create cluster links (all-to-all within cluster)
         for cluster in clusters:
             for i, node1 in enumerate(cluster):
                 for node2 in cluster[i+1:]:
+                    if (min(node1, node2), max(node1, node2)) in archived:
+                        continue
                     try:
                         cursor.execute("""
                             INSERT OR IGNORE INTO edges 
                             (source_id, target_id, edge_type, weight, created_at)
                             VALUES (?, ?, 'consolidation', 0.9, ?)
-                        """, (node1, node2, datetime.now().isoformat()))
+                        """, (min(node1, node2), max(node1, node2), datetime.now().isoformat()))
                         created += cursor.rowcount
                     except:
                         pass
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+k-hop neighbourhood of a note, walked on the in-memory graph cache.
+
+Breadth-first from the centre node: at each hop every frontier node
+expands at most `fanout` of its strongest matching edges (edge-type and
+minimum-weight filters applied on the CSR row), and the walk stops once
+`max_nodes` nodes are collected. Node previews for everything returned
+come from a single batched query — no embedding BLOBs, no per-node
+round trips.
+
+Used by the get_neighborhood MCP tool, GET /api/node/<id>/neighborhood
+and get_node_graph.
+"""
+import os
+from typing import Dict, Iterable, List, Optional, Union
+
+NEIGHBORHOOD_MAX_HOPS = int(os.getenv("NEIGHBORHOOD_MAX_HOPS", "3"))
+NEIGHBORHOOD_FANOUT = int(os.getenv("NEIGHBORHOOD_FANOUT", "25"))  # per node per hop, 0 = unlimited
+NEIGHBORHOOD_MAX_NODES = int(os.getenv("NEIGHBORHOOD_MAX_NODES", "500"))
+PREVIEW_CHARS = 200
+
+
+def get_neighborhood(node_id: int, hops: int = 1, edge_types: Optional[Iterable[str]] = None,
+                     min_weight: float = 0.0, fanout: Union[int, List[int], None] = None,
+                     max_nodes: int = None, graph_cache=None) -> dict:
+    """
+    k-hop subgraph around node_id.
+
+    Args:
+        node_id: Centre node
+        hops: Depth (1..NEIGHBORHOOD_MAX_HOPS)
+        edge_types: Only follow these edge types (None = all)
+        min_weight: Only follow edges with at least this weight
+        fanout: Max edges expanded per node at each hop — an int for every
+                hop or a list with one cap per hop (default NEIGHBORHOOD_FANOUT)
+        max_nodes: Stop collecting after this many nodes (default NEIGHBORHOOD_MAX_NODES)
+        graph_cache: GraphCache to walk (default: global cache)
+
+    Returns:
+        {"center", "nodes": [{id, hop, category, importance, timestamp, preview, full_length}],
+         "edges": [{source, target, weight, type}], "hops", "truncated"}
+        or {"error": ...} when the node does not exist
+    """
+    from database import get_node_previews
+    if graph_cache is None:
+        from graph_cache import get_graph_cache
+        graph_cache = get_graph_cache()
+
+    hops = max(1, min(int(hops), NEIGHBORHOOD_MAX_HOPS))
+    max_nodes = NEIGHBORHOOD_MAX_NODES if max_nodes is None else max_nodes
+    if fanout is None:
+        fanout = NEIGHBORHOOD_FANOUT
+    caps = list(fanout) if isinstance(fanout, (list, tuple)) else [fanout] * hops
+    caps += [caps[-1] if caps else NEIGHBORHOOD_FANOUT] * (hops - len(caps))
+    type_filter = set(edge_types) if edge_types else None
+
+    hop_of: Dict[int, int] = {node_id: 0}
+    edges = {}
+    frontier = [node_id]
+    truncated = False
+    for hop in range(1, hops + 1):
+        next_frontier = []
+        for u in frontier:
+            cap = caps[hop - 1]
+            neighbors = graph_cache.top_neighbors(u, limit=cap + 1 if cap else 0, edge_types=type_filter,
+                                                  min_weight=min_weight)
+            if cap and len(neighbors) > cap:
+                neighbors = neighbors[:cap]
+                truncated = True
+            for v, weight, edge_type in neighbors:
+                if v not in hop_of:
+                    if len(hop_of) >= max_nodes:
+                        truncated = True
+                        continue
+                    hop_of[v] = hop
+                    next_frontier.append(v)
+                key = (min(u, v), max(u, v), edge_type)
+                if weight > edges.get(key, -1.0):
+                    edges[key] = weight
+        frontier = next_frontier
+        if not frontier:
+            break
+
+    previews = get_node_previews(hop_of.keys(), PREVIEW_CHARS)
+    if node_id not in previews:
+        return {"error": "Node not found"}
+
+    nodes = []
+    for nid, hop in sorted(hop_of.items(), key=lambda x: (x[1], x[0])):
+        p = previews.get(nid)
+        if p is None:
+            continue  # deleted since the cache saw it
+        nodes.append({"id": nid, "hop": hop, **{k: v for k, v in p.items() if k != "id"}})
+    present = {n["id"] for n in nodes}
+    return {
+        "center": node_id,
+        "nodes": nodes,
+        "edges": [{"source": s, "target": t, "weight": w, "type": et}
+                  for (s, t, et), w in edges.items() if s in present and t in present],
+        "hops": hops,
+        "truncated": truncated,
+    }
@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+"""
+Explanation paths between two notes over the in-memory graph cache.
+
+find_paths answers "how are A and B related" with the top-k loopless
+paths of at most max_depth hops:
+
+- mode="strongest": maximize the product of edge weights
+  (edge cost -log w, so the best path has the smallest summed cost)
+- mode="shortest": fewest hops, ties broken by the weight product
+
+Each path is found by bidirectional Dijkstra from both ends at once with
+hop-aware labels: a node keeps every (hops, cost) label not dominated by
+another one with fewer-or-equal hops and lower-or-equal cost, so the
+hop bound never hides a cheaper short path behind a cheaper long one.
+Each side follows only the PATH_FANOUT strongest edges of the note it
+expands, explored lazily in order, so hubs stay cheap. The cap makes
+the search a heuristic (an edge that is weak for the note on the nearer
+side may be skipped); PATH_FANOUT=0 searches every edge exactly. Alternatives come from Yen's
+algorithm (spur paths with root nodes and used edges banned). SQLite is
+only touched once, for previews of the notes on the returned paths.
+
+Used by the find_path MCP tool and GET /api/path.
+"""
+import heapq
+import math
+import os
+import time
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+import numpy as np
+
+PATH_MAX_DEPTH = int(os.getenv("PATH_MAX_DEPTH", "4"))  # default hop bound
+PATH_DEPTH_LIMIT = 6  # hard ceiling for max_depth
+PATH_MAX_K = 10
+PATH_FANOUT = int(os.getenv("PATH_FANOUT", "16"))  # strongest edges considered per node, 0 = all
+PATH_MAX_EXPANSIONS = int(os.getenv("PATH_MAX_EXPANSIONS", "200000"))  # settled labels per find_paths call
+PATH_MODES = ("strongest", "shortest")
+HOP_COST = 1000.0  # shortest mode: one hop outweighs any -log(w) sum within PATH_DEPTH_LIMIT hops
+PREVIEW_CHARS = 120
+MIN_WEIGHT = 1e-6  # weights are clamped to [MIN_WEIGHT, 1] before taking -log
+
+
+def _edge_key(u: int, v: int, edge_type: str) -> Tuple[int, int, str]:
+    return (u, v, edge_type) if u <= v else (v, u, edge_type)
+
+
+class _Search:
+    """Shared state for one find_paths call: neighbor cache, cost model, work budget."""
+
+    def __init__(self, graph_cache, mode: str, edge_types: Optional[Set[str]], min_weight: float,
+                 fanout: int, max_expansions: int):
+        self.graph = graph_cache
+        self.edge_types = edge_types
+        self.min_weight = min_weight
+        self.fanout = fanout
+        self.shortest = mode == "shortest"
+        self.max_expansions = max_expansions
+        self.expanded = 0
+        self.budget_hit = False
+        self._neighbors: Dict[int, tuple] = {}
+
+    def neighbors(self, node_id: int) -> tuple:
+        """(ids, costs, weights, type codes) lists of the node's strongest edges, cheapest first — cached per call."""
+        entry = self._neighbors.get(node_id)
+        if entry is None:
+            ids, weights, codes = self.graph.neighbor_arrays(node_id, self.edge_types, self.min_weight,
+                                                             self.fanout)
+            keep = (weights > 0) & (ids != node_id)
+            ids, weights, codes = ids[keep], weights[keep], codes[keep]
+            costs = -np.log(np.clip(weights.astype(np.float64), MIN_WEIGHT, 1.0))
+            if self.shortest:
+                costs += HOP_COST
+            entry = (ids.tolist(), costs.tolist(), weights.tolist(), codes.tolist())
+            self._neighbors[node_id] = entry
+        return entry
+
+    def best_path(self, source: int, target: int, max_depth: int,
+                  banned_nodes: Set[int] = frozenset(), banned_edges: Set[tuple] = frozenset()):
+        """
+        Cheapest source→target path with at most max_depth hops.
+
+        Neighbor lists are sorted cheapest first, so a settled label only
+        queues its next unexplored edge (the sibling is queued when that
+        one is popped): a hub costs one heap entry per edge actually
+        explored, not one per neighbour. Both sides meet either on a node
+        or across an edge, checked whenever a label settles.
+
+        Returns:
+            (cost, [(node, weight_in, type_in), ...]) or None. The first entry has weight_in None.
+        """
+        if source == target:
+            return 0.0, [(source, None, None)]
+        if max_depth <= 0 or source in banned_nodes or target in banned_nodes:
+            return None
+
+        names = self.graph.edge_types
+        # Label: (node, hops, cost, parent_label, weight, type_code); index 0 is the side's root
+        labels = ([(source, 0, 0.0, -1, None, None)], [(target, 0, 0.0, -1, None, None)])
+        at_node = ({}, {})  # node → label ids (Pareto set over (hops, cost))
+        heaps = ([], [])  # (cost, parent_label, neighbor index)
+        best = [math.inf, None, None, None]  # cost, forward label, backward label, bridge (weight, code)
+
+        def meet(side, lid, node, hops, cost, v, edge_cost, w, code):
+            """Combine label lid (at node) with the other side's labels at v (node itself when v is node)."""
+            other = 1 - side
+            bridge_hops = 0 if v == node else 1
+            for oid in at_node[other].get(v, ()):
+                _, oh, oc, _, _, _ = labels[other][oid]
+                total = cost + edge_cost + oc
+                if hops + oh + bridge_hops <= max_depth and total < best[0]:
+                    bridge = None if v == node else (w, code)
+                    best[:] = [total, lid, oid, bridge] if side == 0 else [total, oid, lid, bridge]
+
+        def settle(side, lid):
+            node, hops, cost, _, _, _ = labels[side][lid]
+            at_node[side].setdefault(node, []).append(lid)
+            self.expanded += 1
+            meet(side, lid, node, hops, cost, node, 0.0, None, None)
+            if hops >= max_depth:
+                return  # no edge left to bridge or expand
+            ids, costs, weights, codes = self.neighbors(node)
+            if not ids:
+                return
+            other_nodes = at_node[1 - side]
+            for i, v in enumerate(ids):
+                if v in other_nodes:
+                    code = codes[i]
+                    if v in banned_nodes or (banned_edges and _edge_key(node, v, names[code]) in banned_edges):
+                        continue
+                    meet(side, lid, node, hops, cost, v, costs[i], weights[i], code)
+            heapq.heappush(heaps[side], (cost + costs[0], lid, 0))
+
+        def dominated(side, node, hops, cost):
+            for lid in at_node[side].get(node, ()):
+                _, h, c, _, _, _ = labels[side][lid]
+                if h <= hops and c <= cost:
+                    return True
+            return False
+
+        settle(0, 0)
+        settle(1, 0)
+        while True:
+            if not heaps[0] and not heaps[1]:
+                break
+            # An exhausted side proves nothing more is reachable only when both sides
+            # see the same (uncapped) edges; with a fan-out cap the other side goes on
+            exhausted = 0.0 if self.fanout else math.inf
+            top_f = heaps[0][0][0] if heaps[0] else exhausted
+            top_b = heaps[1][0][0] if heaps[1] else exhausted
+            if top_f + top_b >= best[0]:
+                break
+            if self.expanded >= self.max_expansions:
+                self.budget_hit = True
+                break
+            side = 0 if heaps[0] and (top_f <= top_b or not heaps[1]) else 1
+            cost, parent, i = heapq.heappop(heaps[side])
+            u, hops, parent_cost, _, _, _ = labels[side][parent]
+            ids, costs, weights, codes = self.neighbors(u)
+            if i + 1 < len(ids):
+                heapq.heappush(heaps[side], (parent_cost + costs[i + 1], parent, i + 1))
+            v, code = ids[i], codes[i]
+            if v in banned_nodes or (banned_edges and _edge_key(u, v, names[code]) in banned_edges):
+                continue
+            if cost >= best[0] or dominated(side, v, hops + 1, cost):
+                continue
+            labels[side].append((v, hops + 1, cost, parent, weights[i], code))
+            settle(side, len(labels[side]) - 1)
+
+        if best[1] is None:
+            return None
+        # Forward half: walk parents back to the source
+        forward = []
+        lid = best[1]
+        while lid != -1:
+            node, _, _, parent, w, code = labels[0][lid]
+            forward.append((node, w, names[code] if code is not None else None))
+            lid = parent
+        forward.reverse()
+        path = [(forward[0][0], None, None)] + forward[1:]
+        lid = best[2]
+        if best[3] is not None:
+            w, code = best[3]
+            path.append((labels[1][lid][0], w, names[code]))
+        # Backward half: each label's edge leads towards the target
+        while True:
+            node, _, _, parent, w, code = labels[1][lid]
+            if parent == -1:
+                break
+            path.append((labels[1][parent][0], w, names[code]))
+            lid = parent
+        return best[0], path
+
+
+def _path_cost(search: _Search, path) -> float:
+    return sum(-math.log(min(max(w, MIN_WEIGHT), 1.0)) + (HOP_COST if search.shortest else 0.0)
+               for _, w, _ in path[1:])
+
+
+def find_paths(source_id: int, target_id: int, k: int = 3, mode: str = "strongest",
+               max_depth: int = None, edge_types: Optional[Iterable[str]] = None,
+               min_weight: float = 0.0, fanout: int = None, graph_cache=None,
+               previews: bool = True) -> dict:
+    """
+    Top-k distinct loopless paths between two notes.
+
+    Args:
+        source_id / target_id: Endpoints
+        k: Number of paths (1..PATH_MAX_K)
+        mode: "strongest" (max product of weights) or "shortest" (fewest hops)
+        max_depth: Max hops per path (default PATH_MAX_DEPTH, at most PATH_DEPTH_LIMIT)
+        edge_types: Only traverse these edge types (None = all)
+        min_weight: Ignore edges below this weight
+        fanout: Strongest edges followed out of each note (default PATH_FANOUT, 0 = all, exact)
+        graph_cache: GraphCache to search (default: global cache)
+        previews: Attach note previews (one batched query)
+
+    Returns:
+        {"source", "target", "mode", "paths": [{"nodes": [ids], "edges": [{source, target, weight, type}],
+         "strength", "hops"}], "notes": {id: preview}, "stats": {expanded, budget_hit, ms}}
+        or {"error": ...} when an endpoint does not exist (checked with the previews)
+    """
+    if mode not in PATH_MODES:
+        raise ValueError(f"Unknown mode '{mode}' (expected one of {', '.join(PATH_MODES)})")
+    if graph_cache is None:
+        from graph_cache import get_graph_cache
+        graph_cache = get_graph_cache()
+    k = max(1, min(int(k), PATH_MAX_K))
+    max_depth = PATH_MAX_DEPTH if max_depth is None else max(1, min(int(max_depth), PATH_DEPTH_LIMIT))
+
+    start = time.perf_counter()
+    search = _Search(graph_cache, mode, set(edge_types) if edge_types else None, min_weight,
+                     PATH_FANOUT if fanout is None else fanout, PATH_MAX_EXPANSIONS)
+
+    # Yen's k shortest loopless paths; a path only spurs from its deviation
+    # index onwards (Lawler), earlier prefixes were spurred by its parent
+    found = []  # (cost, path, deviation index)
+    first = search.best_path(source_id, target_id, max_depth)
+    if first is not None:
+        found.append((first[0], first[1], 0))
+    candidates = []  # heap of (cost, tiebreak, path, deviation index)
+    seen = {tuple((n, et) for n, _, et in first[1])} if first else set()
+    counter = 0
+    while found and len(found) < k and not search.budget_hit:
+        _, last, deviation = found[-1]
+        for i in range(deviation, len(last) - 1):
+            root = last[:i + 1]
+            root_nodes = [n for n, _, _ in root]
+            root_key = [(n, et) for n, _, et in root]
+            banned_edges = set()
+            for _, path, _ in found:
+                if len(path) > i + 1 and [(n, et) for n, _, et in path[:i + 1]] == root_key:
+                    banned_edges.add(_edge_key(path[i][0], path[i + 1][0], path[i + 1][2]))
+            spur = search.best_path(root[-1][0], target_id, max_depth - i,
+                                    banned_nodes=set(root_nodes[:-1]), banned_edges=banned_edges)
+            if spur is None:
+                continue
+            path = root + spur[1][1:]
+            signature = tuple((n, et) for n, _, et in path)
+            if signature in seen:
+                continue
+            seen.add(signature)
+            counter += 1
+            heapq.heappush(candidates, (_path_cost(search, path), counter, path, i))
+        if not candidates:
+            break
+        cost, _, path, deviation = heapq.heappop(candidates)
+        found.append((cost, path, deviation))
+
+    paths = []
+    for _, path, _ in found[:k]:
+        strength = 1.0
+        edges = []
+        for (u, _, _), (v, w, et) in zip(path, path[1:]):
+            strength *= w
+            edges.append({"source": u, "target": v, "weight": w, "type": et})
+        paths.append({"nodes": [n for n, _, _ in path], "edges": edges,
+                      "strength": strength, "hops": len(path) - 1})
+
+    result = {
+        "source": source_id,
+        "target": target_id,
+        "mode": mode,
+        "max_depth": max_depth,
+        "paths": paths,
+        "stats": {
+            "expanded": search.expanded,
+            "budget_hit": search.budget_hit,
+            "ms": round((time.perf_counter() - start) * 1000, 2),
+        },
+    }
+    if previews:
+        from database import get_node_previews
+        ids = {source_id, target_id} | {n for p in paths for n in p["nodes"]}
+        notes = get_node_previews(ids, PREVIEW_CHARS)
+        for nid in (source_id, target_id):
+            if nid not in notes:
+                return {"error": f"Note #{nid} not found"}
+        result["notes"] = notes
+    return result
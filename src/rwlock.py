@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Reader-Writer Lock for shared in-memory indexes.
+
+Flask-SocketIO serves requests with async_mode="threading", so searches
+and note inserts run concurrently against the same ANN index. Many
+readers may hold the lock at once; a writer gets exclusive access.
+Writer-preferring: once a writer waits, new readers queue behind it,
+so a steady stream of searches cannot starve inserts.
+
+Usage:
+    lock = RWLock()
+    with lock.read_lock():
+        ...  # search
+    with lock.write_lock():
+        ...  # mutate
+"""
+import threading
+from contextlib import contextmanager
+
+
+class RWLock:
+    """Many concurrent readers or one writer (not reentrant)."""
+
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = False
+        self._waiting_writers = 0
+
+    def acquire_read(self):
+        with self._cond:
+            while self._writer or self._waiting_writers:
+                self._cond.wait()
+            self._readers += 1
+
+    def release_read(self):
+        with self._cond:
+            self._readers -= 1
+            if self._readers == 0:
+                self._cond.notify_all()
+
+    def acquire_write(self):
+        with self._cond:
+            self._waiting_writers += 1
+            try:
+                while self._writer or self._readers:
+                    self._cond.wait()
+            finally:
+                self._waiting_writers -= 1
+            self._writer = True
+
+    def release_write(self):
+        with self._cond:
+            self._writer = False
+            self._cond.notify_all()
+
+    @contextmanager
+    def read_lock(self):
+        self.acquire_read()
+        try:
+            yield
+        finally:
+            self.release_read()
+
+    @contextmanager
+    def write_lock(self):
+        self.acquire_write()
+        try:
+            yield
+        finally:
+            self.release_write()
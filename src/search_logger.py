@@ -39,6 +39,7 @@ CREATE TABLE IF NOT EXISTS search_logs (
     time_before TEXT,
     entity_type_filter TEXT,
     detail_mode TEXT,
+    activation_mode TEXT,
     
     -- Results
     results_count INTEGER,
@@ -64,13 +65,26 @@ CREATE TABLE IF NOT EXISTS search_logs (
     blend_delta REAL,
     bm25_matches INTEGER,
     temporal_matches INTEGER,
-    rerank_enabled INTEGER DEFAULT 0
+    rerank_enabled INTEGER DEFAULT 0,
+    
+    -- Spreading activation work
+    spread_iterations INTEGER,
+    nodes_touched INTEGER,
+    edges_expanded INTEGER
 );
 
 CREATE INDEX IF NOT EXISTS idx_search_logs_timestamp ON search_logs(timestamp);
 CREATE INDEX IF NOT EXISTS idx_search_logs_results ON search_logs(results_count);
 """
 
+# Columns added after the first release: (name, type) — added to old tables by _ensure_schema
+MIGRATION_COLUMNS = [
+    ("spread_iterations", "INTEGER"),
+    ("nodes_touched", "INTEGER"),
+    ("edges_expanded", "INTEGER"),
+    ("activation_mode", "TEXT"),
+]
+
 
 class SearchLogger:
     """Tracks search timing and logs results."""
@@ -85,6 +99,11 @@ class SearchLogger:
         try:
             conn = sqlite3.connect(DB_PATH)
             conn.executescript(SCHEMA)
+            existing = {row[1] for row in conn.execute("PRAGMA table_info(search_logs)")}
+            for name, col_type in MIGRATION_COLUMNS:
+                if name not in existing:
+                    conn.execute(f"ALTER TABLE search_logs ADD COLUMN {name} {col_type}")
+            conn.commit()
             conn.close()
         except Exception as e:
             print(f"⚠️ SearchLogger schema init failed: {e}")
@@ -118,14 +137,15 @@ class SearchLogger:
                 INSERT INTO search_logs (
                     timestamp, query, query_cleaned, is_temporal, temporal_direction,
                     limit_requested, category_filter, time_after, time_before,
-                    entity_type_filter, detail_mode,
+                    entity_type_filter, detail_mode, activation_mode,
                     results_count, total_activated, top1_score, top1_node_id, top5_scores,
                     latency_total_ms, latency_embedding_ms, latency_ann_ms,
                     latency_spreading_ms, latency_bm25_ms, latency_temporal_ms,
                     latency_rerank_ms, latency_filters_ms,
                     blend_alpha, blend_beta, blend_gamma, blend_delta,
-                    bm25_matches, temporal_matches, rerank_enabled
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    bm25_matches, temporal_matches, rerank_enabled,
+                    spread_iterations, nodes_touched, edges_expanded
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
             """, (
                 datetime.utcnow().isoformat(),
                 query,
@@ -138,6 +158,7 @@ class SearchLogger:
                 params.get("time_before"),
                 params.get("entity_type_filter"),
                 params.get("detail_mode"),
+                params.get("activation_mode"),
                 len(results),
                 total_activated,
                 top5_scores[0] if top5_scores else None,
@@ -158,6 +179,9 @@ class SearchLogger:
                 signals.get("bm25_matches", 0),
                 signals.get("temporal_matches", 0),
                 1 if signals.get("rerank_enabled") else 0,
+                signals.get("spread_iterations"),
+                signals.get("nodes_touched"),
+                signals.get("edges_expanded"),
             ))
             conn.commit()
             conn.close()
@@ -231,6 +255,25 @@ def get_search_stats(hours=24):
                 "rerank": round(row["rerank"], 1),
             }
         
+        # Spreading activation work (bounded by SPREAD_MAX_FRONTIER / SPREAD_MAX_EDGES)
+        try:
+            row = conn.execute("""
+                SELECT AVG(nodes_touched) as nodes, MAX(nodes_touched) as max_nodes,
+                       AVG(edges_expanded) as edges, MAX(edges_expanded) as max_edges,
+                       AVG(spread_iterations) as iters
+                FROM search_logs WHERE timestamp >= ? AND edges_expanded IS NOT NULL
+            """, (cutoff,)).fetchone()
+        except sqlite3.OperationalError:
+            row = None  # table not migrated yet (no search since upgrade)
+        if row is not None and row["edges"] is not None:
+            stats["spreading"] = {
+                "avg_nodes_touched": round(row["nodes"], 1),
+                "max_nodes_touched": row["max_nodes"],
+                "avg_edges_expanded": round(row["edges"], 1),
+                "max_edges_expanded": row["max_edges"],
+                "avg_iterations": round(row["iters"], 2),
+            }
+        
         # Recent zero-result queries
         rows = conn.execute("""
             SELECT query, timestamp FROM search_logs 
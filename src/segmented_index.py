@@ -0,0 +1,546 @@
+#!/usr/bin/env python3
+"""
+Segmented (LSM-style) ANN index.
+
+Recent vectors go into a small mutable hot segment searched exactly
+(brute-force numpy). When it fills up it is sealed: it stays searchable
+as a frozen exact segment while a background thread builds an immutable
+HNSW segment from it. HNSW segments of similar size are merged
+(size-tiered), and segments with many stale rows are compacted, so
+deletes and updates do not leave holes in one ever-growing graph.
+
+Queries fan out over the hot segment and every sealed segment and merge
+the per-segment top-k.
+
+Deletes/updates never touch sealed segments. Every write is tagged with
+the uid of the hot segment that received it; `_location[node_id]` holds
+the uid of the latest write. A row in a segment is live only if its
+node's location is one of the uids that segment covers (a merged segment
+covers the uids of its inputs), so stale rows are filtered at query time
+and dropped on the next merge/compaction.
+
+Selected with ANN_INDEX_TYPE=segmented; same API as ANNIndex.
+"""
+
+import math
+import os
+import queue
+import threading
+import time
+from typing import List, Tuple
+
+import hnswlib
+import numpy as np
+
+from ann_index import (
+    USE_ANN_INDEX, HNSW_SPACE, HNSW_M, HNSW_EF_CONSTRUCTION, HNSW_EF_SEARCH,
+    EF_SEARCH_SETTING, ANN_SETTINGS_POLL_SEC,
+)
+
+# Configuration
+SEGMENT_HOT_MAX = int(os.getenv("SEGMENT_HOT_MAX", "2000"))  # rows before the hot segment is sealed
+SEGMENT_MERGE_FACTOR = int(os.getenv("SEGMENT_MERGE_FACTOR", "4"))  # merge when a size tier has this many segments
+SEGMENT_MAX_DELETED_RATIO = float(os.getenv("SEGMENT_MAX_DELETED_RATIO", "0.3"))  # compact above this stale ratio
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+
+def _to_similarity(dist: np.ndarray) -> np.ndarray:
+    """hnswlib distance → similarity (same convention as ANNIndex.search)."""
+    if HNSW_SPACE in ("cosine", "ip"):
+        return 1.0 - dist
+    return 1.0 / (1.0 + dist)
+
+
+class _ExactSegment:
+    """Frozen brute-force segment (sealed hot segment awaiting its HNSW build)."""
+
+    kind = "exact"
+
+    def __init__(self, uid: int, ids: np.ndarray, vectors: np.ndarray, covers: frozenset):
+        self.uid = uid
+        self.ids = ids
+        self.covers = covers
+        self.vectors = _normalize(vectors) if HNSW_SPACE == "cosine" else vectors
+
+    def __len__(self):
+        return len(self.ids)
+
+    def get_vectors(self) -> np.ndarray:
+        return self.vectors
+
+    def search(self, query: np.ndarray, k: int, ef: int):
+        return _exact_search(self.ids, self.vectors, query, k)
+
+
+class _HNSWSegment:
+    """Immutable HNSW segment (never written after build, so no lock needed)."""
+
+    kind = "hnsw"
+
+    def __init__(self, uid: int, ids: np.ndarray, vectors: np.ndarray, covers: frozenset):
+        self.uid = uid
+        self.ids = ids
+        self.covers = covers
+        self.index = hnswlib.Index(space=HNSW_SPACE, dim=vectors.shape[1])
+        self.index.init_index(max_elements=max(len(ids), 1),
+                              ef_construction=HNSW_EF_CONSTRUCTION, M=HNSW_M)
+        self.index.add_items(vectors, ids)
+        self.ef = None
+
+    def __len__(self):
+        return len(self.ids)
+
+    def get_vectors(self) -> np.ndarray:
+        return np.asarray(self.index.get_items(self.ids), dtype=np.float32)
+
+    def search(self, query: np.ndarray, k: int, ef: int):
+        k = min(k, len(self.ids))
+        if k == 0:
+            return np.array([], dtype=np.int64), np.array([], dtype=np.float32)
+        # ef is shared state on the hnswlib object; a racing value only affects recall
+        ef = max(ef, k)
+        if ef != self.ef:
+            self.index.set_ef(ef)
+            self.ef = ef
+        labels, distances = self.index.knn_query(query.reshape(1, -1), k=k)
+        return labels[0].astype(np.int64), _to_similarity(distances[0])
+
+
+def _exact_search(ids: np.ndarray, vectors: np.ndarray, query: np.ndarray, k: int):
+    """Brute-force top-k over a (n, dim) matrix."""
+    n = len(ids)
+    k = min(k, n)
+    if k == 0:
+        return np.array([], dtype=np.int64), np.array([], dtype=np.float32)
+    if HNSW_SPACE == "l2":
+        diff = vectors - query
+        sims = 1.0 / (1.0 + np.einsum("ij,ij->i", diff, diff))
+    else:
+        q = _normalize(query.reshape(1, -1))[0] if HNSW_SPACE == "cosine" else query
+        sims = vectors @ q
+    top = np.argpartition(-sims, k - 1)[:k] if k < n else np.arange(n)
+    return ids[top], sims[top]
+
+
+class SegmentedANNIndex:
+    """Hot exact segment + immutable HNSW segments, merged in the background."""
+
+    def __init__(self, dimension=None, hot_max=None, background=True):
+        if dimension is None:
+            dimension = int(os.getenv("EMBEDDING_DIMENSION", "384"))
+        self.dimension = dimension
+        self.enabled = USE_ANN_INDEX
+        self.hot_max = hot_max or SEGMENT_HOT_MAX
+        self.ef_search = HNSW_EF_SEARCH
+        self._ef_checked_at = time.monotonic()
+        self._mutex = threading.Lock()  # serializes writers; readers are lock-free
+
+        self._next_uid = 0
+        self._location = {}  # node_id → uid of hot segment holding its latest write
+        self._live = {}  # uid → live rows written under that uid
+        self._segments = ()  # published tuple of sealed segments
+        self._new_hot()
+
+        self._background = background
+        self._jobs = queue.Queue()
+        self._worker = None
+        self._job_lock = threading.Lock()  # background=False: one caller runs jobs at a time
+        self._merge_pending = False
+        self.merges = 0
+
+        if not self.enabled:
+            print("ℹ️  ANN indexing disabled (USE_ANN_INDEX=false)")
+            return
+        print(f"✅ Created segmented {HNSW_SPACE.upper()} index (hot={self.hot_max}, "
+              f"merge_factor={SEGMENT_MERGE_FACTOR}, dim={dimension})")
+
+    # ------------------------------------------------------------------ writes
+
+    def _new_hot(self):
+        """Start an empty hot segment (caller holds _mutex or is __init__)."""
+        self._hot_uid = self._next_uid
+        self._next_uid += 1
+        self._live[self._hot_uid] = 0
+        self._hot_ids = np.zeros(self.hot_max, dtype=np.int64)
+        self._hot_vecs = np.zeros((self.hot_max, self.dimension), dtype=np.float32)
+        self._hot_rows = {}  # node_id → row (hot rows are updated in place)
+        self._hot_count = 0
+        self._hot_view = (self._hot_uid, self._hot_ids, self._hot_vecs, 0)
+
+    def _retract(self, node_id):
+        """Mark the previous write of node_id stale (caller holds _mutex)."""
+        uid = self._location.pop(node_id, None)
+        if uid is not None:
+            self._live[uid] -= 1
+        return uid
+
+    def add_vector(self, node_id: int, embedding: np.ndarray) -> bool:
+        """Insert or update one vector (O(dim), never touches sealed segments)."""
+        if not self.enabled:
+            return False
+        vec = np.asarray(embedding, dtype=np.float32).reshape(-1)
+        if len(vec) != self.dimension:
+            print(f"⚠️  Failed to add vector {node_id}: dimension {len(vec)} != {self.dimension}")
+            return False
+        if HNSW_SPACE == "cosine":
+            vec = vec / max(float(np.linalg.norm(vec)), 1e-12)
+
+        with self._mutex:
+            row = self._hot_rows.get(node_id)
+            if row is not None:
+                # Latest write (or its tombstone) is in the hot segment: update in place
+                self._hot_vecs[row] = vec
+                if node_id not in self._location:
+                    self._location[node_id] = self._hot_uid
+                    self._live[self._hot_uid] += 1
+                return True
+            moved = self._retract(node_id) is not None
+            row = self._hot_count
+            self._hot_ids[row] = node_id
+            self._hot_vecs[row] = vec
+            self._hot_rows[node_id] = row
+            self._hot_count = row + 1
+            self._location[node_id] = self._hot_uid
+            self._live[self._hot_uid] += 1
+            self._hot_view = (self._hot_uid, self._hot_ids, self._hot_vecs, self._hot_count)
+            if self._hot_count >= self.hot_max:
+                self._seal()
+        if moved:
+            self._maybe_schedule_merge()  # the old row is now stale in its sealed segment
+        self._drain()
+        return True
+
+    def add_vectors(self, node_ids: List[int], embeddings: np.ndarray) -> int:
+        """Insert or update a batch (hot-segment appends, same as add_vector each)."""
+        return sum(self.add_vector(node_id, emb) for node_id, emb in zip(node_ids, embeddings))
+
+    def remove_vector(self, node_id: int) -> bool:
+        """Delete a vector; its row becomes stale and is dropped on compaction."""
+        if not self.enabled:
+            return False
+        with self._mutex:
+            uid = self._retract(node_id)
+            if uid is None:
+                return False
+        self._maybe_schedule_merge()
+        self._drain()
+        return True
+
+    def _seal(self):
+        """Freeze the hot segment and queue its HNSW build (caller holds _mutex)."""
+        n = self._hot_count
+        frozen = _ExactSegment(self._hot_uid, self._hot_ids[:n].copy(),
+                               self._hot_vecs[:n].copy(), frozenset([self._hot_uid]))
+        self._segments = self._segments + (frozen,)
+        self._new_hot()
+        self._submit(("build", frozen.uid))
+
+    def flush(self):
+        """Seal the hot segment and wait until background builds/merges finish."""
+        if not self.enabled:
+            return
+        with self._mutex:
+            if self._hot_count:
+                self._seal()
+        if self._background:
+            self._jobs.join()
+        else:
+            self._drain()
+
+    def build(self, nodes: List[dict]) -> int:
+        """Bulk load (startup): one HNSW segment for everything, empty hot segment."""
+        if not self.enabled:
+            return 0
+        ids, vectors = [], []
+        for node in nodes:
+            if node.get("embedding") is None:
+                continue
+            emb = np.frombuffer(node["embedding"], dtype=np.float32)
+            if len(emb) != self.dimension:
+                continue
+            ids.append(node["id"])
+            vectors.append(emb)
+        if not vectors:
+            print("⚠️  No embeddings to index")
+            return 0
+
+        # Last occurrence wins, like repeated add_vector calls
+        latest = {nid: i for i, nid in enumerate(ids)}
+        rows = sorted(latest.values())
+        ids_arr = np.array([ids[i] for i in rows], dtype=np.int64)
+        matrix = np.array([vectors[i] for i in rows], dtype=np.float32)
+
+        with self._mutex:
+            uid = self._next_uid
+            self._next_uid += 1
+            segment = _HNSWSegment(uid, ids_arr, matrix, frozenset([uid]))
+            self._location = {int(nid): uid for nid in ids_arr}
+            self._live = {uid: len(ids_arr)}
+            self._segments = (segment,)
+            self._new_hot()
+        print(f"✅ Built segmented ANN index with {len(ids_arr)} vectors")
+        return len(ids_arr)
+
+    # ------------------------------------------------------- background work
+
+    def _submit(self, job):
+        """Queue a build/merge job (may be called under _mutex, so never runs it inline)."""
+        self._jobs.put(job)
+        if not self._background:
+            return
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._work_loop, name="ann-segments", daemon=True)
+            self._worker.start()
+
+    def _drain(self):
+        """background=False: run queued jobs in the calling thread (tests, bulk scripts)."""
+        if self._background:
+            return
+        with self._job_lock:
+            while True:
+                try:
+                    job = self._jobs.get_nowait()
+                except queue.Empty:
+                    return
+                try:
+                    self._run_job(job)
+                finally:
+                    self._jobs.task_done()
+
+    def _work_loop(self):
+        while True:
+            job = self._jobs.get()
+            try:
+                self._run_job(job)
+            except Exception as e:
+                print(f"⚠️  Segment job {job[0]} failed: {e}")
+            finally:
+                self._jobs.task_done()
+
+    def _run_job(self, job):
+        kind = job[0]
+        if kind == "build":
+            self._build_segment(job[1])
+        elif kind == "merge":
+            self._merge_pending = False
+            self._merge_once()
+
+    def _build_segment(self, uid):
+        """Replace the frozen exact segment `uid` with an HNSW segment (same rows, same uid)."""
+        frozen = next((s for s in self._segments if s.uid == uid and s.kind == "exact"), None)
+        if frozen is None:
+            return
+        t0 = time.time()
+        segment = _HNSWSegment(uid, frozen.ids, frozen.vectors, frozen.covers)
+        with self._mutex:
+            self._segments = tuple(segment if s is frozen else s for s in self._segments)
+        print(f"🧱 Built HNSW segment #{uid} ({len(segment)} rows, {time.time() - t0:.2f}s)")
+        self._merge_once()
+
+    def _stale(self, segment) -> int:
+        return len(segment) - sum(self._live.get(u, 0) for u in segment.covers)
+
+    def _tier(self, segment) -> int:
+        size = max(len(segment), 1)
+        return int(math.log(max(size / self.hot_max, 1.0), SEGMENT_MERGE_FACTOR))
+
+    def _pick_merge(self):
+        """Size-tiered: SEGMENT_MERGE_FACTOR segments of one tier, else the most stale segment."""
+        sealed = [s for s in self._segments if s.kind == "hnsw"]
+        tiers = {}
+        for s in sealed:
+            tiers.setdefault(self._tier(s), []).append(s)
+        for tier in sorted(tiers):
+            if len(tiers[tier]) >= SEGMENT_MERGE_FACTOR:
+                return tiers[tier][:SEGMENT_MERGE_FACTOR]
+        worst = max(sealed, key=lambda s: self._stale(s) / max(len(s), 1), default=None)
+        if worst is not None and self._stale(worst) > SEGMENT_MAX_DELETED_RATIO * len(worst):
+            return [worst]
+        return None
+
+    def _maybe_schedule_merge(self):
+        if self._merge_pending:
+            return
+        if self._pick_merge() is not None:
+            self._merge_pending = True
+            self._submit(("merge",))
+
+    def _merge_once(self):
+        """Merge/compact until no tier is full and no segment is over the stale ratio."""
+        while True:
+            inputs = self._pick_merge()
+            if inputs is None:
+                return
+            t0 = time.time()
+            covers = frozenset().union(*(s.covers for s in inputs))
+            ids = np.concatenate([s.ids for s in inputs])
+            vectors = np.vstack([s.get_vectors() for s in inputs])
+            location = self._location
+            keep = np.array([location.get(int(nid)) in covers for nid in ids], dtype=bool)
+            uid = min(covers)
+
+            if keep.any():
+                merged = _HNSWSegment(uid, ids[keep], vectors[keep], covers)
+            else:
+                merged = None
+
+            with self._mutex:
+                # Rows retracted while building stay filtered (covers unchanged)
+                remaining = tuple(s for s in self._segments if s not in inputs)
+                self._segments = remaining + ((merged,) if merged is not None else ())
+                if merged is None:
+                    for u in covers:
+                        self._live.pop(u, None)
+            self.merges += 1
+            dropped = int((~keep).sum())
+            print(f"🗜️  Merged {len(inputs)} segment(s) → {int(keep.sum())} rows "
+                  f"(dropped {dropped} stale, {time.time() - t0:.2f}s)")
+
+    # ------------------------------------------------------------------ reads
+
+    def set_ef_search(self, ef: int) -> bool:
+        """Change ef_search at runtime (applies to all HNSW segments)."""
+        if not self.enabled:
+            return False
+        ef = int(ef)
+        if ef < 1:
+            return False
+        if ef != self.ef_search:
+            print(f"🎛️  ANN ef_search: {self.ef_search} → {ef}")
+            self.ef_search = ef
+        return True
+
+    def refresh_tuned_ef(self, force: bool = False) -> int:
+        """Apply ef_search stored by ann_tune.py (settings table)."""
+        now = time.monotonic()
+        if not force and now - self._ef_checked_at < ANN_SETTINGS_POLL_SEC:
+            return self.ef_search
+        self._ef_checked_at = now
+        try:
+            from database import get_setting
+            value = get_setting(EF_SEARCH_SETTING)
+            if value is not None:
+                self.set_ef_search(int(value))
+        except Exception as e:
+            print(f"⚠️  Failed to read tuned ef_search: {e}")
+        return self.ef_search
+
+    def search(self, query_embedding: np.ndarray, k: int = 10,
+               min_similarity: float = 0.3) -> List[Tuple[int, float]]:
+        """Fan out over hot + sealed segments, drop stale rows, merge top-k."""
+        if not self.enabled or not self._location:
+            return []
+        self.refresh_tuned_ef()
+        query = np.asarray(query_embedding, dtype=np.float32).reshape(-1)
+        ef = self.ef_search
+        location = self._location
+
+        # Snapshot: hot view and segment tuple are each published atomically;
+        # a segment sealed in between shows up in both, duplicates are merged below.
+        hot_uid, hot_ids, hot_vecs, hot_n = self._hot_view
+        segments = self._segments
+
+        best = {}
+        try:
+            if hot_n:
+                # Tombstoned hot rows stay until the seal: over-fetch by them as for sealed segments
+                fetch = k + max(hot_n - self._live.get(hot_uid, 0), 0)
+                ids, sims = _exact_search(hot_ids[:hot_n], hot_vecs[:hot_n], query, fetch)
+                for nid, sim in zip(ids, sims):
+                    if location.get(int(nid)) == hot_uid:
+                        best[int(nid)] = max(float(sim), best.get(int(nid), -math.inf))
+            for segment in segments:
+                # Over-fetch by the stale count so filtering cannot starve top-k
+                fetch = k + max(self._stale(segment), 0)
+                ids, sims = segment.search(query, fetch, ef)
+                covers = segment.covers
+                for nid, sim in zip(ids, sims):
+                    nid = int(nid)
+                    if nid >= 0 and location.get(nid) in covers:
+                        best[nid] = max(float(sim), best.get(nid, -math.inf))
+        except Exception as e:
+            print(f"⚠️  Search failed: {e}")
+            return []
+
+        results = [(nid, sim) for nid, sim in best.items() if sim >= min_similarity]
+        results.sort(key=lambda x: -x[1])
+        return results[:k]
+
+    # ------------------------------------------------------------ persistence
+
+    def save(self, path: str):
+        """Save live vectors as one .npz (segments are rebuilt on load)."""
+        if not self.enabled:
+            return
+        ids, vectors = self._live_rows()
+        np.savez(path, ids=ids, vectors=vectors)
+        print(f"💾 Saved segmented ANN index to {path} ({len(ids)} vectors)")
+
+    def load(self, path: str):
+        """Load vectors saved by save() into a single HNSW segment."""
+        if not self.enabled:
+            return
+        if not os.path.exists(path):
+            print(f"⚠️  Index file not found: {path}")
+            return
+        data = np.load(path)
+        nodes = [{"id": int(nid), "embedding": vec.astype(np.float32).tobytes()}
+                 for nid, vec in zip(data["ids"], data["vectors"])]
+        self.build(nodes)
+        print(f"📂 Loaded segmented ANN index from {path} ({len(nodes)} vectors)")
+
+    def _live_rows(self):
+        with self._mutex:
+            hot_uid, hot_ids, hot_vecs, hot_n = self._hot_view
+            segments = self._segments
+            location = dict(self._location)
+        ids, vectors = [hot_ids[:hot_n]], [hot_vecs[:hot_n]]
+        keep = [np.array([location.get(int(n)) == hot_uid for n in hot_ids[:hot_n]], dtype=bool)]
+        for s in segments:
+            ids.append(s.ids)
+            vectors.append(s.get_vectors())
+            keep.append(np.array([location.get(int(n)) in s.covers for n in s.ids], dtype=bool))
+        ids = np.concatenate(ids)
+        vectors = np.vstack(vectors)
+        keep = np.concatenate(keep)
+        return ids[keep], vectors[keep]
+
+    # ------------------------------------------------------------------ stats
+
+    @property
+    def node_ids(self) -> List[int]:
+        with self._mutex:
+            return list(self._location)
+
+    @property
+    def vector_count(self) -> int:
+        """Number of live (searchable) vectors."""
+        return len(self._location)
+
+    def get_stats(self) -> dict:
+        """Get index statistics (per-segment sizes and stale rows)."""
+        if not self.enabled:
+            return {"enabled": False}
+        segments = self._segments
+        return {
+            "enabled": True,
+            "type": "segmented",
+            "space": HNSW_SPACE,
+            "dimension": self.dimension,
+            "vectors": len(self._location),
+            "hot_rows": self._hot_count,
+            "hot_max": self.hot_max,
+            "segments": [
+                {"uid": s.uid, "kind": s.kind, "rows": len(s), "stale": self._stale(s)}
+                for s in segments
+            ],
+            "merges": self.merges,
+            "pending_jobs": self._jobs.unfinished_tasks,
+            "M": HNSW_M,
+            "ef_construction": HNSW_EF_CONSTRUCTION,
+            "ef_search": self.ef_search,
+        }
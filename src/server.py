@@ -14,11 +14,11 @@ import sys
 sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__))))
 sys.path.insert(0, '/app/src')
 
-from database import init_database
+from database import init_database, entity_dictionary
 from mcp_sse_handler import create_mcp_endpoint
-from ann_index import rebuild_index
+from ann_index import rebuild_index, get_ann_index
 from database import get_all_nodes, get_all_edges
-from graph_cache import rebuild_graph_cache
+from graph_cache import rebuild_graph_cache, start_reconciler
 
 
 def create_app():
@@ -39,16 +39,33 @@ def create_app():
     vector_count = rebuild_index(nodes)
     print(f"📊 Built ANN index with {vector_count} vectors")
     
+    # Apply ef_search chosen by ann_tune.py (if any)
+    get_ann_index().refresh_tuned_ef(force=True)
+    
     # Build graph cache for fast edge traversal
     edges = get_all_edges()
     edge_count = rebuild_graph_cache(edges)
     print(f"🔗 Built graph cache with {edge_count} edges")
+    start_reconciler()
+    
+    # Note ↔ entity links for entity hops in spreading (replaces materialised entity edges)
+    from entity_graph import get_entity_graph
+    entity_stats = get_entity_graph().get_stats()
+    print(f"🏷️  Built entity graph with {entity_stats['links']} links ({entity_stats['entities']} entities)")
+    print(f"📖 Warmed entity dictionary with {entity_dictionary.warm()} names")
     
-    # Compute graph metrics (PageRank, communities)
+    # Graph metrics (PageRank, communities): saved by sleep-compute, computed only on first start
     from graph_metrics import get_graph_metrics
-    node_ids = [n["id"] for n in nodes]
-    edge_tuples = [(e["source_id"], e["target_id"], e["weight"]) for e in edges]
-    get_graph_metrics().compute(edge_tuples, node_ids)
+    metrics = get_graph_metrics()
+    if not metrics.load():
+        node_ids = [n["id"] for n in nodes]
+        edge_tuples = [(e["source_id"], e["target_id"], e["weight"], e["edge_type"]) for e in edges]
+        metrics.compute(edge_tuples, node_ids)
+        metrics.save()
+    
+    # Load diffusion vectors precomputed by sleep-compute (activation_mode=diffusion)
+    from diffusion import get_diffusion_store
+    get_diffusion_store()
     
     # Build BM25 keyword index
     from bm25_index import get_bm25_index
@@ -62,6 +79,10 @@ def create_app():
     else:
         print("ℹ️  Reranker disabled (set RERANK_ENABLED=true to enable)")
     
+    # Background enrichment (ENRICHMENT_MODE=async), after the indexes it links against
+    from enrichment import start_enrichment_workers
+    start_enrichment_workers()
+    
     # Register MCP endpoint
     create_mcp_endpoint(app)
     
@@ -86,6 +107,40 @@ def create_app():
         result = add_note_with_links(content, category)
         return jsonify(result)
     
+    @app.route("/api/add_notes", methods=["POST"])
+    def api_add_notes():
+        """REST endpoint for adding many notes in one call (one encode, one transaction)."""
+        api_key = request.args.get('api_key', '')
+        expected_key = os.getenv('NEURAL_API_KEY', '')
+        if not expected_key or api_key != expected_key:
+            return jsonify({"error": "unauthorized"}), 401
+        
+        data = request.get_json() or {}
+        notes = data.get("notes", [])
+        
+        from graph_engine import add_notes_with_links, ADD_NOTES_MAX_BATCH
+        if not isinstance(notes, list) or not notes:
+            return jsonify({"error": "notes required (list of {content, category, ...})"}), 400
+        if len(notes) > ADD_NOTES_MAX_BATCH:
+            return jsonify({"error": f"at most {ADD_NOTES_MAX_BATCH} notes per call"}), 400
+        
+        return jsonify(add_notes_with_links(notes))
+    
+    @app.route("/api/enrichment_status", methods=["GET"])
+    def api_enrichment_status():
+        """REST endpoint for background enrichment: one note (?note_id=) or queue stats."""
+        api_key = request.args.get('api_key', '')
+        expected_key = os.getenv('NEURAL_API_KEY', '')
+        if not expected_key or api_key != expected_key:
+            return jsonify({"error": "unauthorized"}), 401
+        
+        note_id = request.args.get("note_id", type=int)
+        if note_id is not None:
+            from database import get_enrichment_status
+            return jsonify(get_enrichment_status(note_id))
+        from enrichment import get_enrichment_workers
+        return jsonify(get_enrichment_workers().get_stats())
+    
     @app.route("/api/search", methods=["POST"])
     def api_search():
         """REST endpoint for searching (used by benchmark adapter)."""
@@ -99,14 +154,22 @@ def create_app():
         limit = data.get("limit", 5)
         detail_mode = data.get("detail_mode", "full")
         category = data.get("category", None)
+        activation_mode = data.get("activation_mode", None)
+        epsilon = data.get("epsilon", None)
         
         if not query:
             return jsonify({"error": "query required"}), 400
         
+        from spreading import ACTIVATION_MODES
+        if activation_mode and activation_mode not in ACTIVATION_MODES:
+            return jsonify({"error": f"activation_mode must be one of: {', '.join(ACTIVATION_MODES)}"}), 400
+        
         from graph_engine import search_with_activation_protected
         results = search_with_activation_protected(
             query, limit=limit, detail_mode=detail_mode,
-            category_filter=category
+            category_filter=category,
+            activation_mode=activation_mode,
+            epsilon=float(epsilon) if epsilon is not None else None
         )
         return jsonify(results)
 
@@ -184,6 +247,82 @@ def create_app():
             return jsonify({"error": "not found"}), 404
         return jsonify(dict(node))
 
+    @app.route("/api/node/<int:node_id>/neighborhood", methods=["GET"])
+    def get_node_neighborhood(node_id):
+        """Return the k-hop neighbourhood of a node (previews + edges).
+        Query params:
+            - api_key: required for authentication
+            - hops: depth (default 1)
+            - edge_types: comma-separated edge types to follow (default: all)
+            - min_weight: minimum edge weight (default 0)
+            - fanout: max edges expanded per node per hop (comma-separated for per-hop caps)
+            - max_nodes: max nodes returned
+        """
+        api_key = request.args.get('api_key', '')
+        expected_key = os.getenv('NEURAL_API_KEY', '')
+        if not expected_key or api_key != expected_key:
+            return jsonify({"error": "unauthorized"}), 401
+        
+        from neighborhood import get_neighborhood, NEIGHBORHOOD_MAX_HOPS
+        try:
+            hops = int(request.args.get('hops', 1))
+            min_weight = float(request.args.get('min_weight', 0.0))
+            fanout = request.args.get('fanout')
+            if fanout:
+                fanout = [int(f) for f in fanout.split(",")]
+                fanout = fanout[0] if len(fanout) == 1 else fanout
+            max_nodes = request.args.get('max_nodes')
+            max_nodes = int(max_nodes) if max_nodes else None
+        except ValueError:
+            return jsonify({"error": "hops, fanout and max_nodes must be integers, min_weight a number"}), 400
+        if not 1 <= hops <= NEIGHBORHOOD_MAX_HOPS:
+            return jsonify({"error": f"hops must be between 1 and {NEIGHBORHOOD_MAX_HOPS}"}), 400
+        edge_types = request.args.get('edge_types')
+        edge_types = [t.strip() for t in edge_types.split(",") if t.strip()] if edge_types else None
+        
+        hood = get_neighborhood(node_id, hops=hops, edge_types=edge_types, min_weight=min_weight,
+                                fanout=fanout or None, max_nodes=max_nodes)
+        if "error" in hood:
+            return jsonify(hood), 404
+        return jsonify(hood)
+
+    @app.route("/api/path", methods=["GET"])
+    def get_path():
+        """Return the top-k paths between two nodes.
+        Query params:
+            - api_key: required for authentication
+            - source, target: node ids (required)
+            - k: number of paths (default 3)
+            - mode: strongest (max weight product, default) or shortest (fewest hops)
+            - max_depth: max hops per path
+            - edge_types: comma-separated edge types to follow (default: all)
+        """
+        api_key = request.args.get('api_key', '')
+        expected_key = os.getenv('NEURAL_API_KEY', '')
+        if not expected_key or api_key != expected_key:
+            return jsonify({"error": "unauthorized"}), 401
+        
+        from paths import find_paths, PATH_MAX_DEPTH, PATH_DEPTH_LIMIT, PATH_MAX_K, PATH_MODES
+        try:
+            source = int(request.args['source'])
+            target = int(request.args['target'])
+            k = int(request.args.get('k', 3))
+            max_depth = int(request.args.get('max_depth', PATH_MAX_DEPTH))
+        except (KeyError, ValueError):
+            return jsonify({"error": "source and target are required; source, target, k and max_depth must be integers"}), 400
+        mode = request.args.get('mode', 'strongest')
+        if mode not in PATH_MODES:
+            return jsonify({"error": f"mode must be one of: {', '.join(PATH_MODES)}"}), 400
+        if not 1 <= max_depth <= PATH_DEPTH_LIMIT or not 1 <= k <= PATH_MAX_K:
+            return jsonify({"error": f"max_depth must be 1-{PATH_DEPTH_LIMIT}, k 1-{PATH_MAX_K}"}), 400
+        edge_types = request.args.get('edge_types')
+        edge_types = [t.strip() for t in edge_types.split(",") if t.strip()] if edge_types else None
+        
+        result = find_paths(source, target, k=k, mode=mode, max_depth=max_depth, edge_types=edge_types)
+        if "error" in result:
+            return jsonify(result), 404
+        return jsonify(result)
+
     return app
 
 
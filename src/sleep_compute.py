@@ -8,8 +8,11 @@ Runs periodically (default: every 6 hours) and performs:
 3. Community detection refresh
 4. Orphan entity cleanup
 5. Stale edge decay
+6. Degree-capped sparsification (removed edges archived, restorable)
+7. Duplicate scan (exact content, then near-duplicates)
+8. Diffusion vectors for query-time spreading (incremental)
 
-Zero LLM cost — pure graph math via NetworkX.
+Zero LLM cost — pure graph math (numpy / scipy.sparse).
 
 Usage:
     # Run once
@@ -76,12 +79,15 @@ def step_pagerank(db_path, dry_run=False):
     conn = sqlite3.connect(db_path)
     nodes = [r[0] for r in conn.execute("SELECT id FROM nodes").fetchall()]
     edges = conn.execute(
-        "SELECT source_id, target_id, weight FROM edges"
+        "SELECT source_id, target_id, weight, edge_type FROM edges"
     ).fetchall()
     conn.close()
 
     metrics = GraphMetrics()
+    metrics.load(db_path)  # previous run: PageRank warm start
     metrics.compute(edges, nodes)
+    if not dry_run:
+        metrics.save(db_path)
 
     top_pr = sorted(metrics._pagerank.items(), key=lambda x: x[1], reverse=True)[:10]
     n_communities = len(metrics._community_sizes)
@@ -92,7 +98,8 @@ def step_pagerank(db_path, dry_run=False):
     print(f"  Top PageRank: {', '.join(f'#{nid}({pr:.3f})' for nid, pr in top_pr[:5])}")
     return {
         "nodes": len(nodes), "edges": len(edges),
-        "communities": n_communities, "isolated": isolated
+        "communities": n_communities, "isolated": isolated,
+        "pagerank_iterations": metrics._last_run.get("pagerank_iterations"),
     }
 
 
@@ -152,15 +159,44 @@ def step_stale_decay(db_path, dry_run=False):
     return {"stale_edges": stale, "decayed": stale}
 
 
+def step_sparsify(db_path, dry_run=False):
+    """Step 5: Cap edges per node per type; archive the weakest, keep recent ones."""
+    print("\n=== Step 5: Graph Sparsification ===")
+    from sparsify import sparsify_edges, type_caps
+    caps = type_caps()
+    if not any(caps.values()):
+        print("  Disabled (SPARSIFY_MAX_DEGREE=0, no SPARSIFY_TYPE_CAPS)")
+        return {"removed": 0, "disabled": True}
+    result = sparsify_edges(db_path, caps=caps, dry_run=dry_run)
+    b, a = result["before"], result["after"]
+    verb = "Would archive" if dry_run else "Archived"
+    detail = ", ".join(f"{t}: {n}" for t, n in sorted(result["by_type"].items())) or "nothing over the cap"
+    print(f"  {verb} {result['removed']}/{result['edges']} edges ({detail}); "
+          f"{result['protected']} recent edges protected")
+    print(f"  Degree avg {b['avg_degree']} → {a['avg_degree']}, max {b['max_degree']} → {a['max_degree']}")
+    if "p50_ms" in b:
+        print(f"  Spreading p50 {b['p50_ms']}ms → {a['p50_ms']}ms, "
+              f"edges expanded {b['edges_expanded']} → {a['edges_expanded']}, "
+              f"hops completed {b['iterations']:g} → {a['iterations']:g}, "
+              f"edge budget hit {b['budget_hits']} → {a['budget_hits']} queries")
+    return result
+
+
 def step_duplicate_scan(db_path, dry_run=False):
-    """Step 5: Find near-duplicate notes by embedding similarity."""
-    print("\n=== Step 5: Duplicate Scan ===")
+    """Step 6: Find duplicate notes: exact (same content_hash), then near-duplicates by embedding similarity."""
+    print("\n=== Step 6: Duplicate Scan ===")
     import numpy as np
     conn = sqlite3.connect(db_path)
+    exact_groups = []
+    if "content_hash" in [col[1] for col in conn.execute("PRAGMA table_info(nodes)")]:
+        exact_groups = [sorted(int(i) for i in ids.split(",")) for ids, in conn.execute(
+            """SELECT GROUP_CONCAT(id) FROM nodes WHERE content_hash IS NOT NULL
+               GROUP BY content_hash HAVING COUNT(*) > 1""")]
     rows = conn.execute(
         "SELECT id, embedding FROM nodes WHERE embedding IS NOT NULL"
     ).fetchall()
     conn.close()
+    exact_of = {nid: group[0] for group in exact_groups for nid in group}
 
     embeddings = {}
     for nid, blob in rows:
@@ -175,16 +211,45 @@ def step_duplicate_scan(db_path, dry_run=False):
 
     for i in range(len(ids)):
         for j in range(i + 1, min(i + 50, len(ids))):  # sliding window
+            if ids[i] in exact_of and exact_of[ids[i]] == exact_of.get(ids[j]):
+                continue  # already reported as exact
             e1, e2 = embeddings[ids[i]], embeddings[ids[j]]
             sim = np.dot(e1, e2) / (np.linalg.norm(e1) * np.linalg.norm(e2))
             checked += 1
             if sim >= threshold:
                 duplicates.append((ids[i], ids[j], float(sim)))
 
+    exact = sum(len(group) - 1 for group in exact_groups)
+    print(f"  {exact} exact duplicates in {len(exact_groups)} groups (same content)")
+    for group in exact_groups[:5]:
+        print(f"    #{group[0]} = " + ", ".join(f"#{nid}" for nid in group[1:]))
     print(f"  Checked {checked} pairs, found {len(duplicates)} near-duplicates (>{threshold})")
     for a, b, sim in duplicates[:5]:
         print(f"    #{a} <-> #{b} similarity={sim:.4f}")
-    return {"checked": checked, "duplicates": len(duplicates), "pairs": duplicates[:20]}
+    return {"checked": checked, "duplicates": len(duplicates), "pairs": duplicates[:20],
+            "exact_duplicates": exact, "exact_groups": exact_groups[:20]}
+
+def step_diffusion(db_path, dry_run=False):
+    """Step 7: Precompute top-K diffusion vectors for nodes whose neighbourhood changed."""
+    print("\n=== Step 7: Diffusion Vectors ===")
+    from diffusion import refresh_diffusion_vectors, ranking_report
+    result = refresh_diffusion_vectors(db_path, dry_run=dry_run)
+    scope = "all nodes (parameters changed)" if result["full"] else f"{result['changed']} changed adjacencies"
+    if dry_run:
+        print(f"  Would recompute {result['dirty']}/{result['nodes']} vectors ({scope}), drop {result['removed']}")
+        return result
+    print(f"  Recomputed {result['computed']}/{result['nodes']} vectors ({scope}), dropped {result['removed']}, "
+          f"{result['drifting']} within tolerance, {result['bytes'] / 1024:.0f} KB in {result['seconds']}s")
+
+    # How far the precomputed ranking drifts from live spreading on sampled queries
+    result["ranking"] = ranking_report(db_path)
+    r = result["ranking"]
+    if r.get("queries"):
+        print(f"  vs live spreading ({r['queries']} queries): overlap@{r['k']}={r['overlap_at_k']:.2f}, "
+              f"top-1 agreement={r['top1_agreement']:.2f}, kendall tau={r['kendall_tau']}, "
+              f"overlap with unbounded spreading={r['overlap_exact']:.2f}")
+    return result
+
 
 def run_all(db_path, dry_run=False):
     """Run all sleep-time compute steps."""
@@ -221,12 +286,24 @@ def run_all(db_path, dry_run=False):
         print(f"  ERROR in stale decay: {e}")
         results['decay'] = {"error": str(e)}
 
+    try:
+        results['sparsify'] = step_sparsify(db_path, dry_run)
+    except Exception as e:
+        print(f"  ERROR in sparsification: {e}")
+        results['sparsify'] = {"error": str(e)}
+
     try:
         results['duplicates'] = step_duplicate_scan(db_path, dry_run)
     except Exception as e:
         print(f"  ERROR in duplicate scan: {e}")
         results['duplicates'] = {"error": str(e)}
 
+    try:
+        results['diffusion'] = step_diffusion(db_path, dry_run)
+    except Exception as e:
+        print(f"  ERROR in diffusion: {e}")
+        results['diffusion'] = {"error": str(e)}
+
     elapsed = time.time() - t0
     print(f"\n{'='*60}")
     print(f"  Completed in {elapsed:.1f}s")
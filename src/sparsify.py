@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+Degree-capped edge sparsification (sleep-compute step).
+
+Spreading cost and hub dominance both grow with node degree, and
+consolidation's all-to-all cluster links give some notes hundreds of
+edges of one type. This step enforces a per-node budget per edge type:
+
+  1. protected edges are always kept — created within
+     SPARSIFY_KEEP_RECENT_DAYS, or joining two notes both accessed in
+     that window;
+  2. the remaining edges of each type are taken strongest first
+     (greedy b-matching) while both endpoints are under the type's cap;
+  3. a note left with no edge at all keeps its strongest one.
+
+So no note exceeds its cap through unprotected edges, except to keep a
+note from losing its last link. Removed edges move to edges_archive
+(with archived_at and reason) and restore_edges() moves them back.
+
+A report compares average / max degree and spreading latency on the
+graph cache before and after (sampled seed sets, default SPREAD_*
+budgets).
+
+Caps: SPARSIFY_MAX_DEGREE for every type, overridden per type with
+SPARSIFY_TYPE_CAPS="consolidation=10,semantic=30" (0 = type not capped).
+"""
+import os
+import time
+import sqlite3
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from database import EDGES_ARCHIVE_SCHEMA
+
+SPARSIFY_MAX_DEGREE = int(os.getenv("SPARSIFY_MAX_DEGREE", "50"))  # edges per node per type, 0 = uncapped
+SPARSIFY_TYPE_CAPS = os.getenv("SPARSIFY_TYPE_CAPS", "")  # per-type overrides, "type=cap,..."
+SPARSIFY_KEEP_RECENT_DAYS = float(os.getenv("SPARSIFY_KEEP_RECENT_DAYS", "14"))
+SPARSIFY_REPORT_QUERIES = int(os.getenv("SPARSIFY_REPORT_QUERIES", "50"))  # sampled spreading runs per graph
+
+
+def type_caps(default: int = None, overrides: str = None) -> Dict[str, int]:
+    """Parse SPARSIFY_TYPE_CAPS ("type=cap,...") → {type: cap}; "*" holds the default."""
+    caps = {"*": SPARSIFY_MAX_DEGREE if default is None else default}
+    for part in (SPARSIFY_TYPE_CAPS if overrides is None else overrides).split(","):
+        if "=" in part:
+            name, value = part.split("=", 1)
+            caps[name.strip()] = int(value)
+    return caps
+
+
+def _degree_stats(src: np.ndarray, dst: np.ndarray) -> dict:
+    """Average and max degree over nodes with at least one edge."""
+    if len(src) == 0:
+        return {"avg_degree": 0.0, "max_degree": 0}
+    _, counts = np.unique(np.concatenate([src, dst]), return_counts=True)
+    return {"avg_degree": round(float(counts.mean()), 2), "max_degree": int(counts.max())}
+
+
+def plan_sparsification(rows: List[tuple], caps: Dict[str, int], protected: Iterable[int] = ()) -> np.ndarray:
+    """
+    Choose edges to remove.
+
+    Args:
+        rows: (id, source_id, target_id, weight, edge_type) edge rows
+        caps: {edge_type: cap}, "*" for types not listed (0 = uncapped)
+        protected: Edge ids always kept (count towards the cap)
+
+    Returns:
+        Sorted array of edge ids to archive
+    """
+    if not rows:
+        return np.zeros(0, dtype=np.int64)
+    protected = set(protected)
+    by_type: Dict[str, list] = {}
+    for row in rows:
+        by_type.setdefault(row[4], []).append(row)
+
+    removed = []
+    for edge_type, typed in by_type.items():
+        cap = caps.get(edge_type, caps.get("*", 0))
+        if cap <= 0:
+            continue
+        degree: Dict[int, int] = {}
+        for eid, s, t, _, _ in typed:
+            degree[s] = degree.get(s, 0) + 1
+            if t != s:
+                degree[t] = degree.get(t, 0) + 1
+        if max(degree.values()) <= cap:
+            continue
+
+        kept: Dict[int, int] = {}
+        candidates = []
+        for eid, s, t, w, _ in typed:
+            if eid in protected:
+                kept[s] = kept.get(s, 0) + 1
+                kept[t] = kept.get(t, 0) + (t != s)
+            else:
+                candidates.append((w, eid, s, t))
+        # Strongest first; ties: older edge (lower id) first
+        candidates.sort(key=lambda c: (-c[0], c[1]))
+        for w, eid, s, t in candidates:
+            if kept.get(s, 0) < cap and kept.get(t, 0) < cap:
+                kept[s] = kept.get(s, 0) + 1
+                kept[t] = kept.get(t, 0) + (t != s)
+            else:
+                removed.append((eid, s, t, w))
+
+    if not removed:
+        return np.zeros(0, dtype=np.int64)
+
+    # A note never loses its last edge: keep the strongest removed one
+    removed_ids = {eid for eid, _, _, _ in removed}
+    has_edge = set()
+    for eid, s, t, _, _ in rows:
+        if eid not in removed_ids:
+            has_edge.update((s, t))
+    best: Dict[int, tuple] = {}
+    for eid, s, t, w in removed:
+        for node in (s, t):
+            if node not in has_edge and (node not in best or w > best[node][0]):
+                best[node] = (w, eid)
+    for _, eid in best.values():
+        removed_ids.discard(eid)
+    return np.array(sorted(removed_ids), dtype=np.int64)
+
+
+def spreading_latency(rows: List[tuple], seed_sets: List[Dict[int, float]]) -> dict:
+    """
+    Spreading cost on a graph cache built from rows (default SPREAD_* budgets).
+
+    A dense graph can look fast only because it exhausts the edge budget
+    before the last hop, so completed iterations and budget hits are
+    reported next to the median time and edges expanded.
+    """
+    from graph_cache import GraphCache
+    from spreading import spread_activation
+    import contextlib
+    import io
+
+    cache = GraphCache()
+    times, edges, iterations, budget_hits = [], [], [], 0
+    with contextlib.redirect_stdout(io.StringIO()):
+        cache.build([{"source_id": s, "target_id": t, "weight": w, "edge_type": et} for _, s, t, w, et in rows])
+        for seeds in seed_sets:
+            t0 = time.perf_counter()
+            _, stats = spread_activation(dict(seeds), cache, 3, 0.7)
+            times.append((time.perf_counter() - t0) * 1000)
+            edges.append(stats["edges_expanded"])
+            iterations.append(stats["iterations"])
+            budget_hits += stats["edge_budget_hit"]
+    if not times:
+        return {"p50_ms": 0.0, "edges_expanded": 0, "iterations": 0, "budget_hits": 0}
+    return {"p50_ms": round(float(np.median(times)), 2), "edges_expanded": int(np.median(edges)),
+            "iterations": float(np.median(iterations)), "budget_hits": budget_hits}
+
+
+def sparsify_edges(db_path: str, caps: Dict[str, int] = None, keep_recent_days: float = None,
+                   report_queries: int = None, dry_run: bool = False) -> dict:
+    """
+    Cap per-node degree per edge type; archive the removed edges.
+
+    Returns:
+        {edges, removed, by_type, before, after, seconds}; before/after hold
+        avg_degree, max_degree and (with report_queries) spreading p50_ms,
+        edges_expanded, iterations and budget_hits
+    """
+    caps = type_caps() if caps is None else caps
+    keep_recent_days = SPARSIFY_KEEP_RECENT_DAYS if keep_recent_days is None else keep_recent_days
+    report_queries = SPARSIFY_REPORT_QUERIES if report_queries is None else report_queries
+    t0 = time.time()
+
+    conn = sqlite3.connect(db_path)
+    conn.execute(EDGES_ARCHIVE_SCHEMA)
+    rows = conn.execute("SELECT id, source_id, target_id, weight, edge_type FROM edges").fetchall()
+    cutoff = (datetime.now() - timedelta(days=keep_recent_days)).isoformat()
+    protected = [r[0] for r in conn.execute(
+        """SELECT e.id FROM edges e
+           JOIN nodes a ON a.id = e.source_id JOIN nodes b ON b.id = e.target_id
+           WHERE e.created_at >= ? OR (a.last_accessed >= ? AND b.last_accessed >= ?)""",
+        (cutoff, cutoff, cutoff))] if keep_recent_days > 0 else []
+
+    remove = plan_sparsification(rows, caps, protected)
+    remove_set = set(remove.tolist())
+    kept_rows = [r for r in rows if r[0] not in remove_set]
+    by_type: Dict[str, int] = {}
+    for r in rows:
+        if r[0] in remove_set:
+            by_type[r[4]] = by_type.get(r[4], 0) + 1
+
+    def stats_of(edge_rows):
+        src = np.array([r[1] for r in edge_rows], dtype=np.int64)
+        dst = np.array([r[2] for r in edge_rows], dtype=np.int64)
+        return _degree_stats(src, dst)
+
+    result = {"edges": len(rows), "removed": len(remove), "protected": len(protected), "by_type": by_type,
+              "before": stats_of(rows), "after": stats_of(kept_rows)}
+
+    if report_queries > 0 and len(remove):
+        node_ids = np.unique(np.array([[r[1], r[2]] for r in rows], dtype=np.int64))
+        rng = np.random.default_rng(0)
+        seed_sets = [{int(n): 1.0 - 0.05 * i for i, n in enumerate(rng.choice(node_ids, min(10, len(node_ids)),
+                                                                              replace=False))}
+                     for _ in range(report_queries)]
+        result["before"].update(spreading_latency(rows, seed_sets))
+        result["after"].update(spreading_latency(kept_rows, seed_sets))
+
+    if not dry_run and len(remove):
+        now = datetime.now().isoformat()
+        with conn:
+            conn.execute("CREATE TEMP TABLE sparsify_ids (id INTEGER PRIMARY KEY)")
+            conn.executemany("INSERT INTO sparsify_ids VALUES (?)", ((int(i),) for i in remove))
+            conn.execute(
+                """INSERT OR REPLACE INTO edges_archive
+                   (id, source_id, target_id, weight, edge_type, created_at, archived_at, reason)
+                   SELECT id, source_id, target_id, weight, edge_type, created_at, ?, 'degree_cap'
+                   FROM edges WHERE id IN (SELECT id FROM sparsify_ids)""", (now,))
+            conn.execute("DELETE FROM edges WHERE id IN (SELECT id FROM sparsify_ids)")
+            conn.execute("DROP TABLE sparsify_ids")
+    conn.close()
+    result["seconds"] = round(time.time() - t0, 2)
+    return result
+
+
+def restore_edges(db_path: str, node_id: Optional[int] = None, edge_type: Optional[str] = None,
+                  since: Optional[str] = None, dry_run: bool = False) -> dict:
+    """
+    Move archived edges back into the edges table.
+
+    Args:
+        node_id: Only edges touching this note
+        edge_type: Only this type
+        since: Only edges archived at or after this ISO timestamp
+
+    An edge re-created since it was archived keeps MAX(weight); edges whose
+    notes no longer exist are left in the archive.
+
+    Returns:
+        {matched, restored, dangling}
+    """
+    where, params = ["1 = 1"], []
+    if node_id is not None:
+        where.append("(a.source_id = ? OR a.target_id = ?)")
+        params += [node_id, node_id]
+    if edge_type:
+        where.append("a.edge_type = ?")
+        params.append(edge_type)
+    if since:
+        where.append("a.archived_at >= ?")
+        params.append(since)
+    live = "a.source_id IN (SELECT id FROM nodes) AND a.target_id IN (SELECT id FROM nodes)"
+    cond = " AND ".join(where)
+
+    conn = sqlite3.connect(db_path)
+    conn.execute(EDGES_ARCHIVE_SCHEMA)
+    matched = conn.execute(f"SELECT COUNT(*) FROM edges_archive a WHERE {cond}", params).fetchone()[0]
+    restorable = conn.execute(f"SELECT COUNT(*) FROM edges_archive a WHERE {cond} AND {live}", params).fetchone()[0]
+    result = {"matched": matched, "restored": 0, "dangling": matched - restorable}
+    if dry_run or not restorable:
+        conn.close()
+        return result
+
+    with conn:
+        conn.execute(
+            f"""INSERT INTO edges (source_id, target_id, weight, edge_type, created_at)
+                SELECT a.source_id, a.target_id, a.weight, a.edge_type, a.created_at
+                FROM edges_archive a WHERE {cond} AND {live}
+                ON CONFLICT(source_id, target_id, edge_type) DO UPDATE SET weight = MAX(weight, excluded.weight)""",
+            params)
+        conn.execute(f"DELETE FROM edges_archive WHERE id IN (SELECT a.id FROM edges_archive a WHERE {cond} AND {live})",
+                     params)
+    conn.close()
+    result["restored"] = restorable
+    return result
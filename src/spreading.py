@@ -0,0 +1,408 @@
+#!/usr/bin/env python3
+"""
+Bounded spreading activation over the in-memory graph cache.
+
+Each iteration, only the top SPREAD_MAX_FRONTIER active nodes (by
+activation) push to their neighbours, and the whole query may expand at
+most SPREAD_MAX_EDGES edges — strongest nodes first, and a node's row
+strongest edges first (top_neighbors reads it off the CSR arrays without
+building the whole row), so a budget cut drops the weakest contributions. Other active nodes keep their decayed
+activation but do not spread. Iteration stops early once the relative
+L1 change between iterations drops below SPREAD_EPSILON.
+
+A seed next to a hub (entity "memory", a session-summary note) therefore
+costs at most SPREAD_MAX_EDGES neighbour visits instead of most of the
+graph, which bounds spreading latency independent of graph density.
+The work done is returned as stats and logged to search_logs.
+
+ACTIVATION_MODE=ppr (or activation_mode="ppr" per query) replaces the
+iterative spreading with Personalized PageRank by forward push
+(ppr_push), seeded from the ANN and BM25 candidates. ACTIVATION_MODE=diffusion
+sums per-node diffusion vectors precomputed by sleep-compute (see diffusion.py).
+ACTIVATION_MODE=community runs spreading inside the seeds' communities
+first and then crosses into other communities only over the
+SPREAD_COMMUNITY_BRIDGES strongest bridge edges (spread_community).
+
+Notes sharing an entity are not joined by edges (see entity_graph.py):
+given an EntityGraph, each iteration also hops note → entity → notes,
+pushing the frontier's summed activation through every entity once.
+"""
+import heapq
+import os
+from typing import Dict, Tuple
+
+SPREAD_MIN_ACTIVATION = 0.01  # nodes below this neither spread nor survive the iteration
+SPREAD_MAX_FRONTIER = int(os.getenv("SPREAD_MAX_FRONTIER", "1000"))  # 0 = unlimited
+SPREAD_MAX_EDGES = int(os.getenv("SPREAD_MAX_EDGES", "50000"))  # per query, 0 = unlimited
+SPREAD_EPSILON = float(os.getenv("SPREAD_EPSILON", "0.001"))  # relative L1 change, 0 = always run all iterations
+
+
+def entity_hop(frontier, entity_graph, new_activations, decay, budget, admit=None):
+    """
+    One note → entity → notes hop for the whole frontier.
+
+    Frontier activation is summed per entity (activation × IDF weight) and
+    each entity pushes once to its notes, strongest entity first, until
+    `budget` note visits are spent (None = unlimited). A note's own share is
+    taken back so it does not activate itself through its entities.
+    admit(source, target, weight), when given, vetoes targets.
+
+    Returns:
+        (note visits, budget_hit)
+    """
+    sums: Dict[int, float] = {}
+    sources: Dict[int, list] = {}
+    for node_id, activation in frontier:
+        for eid in entity_graph.entities_of(node_id):
+            w = entity_graph.weight(eid)
+            if w > 0:
+                sums[eid] = sums.get(eid, 0.0) + activation * w
+                sources.setdefault(eid, []).append((node_id, activation * w))
+
+    visits = 0
+    for eid, total in sorted(sums.items(), key=lambda x: x[1], reverse=True):
+        notes = entity_graph.notes_of(eid)
+        if budget is not None and visits + len(notes) > budget:
+            return visits, True
+        visits += len(notes)
+        push = total * decay
+        if admit is not None:
+            strongest = max(sources[eid], key=lambda x: x[1])[0]
+            weight = entity_graph.weight(eid)
+            notes = [v for v in notes if admit(strongest, v, weight)]
+        for v in notes:
+            new_activations[v] = new_activations.get(v, 0.0) + push
+        reached = set(notes) if admit is not None else None
+        for u, share in sources[eid]:
+            if reached is None or u in reached:
+                new_activations[u] -= share * decay
+    return visits, False
+
+
+def spread_activation(activations: Dict[int, float], graph_cache, iterations: int, decay: float,
+                      max_frontier: int = None, max_edges: int = None,
+                      epsilon: float = None, entity_graph=None) -> Tuple[Dict[int, float], dict]:
+    """
+    Spread activation through graph_cache edges with per-query work budgets.
+
+    Args:
+        activations: Initial {node_id: activation} (e.g. ANN similarities)
+        graph_cache: Object with get_neighbors(node_id) → [(neighbor_id, weight, edge_type)]
+                     and top_neighbors(node_id, limit) (strongest first, used under an edge budget)
+        iterations: Maximum number of iterations
+        decay: Activation decay factor per hop
+        max_frontier / max_edges / epsilon: Override SPREAD_* defaults
+        entity_graph: EntityGraph to also hop note → entity → notes each
+                      iteration (shares the max_edges budget, one visit per note)
+
+    Returns:
+        (activations normalized to max 1.0, stats dict)
+    """
+    max_frontier = SPREAD_MAX_FRONTIER if max_frontier is None else max_frontier
+    max_edges = SPREAD_MAX_EDGES if max_edges is None else max_edges
+    epsilon = SPREAD_EPSILON if epsilon is None else epsilon
+
+    touched = set(activations)
+    edges_expanded = 0
+    frontier_truncated = False
+    edge_budget_hit = False
+    converged = False
+    entity_visits = 0
+    done = 0
+
+    for iteration in range(iterations):
+        active = [(nid, a) for nid, a in activations.items() if a >= SPREAD_MIN_ACTIVATION]
+        if max_frontier and len(active) > max_frontier:
+            frontier = heapq.nlargest(max_frontier, active, key=lambda x: x[1])
+            frontier_truncated = True
+        else:
+            frontier = sorted(active, key=lambda x: x[1], reverse=True)
+
+        # Keep original activation (with decay) for every active node
+        new_activations = {nid: a * decay for nid, a in active}
+
+        # Spread to neighbors, strongest nodes first, until the edge budget is spent
+        for node_id, activation in frontier:
+            if max_edges and edges_expanded >= max_edges:
+                edge_budget_hit = True
+                break
+            if max_edges:
+                remaining = max_edges - edges_expanded
+                neighbors = graph_cache.top_neighbors(node_id, limit=remaining + 1)
+                if len(neighbors) > remaining:
+                    neighbors = neighbors[:remaining]
+                    edge_budget_hit = True
+            else:
+                neighbors = graph_cache.get_neighbors(node_id)
+            edges_expanded += len(neighbors)
+            for neighbor_id, edge_weight, edge_type in neighbors:
+                new_activations[neighbor_id] = new_activations.get(neighbor_id, 0) + activation * edge_weight * decay
+
+        # Entity hop (note → entity → notes) from the same frontier, on what is left of the budget
+        if entity_graph is not None and not edge_budget_hit:
+            visits, hit = entity_hop(frontier, entity_graph, new_activations, decay,
+                                       max_edges - edges_expanded if max_edges else None,
+                                       getattr(graph_cache, "admit", None))
+            edges_expanded += visits
+            entity_visits += visits
+            edge_budget_hit = edge_budget_hit or hit
+
+        # Normalization: scale to 0-1 range based on max
+        if new_activations:
+            max_activation = max(new_activations.values())
+            if max_activation > 0:
+                for node_id in new_activations:
+                    new_activations[node_id] /= max_activation
+
+        touched.update(new_activations)
+        l1_change = sum(abs(v - activations.get(nid, 0.0)) for nid, v in new_activations.items())
+        l1_change += sum(v for nid, v in activations.items() if nid not in new_activations)
+        l1_prev = sum(activations.values())
+        activations = new_activations
+        done = iteration + 1
+
+        if activations:
+            print(f"  Iteration {done}: {len(activations)} nodes, max={max(activations.values()):.4f}, "
+                  f"sum={sum(activations.values()):.4f}, edges={edges_expanded}")
+
+        if epsilon and l1_prev > 0 and l1_change / l1_prev < epsilon:
+            converged = True
+            break
+        if edge_budget_hit:
+            break
+
+    return activations, {
+        "iterations": done,
+        "nodes_touched": len(touched),
+        "edges_expanded": edges_expanded,
+        "frontier_truncated": frontier_truncated,
+        "edge_budget_hit": edge_budget_hit,
+        "converged": converged,
+        "entity_visits": entity_visits,
+    }
+
+
+# ===== Community-scoped spreading =====
+
+SPREAD_COMMUNITY_BRIDGES = int(os.getenv("SPREAD_COMMUNITY_BRIDGES", "5"))  # bridge edges out of the seed communities
+
+
+class _CommunityView:
+    """
+    Graph-cache view that only returns edges inside `allowed` communities.
+
+    Nodes without a community (-1: isolated, or added after the last
+    sleep-compute run) belong everywhere, so new notes are never cut off.
+    Edges (and entity hops, via admit) leaving the allowed communities are
+    recorded as bridge candidates.
+    """
+
+    def __init__(self, graph_cache, community_of, allowed):
+        self.graph_cache = graph_cache
+        self.community_of = community_of
+        self.allowed = allowed
+        self.crossings = {}  # (node, neighbor) → weight of the strongest crossing edge
+
+    def admit(self, node_id, neighbor_id, weight) -> bool:
+        """True if the hop stays inside; otherwise record it as a crossing."""
+        community = self.community_of(neighbor_id)
+        if community == -1 or community in self.allowed:
+            return True
+        if weight > self.crossings.get((node_id, neighbor_id), 0.0):
+            self.crossings[(node_id, neighbor_id)] = weight
+        return False
+
+    def get_neighbors(self, node_id):
+        return [entry for entry in self.graph_cache.get_neighbors(node_id)
+                if self.admit(node_id, entry[0], entry[1])]
+
+    def top_neighbors(self, node_id, limit=0):
+        """Strongest `limit` inside edges; reads the row in doubling chunks until enough are admitted."""
+        if not limit:
+            return [entry for entry in self.graph_cache.top_neighbors(node_id)
+                    if self.admit(node_id, entry[0], entry[1])]
+        fetch = limit
+        while True:
+            entries = self.graph_cache.top_neighbors(node_id, limit=fetch)
+            inside = [entry for entry in entries if self.admit(node_id, entry[0], entry[1])]
+            if len(inside) >= limit or len(entries) < fetch:
+                return inside[:limit]
+            fetch *= 2
+
+
+def spread_community(activations: Dict[int, float], graph_cache, community_of, iterations: int,
+                     decay: float, bridges: int = None, max_frontier: int = None, max_edges: int = None,
+                     epsilon: float = None, entity_graph=None) -> Tuple[Dict[int, float], dict]:
+    """
+    Two-level spreading: inside the seeds' communities, then across the strongest bridges.
+
+    Level 1 runs spread_activation on edges whose endpoints share one of
+    the seeds' communities. Every edge it skipped is a bridge candidate,
+    scored by (level-1 activation of its inside node × edge weight); the
+    top `bridges` targets seed level 2, which spreads inside the bridged
+    communities only (one iteration less: the bridge was the first hop). Level-2 activations are scaled by the strongest
+    bridge injection and added to level 1.
+
+    Args:
+        activations: Initial {node_id: activation} (e.g. ANN similarities)
+        graph_cache: Object with get_neighbors(node_id) and top_neighbors(node_id, limit)
+        community_of: node_id → community id (-1 = none), e.g. GraphMetrics.get_community
+        iterations / decay: As for spread_activation
+        bridges: Override SPREAD_COMMUNITY_BRIDGES (0 = stay inside the seed communities)
+        max_frontier / max_edges / epsilon: As for spread_activation; max_edges is shared by both levels
+        entity_graph: As for spread_activation; entity hops out of the communities are bridge candidates
+
+    Returns:
+        (activations normalized to max 1.0, stats dict)
+    """
+    bridges = SPREAD_COMMUNITY_BRIDGES if bridges is None else bridges
+    max_edges = SPREAD_MAX_EDGES if max_edges is None else max_edges
+
+    home = {community_of(nid) for nid in activations} - {-1}
+    view = _CommunityView(graph_cache, community_of, home)
+    inside, stats = spread_activation(activations, view, iterations, decay, max_frontier, max_edges, epsilon,
+                                      entity_graph)
+
+    # Strongest bridge per target community member, ranked by inside activation × weight
+    injections: Dict[int, float] = {}
+    for (u, v), w in view.crossings.items():
+        a = inside.get(u, 0.0) * w * decay
+        if a >= SPREAD_MIN_ACTIVATION and a > injections.get(v, 0.0):
+            injections[v] = a
+    chosen = heapq.nlargest(bridges, injections.items(), key=lambda x: x[1]) if bridges else []
+
+    result = dict(inside)
+    touched = stats["nodes_touched"]
+    bridged = {community_of(v) for v, _ in chosen}
+    remaining = max(max_edges - stats["edges_expanded"], 0) if max_edges else 0
+    if chosen and iterations > 1 and (remaining or not max_edges):
+        scale = chosen[0][1]
+        # The bridge itself was the first hop out of the home communities
+        outside, stats2 = spread_activation(dict(chosen), _CommunityView(graph_cache, community_of, bridged),
+                                            iterations - 1, decay, max_frontier, remaining, epsilon,
+                                            entity_graph)
+        for nid, a in outside.items():
+            result[nid] = result.get(nid, 0.0) + a * scale
+        max_activation = max(result.values())
+        if max_activation > 0:
+            result = {nid: a / max_activation for nid, a in result.items()}
+        touched += stats2["nodes_touched"]
+        for key in ("iterations", "edges_expanded", "entity_visits"):
+            stats[key] += stats2[key]
+        for key in ("frontier_truncated", "edge_budget_hit"):
+            stats[key] = stats[key] or stats2[key]
+
+    print(f"  Community spreading: {len(home)} seed communities, {len(view.crossings)} edges pruned, "
+          f"{len(chosen)} bridges into {len(bridged)} communities")
+    stats.update({
+        "nodes_touched": touched,
+        "communities": len(home),
+        "bridges": len(chosen),
+        "bridged_communities": len(bridged),
+        "pruned_edges": len(view.crossings),
+    })
+    return result, stats
+
+
+# ===== Personalized PageRank (Andersen–Chung–Lang forward push) =====
+
+ACTIVATION_MODE = os.getenv("ACTIVATION_MODE", "spreading").lower()  # spreading | ppr | diffusion | community
+ACTIVATION_MODES = ("spreading", "ppr", "diffusion", "community")
+PPR_ALPHA = float(os.getenv("PPR_ALPHA", "0.15"))  # teleport (restart) probability
+PPR_EPSILON = float(os.getenv("PPR_EPSILON", "1e-4"))  # residual tolerance per unit degree
+
+
+def ppr_push(seeds: Dict[int, float], graph_cache, alpha: float = None, epsilon: float = None,
+             max_edges: int = None) -> Tuple[Dict[int, float], dict]:
+    """
+    Approximate Personalized PageRank by forward push.
+
+    Residual mass starts on the seeds (normalized to sum 1). A node u is
+    pushed while r[u] >= epsilon * deg(u): it keeps alpha * r[u] as
+    PageRank and passes (1 - alpha) * r[u] to its neighbours in
+    proportion to edge weight. Total work is O(1 / (epsilon * alpha))
+    pushes regardless of graph size, so cost follows result locality.
+    Dangling nodes keep their whole residual.
+
+    Args:
+        seeds: {node_id: weight} personalization (e.g. ANN + BM25 candidates)
+        graph_cache: Object with get_neighbors(node_id)
+        alpha / epsilon: Override PPR_ALPHA / PPR_EPSILON
+        max_edges: Override SPREAD_MAX_EDGES (hard cap, 0 = unlimited)
+
+    Returns:
+        (PPR scores normalized to max 1.0, stats dict)
+    """
+    alpha = PPR_ALPHA if alpha is None else alpha
+    epsilon = PPR_EPSILON if epsilon is None else epsilon
+    max_edges = SPREAD_MAX_EDGES if max_edges is None else max_edges
+
+    total = sum(w for w in seeds.values() if w > 0)
+    if total <= 0:
+        return {}, {"iterations": 0, "nodes_touched": 0, "edges_expanded": 0,
+                    "edge_budget_hit": False, "residual": 0.0}
+
+    residual = {nid: w / total for nid, w in seeds.items() if w > 0}
+    scores: Dict[int, float] = {}
+    neighbor_cache = {}
+    edges_expanded = 0
+    pushes = 0
+    edge_budget_hit = False
+
+    def neighbors_of(node_id):
+        entry = neighbor_cache.get(node_id)
+        if entry is None:
+            nbrs = graph_cache.get_neighbors(node_id)
+            entry = (nbrs, sum(w for _, w, _ in nbrs))
+            neighbor_cache[node_id] = entry
+        return entry
+
+    # Cheap degree lookup (GraphCache.degree) keeps below-threshold nodes out of the queue
+    degree = getattr(graph_cache, "degree", None) or (lambda nid: len(neighbors_of(nid)[0]))
+
+    queue = list(residual)
+    queued = set(queue)
+    while queue:
+        u = queue.pop()
+        queued.discard(u)
+        r_u = residual.get(u, 0.0)
+        nbrs, weight_sum = neighbors_of(u)
+        if r_u < epsilon * max(len(nbrs), 1):
+            continue
+        if not nbrs or weight_sum <= 0:
+            scores[u] = scores.get(u, 0.0) + r_u
+            residual[u] = 0.0
+            continue
+        if max_edges and edges_expanded + len(nbrs) > max_edges:
+            edge_budget_hit = True
+            break
+
+        pushes += 1
+        edges_expanded += len(nbrs)
+        scores[u] = scores.get(u, 0.0) + alpha * r_u
+        residual[u] = 0.0
+        share = (1.0 - alpha) * r_u / weight_sum
+        for v, w, _ in nbrs:
+            r_v = residual.get(v, 0.0) + share * w
+            residual[v] = r_v
+            if v not in queued and r_v >= epsilon and r_v >= epsilon * max(degree(v), 1):
+                queue.append(v)
+                queued.add(v)
+
+    # Leftover residual: ppr_v(v) >= alpha, so alpha * r[v] is a lower-bound credit
+    for nid, r in residual.items():
+        if r > 0:
+            scores[nid] = scores.get(nid, 0.0) + alpha * r
+    remaining = sum(residual.values())
+
+    max_score = max(scores.values()) if scores else 0.0
+    if max_score > 0:
+        scores = {nid: s / max_score for nid, s in scores.items()}
+    print(f"  PPR push: {pushes} pushes, {len(scores)} nodes, edges={edges_expanded}, residual={remaining:.4f}")
+    return scores, {
+        "iterations": pushes,
+        "nodes_touched": len(set(scores) | set(residual)),
+        "edges_expanded": edges_expanded,
+        "edge_budget_hit": edge_budget_hit,
+        "residual": remaining,
+    }
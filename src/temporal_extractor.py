@@ -177,6 +177,119 @@ def resolve_season(season: str, direction: str, reference_date: datetime) -> Tup
     return reference_date, reference_date
 
 
+# Words (or stems) at least one of which every non-numeric pattern above needs;
+# every other pattern needs a digit. Text with neither cannot match (fast path).
+PREFILTER_KEYWORDS = (
+    # periods, weekdays (…day), today/yesterday, tomorrow/tonight
+    "day", "tomorrow", "tonight", "week", "month", "year", "summer", "winter", "spring", "fall", "autumn",
+    "morning", "afternoon", "evening",
+    "january", "february", "march", "april", "may", "june", "july",
+    "august", "september", "october", "november", "december",
+    # вчера also covers позавчера; мае/мая/маю are the only forms of "ма" the month pattern accepts
+    "вчера", "сегодня", "завтра", "недел", "месяц", "год", "лет", "зим", "весн", "осен",
+    "январ", "феврал", "март", "апрел", "мае", "мая", "маю", "июн", "июл", "август",
+    "сентябр", "октябр", "ноябр", "декабр",
+)
+_DIGIT = re.compile(r'\d')
+
+
+def _compile_patterns():
+    """
+    All patterns in one alternation, each in a named group (the pattern type,
+    prefixed en_/ru_ for relative ones). The alternation is a lookahead, so
+    matches of different patterns may overlap (e.g. "in january 15, 2025" is
+    both month_ref and written_date), as with one finditer per pattern.
+    Returns (regex, {group name: (rank, source, ptype, first inner group, inner groups)}).
+    """
+    parts, groups, offset = [], {}, 0
+    for source, patterns in (('explicit', EXPLICIT_DATE_PATTERNS), ('en', RELATIVE_PATTERNS_EN),
+                             ('ru', RELATIVE_PATTERNS_RU)):
+        for pattern, ptype in patterns:
+            name = ptype if source == 'explicit' else f"{source}_{ptype}"
+            inner = re.compile(pattern).groups
+            parts.append(f"(?P<{name}>{pattern})")
+            groups[name] = (len(groups), source, ptype, offset + 2, inner)
+            offset += inner + 1
+    # Every pattern starts at a word boundary; testing it first skips most positions
+    return re.compile(r'\b(?=' + '|'.join(parts) + ')'), groups
+
+
+TEMPORAL_REGEX, _PATTERN_GROUPS = _compile_patterns()
+
+
+def might_contain_temporal(text_lower: str) -> bool:
+    """Cheap test: False means no temporal pattern can match the (lowercased) text."""
+    return bool(_DIGIT.search(text_lower)) or any(k in text_lower for k in PREFILTER_KEYWORDS)
+
+
+def _find_matches(text_lower: str) -> List[Tuple[str, str, tuple]]:
+    """
+    (source, ptype, groups) for every pattern match, where groups[0] is the
+    matched text and groups[i] the pattern's i-th group. Ordered as the
+    per-pattern passes found them: by pattern, then by position.
+    """
+    found = []
+    for match in TEMPORAL_REGEX.finditer(text_lower):
+        name = match.lastgroup
+        rank, source, ptype, first, count = _PATTERN_GROUPS[name]
+        groups = (match.group(name),) + match.groups()[first - 1:first - 1 + count]
+        found.append((rank, match.start(), source, ptype, groups))
+    found.sort(key=lambda f: (f[0], f[1]))
+    matches = []
+    last_end = {}
+    for rank, start, source, ptype, groups in found:
+        # finditer never reports a pattern inside its own previous match
+        if start < last_end.get(rank, 0):
+            continue
+        last_end[rank] = start + len(groups[0])
+        matches.append((source, ptype, groups))
+    return matches
+
+
+def _resolve_explicit(ptype: str, g: tuple) -> Optional[datetime]:
+    if ptype == 'iso_date':
+        return datetime(int(g[1]), int(g[2]), int(g[3]))
+    if ptype == 'us_date':
+        return datetime(int(g[3]), int(g[1]), int(g[2]))
+    if ptype == 'written_date':
+        m = MONTH_MAP.get(g[1])
+        return datetime(int(g[3]), m, int(g[2])) if m else None
+    if ptype == 'written_date_eu':
+        m = MONTH_MAP.get(g[2])
+        return datetime(int(g[3]), m, int(g[1])) if m else None
+    return None
+
+
+def _resolve_relative_period(ptype: str, period: str, reference_date: datetime) -> Optional[Tuple[datetime, datetime]]:
+    """last/next/this + season, week or month"""
+    if period in SEASON_RANGES:
+        return resolve_season(period, ptype, reference_date)
+    if period == 'week':
+        if ptype == 'relative_past':
+            end = reference_date - timedelta(days=reference_date.weekday() + 1)
+            start = end - timedelta(days=6)
+        elif ptype == 'relative_future':
+            start = reference_date + timedelta(days=7 - reference_date.weekday())
+            end = start + timedelta(days=6)
+        else:
+            start = reference_date - timedelta(days=reference_date.weekday())
+            end = start + timedelta(days=6)
+        return start.replace(hour=0,minute=0,second=0), end.replace(hour=23,minute=59,second=59)
+    if period == 'month':
+        if ptype == 'relative_past':
+            first = reference_date.replace(day=1) - timedelta(days=1)
+            start = first.replace(day=1)
+            end = first
+        else:
+            start = reference_date.replace(day=1)
+            if start.month == 12:
+                end = start.replace(year=start.year+1, month=1, day=1) - timedelta(seconds=1)
+            else:
+                end = start.replace(month=start.month+1, day=1) - timedelta(seconds=1)
+        return start.replace(hour=0,minute=0,second=0), end.replace(hour=23,minute=59,second=59)
+    return None
+
+
 def extract_temporal_expressions(text: str, reference_date: Optional[datetime] = None) -> Dict:
     """
     Extract and resolve temporal expressions from text.
@@ -198,113 +311,41 @@ def extract_temporal_expressions(text: str, reference_date: Optional[datetime] =
     found_expressions = []
     resolved_ranges = []
     
-    # 1. Check explicit date patterns first (highest priority)
-    for pattern, ptype in EXPLICIT_DATE_PATTERNS:
-        for match in re.finditer(pattern, text_lower):
-            try:
-                if ptype == 'iso_date':
-                    y, m, d = int(match.group(1)), int(match.group(2)), int(match.group(3))
-                    dt = datetime(y, m, d)
-                    found_expressions.append(match.group(0))
-                    resolved_ranges.append((dt, dt.replace(hour=23, minute=59, second=59), 'explicit'))
-                elif ptype == 'us_date':
-                    m, d, y = int(match.group(1)), int(match.group(2)), int(match.group(3))
-                    dt = datetime(y, m, d)
-                    found_expressions.append(match.group(0))
-                    resolved_ranges.append((dt, dt.replace(hour=23, minute=59, second=59), 'explicit'))
-                elif ptype == 'written_date':
-                    m = MONTH_MAP.get(match.group(1))
-                    d, y = int(match.group(2)), int(match.group(3))
-                    if m:
-                        dt = datetime(y, m, d)
-                        found_expressions.append(match.group(0))
-                        resolved_ranges.append((dt, dt.replace(hour=23, minute=59, second=59), 'explicit'))
-                elif ptype == 'written_date_eu':
-                    d = int(match.group(1))
-                    m = MONTH_MAP.get(match.group(2))
-                    y = int(match.group(3))
-                    if m:
-                        dt = datetime(y, m, d)
-                        found_expressions.append(match.group(0))
-                        resolved_ranges.append((dt, dt.replace(hour=23, minute=59, second=59), 'explicit'))
-            except (ValueError, TypeError):
-                continue
+    # Most notes have no temporal content: skip the regex pass entirely
+    matches = _find_matches(text_lower) if might_contain_temporal(text_lower) else []
 
-    
-    # 2. Check relative patterns (English)
-    for pattern, ptype in RELATIVE_PATTERNS_EN:
-        for match in re.finditer(pattern, text_lower):
-            expr = match.group(0)
-            found_expressions.append(expr)
+    # Matches come explicit dates first (highest priority), then English, then Russian relative ones
+    for source, ptype, g in matches:
+        if source == 'explicit':
             try:
-                if ptype == 'relative_day':
-                    start, end = resolve_relative_day(match.group(1), reference_date)
-                    resolved_ranges.append((start, end, 'relative'))
-                elif ptype == 'relative_ago':
-                    amount = int(match.group(1))
-                    unit = match.group(2)
-                    start, end = resolve_relative_ago(amount, unit, reference_date)
-                    resolved_ranges.append((start, end, 'relative'))
-                elif ptype == 'month_ref':
-                    month_str = match.group(1)
-                    year = int(match.group(2)) if match.group(2) else None
-                    start, end = resolve_month_ref(month_str, year, reference_date)
-                    resolved_ranges.append((start, end, 'relative'))
-                elif ptype in ('relative_past', 'relative_future', 'relative_current'):
-                    period = match.group(2)
-                    if period in SEASON_RANGES:
-                        start, end = resolve_season(period, ptype, reference_date)
-                        resolved_ranges.append((start, end, 'relative'))
-                    elif period == 'week':
-                        if ptype == 'relative_past':
-                            end = reference_date - timedelta(days=reference_date.weekday() + 1)
-                            start = end - timedelta(days=6)
-                        elif ptype == 'relative_future':
-                            start = reference_date + timedelta(days=7 - reference_date.weekday())
-                            end = start + timedelta(days=6)
-                        else:
-                            start = reference_date - timedelta(days=reference_date.weekday())
-                            end = start + timedelta(days=6)
-                        resolved_ranges.append((start.replace(hour=0,minute=0,second=0), end.replace(hour=23,minute=59,second=59), 'relative'))
-                    elif period == 'month':
-                        if ptype == 'relative_past':
-                            first = reference_date.replace(day=1) - timedelta(days=1)
-                            start = first.replace(day=1)
-                            end = first
-                        else:
-                            start = reference_date.replace(day=1)
-                            if start.month == 12:
-                                end = start.replace(year=start.year+1, month=1, day=1) - timedelta(seconds=1)
-                            else:
-                                end = start.replace(month=start.month+1, day=1) - timedelta(seconds=1)
-                        resolved_ranges.append((start.replace(hour=0,minute=0,second=0), end.replace(hour=23,minute=59,second=59), 'relative'))
-            except (ValueError, TypeError):
-                continue
-    
-    # 3. Check relative patterns (Russian)
-    for pattern, ptype in RELATIVE_PATTERNS_RU:
-        for match in re.finditer(pattern, text_lower):
-            expr = match.group(0)
-            found_expressions.append(expr)
-            try:
-                if ptype == 'relative_day':
-                    start, end = resolve_relative_day(match.group(1), reference_date)
-                    resolved_ranges.append((start, end, 'relative'))
-                elif ptype == 'relative_ago':
-                    amount = int(match.group(1))
-                    unit = match.group(2)
-                    start, end = resolve_relative_ago(amount, unit, reference_date)
-                    resolved_ranges.append((start, end, 'relative'))
-                elif ptype == 'month_ref':
-                    month_str = match.group(1)
-                    year = int(match.group(2)) if match.lastindex >= 2 and match.group(2) else None
-                    start, end = resolve_month_ref(month_str, year, reference_date)
-                    resolved_ranges.append((start, end, 'relative'))
+                dt = _resolve_explicit(ptype, g)
             except (ValueError, TypeError):
                 continue
+            if dt:
+                found_expressions.append(g[0])
+                resolved_ranges.append((dt, dt.replace(hour=23, minute=59, second=59), 'explicit'))
+            continue
 
-    
-    # 4. Select best range: prefer explicit > relative, then most specific
+        found_expressions.append(g[0])
+        try:
+            if ptype == 'relative_day':
+                start, end = resolve_relative_day(g[1], reference_date)
+                resolved_ranges.append((start, end, 'relative'))
+            elif ptype == 'relative_ago':
+                start, end = resolve_relative_ago(int(g[1]), g[2], reference_date)
+                resolved_ranges.append((start, end, 'relative'))
+            elif ptype == 'month_ref':
+                year = int(g[2]) if g[2] else None
+                start, end = resolve_month_ref(g[1], year, reference_date)
+                resolved_ranges.append((start, end, 'relative'))
+            elif source == 'en' and ptype in ('relative_past', 'relative_future', 'relative_current'):
+                resolved = _resolve_relative_period(ptype, g[2], reference_date)
+                if resolved:
+                    resolved_ranges.append((*resolved, 'relative'))
+        except (ValueError, TypeError):
+            continue
+
+    # Select best range: prefer explicit > relative, then most specific
     if not resolved_ranges:
         return {
             "expressions": found_expressions if found_expressions else [],
@@ -323,6 +364,18 @@ def extract_temporal_expressions(text: str, reference_date: Optional[datetime] =
     }
 
 
+def extract_temporal_batch(texts: List[str], reference_dates=None) -> List[Dict]:
+    """
+    extract_temporal_expressions for many texts (backfill, bulk ingest).
+    reference_dates: one datetime for all texts, or a list with one per text
+    (None entries = now).
+    """
+    now = datetime.now()
+    if reference_dates is None or isinstance(reference_dates, datetime):
+        reference_dates = [reference_dates or now] * len(texts)
+    return [extract_temporal_expressions(text, ref or now) for text, ref in zip(texts, reference_dates)]
+
+
 def compute_temporal_overlap(query_start: str, query_end: str, 
                               note_start: str, note_end: str) -> float:
     """
@@ -5,7 +5,7 @@ Handles version history for notes
 """
 
 from datetime import datetime
-from database import get_connection
+from database import get_connection, content_hash
 
 
 def save_note_version(note_id, content, category, importance, 
@@ -102,10 +102,11 @@ def restore_note_version(note_id, version_number):
             UPDATE nodes
             SET content = ?, category = ?, importance = ?,
                 emotional_tone = ?, emotional_intensity = ?, emotional_reflection = ?,
-                timestamp = ?
+                timestamp = ?, content_hash = ?
             WHERE id = ?
         """, (version_dict['content'], version_dict['category'], version_dict['importance'],
               version_dict['emotional_tone'], version_dict['emotional_intensity'],
-              version_dict['emotional_reflection'], datetime.now().isoformat(), note_id))
+              version_dict['emotional_reflection'], datetime.now().isoformat(),
+              content_hash(version_dict['content']), note_id))
         
         return cursor.rowcount > 0
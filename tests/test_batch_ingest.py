@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+Tests for batch note ingestion: create_notes_batch (one transaction) and the
+batch updates of the ANN index, BM25 index and graph cache.
+"""
+import pytest
+import sqlite3
+import tempfile
+import sys
+import os
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+
+@pytest.mark.integration
+class TestCreateNotesBatch:
+
+    def setup_method(self):
+        self.tmp = tempfile.NamedTemporaryFile(suffix=".db", delete=False)
+        self.tmp.close()
+        import database
+        database.DB_PATH = self.tmp.name
+        database.init_database()
+        self.db = database
+
+    def teardown_method(self):
+        os.unlink(self.tmp.name)
+
+    def test_ids_entities_and_edges(self):
+        existing = self.db.create_node("Existing note", "test")
+        self.db.delete_node(self.db.create_node("Deleted note", "test"))  # its id is never reused
+        python = self.db.get_or_create_entity("Python", "tech")
+        notes = [{"content": f"Batch note {i}", "category": "batch", "embedding": b"\x00" * 8} for i in range(3)]
+        written = self.db.create_notes_batch(
+            notes,
+            [[("python", "tech"), ("Docker", "tech")], [("docker", "tech")], []],
+            edges=[(0, existing, 0.7, "semantic"), (1, existing, 0.6, "semantic")],
+            batch_edges=[(1, 0, 0.8, "semantic"), (2, 1, 0.75, "semantic")])
+
+        assert written["node_ids"] == [existing + 2, existing + 3, existing + 4]
+        assert self.db.create_node("After batch", "test") == existing + 5
+        assert [self.db.get_node(n)["content"] for n in written["node_ids"]] == [n["content"] for n in notes]
+
+        docker = self.db.get_or_create_entity("docker")
+        assert written["entity_ids"] == [[python, docker], [docker], []]
+        assert sorted(self.db.get_all_node_entities()) == sorted(
+            [(written["node_ids"][0], python), (written["node_ids"][0], docker), (written["node_ids"][1], docker)])
+
+        a, b, c = written["node_ids"]
+        stored = {(e["source_id"], e["target_id"]): e["weight"] for e in self.db.get_all_edges()}
+        assert stored == {(existing, a): 0.7, (existing, b): 0.6, (a, b): 0.8, (b, c): 0.75}
+        assert sorted(written["edges"]) == sorted((s, t, w, "semantic") for (s, t), w in stored.items())
+
+    def test_existing_edges_keep_max_weight(self):
+        a, b = self.db.create_node("A", "test"), self.db.create_node("B", "test")
+        self.db.create_edge(a, b, weight=0.9)
+        written = self.db.create_notes_batch([{"content": "C"}], edges=[(0, a, 0.6, "semantic")])
+        c = written["node_ids"][0]
+        self.db.create_notes_batch([{"content": "D"}], edges=[(0, c, 0.95, "semantic"), (0, b, 0.5, "semantic")])
+        weights = {(e["source_id"], e["target_id"]): e["weight"] for e in self.db.get_all_edges()}
+        assert weights[(a, b)] == 0.9 and weights[(a, c)] == 0.6
+
+    def test_failure_rolls_back_whole_batch(self):
+        with pytest.raises(Exception):
+            self.db.create_notes_batch([{"content": "ok"}, {"content": None}], [[("Python", "tech")], []])
+        conn = sqlite3.connect(self.tmp.name)
+        counts = [conn.execute(f"SELECT COUNT(*) FROM {t}").fetchone()[0] for t in ("nodes", "entities", "node_entities")]
+        conn.close()
+        assert counts == [0, 0, 0]
+
+    def test_materialised_entity_edges(self):
+        first = self.db.create_notes_batch([{"content": "A"}], [[("robots", "concept")]])["node_ids"][0]
+        written = self.db.create_notes_batch([{"content": "B"}, {"content": "C"}],
+                                             [[("Robots", "concept")], [("robots", "concept")]],
+                                             entity_edge_weight=0.6)
+        b, c = written["node_ids"]
+        assert sorted((s, t) for s, t, _, et in written["edges"] if et == "entity") == [(first, b), (first, c), (b, c)]
+
+    def test_entity_edges_capped(self):
+        """Materialised entity edges skip entities above max_df and keep the top-K strongest notes"""
+        common = self.db.create_notes_batch([{"content": f"Common {i}"} for i in range(5)],
+                                            [[("memory", "concept")]] * 5)["node_ids"]
+        rare = self.db.create_notes_batch([{"content": "Rare"}], [[("memory", "concept"), ("hnsw", "tech")]])
+        written = self.db.create_notes_batch([{"content": "New"}], [[("Memory", "concept"), ("HNSW", "tech")]],
+                                             entity_edge_weight=0.6, entity_link_max_df=4, entity_link_top_k=1)
+        new, = written["node_ids"]
+        assert [(s, t) for s, t, _, et in written["edges"] if et == "entity"] == [(rare["node_ids"][0], new)]
+        assert self.db.get_co_entity_node_ids(new, written["entity_ids"][0], max_df=10)[:2] == [
+            (rare["node_ids"][0], pytest.approx(1 / np.log1p(7) + 1 / np.log1p(2))),
+            (common[-1], pytest.approx(1 / np.log1p(7)))]
+
+    def test_create_edges_and_entity_links(self):
+        a, b = self.db.create_node("A", "test"), self.db.create_node("B", "test")
+        rows = self.db.create_edges([(b, a, 0.5, "semantic"), (a, b, 0.7, "semantic"), (b, a, 0.6, "entity")])
+        assert sorted(rows) == [(a, b, 0.6, "entity"), (a, b, 0.7, "semantic")]
+        self.db.create_edges([(a, b, 0.4, "semantic")])
+        assert sorted((e["edge_type"], e["weight"]) for e in self.db.get_all_edges()) == [("entity", 0.6), ("semantic", 0.7)]
+        eid = self.db.get_or_create_entity("Python")
+        self.db.link_node_to_entities(a, [eid, eid])
+        self.db.link_node_to_entities(a, [eid])
+        assert self.db.get_all_node_entities() == [(a, eid)]
+
+
+@pytest.mark.unit
+class TestBatchIndexUpdates:
+
+    def test_bm25_add_documents_matches_sequential(self):
+        from bm25_index import BM25Index
+        docs = [(1, "python docker deploy"), (2, "docker compose"), (3, "python tests"), (2, "docker swarm")]
+        one, many = BM25Index(), BM25Index()
+        one.build([(0, "seed document")])
+        many.build([(0, "seed document")])
+        for node_id, content in docs:
+            one.add_document(node_id, content)
+        many.add_documents(docs)
+        assert many.search("docker python") == pytest.approx(one.search("docker python"))
+
+    def test_graph_cache_add_edges_matches_sequential(self):
+        from graph_cache import GraphCache
+        edges = [(1, 2, 0.5, "semantic"), (2, 3, 0.7, "entity"), (1, 2, 0.9, "semantic"), (3, 1, 0.4, "semantic")]
+        one, many = GraphCache(), GraphCache()
+        one.build([])
+        many.build([])
+        for s, t, w, et in edges:
+            one.add_edge(s, t, w, et)
+        many.add_edges(edges)
+        for node in (1, 2, 3):
+            assert sorted(many.get_neighbors(node)) == sorted(one.get_neighbors(node))
+        assert many.edge_count == one.edge_count == 6
+
+    def test_ann_add_vectors(self):
+        from ann_index import ANNIndex
+        rng = np.random.default_rng(0)
+        vectors = rng.normal(size=(20, 16)).astype(np.float32)
+        index = ANNIndex(dimension=16)
+        index.max_elements = 8  # forces a resize inside the batch
+        assert index.add_vectors(list(range(100, 120)), vectors) == 20
+        assert index.vector_count == 20
+        assert index.search(vectors[7], k=1, min_similarity=0.0)[0][0] == 107
+
+
+@pytest.mark.integration
+class TestExactDuplicates:
+
+    def setup_method(self):
+        self.tmp = tempfile.NamedTemporaryFile(suffix=".db", delete=False)
+        self.tmp.close()
+        import database
+        database.DB_PATH = self.tmp.name
+        database.init_database()
+        self.db = database
+
+    def teardown_method(self):
+        os.unlink(self.tmp.name)
+
+    def test_content_hash_normalisation(self):
+        from database import content_hash
+        assert content_hash("Deploy  the\nAPI ") == content_hash("Deploy the API")
+        assert content_hash("café") == content_hash("café")  # NFC
+        assert content_hash("Deploy the API") != content_hash("deploy the api")
+
+    def test_lookup_returns_oldest_and_follows_edits(self):
+        from database import content_hash
+        first = self.db.create_node("Deploy the API", "test")
+        self.db.create_node("Deploy  the API", "test")  # forced copy
+        self.db.create_notes_batch([{"content": "Batch note"}])
+        other = self.db.create_node("Other", "test")
+        found = self.db.find_exact_duplicates([content_hash("Deploy the API"), content_hash("Batch note"),
+                                               content_hash("Missing")])
+        assert found[content_hash("Deploy the API")] == (first, "Deploy the API")
+        assert content_hash("Batch note") in found and content_hash("Missing") not in found
+        assert self.db.find_exact_duplicates([]) == {}
+
+        sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'migrations'))
+        from migrate_versioning import migrate_up
+        migrate_up(self.tmp.name)
+        self.db.save_note_version(other, "Other", "test", "normal")
+        self.db.update_node(other, content="Edited")
+        assert self.db.find_exact_duplicates([content_hash("Edited")])[content_hash("Edited")][0] == other
+        assert not self.db.find_exact_duplicates([content_hash("Other")])
+        assert self.db.restore_note_version(other, 1)
+        assert content_hash("Other") in self.db.find_exact_duplicates([content_hash("Other")])
+
+    def test_migration_backfills_hash(self):
+        from database import content_hash
+        node = self.db.create_node("Old note", "test")
+        conn = sqlite3.connect(self.tmp.name)
+        conn.execute("UPDATE nodes SET content_hash = NULL")
+        conn.commit()
+        conn.close()
+        self.db.init_database()
+        assert self.db.find_exact_duplicates([content_hash("Old note")]) == {
+            content_hash("Old note"): (node, "Old note")}
+
+    def test_sleep_scan_reports_exact_groups(self):
+        from sleep_compute import step_duplicate_scan
+        embedding = np.ones(4, dtype=np.float32).tobytes()
+        ids = [self.db.create_node(text, "test", embedding=embedding)
+               for text in ("Same note", "Different note", "Same  note", "Same note")]
+        result = step_duplicate_scan(self.tmp.name)
+        assert result["exact_groups"] == [[ids[0], ids[2], ids[3]]]
+        assert result["exact_duplicates"] == 2
+        # pairs inside the exact group are not reported again as near-duplicates
+        assert sorted((a, b) for a, b, _ in result["pairs"]) == [(ids[0], ids[1]), (ids[1], ids[2]), (ids[1], ids[3])]
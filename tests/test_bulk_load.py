@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Tests for scripts/bulk_load.py: streaming input, record formats, batching
+on record boundaries and the resume checkpoint.
+"""
+import io
+import json
+import pytest
+import tempfile
+import sys
+import os
+from concurrent.futures import Future
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+
+LOCOMO = {"conversation": {
+    "speaker_a": "Ann", "speaker_b": "Ben",
+    "session_1": [{"speaker": "Ann", "text": "Hi"}, {"speaker": "Ben", "text": "Hello"}],
+    "session_1_date_time": "1 May 2023",
+    "session_2": [{"speaker": "Ben", "text": "Back again"}],
+}}
+
+
+@pytest.mark.unit
+class TestBulkLoadInput:
+
+    def test_json_array_streams_across_chunks(self):
+        from bulk_load import iter_json_array
+        items = [{"content": f"note {i} with ] and , inside", "n": [i, {"x": "}"}]} for i in range(50)]
+        text = " \n" + json.dumps(items, indent=1)
+        assert list(iter_json_array(io.StringIO(text), chunk_size=7)) == items
+        assert list(iter_json_array(io.StringIO("[]"))) == []
+
+    def test_record_formats(self, tmp_path):
+        from bulk_load import iter_records, iter_batches, detect_format, record_notes
+        export = tmp_path / "export.json"
+        export.write_text(json.dumps({"metadata": {}, "nodes": [
+            {"id": 7, "content": "Old note", "category": "work", "timestamp": "2023-01-02T03:04:05",
+             "emotional_tone": None}]}))
+        assert record_notes(next(iter_records(str(export))), "notes") == [
+            {"content": "Old note", "category": "work", "timestamp": "2023-01-02T03:04:05"}]
+
+        ndjson = tmp_path / "conv.ndjson"
+        ndjson.write_text(json.dumps(LOCOMO) + "\n\n" + json.dumps(LOCOMO) + "\n")
+        records = list(iter_records(str(ndjson)))
+        assert detect_format(records[0]) == "locomo"
+        notes = record_notes(records[0], "locomo")
+        assert [n["content"] for n in notes] == ["[Ann & Ben — 1 May 2023]\nAnn: Hi\nBen: Hello",
+                                                 "[Ann & Ben — ]\nBen: Back again"]
+
+        skill = {"name": "docker-optimization", "purpose": "Smaller images", "tags": ["docker"]}
+        assert detect_format(skill) == "skills"
+        assert record_notes(skill, "skills", "devops")[0] == {
+            "content": "SKILL LEARNED: docker-optimization\n\nPurpose: Smaller images\n\nTags: docker",
+            "category": "devops", "importance": "normal"}
+
+        # Batches end on record boundaries; resume skips whole records
+        batches = list(iter_batches(iter(records * 3), "auto", None, 3, skip=0))
+        assert [(consumed, len(notes)) for consumed, notes in batches] == [(2, 4), (4, 4), (6, 4), (6, 0)]
+        assert [c for c, _ in iter_batches(iter(records * 3), "auto", None, 3, skip=4)] == [6, 6]
+
+
+@pytest.mark.integration
+class TestBulkLoadCheckpoint:
+
+    def setup_method(self):
+        self.tmp = tempfile.NamedTemporaryFile(suffix=".db", delete=False)
+        self.tmp.close()
+        import database
+        database.DB_PATH = self.tmp.name
+        database.init_database()
+        self.db = database
+
+    def teardown_method(self):
+        os.unlink(self.tmp.name)
+
+    def write(self, state, consumed, notes):
+        from bulk_load import _write_batch
+        future = Future()
+        future.set_result(np.ones((len(notes), 4), dtype=np.float32))
+        _write_batch("bulk_load:test", state, consumed, notes, future, lambda texts: [[("Python", "tech")] for _ in texts],
+                     False, 0.6, 0, 0)
+
+    def test_batch_and_checkpoint_commit_together(self):
+        state = {"size": 1, "records": 0, "notes": 0, "first_id": None, "last_id": None,
+                 "loaded": False, "linked": False}
+        self.write(state, 2, [{"content": "A", "timestamp": "2023-05-01T00:00:00"}, {"content": "B"}])
+        assert (state["records"], state["notes"], state["first_id"], state["last_id"]) == (2, 2, 1, 2)
+        assert json.loads(self.db.get_setting("bulk_load:test")) == state
+        assert self.db.get_node(1)["timestamp"] == "2023-05-01T00:00:00"
+
+        with pytest.raises(Exception):  # second note violates NOT NULL: batch and checkpoint roll back
+            self.write(state, 3, [{"content": "C"}, {"content": None}])
+        assert state["records"] == 2 and json.loads(self.db.get_setting("bulk_load:test"))["records"] == 2
+        assert len(self.db.get_all_node_entities()) == 2
+        self.write(state, 3, [{"content": "C"}])
+        assert (state["records"], state["last_id"]) == (3, 3)
+
+    def test_exact_duplicates_dropped_before_encoding(self):
+        from bulk_load import drop_exact_duplicates
+        from database import content_hash
+        self.db.create_node("Stored note", "test")
+        inflight = {content_hash("Encoding elsewhere")}
+        notes = [{"content": c} for c in ("Stored  note", "New", "Encoding elsewhere", "New", "Other")]
+        kept, dropped = drop_exact_duplicates(notes, inflight)
+        assert [n["content"] for n in kept] == ["New", "Other"] and dropped == 3
+        assert inflight == {content_hash(c) for c in ("Encoding elsewhere", "New", "Other")}
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Stress tests — concurrent adds and searches on the shared in-memory indexes
+(ANN, BM25, graph cache), as happens under threaded Flask-SocketIO serving.
+"""
+import pytest
+import threading
+import numpy as np
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+pytestmark = pytest.mark.integration
+
+WRITERS = 4
+READERS = 4
+ADDS_PER_WRITER = 300
+
+
+def run_threads(writer, reader):
+    """Run writer/reader functions in parallel, collect exceptions."""
+    errors = []
+    done = threading.Event()
+
+    def wrap(fn, *args):
+        try:
+            fn(*args)
+        except Exception as e:  # pragma: no cover - reported via assert
+            errors.append(repr(e))
+
+    def read_loop(i):
+        while not done.is_set():
+            reader(i)
+
+    writers = [threading.Thread(target=wrap, args=(writer, i)) for i in range(WRITERS)]
+    readers = [threading.Thread(target=wrap, args=(read_loop, i)) for i in range(READERS)]
+    for t in readers + writers:
+        t.start()
+    for t in writers:
+        t.join()
+    done.set()
+    for t in readers:
+        t.join()
+    return errors
+
+
+class TestConcurrentBM25:
+
+    def test_parallel_add_and_search(self):
+        from bm25_index import BM25Index
+        index = BM25Index()
+        index.build([(0, "seed document about graphs")])
+
+        def writer(w):
+            for i in range(ADDS_PER_WRITER):
+                nid = 1 + w * ADDS_PER_WRITER + i
+                index.add_document(nid, f"note {nid} about memory graph term{i % 17}")
+
+        def reader(_):
+            scores = index.search("memory graph term3", top_k=20)
+            assert all(s > 0 for s in scores.values())
+
+        errors = run_threads(writer, reader)
+        assert errors == []
+        n_docs, avg_dl = index._stats
+        assert n_docs == 1 + WRITERS * ADDS_PER_WRITER
+        assert len(index._doc_terms) == n_docs
+        assert index._doc_freqs["memory"] == WRITERS * ADDS_PER_WRITER
+
+    def test_readd_document_keeps_stats_consistent(self):
+        from bm25_index import BM25Index
+        index = BM25Index()
+        index.build([(1, "alpha beta")])
+        index.add_document(1, "alpha gamma delta")
+        assert index._stats == (1, 3.0)
+        assert index._doc_freqs.get("beta") == 0
+        assert index._doc_freqs["alpha"] == 1
+
+
+class TestConcurrentGraphCache:
+
+    def test_parallel_add_edge_and_traversal(self):
+        from graph_cache import GraphCache
+        cache = GraphCache()
+        cache.build([{"source_id": 0, "target_id": 1, "weight": 0.5, "edge_type": "semantic"}])
+
+        def writer(w):
+            for i in range(ADDS_PER_WRITER):
+                cache.add_edge(0, 2 + w * ADDS_PER_WRITER + i, weight=0.6, edge_type="entity")
+
+        def reader(_):
+            for neighbor_id, weight, edge_type in cache.get_neighbors(0):
+                assert 0 <= weight <= 1
+            cache.get_stats()
+
+        errors = run_threads(writer, reader)
+        assert errors == []
+        assert len(cache.get_neighbors(0)) == 1 + WRITERS * ADDS_PER_WRITER
+
+    def test_delta_grows_during_reconcile_and_stats(self):
+        """Writers add delta rows for new nodes while readers walk the whole delta"""
+        from graph_cache import GraphCache
+        cache = GraphCache()
+        cache.build([{"source_id": 0, "target_id": 1, "weight": 0.5, "edge_type": "semantic"}])
+
+        def writer(w):
+            for i in range(ADDS_PER_WRITER):
+                node = 2 + w * ADDS_PER_WRITER + i
+                cache.add_edge(node, node + 100000, weight=0.6)
+
+        def reader(_):
+            cache.get_stats()
+            cache.reconcile(all_edges=[], heal=False)
+
+        errors = run_threads(writer, reader)
+        assert errors == []
+        assert cache.get_stats()["node_count"] == 2 + 2 * WRITERS * ADDS_PER_WRITER
+
+
+class TestConcurrentANN:
+
+    def test_parallel_add_vector_and_search(self):
+        import ann_index
+        index = ann_index.ANNIndex(dimension=16)
+        index.max_elements = 64  # force resizes while readers are active
+        index.index.resize_index(64)
+        rng = np.random.default_rng(0)
+        vectors = rng.standard_normal((WRITERS * ADDS_PER_WRITER, 16)).astype(np.float32)
+        index.add_vector(10 ** 6, vectors[0])
+
+        def writer(w):
+            for i in range(ADDS_PER_WRITER):
+                nid = w * ADDS_PER_WRITER + i
+                assert index.add_vector(nid, vectors[nid])
+
+        def reader(i):
+            results = index.search(vectors[i], k=5, min_similarity=-1.0)
+            assert len(results) >= 1
+
+        errors = run_threads(writer, reader)
+        assert errors == []
+        assert index.index.get_current_count() == WRITERS * ADDS_PER_WRITER + 1
+        assert len(index.node_ids) == WRITERS * ADDS_PER_WRITER + 1
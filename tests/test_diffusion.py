@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Tests for precomputed diffusion vectors (sleep-compute step + query-time
+activation_mode="diffusion").
+"""
+import pytest
+import sqlite3
+import tempfile
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+
+# Two clusters joined by a bridge: 1-2-3-4 (path) and 10-11-12 (triangle), 4-10 bridge
+EDGES = [
+    (1, 2, 0.8, "semantic"), (2, 3, 0.6, "semantic"), (3, 4, 0.5, "entity"),
+    (4, 10, 0.4, "semantic"), (10, 11, 0.9, "semantic"), (11, 12, 0.7, "entity"),
+    (10, 12, 0.3, "semantic"), (2, 3, 0.4, "entity"),
+]
+NODES = [1, 2, 3, 4, 10, 11, 12, 20]
+
+
+def make_db(path):
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE nodes (id INTEGER PRIMARY KEY, content TEXT, embedding BLOB)")
+    conn.execute("""CREATE TABLE edges (id INTEGER PRIMARY KEY AUTOINCREMENT, source_id INTEGER,
+                    target_id INTEGER, weight REAL, edge_type TEXT, created_at TEXT,
+                    UNIQUE(source_id, target_id, edge_type))""")
+    conn.executemany("INSERT INTO nodes (id, content) VALUES (?, ?)", [(n, f"note {n}") for n in NODES])
+    conn.executemany("INSERT INTO edges (source_id, target_id, weight, edge_type) VALUES (?, ?, ?, ?)", EDGES)
+    conn.commit()
+    conn.close()
+
+
+def make_cache(db_path):
+    from graph_cache import GraphCache
+    conn = sqlite3.connect(db_path)
+    rows = conn.execute("SELECT source_id, target_id, weight, edge_type FROM edges").fetchall()
+    conn.close()
+    cache = GraphCache()
+    cache.build([{"source_id": s, "target_id": t, "weight": w, "edge_type": et} for s, t, w, et in rows])
+    return cache
+
+
+@pytest.mark.unit
+class TestDiffusionVectors:
+
+    def setup_method(self):
+        self.tmp = tempfile.NamedTemporaryFile(suffix=".db", delete=False)
+        self.tmp.close()
+        self.db_path = self.tmp.name
+        make_db(self.db_path)
+
+    def teardown_method(self):
+        os.unlink(self.db_path)
+
+    def test_sum_of_vectors_matches_live_spreading(self):
+        """Unbounded live spreading is linear: the seed-vector sum reproduces it"""
+        from diffusion import refresh_diffusion_vectors, DiffusionStore
+        from spreading import spread_activation
+        refresh_diffusion_vectors(self.db_path, hops=3, decay=0.7, top_k=100)
+        store = DiffusionStore(self.db_path)
+        assert store.load() == len(NODES)
+
+        cache = make_cache(self.db_path)
+        seeds = {1: 0.9, 11: 0.5}
+        live, _ = spread_activation(dict(seeds), cache, 3, 0.7, max_frontier=0, max_edges=0, epsilon=0)
+        approx, stats = store.diffuse(seeds, cache)
+        assert stats["precomputed"] == 2 and stats["fallback"] == 0
+        assert approx == pytest.approx(live, rel=1e-5)
+
+    def test_top_k_truncation(self):
+        from diffusion import refresh_diffusion_vectors, DiffusionStore
+        refresh_diffusion_vectors(self.db_path, hops=3, decay=0.7, top_k=2)
+        store = DiffusionStore(self.db_path)
+        store.load()
+        ids, scores = store.get(1)
+        assert len(ids) == 2
+        assert set(ids.tolist()) <= {1, 2, 3}  # strongest entries are within the path cluster
+        assert scores[0] >= scores[1]
+        assert store.get(20)[0].tolist() == [20]  # isolated node: only itself
+
+    def test_incremental_refresh_recomputes_only_neighbourhood(self):
+        from diffusion import refresh_diffusion_vectors
+        first = refresh_diffusion_vectors(self.db_path, hops=2, decay=0.7, top_k=10)
+        assert first["full"] and first["computed"] == len(NODES)
+
+        unchanged = refresh_diffusion_vectors(self.db_path, hops=2, decay=0.7, top_k=10)
+        assert unchanged["computed"] == 0
+
+        # Weight change on 11-12: both adjacencies change, plus 1 hop around them (10)
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("UPDATE edges SET weight = 0.95 WHERE source_id = 11 AND target_id = 12")
+        conn.commit()
+        conn.close()
+        partial = refresh_diffusion_vectors(self.db_path, hops=2, decay=0.7, top_k=10)
+        assert partial["changed"] == 2
+        assert partial["computed"] == 4  # 11, 12 + holders 10 and 4 (vectors shorter than top_k)
+        assert not partial["full"]
+
+    def test_parameter_change_recomputes_everything(self):
+        from diffusion import refresh_diffusion_vectors
+        refresh_diffusion_vectors(self.db_path, hops=2, decay=0.7, top_k=10)
+        result = refresh_diffusion_vectors(self.db_path, hops=3, decay=0.7, top_k=10)
+        assert result["full"] and result["computed"] == len(NODES)
+
+    def test_deleted_node_vector_removed(self):
+        from diffusion import refresh_diffusion_vectors, DiffusionStore
+        refresh_diffusion_vectors(self.db_path, hops=2, decay=0.7, top_k=10)
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("DELETE FROM nodes WHERE id = 12")
+        conn.execute("DELETE FROM edges WHERE source_id = 12 OR target_id = 12")
+        conn.commit()
+        conn.close()
+        result = refresh_diffusion_vectors(self.db_path, hops=2, decay=0.7, top_k=10)
+        assert result["removed"] == 1
+        store = DiffusionStore(self.db_path)
+        store.load()
+        assert store.get(12) is None
+        assert 12 not in store.get(11)[0].tolist()
+
+    def test_dry_run_writes_nothing(self):
+        from diffusion import refresh_diffusion_vectors, DiffusionStore
+        result = refresh_diffusion_vectors(self.db_path, dry_run=True)
+        assert result["dirty"] == len(NODES) and result["computed"] == 0
+        assert DiffusionStore(self.db_path).load() == 0
+
+    def test_missing_seed_falls_back_to_live_vector(self):
+        """Notes added after the last sleep-compute run are diffused over the graph cache"""
+        from diffusion import refresh_diffusion_vectors, DiffusionStore
+        refresh_diffusion_vectors(self.db_path, hops=3, decay=0.7, top_k=100)
+        store = DiffusionStore(self.db_path)
+        store.load()
+        cache = make_cache(self.db_path)
+        precomputed, _ = store.diffuse({3: 1.0}, cache)
+
+        store._vectors.pop(3)
+        live, stats = store.diffuse({3: 1.0}, cache)
+        assert stats["fallback"] == 1 and stats["edges_expanded"] > 0
+        assert live == pytest.approx(precomputed, rel=1e-5)
+
+    def test_live_fallback_stops_at_edge_budget(self):
+        """A hub seed without a vector reads its strongest edges only, and no rows once the budget is spent"""
+        from diffusion import DiffusionStore
+        from graph_cache import GraphCache
+        cache = GraphCache()
+        cache.build([{"source_id": 0, "target_id": i, "weight": i / 1000, "edge_type": "semantic"}
+                     for i in range(1, 1001)])
+        rows = []
+        top_neighbors = cache.top_neighbors
+        cache.top_neighbors = lambda nid, limit=0: rows.append(nid) or top_neighbors(nid, limit)
+        cache.get_neighbors = None  # full rows are never built
+
+        store = DiffusionStore(self.db_path)
+        store.hops, store.decay = 3, 0.7
+        acts, stats = store.diffuse({0: 1.0, 500: 0.5}, cache, max_edges=10)
+        assert stats["fallback"] == 2 and stats["edges_expanded"] == 11  # second seed gets the minimum budget of 1
+        assert rows == [0, 500]  # one row per seed, hop 1 only
+        assert {nid for nid in acts if nid not in (0, 500)} == set(range(991, 1001))
+
+    def test_store_reloads_new_version(self):
+        from diffusion import refresh_diffusion_vectors, DiffusionStore
+        store = DiffusionStore(self.db_path)
+        assert store.load() == 0
+        refresh_diffusion_vectors(self.db_path, hops=2, decay=0.7, top_k=10)
+        assert store.refresh(force=True)
+        assert len(store) == len(NODES)
+        assert not store.refresh(force=True)
+
+    def test_ranking_report_against_live(self):
+        from diffusion import refresh_diffusion_vectors, DiffusionStore, compare_with_live
+        refresh_diffusion_vectors(self.db_path, hops=3, decay=0.7, top_k=100)
+        store = DiffusionStore(self.db_path)
+        store.load()
+        report = compare_with_live(store, make_cache(self.db_path), [{1: 1.0}, {10: 0.8, 4: 0.3}], k=5)
+        assert report["queries"] == 2
+        assert report["overlap_at_k"] == pytest.approx(1.0)
+        assert report["top1_agreement"] == pytest.approx(1.0)
+
+    def test_small_hub_change_within_tolerance(self):
+        """A small change on a hub does not recompute every vector that holds the hub"""
+        from diffusion import refresh_diffusion_vectors
+        conn = sqlite3.connect(self.db_path)
+        conn.executemany("INSERT INTO nodes (id, content) VALUES (?, ?)", [(n, "leaf") for n in range(100, 130)])
+        conn.executemany("INSERT INTO edges (source_id, target_id, weight, edge_type) VALUES (?, ?, ?, ?)",
+                         [(20, n, 0.5, "entity") for n in range(100, 130)])
+        conn.commit()
+        refresh_diffusion_vectors(self.db_path, hops=2, decay=0.7, top_k=5)
+
+        conn.execute("UPDATE edges SET weight = 0.51 WHERE source_id = 20 AND target_id = 100")
+        conn.commit()
+        conn.close()
+        result = refresh_diffusion_vectors(self.db_path, hops=2, decay=0.7, top_k=5)
+        assert result["changed"] == 2  # hub 20 and leaf 100
+        assert result["computed"] == 2
+        assert result["drifting"] > 0
+
+        # tolerance 0 = exact invalidation: every holder of a changed node is recomputed
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("UPDATE edges SET weight = 0.52 WHERE source_id = 20 AND target_id = 100")
+        conn.commit()
+        conn.close()
+        exact = refresh_diffusion_vectors(self.db_path, hops=2, decay=0.7, top_k=5, tolerance=0)
+        assert exact["computed"] > 2
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Tests for the durable enrichment queue (ENRICHMENT_MODE=async): job
+lifecycle, retries, recovery after a restart and backpressure.
+"""
+import time
+import pytest
+import tempfile
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+
+@pytest.mark.integration
+class TestEnrichmentQueue:
+
+    def setup_method(self):
+        self.tmp = tempfile.NamedTemporaryFile(suffix=".db", delete=False)
+        self.tmp.close()
+        import database
+        database.DB_PATH = self.tmp.name
+        database.init_database()
+        self.db = database
+        self.enriched = []
+
+    def teardown_method(self):
+        os.unlink(self.tmp.name)
+
+    def add_pending(self, content):
+        """What add_note_with_links does in async mode: note and job in one transaction."""
+        with self.db.get_connection() as conn:
+            node_id = self.db.create_node(content, "test", conn=conn, auto_temporal=False)
+            self.db.enqueue_enrichment(node_id, conn=conn)
+        return node_id
+
+    def enrich(self, node_id, job_id):
+        with self.db.get_connection() as conn:
+            self.db.fill_node_temporal(node_id, conn=conn)
+            self.db.finish_enrichment_job(job_id, conn=conn)
+        self.enriched.append(node_id)
+
+    def test_jobs_run_in_order_and_finish(self):
+        from enrichment import EnrichmentWorkers
+        ids = [self.add_pending(f"Meeting on 2024-03-0{i + 1}") for i in range(3)]
+        assert self.db.get_node(ids[0])["temporal_expressions"] is None
+        assert [self.db.get_enrichment_status(n)["status"] for n in ids] == ["pending"] * 3
+        assert self.db.get_enrichment_depth() == 3
+
+        assert EnrichmentWorkers(enrich_fn=self.enrich).drain() == 3
+        assert self.enriched == ids
+        assert self.db.get_enrichment_status(ids[0]) == {"node_id": ids[0], "status": "done"}
+        assert self.db.get_node(ids[0])["t_event_start"].startswith("2024-03-01")
+        assert self.db.get_enrichment_status(999)["status"] == "not_found"
+
+    def test_failures_retry_then_park(self):
+        from enrichment import EnrichmentWorkers
+        node_id = self.add_pending("Flaky note")
+
+        def failing(node_id, job_id):
+            raise RuntimeError("NER model not loaded")
+
+        workers = EnrichmentWorkers(enrich_fn=failing, max_attempts=2)
+        assert workers.run_once() and self.db.get_enrichment_status(node_id)["status"] == "pending"
+        assert workers.run_once()
+        status = self.db.get_enrichment_status(node_id)
+        assert status["status"] == "failed" and status["attempts"] == 2 and "NER" in status["error"]
+        assert not workers.run_once() and self.db.get_enrichment_depth() == 0
+
+        assert self.db.recover_enrichment_jobs(running=False, failed=True) == 1
+        assert EnrichmentWorkers(enrich_fn=self.enrich).drain() == 1
+        assert self.enriched == [node_id]
+
+    def test_interrupted_job_recovered_by_workers(self):
+        """A job left 'running' by a crash is requeued when the pool starts"""
+        from enrichment import EnrichmentWorkers
+        node_id = self.add_pending("Interrupted")
+        assert self.db.claim_enrichment_job()["node_id"] == node_id  # worker died mid-job
+        assert self.db.claim_enrichment_job() is None
+
+        workers = EnrichmentWorkers(enrich_fn=self.enrich, poll_sec=0.05)
+        assert workers.start(workers=2) == 1
+        try:
+            deadline = time.time() + 5
+            while self.db.get_enrichment_depth() and time.time() < deadline:
+                time.sleep(0.02)
+            later = self.add_pending("Queued while running")
+            workers.notify()
+            while self.db.get_enrichment_depth() and time.time() < deadline:
+                time.sleep(0.02)
+        finally:
+            workers.stop()
+        assert sorted(self.enriched) == [node_id, later]
+        assert workers.get_stats()["processed"] == 2
+
+    def test_deleted_note_drops_job_and_queue_bound(self, monkeypatch):
+        import enrichment
+        first = self.add_pending("Deleted before enrichment")
+        self.add_pending("Kept")
+        monkeypatch.setattr(enrichment, "ENRICHMENT_MAX_PENDING", 2)
+        assert enrichment.queue_full()
+        self.db.delete_node(first)  # ON DELETE CASCADE
+        assert not enrichment.queue_full()
+        monkeypatch.setattr(enrichment, "ENRICHMENT_MAX_PENDING", 0)
+        assert not enrichment.queue_full()
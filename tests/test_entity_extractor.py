@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Tests for entity_extractor.py: batched extraction and the NER-only spaCy
+pipeline.
+"""
+import json
+import pytest
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+TEXTS = [
+    "Deployed the Flask API with Docker on Kubernetes",
+    "Встреча с Иваном в Москве про PostgreSQL",
+    "",
+    "Alice moved from Santiago to Berlin, still using Python",
+]
+
+
+@pytest.mark.unit
+class TestExtractEntitiesBatch:
+
+    def test_regex_batch_matches_single(self):
+        import entity_extractor
+        assert entity_extractor.EXTRACTOR_TYPE == "regex"
+        assert entity_extractor.extract_entities_batch(TEXTS) == [
+            entity_extractor.extract_entities(t) for t in TEXTS]
+        assert entity_extractor.extract_entities_batch([]) == []
+
+    def test_spacy_batch_groups_by_language(self, monkeypatch):
+        spacy = pytest.importorskip("spacy")
+        import entity_extractor
+        models = {}
+        for lang, patterns in (("en", [{"label": "PERSON", "pattern": "Alice"},
+                                       {"label": "GPE", "pattern": "Berlin"}]),
+                               ("ru", [{"label": "PER", "pattern": "Иваном"},
+                                       {"label": "LOC", "pattern": "Москве"}])):
+            nlp = spacy.blank("en" if lang == "en" else "xx")
+            nlp.add_pipe("sentencizer")
+            nlp.add_pipe("entity_ruler").add_patterns(patterns)
+            models[lang] = entity_extractor._trim_pipeline(nlp)
+            monkeypatch.setattr(entity_extractor._get_spacy_model, f"_nlp_{lang}", nlp, raising=False)
+        assert models["en"].pipe_names == ["entity_ruler"]  # sentencizer disabled
+
+        batch = entity_extractor.extract_entities_spacy_batch(TEXTS, batch_size=2)
+        assert batch == [entity_extractor.extract_entities_spacy(t) for t in TEXTS]
+        assert ("Иваном", "person", 0.8) in batch[1] and ("PostgreSQL", "tech", 1.0) in batch[1]
+        assert ("Alice", "person", 0.8) in batch[3] and ("Berlin", "location", 0.8) in batch[3]
+
+    def test_trim_keeps_tok2vec_only_for_listening_ner(self):
+        spacy = pytest.importorskip("spacy")
+        from entity_extractor import _trim_pipeline
+        listener = {"model": {"@architectures": "spacy.TransitionBasedParser.v2", "state_type": "ner",
+                              "extra_state_tokens": False, "hidden_width": 64, "maxout_pieces": 2,
+                              "use_upper": True, "nO": None,
+                              "tok2vec": {"@architectures": "spacy.Tok2VecListener.v1", "width": 96,
+                                          "upstream": "*"}}}
+        for ner_config, expected in ((listener, ["tok2vec", "ner"]),
+                                     ({}, ["ner"])):  # own embedding layer, as in en_core_web_sm
+            nlp = spacy.blank("en")
+            nlp.add_pipe("tok2vec")
+            nlp.add_pipe("tagger").add_label("NN")
+            nlp.add_pipe("ner", config=ner_config).add_label("ORG")
+            nlp.initialize()
+            assert _trim_pipeline(nlp).pipe_names == expected
+            assert nlp("Acme hired Bob").ents is not None
+
+
+@pytest.mark.unit
+class TestKnownEntityMatcher:
+
+    def test_one_pass_matches_with_word_boundaries(self):
+        from entity_extractor import KnownEntityMatcher
+        matcher = KnownEntityMatcher({"ann": ("ANN", "tech"), "rag": ("RAG", "concept"), "c++": ("C++", "tech"),
+                                      "postgres": ("PostgreSQL", "tech"), "postgresql": ("PostgreSQL", "tech"),
+                                      "spreading activation": ("spreading activation", "concept"),
+                                      "activation": ("activation", "concept")})
+        # Short keys are whole words; longer keys also match inside words
+        assert matcher.match("Annual planning, storage and RAG over an ANN index") == [
+            ("ANN", "tech", 1.0), ("RAG", "concept", 1.0)]
+        assert matcher.match("c++ code, PostgreSQL 16") == [
+            ("C++", "tech", 1.0), ("PostgreSQL", "tech", 1.0), ("PostgreSQL", "tech", 1.0)]
+        assert [v[0] for v in matcher.match("Spreading activation.")] == ["spreading activation", "activation"]
+        assert KnownEntityMatcher({}).match("anything") == []
+
+    def test_user_dictionary_hot_reload(self, tmp_path, monkeypatch):
+        import entity_extractor as ee
+        path = tmp_path / "entities.json"
+        path.write_text(json.dumps({"Kafka": ["Kafka", "tech"], "acme corp": {"name": "ACME", "type": "organization"}}))
+        monkeypatch.setattr(ee, "KNOWN_ENTITIES_FILE", str(path))
+        monkeypatch.setattr(ee, "KNOWN_ENTITIES_RELOAD_SEC", 0)
+        monkeypatch.setattr(ee, "_file_mtime", None)
+        monkeypatch.setattr(ee, "_file_checked", 0.0)
+        monkeypatch.setattr(ee, "_matcher", ee._base_matcher)
+
+        assert ee.extract_entities("ACME Corp streams Python events to kafka") == [
+            ("Python", "tech"), ("Kafka", "tech"), ("ACME", "organization")]
+        assert len(ee.get_known_entity_matcher()) == len(ee.KNOWN_ENTITIES) + 2
+
+        path.write_text(json.dumps({"flink": ["Flink", "tech"]}))
+        os.utime(path, (1, 1))  # mtime changes even within the filesystem's timestamp resolution
+        assert ee.extract_entities("Kafka into Flink") == [("Flink", "tech")]
+
+        path.write_text("{not json")
+        os.utime(path, (2, 2))
+        assert ee.extract_entities("Kafka into Flink") == [("Flink", "tech")]  # previous dictionary kept
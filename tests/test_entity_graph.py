@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+Tests for the bipartite note ↔ entity graph and entity hops in spreading,
+PPR and diffusion (replacing materialised entity edges).
+"""
+import random
+import pytest
+import sqlite3
+import tempfile
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+
+class AdjacencyGraph:
+    """Undirected weighted graph; parallel edges between a pair are summed."""
+
+    def __init__(self, edges=()):
+        self.adj = {}
+        for a, b, w in edges:
+            self.add(a, b, w)
+
+    def add(self, a, b, w):
+        for u, v in ((a, b), (b, a)):
+            row = self.adj.setdefault(u, {})
+            row[v] = row.get(v, 0.0) + w
+
+    def get_neighbors(self, node_id):
+        return [(v, w, "semantic") for v, w in self.adj.get(node_id, {}).items()]
+
+    def top_neighbors(self, node_id, limit=0):
+        row = sorted(self.get_neighbors(node_id), key=lambda e: e[1], reverse=True)
+        return row[:limit] if limit else row
+
+    def degree(self, node_id):
+        return len(self.adj.get(node_id, {}))
+
+
+def make_entity_graph(links, max_df=0):
+    from entity_graph import EntityGraph
+    graph = EntityGraph(max_df=max_df, base_weight=0.6)
+    graph.build(links)
+    return graph
+
+
+def materialise(entity_graph, base=()):
+    """Pairwise edges equivalent to the entity hops (one per entity per pair)."""
+    graph = AdjacencyGraph(base)
+    for _, w, notes in entity_graph.spreadable():
+        for i, a in enumerate(notes):
+            for b in notes[i + 1:]:
+                graph.add(a, b, w)
+    return graph
+
+
+@pytest.mark.unit
+class TestEntityGraph:
+
+    def test_idf_weights(self):
+        # entity 1 on two notes, entity 2 on all ten, entity 3 on one
+        links = [(1, 1), (2, 1)] + [(n, 2) for n in range(1, 11)] + [(5, 3)]
+        graph = make_entity_graph(links)
+        assert graph.weight(1) == pytest.approx(0.6)
+        assert 0 < graph.weight(2) < graph.weight(1)
+        assert graph.weight(3) == 0.0  # nothing to share
+        assert make_entity_graph(links, max_df=5).weight(2) == 0.0
+
+    def test_incremental_updates(self):
+        graph = make_entity_graph([(1, 7), (2, 7)])
+        assert graph.add_links(3, [7, 8, 7]) == 2
+        assert graph.add_links(3, [7]) == 0
+        assert sorted(graph.notes_of(7)) == [1, 2, 3]
+        assert graph.co_entity_notes(3) == {1, 2}
+        assert graph.remove_node(3) == 2
+        assert sorted(graph.notes_of(7)) == [1, 2] and graph.df(8) == 0
+        assert graph.link_count == 2
+
+    def test_stats_count_pairwise_edges_replaced(self):
+        graph = make_entity_graph([(n, 1) for n in range(100)])
+        stats = graph.get_stats()
+        assert stats["links"] == 100
+        assert stats["pairwise_edges"] == 100 * 99
+
+
+@pytest.mark.unit
+class TestEntitySpreading:
+
+    def test_matches_materialised_edges(self):
+        """Unbounded, the entity hop equals spreading over the equivalent pairwise edges"""
+        from spreading import spread_activation
+        rng = random.Random(7)
+        for _ in range(20):
+            links = {(rng.randint(1, 30), rng.randint(1, 8)) for _ in range(60)}
+            base = [(rng.randint(1, 30), rng.randint(1, 30), 0.5) for _ in range(10)]
+            base = [(a, b, w) for a, b, w in base if a != b]
+            entity_graph = make_entity_graph(links)
+            seeds = {n: rng.random() for n in rng.sample(range(1, 31), 3)}
+
+            bipartite, _ = spread_activation(dict(seeds), AdjacencyGraph(base), 3, 0.7, max_frontier=0,
+                                             max_edges=0, epsilon=0, entity_graph=entity_graph)
+            pairwise, _ = spread_activation(dict(seeds), materialise(entity_graph, base), 3, 0.7,
+                                            max_frontier=0, max_edges=0, epsilon=0)
+            assert bipartite == pytest.approx(pairwise, rel=1e-6, abs=1e-9)
+
+    def test_shared_entity_visited_once_per_iteration(self):
+        from spreading import spread_activation
+        entity_graph = make_entity_graph([(n, 1) for n in range(200)])
+        seeds = {n: 1.0 for n in range(50)}
+        acts, stats = spread_activation(seeds, AdjacencyGraph(), 1, 0.7, max_frontier=0,
+                                        max_edges=0, epsilon=0, entity_graph=entity_graph)
+        assert stats["entity_visits"] == stats["edges_expanded"] == 200  # pairwise: 50 × 199
+        assert acts[0] == pytest.approx(1.0) and 0 < acts[199] < 1.0
+
+    def test_budget_shared_with_edges(self):
+        from spreading import spread_activation
+        entity_graph = make_entity_graph([(n, 1) for n in range(1, 1000)] + [(1, 2), (2, 2)])
+        _, stats = spread_activation({1: 1.0}, AdjacencyGraph([(1, 5000, 0.5)]), 3, 0.7, max_frontier=0,
+                                     max_edges=100, epsilon=0, entity_graph=entity_graph)
+        assert stats["edge_budget_hit"]
+        assert stats["edges_expanded"] <= 100
+
+    def test_community_entity_hop_is_bridge_candidate(self):
+        from spreading import spread_community
+        community = {1: 0, 2: 0, 3: 1, 4: 1}
+        entity_graph = make_entity_graph([(1, 9), (3, 9)])
+        acts, stats = spread_community({1: 1.0}, AdjacencyGraph([(1, 2, 0.8), (3, 4, 0.8)]),
+                                       lambda n: community.get(n, -1), 3, 0.7, bridges=0,
+                                       max_frontier=0, max_edges=0, epsilon=0, entity_graph=entity_graph)
+        assert 3 not in acts and stats["pruned_edges"] == 1
+        acts, stats = spread_community({1: 1.0}, AdjacencyGraph([(1, 2, 0.8), (3, 4, 0.8)]),
+                                       lambda n: community.get(n, -1), 3, 0.7, bridges=1,
+                                       max_frontier=0, max_edges=0, epsilon=0, entity_graph=entity_graph)
+        assert stats["bridges"] == 1 and 3 in acts and 4 in acts
+
+    def test_ppr_through_entity_view(self):
+        from entity_graph import EntityView
+        from spreading import ppr_push
+        entity_graph = make_entity_graph([(1, 9), (2, 9), (3, 8)])
+        view = EntityView(AdjacencyGraph([(3, 4, 0.5)]), entity_graph)
+        assert view.get_neighbors(1) == [(-9, pytest.approx(0.6), "entity")]
+        scores, _ = ppr_push({1: 1.0}, view, epsilon=1e-6, max_edges=0)
+        notes = EntityView.strip(scores)
+        assert -9 in scores and all(n > 0 for n in notes)
+        assert notes[1] == 1.0 and notes[2] > 0
+        assert 3 not in notes  # entity 8 has a single note
+
+        view = EntityView(AdjacencyGraph([(1, 5, 0.9), (1, 6, 0.3)]), entity_graph)
+        assert view.top_neighbors(1, limit=2) == [(5, 0.9, "semantic"), (-9, pytest.approx(0.6), "entity")]
+        assert len(view.top_neighbors(1)) == 3
+        assert [nid for nid, _, _ in view.top_neighbors(-9, limit=1)] in ([1], [2])
+
+
+@pytest.mark.unit
+class TestEntityDiffusion:
+
+    def setup_method(self):
+        self.tmp = tempfile.NamedTemporaryFile(suffix=".db", delete=False)
+        self.tmp.close()
+        conn = sqlite3.connect(self.tmp.name)
+        conn.execute("CREATE TABLE nodes (id INTEGER PRIMARY KEY, content TEXT, embedding BLOB)")
+        conn.execute("""CREATE TABLE edges (id INTEGER PRIMARY KEY AUTOINCREMENT, source_id INTEGER,
+                        target_id INTEGER, weight REAL, edge_type TEXT, created_at TEXT)""")
+        conn.execute("CREATE TABLE node_entities (node_id INTEGER, entity_id INTEGER)")
+        conn.executemany("INSERT INTO nodes (id, content) VALUES (?, ?)", [(n, f"note {n}") for n in range(1, 9)])
+        conn.executemany("INSERT INTO edges (source_id, target_id, weight, edge_type) VALUES (?, ?, ?, ?)",
+                         [(1, 2, 0.8, "semantic"), (5, 6, 0.7, "semantic")])
+        self.links = [(2, 1), (3, 1), (4, 1), (6, 2), (7, 2), (8, 3)]
+        conn.executemany("INSERT INTO node_entities VALUES (?, ?)", self.links)
+        conn.commit()
+        conn.close()
+
+    def teardown_method(self):
+        os.unlink(self.tmp.name)
+
+    def test_vectors_include_entity_hops(self):
+        """Precomputed vectors (B W Bᵀ term) match live spreading with the entity graph"""
+        from diffusion import refresh_diffusion_vectors, DiffusionStore
+        from graph_cache import GraphCache
+        from spreading import spread_activation
+        refresh_diffusion_vectors(self.tmp.name, hops=3, decay=0.7, top_k=100)
+        store = DiffusionStore(self.tmp.name)
+        store.load()
+
+        cache = GraphCache()
+        cache.build([{"source_id": 1, "target_id": 2, "weight": 0.8, "edge_type": "semantic"},
+                     {"source_id": 5, "target_id": 6, "weight": 0.7, "edge_type": "semantic"}])
+        entity_graph = make_entity_graph(self.links, max_df=500)
+        seeds = {1: 0.9, 7: 0.4}
+        live, _ = spread_activation(dict(seeds), cache, 3, 0.7, max_frontier=0, max_edges=0, epsilon=0,
+                                    entity_graph=entity_graph)
+        approx, _ = store.diffuse(seeds, cache)
+        assert {3, 4, 5, 6} <= set(approx)
+        # Entity weights are rounded to 0.01 in the precomputed matrix
+        assert approx == pytest.approx(live, rel=0.05)
+
+
+@pytest.mark.integration
+class TestDropEntityEdges:
+
+    def setup_method(self):
+        self.tmp = tempfile.NamedTemporaryFile(suffix=".db", delete=False)
+        self.tmp.close()
+        import database
+        database.DB_PATH = self.tmp.name
+        database.init_database()
+        self.db = database
+
+    def teardown_method(self):
+        os.unlink(self.tmp.name)
+
+    def test_migration_keeps_other_edges_and_links(self):
+        sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+        from drop_entity_edges import drop
+        a, b, c = (self.db.create_node(f"Note {i} about robots", "test") for i in range(3))
+        eid = self.db.get_or_create_entity("robots", "concept")
+        for n in (a, b, c):
+            self.db.link_node_to_entity(n, eid)
+        for s, t in ((a, b), (a, c), (b, c)):
+            self.db.create_edge(s, t, weight=0.6, edge_type="entity")
+        self.db.create_edge(a, b, weight=0.9, edge_type="semantic")
+
+        drop(self.tmp.name, dry_run=True)
+        assert len(self.db.get_all_edges()) == 4
+        drop(self.tmp.name)
+        assert [e["edge_type"] for e in self.db.get_all_edges()] == ["semantic"]
+        assert len(self.db.get_all_node_entities()) == 3
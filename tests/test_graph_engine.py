@@ -176,6 +176,172 @@ class TestGraphCache:
         assert len(cache[1]) == 2
         assert cache[1][1] == (3, 0.6, 'entity')
 
+    def test_csr_build_dedupes_directed_rows(self):
+        """Both DB rows of an undirected edge collapse to one entry per direction"""
+        from graph_cache import GraphCache
+        cache = GraphCache()
+        cache.build([
+            {"source_id": 1, "target_id": 2, "weight": 0.7, "edge_type": "semantic"},
+            {"source_id": 2, "target_id": 1, "weight": 0.7, "edge_type": "semantic"},
+            {"source_id": 1, "target_id": 3, "weight": 0.5, "edge_type": "entity"},
+        ])
+        assert sorted((n, round(w, 4), t) for n, w, t in cache.get_neighbors(1)) == \
+            [(2, 0.7, 'semantic'), (3, 0.5, 'entity')]
+        assert [(n, t) for n, _, t in cache.get_neighbors(2)] == [(1, 'semantic')]
+        assert cache.get_neighbors(99) == []
+
+    def test_csr_delta_fold(self, monkeypatch):
+        """Delta entries are visible immediately and survive folding into CSR"""
+        import graph_cache
+        monkeypatch.setattr(graph_cache, "GRAPH_CACHE_DELTA_MAX", 4)
+        cache = graph_cache.GraphCache()
+        cache.build([{"source_id": 1, "target_id": 2, "weight": 0.7, "edge_type": "semantic"}])
+        cache.add_edge(1, 3, weight=0.6, edge_type="entity")
+        assert cache.get_stats()["delta_entries"] == 2
+        assert (3, 0.6, 'entity') in cache.get_neighbors(1)
+        cache.add_edge(4, 1, weight=0.9, edge_type="temporal_chain")  # triggers fold
+        stats = cache.get_stats()
+        assert stats["delta_entries"] == 0
+        assert stats["node_count"] == 4
+        assert {n for n, _, _ in cache.get_neighbors(1)} == {2, 3, 4}
+        assert stats["memory"]["csr_bytes"] > 0
+
+    def test_add_edge_upserts_max_weight(self):
+        """Re-linking keeps one entry per (neighbor, edge_type) with MAX(weight)"""
+        from graph_cache import GraphCache
+        cache = GraphCache()
+        cache.build([{"source_id": 1, "target_id": 2, "weight": 0.7, "edge_type": "semantic"}])
+        cache.add_edge(1, 2, weight=0.5, edge_type="semantic")
+        cache.add_edge(2, 1, weight=0.9, edge_type="semantic")
+        cache.add_edge(1, 2, weight=0.6, edge_type="entity")
+        neighbors = sorted(cache.get_neighbors(1), key=lambda e: e[2])
+        assert [(n, round(w, 4), t) for n, w, t in neighbors] == [(2, 0.6, 'entity'), (2, 0.9, 'semantic')]
+        assert cache.edge_count == 4  # two types x two directions
+
+    def test_remove_edge_and_node(self):
+        """remove_edge drops both directions; remove_node drops every incident edge"""
+        from graph_cache import GraphCache
+        cache = GraphCache()
+        cache.build([
+            {"source_id": 1, "target_id": 2, "weight": 0.7, "edge_type": "semantic"},
+            {"source_id": 1, "target_id": 3, "weight": 0.5, "edge_type": "entity"},
+            {"source_id": 2, "target_id": 3, "weight": 0.5, "edge_type": "entity"},
+        ])
+        assert cache.remove_edge(1, 2) == 2
+        assert [n for n, _, _ in cache.get_neighbors(1)] == [3]
+        assert cache.remove_node(3) == 4
+        assert cache.get_neighbors(1) == [] and cache.get_neighbors(2) == []
+        assert cache.edge_count == 0
+        cache.compact()
+        assert cache.get_stats()["node_count"] == 0
+
+    def test_reconcile_reports_and_heals_drift(self):
+        """reconcile() finds missing/extra/weight drift against table rows and rebuilds"""
+        from graph_cache import GraphCache
+        table = [
+            {"source_id": 1, "target_id": 2, "weight": 0.7, "edge_type": "semantic"},
+            {"source_id": 2, "target_id": 1, "weight": 0.7, "edge_type": "semantic"},
+        ]
+        cache = GraphCache()
+        cache.build(table)
+        assert cache.reconcile(table)["drift"] == 0
+        cache.add_edge(1, 5, weight=0.6, edge_type="entity")  # not in table
+        table.append({"source_id": 2, "target_id": 3, "weight": 0.4, "edge_type": "entity"})
+        report = cache.reconcile(table)
+        assert (report["missing"], report["extra"], report["healed"]) == (2, 2, True)
+        assert cache.reconcile(table)["drift"] == 0
+        assert {n for n, _, _ in cache.get_neighbors(2)} == {1, 3}
+
+
+class TestGraphMetrics:
+    """Test sparse PageRank, label propagation and persistence"""
+
+    @staticmethod
+    def two_cliques():
+        """Cliques 1-5 and 6-10 joined by a weak bridge 5-6, node 11 isolated"""
+        edges = []
+        for group in (range(1, 6), range(6, 11)):
+            edges += [(a, b, 0.8) for a in group for b in group if a != b]
+        edges.append((5, 6, 0.1))
+        return edges, list(range(1, 12))
+
+    def test_pagerank_matches_power_iteration_reference(self):
+        """Scores equal networkx pagerank (when available), normalized to max 1"""
+        nx = pytest.importorskip("networkx")
+        from graph_metrics import GraphMetrics
+        edges = [(1, 2, 0.5), (2, 3, 0.9), (3, 1, 0.3), (3, 4, 0.7), (5, 3, 0.2)]
+        metrics = GraphMetrics()
+        metrics.compute(edges, [1, 2, 3, 4, 5, 6])
+        G = nx.DiGraph()
+        G.add_nodes_from([1, 2, 3, 4, 5, 6])
+        G.add_weighted_edges_from(edges)
+        expected = nx.pagerank(G, weight="weight")
+        top = max(expected.values())
+        for nid, pr in expected.items():
+            assert metrics.get_pagerank(nid) == pytest.approx(pr / top, abs=1e-4)
+
+    def test_pagerank_warm_start_converges_faster(self):
+        from graph_metrics import GraphMetrics
+        rng = np.random.default_rng(0)
+        edges = [(int(a), int(b), 0.5) for a, b in rng.integers(0, 500, size=(3000, 2)) if a != b]
+        metrics = GraphMetrics()
+        metrics.compute(edges, list(range(500)))
+        cold = metrics._last_run["pagerank_iterations"]
+        metrics.compute(edges + [(1, 2, 0.9)], list(range(500)))
+        assert metrics._last_run["warm_start"]
+        assert metrics._last_run["pagerank_iterations"] < cold
+
+    def test_canonical_undirected_rows_count_both_ways(self):
+        """One (min_id, max_id) row per undirected link scores like the old mirrored pair"""
+        from graph_metrics import GraphMetrics
+        links = [(1, 2), (2, 3), (1, 3), (3, 4)]
+        canonical, mirrored = GraphMetrics(), GraphMetrics()
+        canonical.compute([(a, b, 0.5, "semantic") for a, b in links], [1, 2, 3, 4])
+        mirrored.compute([(u, v, 0.5) for a, b in links for u, v in ((a, b), (b, a))], [1, 2, 3, 4])
+        assert canonical._pagerank == pytest.approx(mirrored._pagerank)
+        assert canonical.get_pagerank(1) == pytest.approx(canonical.get_pagerank(2))
+        assert canonical.get_pagerank(3) == 1.0 and canonical.get_pagerank(4) < canonical.get_pagerank(1)
+
+        # Directed types keep their direction
+        chain = GraphMetrics()
+        chain.compute([(1, 2, 0.5, "temporal_chain"), (2, 3, 0.5, "temporal_chain")], [1, 2, 3])
+        assert chain.get_pagerank(1) < chain.get_pagerank(2) < chain.get_pagerank(3)
+
+    def test_label_propagation_finds_cliques(self):
+        from graph_metrics import GraphMetrics
+        edges, nodes = self.two_cliques()
+        metrics = GraphMetrics()
+        metrics.compute(edges, nodes)
+        assert len({metrics.get_community(n) for n in range(1, 6)}) == 1
+        assert len({metrics.get_community(n) for n in range(6, 11)}) == 1
+        assert metrics.get_community(1) != metrics.get_community(6)
+        assert metrics.get_community(11) == -1
+        assert metrics.get_stats()["community_sizes"] == {0: 5, 1: 5}
+
+    def test_save_and_load(self, tmp_path):
+        from graph_metrics import GraphMetrics
+        db_path = str(tmp_path / "metrics.db")
+        edges, nodes = self.two_cliques()
+        metrics = GraphMetrics()
+        assert not metrics.load(db_path)
+        metrics.compute(edges, nodes)
+        assert metrics.save(db_path) == len(nodes)
+
+        loaded = GraphMetrics()
+        assert loaded.load(db_path)
+        assert loaded.is_computed
+        assert loaded._pagerank == pytest.approx(metrics._pagerank)
+        assert loaded._communities == metrics._communities
+        assert loaded._community_sizes == metrics._community_sizes
+
+        # A later sleep-compute run (note 12 added) replaces what a running server loaded
+        metrics.compute(edges + [(11, 12, 0.9, "semantic")], nodes + [12])  # one row per pair, as stored
+        metrics.save(db_path)
+        assert loaded.load(db_path)
+        assert loaded.get_pagerank(12) > 0 and loaded.get_pagerank(12) == pytest.approx(loaded.get_pagerank(11), abs=1e-3)
+        assert loaded.get_community(12) == loaded.get_community(11) != -1
+        assert loaded._community_sizes == metrics._community_sizes
+
 
 class TestANNIndex:
     """Test ANN index functionality"""
@@ -204,6 +370,31 @@ class TestANNIndex:
         actual_k = min(10, index_size)
         assert actual_k == 0
 
+    def test_tuner_exact_topk(self):
+        """Ground truth top-k is ordered by cosine similarity"""
+        from ann_tune import exact_topk
+        ids = np.array([10, 20, 30])
+        matrix = np.array([[1, 0], [0.8, 0.6], [0, 1]], dtype=np.float32)
+        query = np.array([[1, 0.1]], dtype=np.float32)
+        assert list(exact_topk(matrix, ids, query, 2)[0]) == [10, 20]
+
+    def test_tuner_recall_at_k(self):
+        """recall@k counts overlap with ground truth"""
+        from ann_tune import recall_at_k
+        assert recall_at_k([[1, 2]], [[1, 2]], 2) == 1.0
+        assert recall_at_k([[1, 3], [4, 5]], [[1, 2], [4, 5]], 2) == 0.75
+
+    def test_tuner_target_recall_across_m(self):
+        """The cheapest row meeting the target wins, whichever M it was swept with"""
+        from ann_tune import choose_config
+        rows = [{"M": 16, "ef": 64, "recall": 0.97, "p50_ms": 0.20},
+                {"M": 16, "ef": 128, "recall": 0.99, "p50_ms": 0.40},
+                {"M": 32, "ef": 32, "recall": 0.985, "p50_ms": 0.25},
+                {"M": 32, "ef": 64, "recall": 0.995, "p50_ms": 0.35}]
+        best = choose_config(rows, 0.98)
+        assert (best["M"], best["ef"]) == (32, 32)
+        assert choose_config(rows, 0.999) is None
+
 
 if __name__ == '__main__':
     pytest.main([__file__, '-v'])
@@ -23,6 +23,7 @@ class TestDatabaseOperations:
         os.environ['DB_PATH'] = self.db_path
         # Re-import to use test DB
         import database
+        database.DB_PATH = self.db_path  # read once at import; point each test at its own DB
         database._connection = None
         database.init_database()
         self.db = database
@@ -70,6 +71,148 @@ class TestDatabaseOperations:
         neighbor_ids = [n['id'] for n in neighbors]
         assert n2 in neighbor_ids
 
+    def test_tuned_ef_applied_at_runtime(self):
+        """ef_search stored in settings is applied without rebuilding the index"""
+        import ann_index
+        index = ann_index.ANNIndex(dimension=8)
+        assert self.db.get_setting(ann_index.EF_SEARCH_SETTING) is None
+        self.db.set_setting(ann_index.EF_SEARCH_SETTING, 123)
+        assert index.refresh_tuned_ef(force=True) == 123
+        assert index.get_stats()["ef_search"] == 123
+
+
+    def test_graph_cache_matches_edges_table(self):
+        """Cache built from the table, then updated like add_note_with_links, has no drift"""
+        from graph_cache import GraphCache
+        n1, n2, n3 = (self.db.create_node(f"Node {i}", "test") for i in range(3))
+        for a, b in ((n1, n2), (n2, n1)):
+            self.db.create_edge(a, b, weight=0.5, edge_type="semantic")
+        cache = GraphCache()
+        cache.build(self.db.get_all_edges())
+        for a, b, w in ((n1, n2, 0.8), (n2, n3, 0.6)):
+            self.db.create_edge(a, b, weight=w, edge_type="semantic")
+            self.db.create_edge(b, a, weight=w, edge_type="semantic")
+            cache.add_edge(a, b, weight=w, edge_type="semantic")
+        report = cache.reconcile(self.db.get_all_edges(), heal=False)
+        assert report["drift"] == 0
+        assert cache.edge_count == report["table_entries"] == 4
+
+        self.db.delete_node(n3)  # ON DELETE CASCADE removes its edges
+        assert cache.reconcile(self.db.get_all_edges(), heal=False)["extra"] == 2
+        cache.remove_node(n3)
+        assert cache.reconcile(self.db.get_all_edges(), heal=False)["drift"] == 0
+
+    def test_undirected_edges_stored_once(self):
+        """create_edge(a, b) and create_edge(b, a) share one (min, max) row; directed types do not"""
+        n1, n2 = (self.db.create_node(f"Node {i}", "test") for i in range(2))
+        self.db.create_edge(n2, n1, weight=0.5, edge_type="semantic")
+        self.db.create_edge(n1, n2, weight=0.7, edge_type="semantic")
+        self.db.create_edge(n2, n1, weight=0.6, edge_type="semantic")
+        self.db.create_edge(n2, n1, weight=0.9, edge_type="temporal_chain")
+        edges = sorted((e["edge_type"], e["source_id"], e["target_id"], e["weight"]) for e in self.db.get_all_edges())
+        assert edges == [("semantic", n1, n2, 0.7), ("temporal_chain", n2, n1, 0.9)]
+        assert {n["id"] for n in self.db.get_connected_nodes(n2)} == {n1}
+
+    def test_shared_connection_is_one_transaction(self):
+        """Writes passed conn= commit together, or roll back together on error"""
+        existing = self.db.create_node("Existing", "test")
+        with self.db.get_connection() as conn:
+            node_id = self.db.create_node("Unit of work", "test", conn=conn)
+            eid = self.db.get_or_create_entity("Python", "tech", conn=conn)
+            self.db.link_node_to_entity(node_id, eid, conn=conn)
+            self.db.create_edge(node_id, existing, weight=0.7, conn=conn)
+            assert [n["id"] for n in self.db.get_nodes_by_entity(eid, conn=conn)] == [node_id]
+        assert self.db.get_node(node_id)["content"] == "Unit of work"
+        assert len(self.db.get_all_edges()) == 1
+
+        with pytest.raises(RuntimeError):
+            with self.db.get_connection() as conn:
+                failed = self.db.create_node("Rolled back", "test", conn=conn)
+                self.db.link_node_to_entity(failed, self.db.get_or_create_entity("Docker", conn=conn), conn=conn)
+                self.db.create_edge(failed, existing, weight=0.9, conn=conn)
+                raise RuntimeError("index update failed")
+        assert self.db.get_node(failed) is None
+        assert len(self.db.get_all_edges()) == 1
+        assert len(self.db.get_all_node_entities()) == 1
+
+    def test_entity_name_norm_resolution(self):
+        """Case variants (non-ASCII too) resolve to one entity; hits come from the resident dictionary"""
+        eid = self.db.get_or_create_entity("Москва", "place")
+        assert self.db.get_or_create_entity("  москва ") == eid
+        assert self.db.entity_dictionary.get("москва") == eid
+        with pytest.raises(sqlite3.IntegrityError):
+            with self.db.get_connection() as conn:
+                conn.execute("INSERT INTO entities (name, name_norm) VALUES ('МОСКВА', 'москва')")
+
+        self.db.entity_dictionary.warm()
+        original, self.db.sqlite3.connect = self.db.sqlite3.connect, None  # any SQLite access would fail
+        try:
+            assert self.db.get_or_create_entity("МОСКВА") == eid
+        finally:
+            self.db.sqlite3.connect = original
+
+    def test_rolled_back_entity_not_cached(self):
+        """An entity created in a rolled-back transaction never reaches the dictionary"""
+        with pytest.raises(RuntimeError):
+            with self.db.get_connection() as conn:
+                assert self.db.get_or_create_entity("Kafka", conn=conn) == self.db.get_or_create_entity("kafka", conn=conn)
+                raise RuntimeError("rolled back")
+        assert self.db.entity_dictionary.get("kafka") is None
+        eid = self.db.get_or_create_entity("Kafka")
+        assert self.db.entity_dictionary.get("kafka") == eid
+        conn = sqlite3.connect(self.db_path)
+        assert conn.execute("SELECT id FROM entities WHERE name_norm = 'kafka'").fetchone() == (eid,)
+        conn.close()
+
+    def test_name_norm_migration_and_merge(self):
+        """Old databases get name_norm backfilled; case duplicates are merged by the script"""
+        sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+        from merge_entity_names import merge
+        n1, n2 = (self.db.create_node(f"Node {i}", "test") for i in range(2))
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("DROP INDEX idx_entities_name_norm")
+        conn.execute("ALTER TABLE entities DROP COLUMN name_norm")
+        conn.executemany("INSERT INTO entities (id, name) VALUES (?, ?)", [(1, "Київ"), (2, "КИЇВ"), (3, "Docker")])
+        conn.executemany("INSERT INTO node_entities VALUES (?, ?)", [(n1, 1), (n2, 2), (n1, 2)])
+        conn.commit()
+        conn.close()
+
+        self.db.init_database()  # backfills, then falls back to a non-unique index
+        conn = sqlite3.connect(self.db_path)
+        assert dict(conn.execute("SELECT id, name_norm FROM entities")) == {1: "київ", 2: "київ", 3: "docker"}
+        conn.close()
+
+        assert merge(self.db_path, dry_run=True)["merged"] == 1
+        assert merge(self.db_path) == {"groups": 1, "merged": 1, "links_moved": 1}
+        conn = sqlite3.connect(self.db_path)
+        assert sorted(conn.execute("SELECT node_id, entity_id FROM node_entities")) == [(n1, 1), (n2, 1)]
+        indexes = {row[1]: row[2] for row in conn.execute("PRAGMA index_list(entities)")}
+        conn.close()
+        assert indexes.get("idx_entities_name_norm") == 1 and "idx_entities_name_norm_dup" not in indexes
+
+    def test_canonical_edges_migration(self):
+        """Mirrored rows merge into one row with the max weight; temporal_chain untouched"""
+        sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+        from migrate_canonical_edges import migrate
+        n1, n2, n3 = (self.db.create_node(f"Node {i}", "test") for i in range(3))
+        conn = sqlite3.connect(self.db_path)
+        conn.executemany(
+            "INSERT INTO edges (source_id, target_id, weight, edge_type, created_at) VALUES (?, ?, ?, ?, ?)",
+            [(n1, n2, 0.5, "semantic", "2024-02-01"), (n2, n1, 0.8, "semantic", "2024-01-01"),
+             (n3, n2, 0.6, "entity", "2024-01-01"),
+             (n1, n3, 0.9, "temporal_chain", None), (n3, n1, 0.4, "temporal_chain", None)])
+        conn.commit()
+        conn.close()
+
+        assert migrate(self.db_path, dry_run=True)["removed"] == 1
+        result = migrate(self.db_path)
+        assert result["before"]["rows"] == 5 and result["after"]["rows"] == 4
+        conn = sqlite3.connect(self.db_path)
+        rows = sorted(conn.execute("SELECT edge_type, source_id, target_id, weight, created_at FROM edges"))
+        conn.close()
+        assert rows == [("entity", n2, n3, 0.6, "2024-01-01"), ("semantic", n1, n2, 0.8, "2024-01-01"),
+                        ("temporal_chain", n1, n3, 0.9, None), ("temporal_chain", n3, n1, 0.4, None)]
+
 
 class TestModuleImports:
     """Test that all modules import without errors"""
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Tests for the graph-cache k-hop neighbourhood API and batched node previews.
+"""
+import pytest
+import tempfile
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+
+@pytest.mark.integration
+class TestNeighborhood:
+
+    def setup_method(self):
+        self.tmp = tempfile.NamedTemporaryFile(suffix=".db", delete=False)
+        self.tmp.close()
+        import database
+        database.DB_PATH = self.tmp.name
+        database.init_database()
+        self.db = database
+
+        # hub -> 30 leaves (entity), leaf 0 -> chain of two more notes (semantic)
+        from graph_cache import GraphCache
+        self.hub = database.create_node("Hub note\nsecond line", "project")
+        self.leaves = [database.create_node(f"Leaf {i} " + "x" * 300, "general") for i in range(30)]
+        self.far = database.create_node("Two hops away", "general")
+        self.farther = database.create_node("Three hops away", "general")
+        edges = [(self.hub, leaf, 0.3 + i / 100, "entity") for i, leaf in enumerate(self.leaves)]
+        edges += [(self.leaves[0], self.far, 0.9, "semantic"), (self.far, self.farther, 0.8, "semantic")]
+        for s, t, w, et in edges:
+            database.create_edge(s, t, weight=w, edge_type=et)
+        self.cache = GraphCache()
+        self.cache.build(database.get_all_edges())
+
+    def teardown_method(self):
+        os.unlink(self.tmp.name)
+
+    def test_one_hop_fanout_keeps_strongest(self):
+        from neighborhood import get_neighborhood
+        hood = get_neighborhood(self.hub, hops=1, fanout=5, graph_cache=self.cache)
+        ids = [n["id"] for n in hood["nodes"] if n["hop"] == 1]
+        assert sorted(ids) == sorted(self.leaves[-5:])
+        assert hood["truncated"]
+        assert len(hood["edges"]) == 5
+        assert hood["nodes"][0]["id"] == self.hub
+
+    def test_previews_without_full_content(self):
+        from neighborhood import get_neighborhood
+        hood = get_neighborhood(self.leaves[0], hops=1, graph_cache=self.cache)
+        leaf = hood["nodes"][0]
+        assert len(leaf["preview"]) == 200
+        assert leaf["full_length"] == len("Leaf 0 ") + 300
+        assert "embedding" not in leaf and "content" not in leaf
+
+    def test_edge_type_and_weight_filters(self):
+        from neighborhood import get_neighborhood
+        hood = get_neighborhood(self.leaves[0], hops=3, edge_types=["semantic"], graph_cache=self.cache)
+        assert {n["id"]: n["hop"] for n in hood["nodes"]} == {self.leaves[0]: 0, self.far: 1, self.farther: 2}
+        hood = get_neighborhood(self.leaves[0], hops=3, min_weight=0.85, graph_cache=self.cache)
+        assert {n["id"] for n in hood["nodes"]} == {self.leaves[0], self.far}
+
+    def test_per_hop_caps_and_max_nodes(self):
+        from neighborhood import get_neighborhood
+        hood = get_neighborhood(self.far, hops=2, fanout=[2, 1], graph_cache=self.cache)
+        by_hop = {}
+        for n in hood["nodes"]:
+            by_hop.setdefault(n["hop"], []).append(n["id"])
+        assert sorted(by_hop[1]) == sorted([self.leaves[0], self.farther])
+        assert 2 not in by_hop  # hop-2 cap 1: leaf 0 only expands its strongest edge, back to far
+        hood = get_neighborhood(self.far, hops=2, fanout=[2, 2], graph_cache=self.cache)
+        assert [n["id"] for n in hood["nodes"] if n["hop"] == 2] == [self.hub]
+        hood = get_neighborhood(self.hub, hops=2, fanout=0, max_nodes=10, graph_cache=self.cache)
+        assert len(hood["nodes"]) == 10 and hood["truncated"]
+
+    def test_missing_node(self):
+        from neighborhood import get_neighborhood
+        assert "error" in get_neighborhood(999999, graph_cache=self.cache)
+
+    def test_batched_previews_and_connected_nodes(self):
+        previews = self.db.get_node_previews([self.hub, self.far, 999999], preview_chars=8)
+        assert set(previews) == {self.hub, self.far}
+        assert previews[self.hub]["preview"] == "Hub note"
+        connected = self.db.get_connected_nodes(self.far)
+        assert {c["id"] for c in connected} == {self.leaves[0], self.farther}
+        assert all("embedding" not in c for c in connected)
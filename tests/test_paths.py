@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Tests for find_paths: bidirectional top-k paths on the graph cache.
+"""
+import math
+import random
+import pytest
+import tempfile
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+
+def make_cache(edges):
+    from graph_cache import GraphCache
+    cache = GraphCache()
+    cache.build([{"source_id": s, "target_id": t, "weight": w, "edge_type": et} for s, t, w, et in edges])
+    return cache
+
+
+def all_paths(edges, source, target, max_depth):
+    """Every loopless path as [(node, weight_in, type_in)], by DFS."""
+    adj = {}
+    for s, t, w, et in edges:
+        adj.setdefault(s, []).append((t, w, et))
+        adj.setdefault(t, []).append((s, w, et))
+    out = []
+
+    def dfs(path, visited):
+        node = path[-1][0]
+        if node == target:
+            out.append(list(path))
+            return
+        if len(path) > max_depth:
+            return
+        for v, w, et in adj.get(node, []):
+            if v not in visited:
+                path.append((v, w, et))
+                visited.add(v)
+                dfs(path, visited)
+                visited.discard(v)
+                path.pop()
+
+    dfs([(source, None, None)], {source})
+    return out
+
+
+# Two routes 1 → 5: strong 4-hop chain (0.9 each) vs weak direct-ish 2-hop route
+EDGES = [
+    (1, 2, 0.9, "semantic"), (2, 3, 0.9, "semantic"), (3, 4, 0.9, "semantic"), (4, 5, 0.9, "entity"),
+    (1, 6, 0.3, "entity"), (6, 5, 0.3, "entity"),
+    (1, 2, 0.5, "entity"),
+]
+
+
+@pytest.mark.unit
+class TestFindPaths:
+
+    def test_strongest_vs_shortest(self):
+        from paths import find_paths
+        cache = make_cache(EDGES)
+        strongest = find_paths(1, 5, k=1, graph_cache=cache, previews=False)["paths"][0]
+        assert strongest["nodes"] == [1, 2, 3, 4, 5]
+        assert strongest["strength"] == pytest.approx(0.9 ** 4, rel=1e-5)
+        assert [e["type"] for e in strongest["edges"]] == ["semantic", "semantic", "semantic", "entity"]
+
+        shortest = find_paths(1, 5, k=1, mode="shortest", graph_cache=cache, previews=False)["paths"][0]
+        assert shortest["nodes"] == [1, 6, 5] and shortest["hops"] == 2
+
+    def test_depth_bound(self):
+        from paths import find_paths
+        cache = make_cache(EDGES)
+        result = find_paths(1, 5, k=3, max_depth=3, graph_cache=cache, previews=False)
+        assert [p["nodes"] for p in result["paths"]] == [[1, 6, 5]]
+        assert find_paths(1, 5, max_depth=1, graph_cache=cache, previews=False)["paths"] == []
+
+    def test_distinct_paths_include_parallel_edge_types(self):
+        """The entity edge 1-2 gives a second path over the same nodes"""
+        from paths import find_paths
+        cache = make_cache(EDGES)
+        paths = find_paths(1, 5, k=3, graph_cache=cache, previews=False)["paths"]
+        assert [p["nodes"] for p in paths] == [[1, 2, 3, 4, 5], [1, 2, 3, 4, 5], [1, 6, 5]]
+        assert paths[1]["edges"][0]["type"] == "entity"
+        assert paths[0]["strength"] >= paths[1]["strength"] >= paths[2]["strength"]
+
+    def test_edge_type_filter(self):
+        from paths import find_paths
+        cache = make_cache(EDGES)
+        paths = find_paths(1, 5, k=3, edge_types=["entity"], graph_cache=cache, previews=False)["paths"]
+        assert [p["nodes"] for p in paths] == [[1, 6, 5]]
+
+    def test_disconnected(self):
+        from paths import find_paths
+        cache = make_cache(EDGES + [(10, 11, 0.9, "semantic")])
+        result = find_paths(1, 10, graph_cache=cache, previews=False)
+        assert result["paths"] == []
+        with pytest.raises(ValueError):
+            find_paths(1, 5, mode="cheapest", graph_cache=cache, previews=False)
+
+    def test_fanout_limits_hub_edges(self):
+        """Each side only follows the `fanout` strongest edges of the note it expands"""
+        from paths import find_paths
+        edges = [(hub, hub + n, 0.6 + n / 100, "entity") for hub in (0, 100) for n in range(1, 41)]
+        edges.append((0, 100, 0.55, "semantic"))  # weakest edge of both hubs
+        cache = make_cache(edges)
+        assert find_paths(40, 140, fanout=10, graph_cache=cache, previews=False)["paths"] == []
+        assert find_paths(0, 100, fanout=10, graph_cache=cache, previews=False)["paths"] == []
+        assert find_paths(40, 140, fanout=0, graph_cache=cache, previews=False)["paths"][0]["nodes"] == [40, 0, 100, 140]
+        # A weak leaf still reaches the hub through its own edge, from either end
+        assert find_paths(1, 0, fanout=10, graph_cache=cache, previews=False)["paths"][0]["nodes"] == [1, 0]
+        assert find_paths(0, 1, fanout=10, graph_cache=cache, previews=False)["paths"][0]["nodes"] == [0, 1]
+        assert find_paths(1, 40, fanout=10, graph_cache=cache, previews=False)["paths"][0]["nodes"] == [1, 0, 40]
+
+    @pytest.mark.parametrize("mode", ["strongest", "shortest"])
+    def test_matches_brute_force(self, mode):
+        """Top-k costs equal exhaustive enumeration on random multigraphs"""
+        from paths import find_paths
+        rng = random.Random(42)
+        for _ in range(60):
+            n = rng.randint(5, 14)
+            seen, edges = set(), []
+            for _ in range(rng.randint(6, 40)):
+                a, b = rng.sample(range(n), 2)
+                et = rng.choice(["semantic", "entity"])
+                if (min(a, b), max(a, b), et) not in seen:
+                    seen.add((min(a, b), max(a, b), et))
+                    edges.append((a, b, round(rng.uniform(0.05, 1.0), 3), et))
+            source, target = rng.sample(range(n), 2)
+            depth, k = rng.randint(1, 5), rng.randint(1, 5)
+
+            def key(hops, weights):
+                cost = sum(-math.log(w) for w in weights)
+                return (hops, cost) if mode == "shortest" else (0, cost)
+
+            expected = sorted(key(len(p) - 1, [w for _, w, _ in p[1:]])
+                              for p in all_paths(edges, source, target, depth))[:k]
+            result = find_paths(source, target, k=k, mode=mode, max_depth=depth, fanout=0,
+                                graph_cache=make_cache(edges), previews=False)
+            got = [key(p["hops"], [e["weight"] for e in p["edges"]]) for p in result["paths"]]
+            assert len(got) == len(expected)
+            for (eh, ec), (gh, gc) in zip(expected, got):
+                assert gh == eh and gc == pytest.approx(ec, abs=1e-5)
+            for p in result["paths"]:
+                assert len(set(p["nodes"])) == len(p["nodes"])  # loopless
+
+
+@pytest.mark.integration
+class TestFindPathsPreviews:
+
+    def setup_method(self):
+        self.tmp = tempfile.NamedTemporaryFile(suffix=".db", delete=False)
+        self.tmp.close()
+        import database
+        database.DB_PATH = self.tmp.name
+        database.init_database()
+        self.a = database.create_node("Alice joined the robotics team", "general")
+        self.b = database.create_node("The robotics team ships in March", "project")
+        self.c = database.create_node("March release checklist " + "x" * 300, "project")
+        database.create_edge(self.a, self.b, weight=0.8, edge_type="entity")
+        database.create_edge(self.b, self.c, weight=0.7, edge_type="semantic")
+        self.cache = make_cache([(e["source_id"], e["target_id"], e["weight"], e["edge_type"])
+                                 for e in database.get_all_edges()])
+
+    def teardown_method(self):
+        os.unlink(self.tmp.name)
+
+    def test_previews_for_path_notes(self):
+        from paths import find_paths, PREVIEW_CHARS
+        result = find_paths(self.a, self.c, graph_cache=self.cache)
+        assert result["paths"][0]["nodes"] == [self.a, self.b, self.c]
+        assert set(result["notes"]) == {self.a, self.b, self.c}
+        assert len(result["notes"][self.c]["preview"]) == PREVIEW_CHARS
+
+    def test_missing_endpoint(self):
+        from paths import find_paths
+        result = find_paths(self.a, 99999, graph_cache=self.cache)
+        assert "error" in result
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Tests for the LSM-style segmented ANN index (hot exact segment,
+background-built HNSW segments, size-tiered merges, stale-row compaction).
+"""
+import pytest
+import numpy as np
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+DIM = 16
+
+
+def make_index(hot_max=50, background=False):
+    from segmented_index import SegmentedANNIndex
+    return SegmentedANNIndex(dimension=DIM, hot_max=hot_max, background=background)
+
+
+def vectors(n, seed=0):
+    return np.random.default_rng(seed).standard_normal((n, DIM)).astype(np.float32)
+
+
+@pytest.mark.unit
+class TestSegmentedANNIndex:
+
+    def test_hot_segment_exact_search(self):
+        index = make_index()
+        vecs = vectors(10)
+        for i, v in enumerate(vecs):
+            index.add_vector(i, v)
+        results = index.search(vecs[3], k=3, min_similarity=-1.0)
+        assert results[0][0] == 3
+        assert results[0][1] == pytest.approx(1.0, abs=1e-5)
+        assert index.vector_count == 10
+        assert index.get_stats()["segments"] == []
+
+    def test_seal_and_merge_keep_results(self):
+        index = make_index(hot_max=20)
+        vecs = vectors(400)
+        for i, v in enumerate(vecs):
+            index.add_vector(i, v)
+        index.flush()
+        stats = index.get_stats()
+        assert stats["hot_rows"] == 0
+        assert all(s["kind"] == "hnsw" for s in stats["segments"])
+        assert index.merges > 0
+        assert sum(s["rows"] for s in stats["segments"]) == 400
+        for i in (0, 123, 399):
+            assert index.search(vecs[i], k=1, min_similarity=-1.0)[0][0] == i
+
+    def test_delete_and_update_filter_stale_rows(self):
+        index = make_index(hot_max=20)
+        vecs = vectors(60)
+        for i, v in enumerate(vecs):
+            index.add_vector(i, v)
+        assert index.remove_vector(5)
+        assert not index.remove_vector(5)
+        index.add_vector(7, vecs[50])  # update: 7 now lives in the hot segment
+        found = [nid for nid, _ in index.search(vecs[5], k=60, min_similarity=-1.0)]
+        assert 5 not in found
+        assert found.count(7) == 1
+        top = index.search(vecs[50], k=2, min_similarity=-1.0)
+        assert {nid for nid, _ in top} == {7, 50}
+        assert index.vector_count == 59
+
+    def test_deleted_hot_rows_do_not_starve_top_k(self):
+        index = make_index()
+        query = vectors(1, seed=1)[0]
+        for i in range(5):
+            index.add_vector(i, query + 0.01 * i)  # nearest rows, then deleted
+        far = vectors(10, seed=2)
+        for i, v in enumerate(far):
+            index.add_vector(10 + i, v)
+        for i in range(5):
+            index.remove_vector(i)
+        assert index.get_stats()["segments"] == []  # all rows still in the hot segment
+        found = [nid for nid, _ in index.search(query, k=3, min_similarity=-1.0)]
+        assert len(found) == 3 and all(nid >= 10 for nid in found)
+
+    def test_compaction_drops_deleted_rows(self):
+        index = make_index(hot_max=20)
+        vecs = vectors(40)
+        for i, v in enumerate(vecs):
+            index.add_vector(i, v)
+        index.flush()
+        for i in range(15):
+            index.remove_vector(i)
+        index.flush()
+        from segmented_index import SEGMENT_MAX_DELETED_RATIO
+        stats = index.get_stats()
+        assert index.merges > 0
+        for s in stats["segments"]:
+            assert s["stale"] <= SEGMENT_MAX_DELETED_RATIO * s["rows"]
+        assert sum(s["rows"] - s["stale"] for s in stats["segments"]) == 25
+
+    def test_updates_compact_sealed_segments(self):
+        """Updating most rows of a sealed segment leaves it stale; it is compacted without another seal"""
+        from segmented_index import SEGMENT_MAX_DELETED_RATIO
+        index = make_index(hot_max=50)
+        vecs = vectors(80)
+        for i, v in enumerate(vecs[:40]):
+            index.add_vector(i, v)
+        index.flush()
+        merges = index.merges
+        for i in range(30):
+            index.add_vector(i, vecs[40 + i])  # updates go to the hot segment, below hot_max
+        stats = index.get_stats()
+        assert index.merges > merges and stats["hot_rows"] == 30
+        for s in stats["segments"]:
+            assert s["stale"] <= SEGMENT_MAX_DELETED_RATIO * s["rows"]
+        assert [nid for nid, _ in index.search(vecs[45], k=1, min_similarity=-1.0)] == [5]
+
+    def test_background_builds(self):
+        index = make_index(hot_max=10, background=True)
+        vecs = vectors(100)
+        for i, v in enumerate(vecs):
+            index.add_vector(i, v)
+        # Searchable before background builds finish
+        assert index.search(vecs[42], k=1, min_similarity=-1.0)[0][0] == 42
+        index.flush()
+        assert index.get_stats()["pending_jobs"] == 0
+        assert index.search(vecs[42], k=1, min_similarity=-1.0)[0][0] == 42
+
+    def test_build_and_save_load(self, tmp_path):
+        index = make_index()
+        vecs = vectors(30)
+        nodes = [{"id": i, "embedding": v.tobytes()} for i, v in enumerate(vecs)]
+        assert index.build(nodes) == 30
+        index.remove_vector(3)
+        path = str(tmp_path / "segments.npz")
+        index.save(path)
+
+        loaded = make_index()
+        loaded.load(path)
+        assert loaded.vector_count == 29
+        assert loaded.search(vecs[9], k=1, min_similarity=-1.0)[0][0] == 9
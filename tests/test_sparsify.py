@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Tests for degree-capped sparsification (sleep compute) and restoring
+archived edges.
+"""
+import random
+import pytest
+import sqlite3
+import tempfile
+import sys
+import os
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+
+def star(center, leaves, edge_type="semantic", start_id=1):
+    """Edge rows from center to each leaf; weight falls with the leaf index."""
+    return [(start_id + i, center, leaf, 1.0 - i * 0.01, edge_type) for i, leaf in enumerate(leaves)]
+
+
+def degrees(rows, edge_type=None):
+    deg = {}
+    for _, s, t, _, et in rows:
+        if edge_type in (None, et):
+            deg[s] = deg.get(s, 0) + 1
+            deg[t] = deg.get(t, 0) + 1
+    return deg
+
+
+@pytest.mark.unit
+class TestPlanSparsification:
+
+    def test_caps_degree_keeping_strongest(self):
+        from sparsify import plan_sparsification
+        rows = star(0, range(1, 21)) + [(100, 1, 2, 0.1, "semantic")]
+        removed = set(plan_sparsification(rows, {"*": 5}).tolist())
+        kept = [r for r in rows if r[0] not in removed]
+        # The hub keeps its 5 strongest; leaves that lost the hub edge keep their only edge
+        hub_edges = sorted(r[0] for r in kept if r[1] == 0)
+        assert hub_edges[:5] == [1, 2, 3, 4, 5]
+        assert all(deg >= 1 for deg in degrees(kept).values())
+        assert set(degrees(kept)) == set(degrees(rows))
+
+    def test_random_graphs_respect_cap(self):
+        """Apart from last-edge rescues, no node keeps more than the cap per type"""
+        from sparsify import plan_sparsification
+        rng = random.Random(3)
+        for _ in range(20):
+            pairs = {tuple(sorted(rng.sample(range(40), 2))) for _ in range(300)}
+            rows = [(i, s, t, rng.random(), rng.choice(["semantic", "consolidation"]))
+                    for i, (s, t) in enumerate(pairs)]
+            caps = {"semantic": 4, "consolidation": 2}
+            removed = set(plan_sparsification(rows, caps).tolist())
+            kept = [r for r in rows if r[0] not in removed]
+            total = degrees(kept)
+            assert set(total) == set(degrees(rows))  # every node still has an edge
+            for edge_type, cap in caps.items():
+                for node, deg in degrees(kept, edge_type).items():
+                    # Any excess is edges kept for a note that would otherwise have none
+                    rescues = sum(1 for _, s, t, _, et in kept if et == edge_type and node in (s, t)
+                                  and total[t if s == node else s] == 1)
+                    assert deg <= cap + rescues
+
+    def test_protected_and_uncapped_types_are_kept(self):
+        from sparsify import plan_sparsification
+        rows = star(0, range(1, 11)) + star(0, range(1, 11), "temporal_chain", start_id=50)
+        removed = set(plan_sparsification(rows, {"*": 3, "temporal_chain": 0}, protected=[10]).tolist())
+        assert 10 not in removed
+        assert not removed & set(range(50, 60))
+        # The protected edge counts towards the cap: the hub keeps 2 more semantic edges
+        assert sorted(set(range(1, 11)) - removed) == [1, 2, 10]
+
+    def test_type_caps_parsing(self):
+        from sparsify import type_caps
+        assert type_caps(50, "consolidation=10, semantic=30") == {"*": 50, "consolidation": 10, "semantic": 30}
+        assert type_caps(0, "") == {"*": 0}
+
+
+@pytest.mark.integration
+class TestSparsifyDatabase:
+
+    def setup_method(self):
+        self.tmp = tempfile.NamedTemporaryFile(suffix=".db", delete=False)
+        self.tmp.close()
+        import database
+        database.DB_PATH = self.tmp.name
+        database.init_database()
+        self.db = database
+        self.hub = self.db.create_node("Hub note", "test")
+        self.leaves = [self.db.create_node(f"Leaf {i}", "test") for i in range(12)]
+        for i, leaf in enumerate(self.leaves):
+            self.db.create_edge(self.hub, leaf, weight=0.9 - i * 0.05, edge_type="consolidation")
+        for a, b in zip(self.leaves, self.leaves[1:]):
+            self.db.create_edge(a, b, weight=0.8, edge_type="semantic")
+
+    def teardown_method(self):
+        os.unlink(self.tmp.name)
+
+    def age(self, days):
+        old = (datetime.now() - timedelta(days=days)).isoformat()
+        conn = sqlite3.connect(self.tmp.name)
+        conn.execute("UPDATE edges SET created_at = ?", (old,))
+        conn.execute("UPDATE nodes SET last_accessed = ?", (old,))
+        conn.commit()
+        conn.close()
+
+    def test_archive_and_restore_round_trip(self):
+        from sparsify import sparsify_edges, restore_edges
+        self.age(60)
+        before = {(e["source_id"], e["target_id"], e["edge_type"]) for e in self.db.get_all_edges()}
+
+        dry = sparsify_edges(self.tmp.name, caps={"*": 4}, keep_recent_days=14, report_queries=5, dry_run=True)
+        assert dry["removed"] > 0 and len(self.db.get_all_edges()) == len(before)
+
+        result = sparsify_edges(self.tmp.name, caps={"*": 4}, keep_recent_days=14, report_queries=5)
+        assert result["removed"] == dry["removed"]
+        assert result["by_type"] == {"consolidation": result["removed"]}
+        assert result["after"]["max_degree"] < result["before"]["max_degree"]
+        assert result["after"]["edges_expanded"] <= result["before"]["edges_expanded"]
+        assert len(self.db.get_all_edges()) == len(before) - result["removed"]
+
+        # Consolidation does not re-create archived pairs
+        from memory_consolidation import MemoryConsolidator
+        MemoryConsolidator(self.tmp.name).create_consolidation_links([[self.hub, leaf] for leaf in self.leaves], [])
+        assert len(self.db.get_all_edges()) == len(before) - result["removed"]
+
+        self.db.delete_node(self.leaves[-1])
+        restored = restore_edges(self.tmp.name)
+        assert restored["dangling"] == 1
+        after = {(e["source_id"], e["target_id"], e["edge_type"]) for e in self.db.get_all_edges()}
+        assert after == {e for e in before if self.leaves[-1] not in e[:2]}
+        assert restore_edges(self.tmp.name)["matched"] == 1
+
+    def test_recent_edges_are_protected(self):
+        from sparsify import sparsify_edges
+        result = sparsify_edges(self.tmp.name, caps={"*": 4}, keep_recent_days=14, report_queries=0)
+        assert result["removed"] == 0 and result["protected"] == 23
@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+Tests for bounded spreading activation (frontier cap, edge budget,
+convergence-based early exit) and its search_logs columns.
+"""
+import pytest
+import sqlite3
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+
+class StarGraph:
+    """Hub 0 connected to leaves 1..n (plus a chain 1-2 for non-hub spread)."""
+
+    def __init__(self, leaves):
+        self.adj = {0: [(i, 0.5, "entity") for i in range(1, leaves + 1)]}
+        for i in range(1, leaves + 1):
+            self.adj[i] = [(0, 0.5, "entity")]
+
+    def get_neighbors(self, node_id):
+        return self.adj.get(node_id, [])
+
+    def top_neighbors(self, node_id, limit=0):
+        row = sorted(self.get_neighbors(node_id), key=lambda e: e[1], reverse=True)
+        return row[:limit] if limit else row
+
+
+@pytest.mark.unit
+class TestBoundedSpreading:
+
+    def test_unbounded_matches_classic_spreading(self):
+        """With no budgets, one iteration equals the original update rule"""
+        from spreading import spread_activation
+        graph = StarGraph(3)
+        acts, stats = spread_activation({1: 1.0}, graph, iterations=1, decay=0.7,
+                                        max_frontier=0, max_edges=0, epsilon=0)
+        # 1 keeps 0.7, hub receives 1.0 * 0.5 * 0.7 = 0.35; normalized by max
+        assert acts == pytest.approx({1: 1.0, 0: 0.5})
+        assert stats["iterations"] == 1
+        assert stats["edges_expanded"] == 1
+
+    def test_edge_budget_caps_hub_expansion(self):
+        from spreading import spread_activation
+        graph = StarGraph(10000)
+        _, stats = spread_activation({0: 1.0}, graph, iterations=3, decay=0.7,
+                                     max_frontier=0, max_edges=500, epsilon=0)
+        assert stats["edges_expanded"] == 500
+        assert stats["edge_budget_hit"]
+        assert stats["nodes_touched"] == 501
+
+    def test_edge_budget_keeps_strongest_hub_edges(self):
+        """A budget cut reads the hub's strongest edges off the CSR row, never its whole row"""
+        from graph_cache import GraphCache
+        from spreading import spread_activation
+        cache = GraphCache()
+        cache.build([{"source_id": 0, "target_id": i, "weight": i / 1000, "edge_type": "semantic"}
+                     for i in range(1, 1001)])
+        cache.get_neighbors = None
+        acts, stats = spread_activation({0: 1.0}, cache, iterations=3, decay=0.7,
+                                        max_frontier=0, max_edges=10, epsilon=0)
+        assert set(acts) - {0} == set(range(991, 1001))
+        assert stats["edges_expanded"] == 10 and stats["edge_budget_hit"] and stats["iterations"] == 1
+
+    def test_frontier_keeps_strongest_nodes(self):
+        from spreading import spread_activation
+        graph = StarGraph(100)
+        seeds = {i: i / 100 for i in range(1, 101)}
+        _, stats = spread_activation(seeds, graph, iterations=1, decay=0.7,
+                                     max_frontier=10, max_edges=0, epsilon=0)
+        assert stats["frontier_truncated"]
+        assert stats["edges_expanded"] == 10
+
+    def test_converges_early(self):
+        from spreading import spread_activation
+        graph = StarGraph(2)
+        _, stats = spread_activation({1: 1.0}, graph, iterations=50, decay=0.7,
+                                     max_frontier=0, max_edges=0, epsilon=1e-3)
+        assert stats["converged"]
+        assert stats["iterations"] < 50
+
+
+class AdjacencyGraph:
+    """Undirected weighted graph from an edge list."""
+
+    def __init__(self, edges):
+        self.adj = {}
+        for a, b, w in edges:
+            self.adj.setdefault(a, []).append((b, w, "semantic"))
+            self.adj.setdefault(b, []).append((a, w, "semantic"))
+
+    def get_neighbors(self, node_id):
+        return self.adj.get(node_id, [])
+
+    def top_neighbors(self, node_id, limit=0):
+        row = sorted(self.get_neighbors(node_id), key=lambda e: e[1], reverse=True)
+        return row[:limit] if limit else row
+
+
+def exact_ppr(graph, seeds, alpha, iters=200):
+    """Power iteration reference: p = alpha * s + (1 - alpha) * p W."""
+    nodes = sorted(graph.adj)
+    total = sum(seeds.values())
+    s = {n: seeds.get(n, 0.0) / total for n in nodes}
+    p = dict(s)
+    for _ in range(iters):
+        nxt = {n: alpha * s[n] for n in nodes}
+        for u in nodes:
+            nbrs = graph.get_neighbors(u)
+            wsum = sum(w for _, w, _ in nbrs)
+            for v, w, _ in nbrs:
+                nxt[v] += (1 - alpha) * p[u] * w / wsum
+        p = nxt
+    return p
+
+
+@pytest.mark.unit
+class TestPPRPush:
+
+    def test_matches_power_iteration_ranking(self):
+        import random
+        rng = random.Random(7)
+        edges = [(i, (i + 1) % 60, 0.5 + rng.random() / 2) for i in range(60)]
+        edges += [(rng.randrange(60), rng.randrange(60), rng.random()) for _ in range(120)]
+        edges = [(a, b, w) for a, b, w in edges if a != b]
+        graph = AdjacencyGraph(edges)
+        from spreading import ppr_push
+        seeds = {3: 1.0, 17: 0.5}
+        approx, stats = ppr_push(seeds, graph, alpha=0.15, epsilon=1e-5, max_edges=0)
+        exact = exact_ppr(graph, seeds, alpha=0.15)
+        top_exact = sorted(exact, key=exact.get, reverse=True)[:5]
+        top_approx = sorted(approx, key=approx.get, reverse=True)[:5]
+        assert top_exact == top_approx
+        assert stats["residual"] < 1e-2
+
+    def test_work_follows_locality_not_graph_size(self):
+        """Pushes on a long path depend on epsilon, not on path length"""
+        from spreading import ppr_push
+        small = AdjacencyGraph([(i, i + 1, 1.0) for i in range(1000)])
+        large = AdjacencyGraph([(i, i + 1, 1.0) for i in range(100000)])
+        _, s_small = ppr_push({500: 1.0}, small, alpha=0.15, epsilon=1e-4, max_edges=0)
+        _, s_large = ppr_push({500: 1.0}, large, alpha=0.15, epsilon=1e-4, max_edges=0)
+        assert s_small["edges_expanded"] == s_large["edges_expanded"]
+        assert s_large["nodes_touched"] < 200
+
+    def test_seed_scores_highest_and_decays_with_distance(self):
+        from spreading import ppr_push
+        graph = AdjacencyGraph([(i, i + 1, 1.0) for i in range(20)])
+        scores, _ = ppr_push({10: 1.0}, graph, alpha=0.3, epsilon=1e-6, max_edges=0)
+        assert scores[10] == 1.0
+        assert scores[10] > scores[11] > scores[12] > scores[13]
+
+    def test_edge_budget(self):
+        from spreading import ppr_push
+        graph = StarGraph(5000)
+        _, stats = ppr_push({0: 1.0}, graph, alpha=0.15, epsilon=1e-9, max_edges=6000)
+        assert stats["edges_expanded"] <= 6000
+        assert stats["edge_budget_hit"]
+
+
+def three_cliques():
+    """Cliques A (0-4), B (10-14), C (20-24); strong bridge A-B (4-10), weak bridge A-C (3-20)."""
+    edges = []
+    for base in (0, 10, 20):
+        edges += [(base + i, base + j, 0.8) for i in range(5) for j in range(i + 1, 5)]
+    edges += [(4, 10, 0.9), (3, 20, 0.2)]
+    communities = {n: n // 10 for n in range(25) if n % 10 < 5}
+    return AdjacencyGraph(edges), communities
+
+
+@pytest.mark.unit
+class TestCommunitySpreading:
+
+    def test_no_bridges_stays_inside(self):
+        from spreading import spread_community
+        graph, communities = three_cliques()
+        acts, stats = spread_community({0: 1.0}, graph, lambda n: communities.get(n, -1), 3, 0.7,
+                                       bridges=0, max_frontier=0, max_edges=0, epsilon=0)
+        assert set(acts) == {0, 1, 2, 3, 4}
+        assert stats["pruned_edges"] == 2 and stats["bridges"] == 0
+
+    def test_strongest_bridge_followed(self):
+        from spreading import spread_community, spread_activation
+        graph, communities = three_cliques()
+        acts, stats = spread_community({0: 1.0}, graph, lambda n: communities.get(n, -1), 3, 0.7,
+                                       bridges=1, max_frontier=0, max_edges=0, epsilon=0)
+        assert {10, 11, 12, 13, 14} <= set(acts)
+        assert not set(acts) & {20, 21, 22, 23, 24}
+        assert stats["bridged_communities"] == 1
+        full, _ = spread_activation({0: 1.0}, graph, 3, 0.7, max_frontier=0, max_edges=0, epsilon=0)
+        # Home community is the unrestricted top-5 as well
+        assert set(sorted(acts, key=acts.get, reverse=True)[:5]) == set(sorted(full, key=full.get, reverse=True)[:5])
+
+    def test_less_work_on_clustered_graph(self):
+        """20 cliques with weak random links between them: community mode touches far fewer nodes"""
+        import random
+        from spreading import spread_community, spread_activation
+        rng = random.Random(3)
+        edges, communities = [], {}
+        for c in range(20):
+            members = [c * 10 + i for i in range(8)]
+            communities.update({n: c for n in members})
+            edges += [(a, b, 0.6) for i, a in enumerate(members) for b in members[i + 1:]]
+        nodes = sorted(communities)
+        edges += [(a, rng.choice(nodes), 0.2) for a in nodes for _ in range(2)]
+        graph = AdjacencyGraph([(a, b, w) for a, b, w in edges if communities[a] != communities[b] or w > 0.5])
+        full, full_stats = spread_activation({0: 1.0}, graph, 3, 0.7, max_frontier=0, max_edges=0, epsilon=0)
+        acts, stats = spread_community({0: 1.0}, graph, communities.get, 3, 0.7,
+                                       bridges=2, max_frontier=0, max_edges=0, epsilon=0)
+        assert stats["nodes_touched"] < full_stats["nodes_touched"] / 2
+        assert stats["edges_expanded"] < full_stats["edges_expanded"]
+        top = sorted(full, key=full.get, reverse=True)[:8]
+        assert len(set(top) & set(sorted(acts, key=acts.get, reverse=True)[:8])) >= 7
+
+    def test_view_top_neighbors_skips_crossings(self):
+        from spreading import _CommunityView
+        graph = AdjacencyGraph([(0, 1, 0.2), (0, 2, 0.3)] + [(0, 10 + i, 0.9) for i in range(5)])
+        view = _CommunityView(graph, {0: 0, 1: 0, 2: 0}.get, {0})
+        assert view.top_neighbors(0, limit=1) == [(2, 0.3, "semantic")]
+        assert view.top_neighbors(0, limit=5) == [(2, 0.3, "semantic"), (1, 0.2, "semantic")]
+        assert set(view.crossings) == {(0, 10 + i) for i in range(5)}
+
+    def test_unassigned_nodes_not_pruned(self):
+        """Notes added after the last sleep-compute run have no community and stay reachable"""
+        from spreading import spread_community
+        graph, communities = three_cliques()
+        graph.adj.setdefault(0, []).append((99, 0.5, "semantic"))
+        graph.adj[99] = [(0, 0.5, "semantic")]
+        acts, _ = spread_community({0: 1.0}, graph, lambda n: communities.get(n, -1), 2, 0.7,
+                                   bridges=0, max_frontier=0, max_edges=0, epsilon=0)
+        assert 99 in acts
+
+
+@pytest.mark.integration
+class TestSpreadingLogs:
+
+    def test_old_table_migrated_and_logged(self, tmp_path, monkeypatch):
+        """Pre-upgrade search_logs gain the work columns; finish() fills them"""
+        import search_logger
+        db = str(tmp_path / "old.db")
+        old_schema = search_logger.SCHEMA.replace(""",
+    
+    -- Spreading activation work
+    spread_iterations INTEGER,
+    nodes_touched INTEGER,
+    edges_expanded INTEGER""", "")
+        conn = sqlite3.connect(db)
+        conn.executescript(old_schema)
+        conn.close()
+        monkeypatch.setattr(search_logger, "DB_PATH", db)
+
+        # Stats must not fail before the first search migrates the table
+        stats = search_logger.get_search_stats()
+        assert "error" not in stats and "spreading" not in stats
+
+        slog = search_logger.SearchLogger()
+        conn = sqlite3.connect(db)
+        cols = {row[1] for row in conn.execute("PRAGMA table_info(search_logs)")}
+        conn.close()
+        assert {"spread_iterations", "nodes_touched", "edges_expanded"} <= cols
+
+        slog.start()
+        slog.finish("hub query", [{"id": 1, "activation": 0.9}], 10,
+                    signals={"spread_iterations": 2, "nodes_touched": 40, "edges_expanded": 500})
+        stats = search_logger.get_search_stats()
+        assert stats["spreading"]["max_edges_expanded"] == 500
+        assert stats["spreading"]["avg_nodes_touched"] == 40
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Tests for temporal_extractor.py: the combined single-pass pattern, the
+prefilter fast path and the batch API.
+"""
+import pytest
+import sys
+import os
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+REF = datetime(2025, 3, 12, 15, 30)  # a Wednesday
+
+# One example per pattern, in pattern order
+EXAMPLES = [
+    "2025-01-15", "1/15/2025", "january 15, 2025", "15 january 2025",
+    "last summer", "next week", "this month", "3 days ago", "yesterday", "in october 2024", "on friday",
+    "прошлой неделе", "следующем месяце", "2 дня назад", "позавчера", "в мае 2023",
+]
+
+
+@pytest.mark.unit
+class TestTemporalExtractor:
+
+    def test_every_pattern_passes_prefilter_and_matches(self):
+        from temporal_extractor import might_contain_temporal, _find_matches, _PATTERN_GROUPS
+        assert len(EXAMPLES) == len(_PATTERN_GROUPS)
+        for example in EXAMPLES:
+            assert might_contain_temporal(example), example
+            assert [g[0] for _, _, g in _find_matches(example)] == [example]
+        assert not might_contain_temporal("refactored the billing service, see notes on hiring")
+
+    def test_overlapping_matches_kept_in_pattern_order(self):
+        from temporal_extractor import extract_temporal_expressions
+        result = extract_temporal_expressions("Kickoff: in January 15, 2025 (yesterday was 2025-01-14)", REF)
+        # explicit dates first, then relative; month_ref and written_date overlap
+        assert result["expressions"] == ["2025-01-14", "january 15, 2025", "yesterday", "in january "]
+        assert result["t_event_start"] == "2025-01-14T00:00:00"
+
+        result = extract_temporal_expressions("Сегодня обсуждали отпуск, last week too", REF)
+        assert result["expressions"] == ["last week", "сегодня"]
+        assert result["t_event_start"] == "2025-03-12T00:00:00"  # narrowest range wins
+
+        assert extract_temporal_expressions("No dates here", REF) == {
+            "expressions": [], "t_event_start": None, "t_event_end": None}
+
+    def test_batch_uses_per_text_reference(self):
+        from temporal_extractor import extract_temporal_batch, extract_temporal_expressions
+        texts = ["yesterday", "nothing", "2 weeks ago"]
+        refs = [REF, None, datetime(2024, 1, 10)]
+        batch = extract_temporal_batch(texts, refs)
+        assert batch[0] == extract_temporal_expressions("yesterday", REF)
+        assert batch[1]["t_event_start"] is None
+        assert batch[2]["t_event_start"] == "2023-12-27T00:00:00"
+        assert [r["t_event_start"] for r in extract_temporal_batch(texts[:1], REF)] == ["2025-03-11T00:00:00"]